@@ -8,6 +8,7 @@ import logging
 import os
 import sys
 import time as timemod
+from collections import deque
 from glob import iglob
 from threading import Event, enumerate as enumerate_threads
 from traceback import print_exc
@@ -20,6 +21,7 @@ from twisted.python.threadable import isInIOThread
 
 from Tribler.Core.CacheDB.sqlitecachedb import forceDBThread
 from Tribler.Core.DownloadConfig import DownloadStartupConfig, DefaultDownloadStartupConfig
+from Tribler.Core.Libtorrent.ResumeStateStore import ResumeStateStore
 from Tribler.Core.Modules.search_manager import SearchManager
 from Tribler.Core.Modules.versioncheck_manager import VersionCheckManager
 from Tribler.Core.Modules.watch_folder import WatchFolder
@@ -32,7 +34,7 @@ from Tribler.Core.Video.VideoServer import VideoServer
 from Tribler.Core.exceptions import DuplicateDownloadException
 from Tribler.Core.simpledefs import (NTFY_DISPERSY, NTFY_STARTED, NTFY_TORRENTS, NTFY_UPDATE, NTFY_TRIBLER,
                                      NTFY_FINISHED, DLSTATUS_DOWNLOADING, DLSTATUS_STOPPED_ON_ERROR, NTFY_ERROR,
-                                     DLSTATUS_SEEDING, NTFY_TORRENT, NTFY_MARKET_IOM_INPUT_REQUIRED)
+                                     DLSTATUS_SEEDING, DLSTATUS_STOPPED, NTFY_TORRENT, NTFY_MARKET_IOM_INPUT_REQUIRED)
 from Tribler.community.market.wallet.btc_wallet import BitcoinWallet
 from Tribler.community.market.wallet.dummy_wallet import DummyWallet1, DummyWallet2
 from Tribler.community.market.wallet.tc_wallet import TrustchainWallet
@@ -41,6 +43,14 @@ from Tribler.community.tunnel.tunnel_community import TunnelSettings
 from Tribler.dispersy.taskmanager import TaskManager
 from Tribler.dispersy.util import blockingCallFromThread, blocking_call_on_reactor_thread
 
+# Checkpoints are parsed on the thread pool in chunks of this size
+RESUME_PARSE_CHUNK_SIZE = 100
+# Parsed downloads are added to libtorrent in batches of this size, one batch every RESUME_BATCH_INTERVAL seconds
+RESUME_BATCH_SIZE = 50
+RESUME_BATCH_INTERVAL = 0.5
+# A resumed download is considered active once it reaches one of these states
+RESUME_ACTIVE_STATES = (DLSTATUS_SEEDING, DLSTATUS_DOWNLOADING, DLSTATUS_STOPPED, DLSTATUS_STOPPED_ON_ERROR)
+
 
 class TriblerLaunchMany(TaskManager):
 
@@ -55,6 +65,8 @@ class TriblerLaunchMany(TaskManager):
         self.previous_active_downloads = []
         self.download_states_lc = None
         self.get_peer_list = []
+        # Infohash -> (state key, DownloadState) of the states handed to the last download states callback
+        self.download_states = {}
 
         self._logger = logging.getLogger(self.__class__.__name__)
 
@@ -67,8 +79,17 @@ class TriblerLaunchMany(TaskManager):
 
         self.shutdownstarttime = None
 
+        # Resuming downloads at startup
+        self.resume_queue = deque()
+        self.resume_chunks_pending = 0
+        self.resume_pending = set()
+        self.resume_started_at = None
+        self.resume_deferred = None
+        self.startup_metrics = {}
+
         # modules
         self.torrent_store = None
+        self.resume_store = None
         self.metadata_store = None
         self.rtorrent_handler = None
         self.tftp_handler = None
@@ -116,6 +137,9 @@ class TriblerLaunchMany(TaskManager):
                 from Tribler.Core.leveldbstore import LevelDbStore
                 self.torrent_store = LevelDbStore(self.session.config.get_torrent_store_dir())
 
+            if self.session.config.get_libtorrent_resume_store_enabled():
+                self.resume_store = ResumeStateStore(self.session.config.get_libtorrent_resume_store_dir())
+
             if self.session.config.get_metadata_enabled():
                 from Tribler.Core.leveldbstore import LevelDbStore
                 self.metadata_store = LevelDbStore(self.session.config.get_metadata_store_dir())
@@ -172,7 +196,9 @@ class TriblerLaunchMany(TaskManager):
 
                 # register TFTP service
                 from Tribler.Core.TFTP.handler import TftpHandler
-                self.tftp_handler = TftpHandler(self.session, endpoint, "fffffffd".decode('hex'), block_size=1024)
+                window_size = self.session.config.get_torrent_collecting_tftp_window_size()
+                self.tftp_handler = TftpHandler(self.session, endpoint, "fffffffd".decode('hex'), block_size=1024,
+                                                window_size=window_size)
                 self.tftp_handler.initialize()
 
             if self.session.config.get_torrent_search_enabled() or self.session.config.get_channel_search_enabled():
@@ -554,13 +580,23 @@ class TriblerLaunchMany(TaskManager):
     def _invoke_states_cb(self, callback):
         """
         Invoke the download states callback with a list of the download states.
+        The state of a download is only rebuilt when it may have changed since the last call, idle and stopped
+        downloads reuse their previous state.
         """
         dslist = []
-        for d in self.downloads.values():
-            d.set_moreinfo_stats(True in self.get_peer_list or d.get_def().get_infohash() in
-                                 self.get_peer_list)
-            ds = d.network_get_state(None, False)
+        download_states = {}
+        for infohash, d in self.downloads.items():
+            get_peer_list = True in self.get_peer_list or infohash in self.get_peer_list
+            d.set_moreinfo_stats(get_peer_list)
+
+            state_key = d.get_state_key()
+            cached_key, ds = self.download_states.get(infohash, (None, None))
+            if get_peer_list or state_key is None or state_key != cached_key:
+                ds = d.network_get_state(None, False)
+            if not get_peer_list:
+                download_states[infohash] = (state_key, ds)
             dslist.append(ds)
+        self.download_states = download_states
 
         def on_cb_done(new_get_peer_list):
             self.get_peer_list = new_get_peer_list
@@ -584,6 +620,11 @@ class TriblerLaunchMany(TaskManager):
             tdef = download.get_def()
             safename = tdef.get_name_as_unicode()
 
+            if self.resume_pending and state in RESUME_ACTIVE_STATES:
+                self.resume_pending.discard(tdef.get_infohash())
+                if not self.resume_pending:
+                    self.on_resume_active()
+
             if state == DLSTATUS_DOWNLOADING:
                 new_active_downloads.append(safename)
             elif state == DLSTATUS_STOPPED_ON_ERROR:
@@ -629,16 +670,132 @@ class TriblerLaunchMany(TaskManager):
 
         def do_load_checkpoint():
             with self.session_lock:
-                for i, filename in enumerate(iglob(os.path.join(self.session.get_downloads_pstate_dir(), '*.state'))):
-                    self.resume_download(filename, setupDelay=i * 0.1)
+                return self.resume_downloads(self.get_checkpoint_infohashes())
 
         if self.initComplete:
-            do_load_checkpoint()
+            return do_load_checkpoint()
         else:
             self.register_task("load_checkpoint", reactor.callLater(1, do_load_checkpoint))
 
+    def get_checkpoint_infohashes(self):
+        """
+        Returns the infohashes of all downloads that have a checkpoint, either in the resume store or on disk.
+        """
+        infohashes = set(self.resume_store.get_infohashes()) if self.resume_store else set()
+        for filename in iglob(os.path.join(self.session.get_downloads_pstate_dir(), '*.state')):
+            try:
+                infohashes.add(binascii.unhexlify(os.path.basename(filename)[:-6]))
+            except TypeError:
+                self._logger.warning("tlm: ignoring checkpoint with invalid name %s", filename)
+        return list(infohashes)
+
+    def resume_downloads(self, infohashes):
+        """
+        Resumes the downloads with the given infohashes. The checkpoints are parsed on the thread pool, after which
+        the downloads are added to libtorrent in batches of RESUME_BATCH_SIZE.
+        :return: a Deferred that fires when all downloads have been added
+        """
+        self.resume_started_at = timemod.time()
+        self.resume_pending = set(infohashes)
+        self.resume_deferred = Deferred()
+        self.startup_metrics = {'downloads_to_resume': len(infohashes)}
+        self._logger.info("tlm: resuming %d downloads", len(infohashes))
+
+        chunks = [infohashes[index:index + RESUME_PARSE_CHUNK_SIZE]
+                  for index in xrange(0, len(infohashes), RESUME_PARSE_CHUNK_SIZE)]
+        self.resume_chunks_pending = len(chunks)
+        for chunk in chunks:
+            # The resume store is flushed on the reactor thread, so it is read here and only parsed on the thread pool
+            stored_pstates = [self.resume_store.get_data(infohash) if self.resume_store else None
+                              for infohash in chunk]
+            deferToThread(self.load_resume_states, chunk, stored_pstates).addCallbacks(self.on_resume_states_loaded,
+                                                                                       self.on_resume_states_failed)
+        if not chunks:
+            self.on_resume_states_loaded([])
+        return self.resume_deferred
+
+    def load_resume_states(self, infohashes, stored_pstates):
+        """
+        Loads the checkpoints of the given downloads. Called on the thread pool.
+        :param stored_pstates: the pstates of the downloads as read from the resume store, None if not in the store
+        :return: a list of (infohash, tdef, dscfg, pstate) tuples
+        """
+        return [(infohash,) + self.load_resume_state(infohash, stored_pstate)
+                for infohash, stored_pstate in zip(infohashes, stored_pstates)]
+
+    def load_resume_state(self, infohash, stored_pstate=None):
+        """
+        Loads the checkpoint of a download, from the given resume store data or from its .state file. Called by any
+        thread.
+        :return: a (tdef, dscfg, pstate) tuple, tdef and dscfg are None if the checkpoint is invalid
+        """
+        tdef = dscfg = pstate = None
+        try:
+            if stored_pstate is not None:
+                pstate = ResumeStateStore.parse(stored_pstate)
+            else:
+                pstate = self.load_download_pstate_file_noexc(infohash)
+            if pstate is not None:
+                tdef, dscfg = self.create_download_from_pstate(pstate)
+        except Exception:
+            self._logger.exception("tlm: invalid checkpoint for %s", binascii.hexlify(infohash))
+            tdef = dscfg = None
+        return tdef, dscfg, pstate
+
+    def on_resume_states_loaded(self, resume_states):
+        self.resume_queue.extend(resume_states)
+        self.resume_chunks_pending = max(self.resume_chunks_pending - 1, 0)
+        if not self.is_pending_task_active("resume_batch"):
+            self.resume_batch()
+
+    def on_resume_states_failed(self, failure):
+        self._logger.error("tlm: failed to load checkpoints: %s", failure.getErrorMessage())
+        self.on_resume_states_loaded([])
+
+    def resume_batch(self):
+        """
+        Adds the next batch of parsed downloads and schedules the one after that.
+        """
+        with self.session_lock:
+            for _ in xrange(min(RESUME_BATCH_SIZE, len(self.resume_queue))):
+                infohash, tdef, dscfg, pstate = self.resume_queue.popleft()
+                self.resume_parsed_download(infohash, tdef, dscfg, pstate)
+
+        if self.resume_queue:
+            self.register_task("resume_batch", reactor.callLater(RESUME_BATCH_INTERVAL, self.resume_batch))
+        elif not self.resume_chunks_pending and self.resume_deferred:
+            self.startup_metrics['time_to_all_added'] = timemod.time() - self.resume_started_at
+            self._logger.info("tlm: added %d resumed downloads in %.2f seconds",
+                              self.startup_metrics['downloads_to_resume'], self.startup_metrics['time_to_all_added'])
+            resume_deferred, self.resume_deferred = self.resume_deferred, None
+            if not self.resume_pending:
+                self.on_resume_active()
+            resume_deferred.callback(None)
+
+    def on_resume_active(self):
+        """
+        Called when every resumed download is seeding, downloading or stopped.
+        """
+        if self.resume_started_at is None or 'time_to_all_active' in self.startup_metrics:
+            return
+        self.startup_metrics['time_to_all_active'] = timemod.time() - self.resume_started_at
+        self._logger.info("tlm: all resumed downloads active after %.2f seconds",
+                          self.startup_metrics['time_to_all_active'])
+
     def load_download_pstate_noexc(self, infohash):
-        """ Called by any thread, assume session_lock already held """
+        """ Called by network thread, assume session_lock already held """
+        if self.resume_store:
+            try:
+                pstate = self.resume_store.get(infohash)
+                if pstate is not None:
+                    return pstate
+            except Exception:
+                self._logger.exception("Exception while loading pstate: %s", infohash)
+
+        return self.load_download_pstate_file_noexc(infohash)
+
+    def load_download_pstate_file_noexc(self, infohash):
+        """ Called by any thread """
         try:
             basename = binascii.hexlify(infohash) + '.state'
             filename = os.path.join(self.session.get_downloads_pstate_dir(), basename)
@@ -650,32 +807,44 @@ class TriblerLaunchMany(TaskManager):
         except Exception:
             self._logger.exception("Exception while loading pstate: %s", infohash)
 
+    def create_download_from_pstate(self, pstate):
+        """
+        Creates the TorrentDef and DownloadStartupConfig of a download from its pstate.
+        """
+        # SWIFTPROC
+        metainfo = pstate.get('state', 'metainfo')
+        if 'infohash' in metainfo:
+            tdef = TorrentDefNoMetainfo(metainfo['infohash'], metainfo['name'], metainfo.get('url', None))
+        else:
+            tdef = TorrentDef.load_from_dict(metainfo)
+
+        if pstate.has_option('download_defaults', 'saveas') and \
+                isinstance(pstate.get('download_defaults', 'saveas'), tuple):
+            pstate.set('download_defaults', 'saveas', pstate.get('download_defaults', 'saveas')[-1])
+
+        return tdef, DownloadStartupConfig(pstate)
+
     def resume_download(self, filename, setupDelay=0):
         tdef = dscfg = pstate = None
 
         try:
             pstate = self.load_download_pstate(filename)
-
-            # SWIFTPROC
-            metainfo = pstate.get('state', 'metainfo')
-            if 'infohash' in metainfo:
-                tdef = TorrentDefNoMetainfo(metainfo['infohash'], metainfo['name'], metainfo.get('url', None))
-            else:
-                tdef = TorrentDef.load_from_dict(metainfo)
-
-            if pstate.has_option('download_defaults', 'saveas') and \
-                    isinstance(pstate.get('download_defaults', 'saveas'), tuple):
-                pstate.set('download_defaults', 'saveas', pstate.get('download_defaults', 'saveas')[-1])
-
-            dscfg = DownloadStartupConfig(pstate)
-
+            tdef, dscfg = self.create_download_from_pstate(pstate)
         except:
             # pstate is invalid or non-existing
-            _, file = os.path.split(filename)
+            tdef = dscfg = None
 
-            infohash = binascii.unhexlify(file[:-6])
+        _, file = os.path.split(filename)
+        infohash = binascii.unhexlify(file[:-6])
+        self.resume_parsed_download(infohash, tdef, dscfg, pstate, setupDelay=setupDelay)
 
-            torrent_data = self.torrent_store.get(infohash)
+    def resume_parsed_download(self, infohash, tdef, dscfg, pstate, setupDelay=0):
+        """
+        Adds a download from its checkpoint. If the checkpoint is invalid, we try to restart the download using the
+        torrent file from the torrent store.
+        """
+        if tdef is None or dscfg is None:
+            torrent_data = self.torrent_store.get(infohash) if self.torrent_store is not None else None
             if torrent_data:
                 try:
                     tdef = TorrentDef.load_from_memory(torrent_data)
@@ -699,16 +868,21 @@ class TriblerLaunchMany(TaskManager):
                 try:
                     if not self.download_exists(tdef.get_infohash()):
                         self.add(tdef, dscfg, pstate, setupDelay=setupDelay)
+                        return
                     else:
                         self._logger.info("tlm: not resuming checkpoint because download has already been added")
 
                 except Exception as e:
                     self._logger.exception("tlm: load check_point: exception while adding download %s", tdef)
             else:
-                self._logger.info("tlm: removing checkpoint %s destdir is %s", filename, dscfg.get_dest_dir())
-                os.remove(filename)
+                self._logger.info("tlm: removing checkpoint %s destdir is %s",
+                                  binascii.hexlify(infohash), dscfg.get_dest_dir())
+                self.remove_checkpoint(infohash)
         else:
-            self._logger.info("tlm: could not resume checkpoint %s %s %s", filename, tdef, dscfg)
+            self._logger.info("tlm: could not resume checkpoint %s %s %s", binascii.hexlify(infohash), tdef, dscfg)
+
+        # This download will never become active, so do not wait for it
+        self.resume_pending.discard(infohash)
 
     def checkpoint_downloads(self):
         """
@@ -735,16 +909,8 @@ class TriblerLaunchMany(TaskManager):
     def remove_pstate(self, infohash):
         def do_remove():
             if not self.download_exists(infohash):
-                dlpstatedir = self.session.get_downloads_pstate_dir()
-
-                # Remove checkpoint
-                hexinfohash = binascii.hexlify(infohash)
                 try:
-                    basename = hexinfohash + '.state'
-                    filename = os.path.join(dlpstatedir, basename)
-                    self._logger.debug("remove pstate: removing dlcheckpoint entry %s", filename)
-                    if os.access(filename, os.F_OK):
-                        os.remove(filename)
+                    self.remove_checkpoint(infohash)
                 except:
                     # Show must go on
                     self._logger.exception("Could not remove state")
@@ -877,6 +1043,41 @@ class TriblerLaunchMany(TaskManager):
             self.ltmgr.shutdown()
             self.ltmgr = None
 
+        # Close the resume store after the final checkpoints have been written to it
+        if self.resume_store is not None:
+            self.resume_store.close()
+            self.resume_store = None
+
+    def remove_checkpoint(self, infohash):
+        """
+        Removes the checkpoint of a download from the resume store and from disk.
+        """
+        if self.resume_store:
+            self.resume_store.remove(infohash)
+
+        filename = os.path.join(self.session.get_downloads_pstate_dir(), binascii.hexlify(infohash) + '.state')
+        self._logger.debug("remove pstate: removing dlcheckpoint entry %s", filename)
+        if os.access(filename, os.F_OK):
+            os.remove(filename)
+
+    def write_download_pstate(self, infohash, pstate):
+        """
+        Writes the checkpoint of a download, to the resume store if it is enabled or to a .state file otherwise.
+        Called on the reactor thread.
+        """
+        filename = os.path.join(self.session.get_downloads_pstate_dir(), binascii.hexlify(infohash) + '.state')
+        if self.resume_store:
+            self.resume_store.put(infohash, pstate)
+            # A checkpoint file from before the resume store was enabled is replaced by the one in the store. Until
+            # the store is flushed the file is the only copy on disk, so the store is flushed first. This only happens
+            # once per download.
+            if os.access(filename, os.F_OK):
+                self.resume_store.flush()
+                os.remove(filename)
+        else:
+            self._logger.debug("tlm: network checkpointing: to file %s", filename)
+            pstate.write_file(filename)
+
     def save_download_pstate(self, infohash, pstate):
         """ Called by network thread """
 
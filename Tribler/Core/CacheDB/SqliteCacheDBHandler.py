@@ -5,7 +5,6 @@ Author(s): Jie Yang
 """
 import json
 import logging
-import math
 import os
 import threading
 from collections import OrderedDict, defaultdict
@@ -20,7 +19,8 @@ from twisted.internet.task import LoopingCall
 
 from Tribler.Core.CacheDB.sqlitecachedb import bin2str, str2bin
 from Tribler.Core.TorrentDef import TorrentDef
-from Tribler.Core.Utilities.search_utils import split_into_keywords, filter_keywords
+from Tribler.Core.Utilities.prefix_index import PrefixIndex, DEFAULT_MAX_TERMS
+from Tribler.Core.Utilities.search_utils import split_into_keywords, filter_keywords, get_trigrams, levenshtein
 from Tribler.Core.Utilities.tracker_utils import get_uniformed_tracker_url
 from Tribler.Core.Utilities.unicode import dunno2unicode
 from Tribler.Core.simpledefs import (INFOHASH_LENGTH, NTFY_UPDATE, NTFY_INSERT, NTFY_DELETE, NTFY_CREATE,
@@ -34,6 +34,17 @@ VOTECAST_FLUSH_DB_INTERVAL = 15
 
 DEFAULT_ID_CACHE_SIZE = 1024 * 5
 
+# Terms in swarm names shorter than this are not added to the search term dictionary
+MIN_SEARCH_TERM_LENGTH = 3
+# The number of terms sharing the most trigrams with a keyword that are compared when looking for the closest term
+SEARCH_TERM_CANDIDATES = 20
+# The number of swarm names that are ranked when making a search suggestion
+SEARCH_SUGGESTION_CANDIDATES = 100
+# The number of terms that are read per trigram of a keyword when looking for the closest term
+SEARCH_TERM_TRIGRAM_ROWS = 1000
+# The number of parameters bound in a single IN (...) clause, SQLite allows at most 999 per statement
+MAX_SQL_PARAMETERS = 500
+
 
 class LimitedOrderedDict(OrderedDict):
 
@@ -227,6 +238,16 @@ class TorrentDBHandler(BasicDBHandler):
         # to incoming remote torrents without doing a full text search.
         self.latest_matchinfo_torrent = None
 
+        # The index used for search completions. It is None until it has been loaded from the search term dictionary.
+        self.autocomplete_index = None
+        # Term -> change in frequency of the terms indexed while the autocomplete index is being loaded, these are
+        # merged into the index once it is loaded. It is None when loading the index failed.
+        self._pending_search_terms = defaultdict(int)
+
+        # Incremented whenever torrents are indexed, collected, removed or renamed, so caches of full text search
+        # results know when they are outdated.
+        self.collected_torrents_version = 0
+
     def initialize(self, *args, **kwargs):
         super(TorrentDBHandler, self).initialize(*args, **kwargs)
         self.category = self.session.lm.category
@@ -235,6 +256,29 @@ class TorrentDBHandler(BasicDBHandler):
         self.channelcast_db = self.session.open_dbhandler(NTFY_CHANNELCAST)
         self._rtorrent_handler = self.session.lm.rtorrent_handler
 
+        # Load the most frequent search terms in the background, so startup does not wait for it
+        self._db.fetchall_async(u"SELECT term, frequency FROM SearchTerms ORDER BY frequency DESC LIMIT ?",
+                                (DEFAULT_MAX_TERMS,)).addCallbacks(self._on_search_terms_loaded,
+                                                                   self._on_search_terms_load_failed)
+
+    def _on_search_terms_loaded(self, term_frequencies):
+        autocomplete_index = PrefixIndex()
+        autocomplete_index.add_many(term_frequencies)
+        # Terms that were indexed during the load may be counted twice, which only slightly affects their ranking
+        for term, count in self._pending_search_terms.iteritems():
+            if count > 0:
+                autocomplete_index.add(term, count)
+            elif count < 0:
+                autocomplete_index.remove(term, -count)
+        self._pending_search_terms = None
+        self.autocomplete_index = autocomplete_index
+        self._logger.info("Loaded %d terms in the autocomplete index", len(autocomplete_index))
+
+    def _on_search_terms_load_failed(self, failure):
+        self._pending_search_terms = None
+        self._logger.error("Could not load the autocomplete index, falling back to full text search: %s",
+                           failure.getErrorMessage())
+
     def close(self):
         super(TorrentDBHandler, self).close()
         self.category = None
@@ -345,9 +389,9 @@ class TorrentDBHandler(BasicDBHandler):
                 if self._rtorrent_handler:
                     self._rtorrent_handler.notify_possible_torrent_infohash(infohash)
 
-                insert_files = [(torrent_id, unicode(path), length) for path, length in files]
                 sql_insert_files = "INSERT OR IGNORE INTO TorrentFiles (torrent_id, path, length) VALUES (?,?,?)"
-                self._db.executemany(sql_insert_files, insert_files)
+                for path, length in files:
+                    self._db.queue_write(sql_insert_files, (torrent_id, unicode(path), length))
             except:
                 self._logger.error("Could not create a TorrentDef instance %r %r %r %r %r %r", infohash, timestamp, name, files, trackers, extra_info)
                 print_exc()
@@ -414,26 +458,35 @@ class TorrentDBHandler(BasicDBHandler):
 
         # see if there is already a torrent in the database with this infohash
         torrent_id = self.getTorrentID(infohash)
+        old_swarmname = None
         if torrent_id is None:  # not in database
             self._db.insert("Torrent", **database_dict)
             torrent_id = self.getTorrentID(infohash)
 
         else:  # infohash in db
+            old_swarmname = self._get_indexed_swarmnames([torrent_id]).get(torrent_id)
             del database_dict["infohash"]  # no need for infohash, its already stored
             where = "torrent_id = %d" % torrent_id
             self._db.update('Torrent', where=where, **database_dict)
 
         if not torrentdef.is_multifile_torrent():
             swarmname, _ = os.path.splitext(swarmname)
-        self._indexTorrent(torrent_id, swarmname, torrentdef.get_files())
+        self._indexTorrent(torrent_id, swarmname, torrentdef.get_files(), old_swarmname)
 
         self._addTorrentTracker(torrent_id, torrentdef, extra_info)
         return torrent_id
 
-    def _indexTorrent(self, torrent_id, swarmname, files):
+    def _indexTorrent(self, torrent_id, swarmname, files, old_swarmname=None):
+        """
+        Adds a torrent to the full text index, replacing the swarm name it was indexed with before, if any.
+        :param old_swarmname: the swarm name in the full text index, see _get_indexed_swarmnames
+        """
+        self.collected_torrents_version += 1
+
         # Niels: new method for indexing, replaces invertedindex
         # Making sure that swarmname does not include extension for single file torrents
-        swarm_keywords = " ".join(split_into_keywords(swarmname))
+        swarm_keywords_list = split_into_keywords(swarmname)
+        swarm_keywords = " ".join(swarm_keywords_list)
 
         filedict = {}
         fileextensions = set()
@@ -453,14 +506,90 @@ class TorrentDBHandler(BasicDBHandler):
 
         values = (torrent_id, swarm_keywords, " ".join(filenames), " ".join(fileextensions))
         try:
-            # INSERT OR REPLACE not working for fts3 table
-            self._db.execute_write(u"DELETE FROM FullTextIndex WHERE rowid = ?", (torrent_id,))
-            self._db.execute_write(
-                u"INSERT INTO FullTextIndex (rowid, swarmname, filenames, fileextensions) VALUES(?,?,?,?)", values)
+            # INSERT OR REPLACE not working for fts3 table. The statements are queued as a group, so the index
+            # writes of many torrents are executed as two batches. If the fts3 module cannot be found, the batch
+            # fails and is logged by the write queue, without affecting the other queued writes.
+            self._db.queue_write_group((u"DELETE FROM FullTextIndex WHERE rowid = ?",
+                                        u"INSERT INTO FullTextIndex (rowid, swarmname, filenames, fileextensions) "
+                                        u"VALUES(?,?,?,?)"),
+                                       ((torrent_id,), values), key=torrent_id)
         except:
-            # this will fail if the fts3 module cannot be found
             print_exc()
 
+        self._index_search_terms(swarm_keywords_list, old_swarmname.split() if old_swarmname else [])
+
+    def _get_indexed_swarmnames(self, torrent_ids):
+        """
+        Returns a dictionary torrent_id -> swarm name in the full text index, for the torrents that have a name. These
+        are the swarm names the terms in the search term dictionary have been counted for.
+        """
+        torrent_ids = list(torrent_ids)
+        swarmnames = {}
+        for index in xrange(0, len(torrent_ids), MAX_SQL_PARAMETERS):
+            chunk = torrent_ids[index:index + MAX_SQL_PARAMETERS]
+            parameters = u",".join(u"?" * len(chunk))
+            sql = u"SELECT F.rowid, F.swarmname FROM FullTextIndex F, Torrent T " \
+                  u"WHERE F.rowid IN (%s) AND T.torrent_id = F.rowid AND T.name IS NOT NULL" % parameters
+            swarmnames.update(self._db.fetchall(sql, chunk))
+        return swarmnames
+
+    def _index_search_terms(self, swarm_keywords, old_swarm_keywords=()):
+        """
+        Updates the search term dictionary and its trigram index for a swarm name that replaces an old one. The terms
+        that are only in the new swarm name are counted once more, the terms that are only in the old one once less.
+        """
+        terms = set(term for term in swarm_keywords if len(term) >= MIN_SEARCH_TERM_LENGTH)
+        old_terms = set(term for term in old_swarm_keywords if len(term) >= MIN_SEARCH_TERM_LENGTH)
+        added_terms = terms - old_terms
+        removed_terms = old_terms - terms
+
+        for term in added_terms:
+            self._db.queue_write(u"INSERT OR IGNORE INTO SearchTerms (term) VALUES (?)", (term,))
+        for term in added_terms:
+            self._db.queue_write(u"UPDATE SearchTerms SET frequency = frequency + 1 WHERE term = ?", (term,))
+        for term in added_terms:
+            for trigram in get_trigrams(term):
+                self._db.queue_write(u"INSERT OR IGNORE INTO SearchTermTrigrams (trigram, term_id) "
+                                     u"SELECT ?, term_id FROM SearchTerms WHERE term = ?", (trigram, term))
+
+        for term in removed_terms:
+            self._db.queue_write(u"UPDATE SearchTerms SET frequency = frequency - 1 WHERE term = ?", (term,))
+        for term in removed_terms:
+            self._db.queue_write_group((u"DELETE FROM SearchTermTrigrams WHERE term_id IN "
+                                        u"(SELECT term_id FROM SearchTerms WHERE term = ? AND frequency <= 0)",
+                                        u"DELETE FROM SearchTerms WHERE term = ? AND frequency <= 0"),
+                                       ((term,), (term,)))
+
+        if self.autocomplete_index is not None:
+            for term in added_terms:
+                self.autocomplete_index.add(term)
+            for term in removed_terms:
+                self.autocomplete_index.remove(term)
+        elif self._pending_search_terms is not None:
+            for term in added_terms:
+                self._pending_search_terms[term] += 1
+            for term in removed_terms:
+                self._pending_search_terms[term] -= 1
+
+    def rebuild_search_terms(self):
+        """
+        Rebuilds the search term dictionary from the swarm names in the full text index.
+        """
+        frequencies = defaultdict(int)
+        for swarmname, in self._db.execute_read(u"SELECT F.swarmname FROM FullTextIndex F, Torrent T "
+                                                u"WHERE T.torrent_id = F.rowid AND T.name IS NOT NULL"):
+            for term in set((swarmname or u"").split()):
+                if len(term) >= MIN_SEARCH_TERM_LENGTH:
+                    frequencies[term] += 1
+
+        self._db.execute_write(u"DELETE FROM SearchTermTrigrams")
+        self._db.execute_write(u"DELETE FROM SearchTerms")
+        if frequencies:
+            self._db.executemany(u"INSERT INTO SearchTerms (term, frequency) VALUES (?, ?)", frequencies.items())
+            self._db.executemany(u"INSERT OR IGNORE INTO SearchTermTrigrams (trigram, term_id) "
+                                 u"SELECT ?, term_id FROM SearchTerms WHERE term = ?",
+                                 [(trigram, term) for term in frequencies for trigram in get_trigrams(term)])
+
     # ------------------------------------------------------------
     # Adds the trackers of a given torrent into the database.
     # ------------------------------------------------------------
@@ -508,6 +637,8 @@ class TorrentDBHandler(BasicDBHandler):
             infohash_str = bin2str(infohash)
             where = "infohash='%s'" % infohash_str
             self._db.update(self.table_name, where, **kw)
+            if 'is_collected' in kw or 'name' in kw or 'secret' in kw:
+                self.collected_torrents_version += 1
 
         if notify:
             self.notifier.notify(NTFY_TORRENTS, NTFY_UPDATE, infohash)
@@ -576,6 +707,8 @@ class TorrentDBHandler(BasicDBHandler):
             else:
                 insert.append((swarmname, length, nrfiles, category, creation_date, infohash, status))
 
+        indexed_swarmnames = self._get_indexed_swarmnames([tid for tid, _ in to_be_indexed])
+
         if len(update) > 0:
             sql = u"UPDATE Torrent SET name = ?, length = ?, num_files = ?, category = ?, creation_date = ?," \
                   u" infohash = ?, status = ? WHERE torrent_id = ?"
@@ -599,19 +732,33 @@ class TorrentDBHandler(BasicDBHandler):
                 self._logger.error(u"infohashes: %s", insert)
 
         for torrent_id, swarmname in to_be_indexed:
-            self._indexTorrent(torrent_id, swarmname, [])
+            self._indexTorrent(torrent_id, swarmname, [], indexed_swarmnames.get(torrent_id))
 
     def getTorrentCheckRetries(self, torrent_id):
         sql = u"SELECT tracker_check_retries FROM Torrent WHERE torrent_id = ?"
         result = self._db.fetchone(sql, (torrent_id,))
         return result
 
+    def getTorrentCheckRetriesInBatch(self, infohashes):
+        """
+        Returns a dictionary infohash -> (torrent_id, tracker_check_retries) with the torrents that are in the database.
+        """
+        infohashes = list(infohashes)
+        if not infohashes:
+            return {}
+
+        parameters = u"?," * len(infohashes)
+        sql = u"SELECT infohash, torrent_id, tracker_check_retries FROM Torrent WHERE infohash IN (%s)" \
+              % parameters[:-1]
+        return dict((str2bin(infohash), (torrent_id, retries)) for infohash, torrent_id, retries
+                    in self._db.fetchall(sql, [bin2str(infohash) for infohash in infohashes]))
+
     def updateTorrentCheckResult(self, torrent_id, infohash, seeders, leechers, last_check, next_check, status,
                                  retries):
         sql = u"UPDATE Torrent SET num_seeders = ?, num_leechers = ?, last_tracker_check = ?, next_tracker_check = ?," \
               u" status = ?, tracker_check_retries = ? WHERE torrent_id = ?"
 
-        self._db.execute_write(sql, (seeders, leechers, last_check, next_check, status, retries, torrent_id))
+        self._db.queue_write(sql, (seeders, leechers, last_check, next_check, status, retries, torrent_id))
 
         self._logger.debug(u"update result %d/%d for %s/%d", seeders, leechers, bin2str(infohash), torrent_id)
 
@@ -690,6 +837,20 @@ class TorrentDBHandler(BasicDBHandler):
             """
         return [str2bin(tinfo[0]) for tinfo in self._db.fetchall(sql, (tracker, current_time, limit))]
 
+    def getChannelTorrentInfohashes(self, infohashes):
+        """
+        Returns the set of the given infohashes that belong to torrents in a channel.
+        """
+        infohashes = list(infohashes)
+        if not infohashes:
+            return set()
+
+        parameters = u"?," * len(infohashes)
+        sql = u"SELECT DISTINCT T.infohash FROM Torrent T, ChannelTorrents CT" \
+              u" WHERE CT.torrent_id = T.torrent_id AND T.infohash IN (%s)" % parameters[:-1]
+        return set(str2bin(infohash) for infohash, in self._db.fetchall(sql, [bin2str(infohash)
+                                                                             for infohash in infohashes]))
+
     def getTrackerListByTorrentID(self, torrent_id):
         sql = 'SELECT TR.tracker FROM TrackerInfo TR, TorrentTrackerMapping MP'\
             + ' WHERE MP.torrent_id = ?'\
@@ -854,10 +1015,14 @@ class TorrentDBHandler(BasicDBHandler):
             tids.append((torrent_id,))
             self.session.delete_collected_torrent(infohash)
 
+        indexed_swarmnames = self._get_indexed_swarmnames([torrent_id for torrent_id, in tids])
         self._db.executemany(sql_del_torrent, tids)
+        self.collected_torrents_version += 1
         # self._db.executemany(sql_del_tracker, tids)
         deleted = self._db.connection.changes()
         # self._db.executemany(sql_del_pref, tids)
+        for swarmname in indexed_swarmnames.itervalues():
+            self._index_search_terms([], swarmname.split())
 
         # but keep the infohash in db to maintain consistence with preference db
         # torrent_id_infohashes = [(torrent_id,infohash_str,relevance) for torrent_file_name, torrent_id, infohash_str, relevance, weight in res_list]
@@ -867,72 +1032,73 @@ class TorrentDBHandler(BasicDBHandler):
         self._logger.info("Erased %d torrents", deleted)
         return deleted
 
-    def search_in_local_torrents_db(self, query, keys=None):
+    def search_in_local_torrents_db(self, query, keys=None, limit=None):
         """
         Search in the local database for torrents matching a specific query. This method also assigns a relevance
-        score to each torrent, based on the name, files and file extensions.
-        The algorithm is based on BM25. The document length factor is regarded since our "documents" are very small
-        (often a few keywords).
-        See https://en.wikipedia.org/wiki/Okapi_BM25 for more information about BM25.
+        score to each torrent, based on the name, files and file extensions (see bm25_relevance in search_utils).
+        The scoring and ordering is done by the database through the tribler_bm25 SQL function, so only the best
+        results are returned to Python.
+        :param limit: the maximum number of (best scoring) results to return, or None to return all results
         """
-        search_results = []
-        keys_str = ", ".join(keys)
-        keywords = split_into_keywords(query, to_filter_stopwords=True)
-        infohash_index = keys.index('infohash')
+        sql, args, keywords = self._get_local_torrents_search_query(query, keys, limit)
+        return self._on_local_torrents_found(self._db.fetchall(sql, args), keys, keywords)
 
-        # This query gets torrents matching speciifc keywords. The matchinfo object is also returned. For more
-        # information about the returned matchinfo parameters, see https://www.sqlite.org/fts3.html#matchinfo.
-        results = self._db.fetchall("SELECT DISTINCT %s, Matchinfo(FullTextIndex, 'pcnalx') "
-                                    "FROM Torrent T, FullTextIndex "
-                                    "LEFT OUTER JOIN _ChannelTorrents C ON T.torrent_id = C.torrent_id "
-                                    "WHERE t.name IS NOT NULL AND t.torrent_id = FullTextIndex.rowid "
-                                    "AND C.deleted_at IS NULL AND FullTextIndex MATCH ?"
-                                    % keys_str, (" OR ".join(keywords),))
+    def search_in_local_torrents_db_async(self, query, keys=None, limit=None):
+        """
+        Same as search_in_local_torrents_db, but the full text search runs on the read pool. The pending writes are
+        committed first, so torrents that have just been added are found as well.
+        :return: a Deferred that fires with the search results
+        """
+        sql, args, keywords = self._get_local_torrents_search_query(query, keys, limit)
+        # remote torrents are not scored with the matchinfo of the previous search while this one is running
+        self.latest_matchinfo_torrent = None
+        return self._db.fetchall_async(sql, args, commit_pending=True).addCallback(self._on_local_torrents_found,
+                                                                                   keys, keywords)
+
+    def _get_local_torrents_search_query(self, query, keys, limit):
+        keywords = split_into_keywords(query, to_filter_stopwords=True)
 
+        # This query gets torrents matching specific keywords, ordered by their relevance score. The matchinfo object
+        # is also returned. For more information about the returned matchinfo parameters,
+        # see https://www.sqlite.org/fts3.html#matchinfo.
+        sql = "SELECT DISTINCT %s, Matchinfo(FullTextIndex, 'pcnalx'), " \
+              "tribler_bm25(Matchinfo(FullTextIndex, 'pcnalx')) AS relevance " \
+              "FROM Torrent T, FullTextIndex " \
+              "LEFT OUTER JOIN _ChannelTorrents C ON T.torrent_id = C.torrent_id " \
+              "WHERE t.name IS NOT NULL AND t.torrent_id = FullTextIndex.rowid " \
+              "AND C.deleted_at IS NULL AND FullTextIndex MATCH ? " \
+              "ORDER BY relevance DESC LIMIT ?" % ", ".join(keys)
+        return sql, (" OR ".join(keywords), -1 if limit is None else limit), keywords
+
+    def _on_local_torrents_found(self, results, keys, keywords):
+        search_results = []
+        infohash_index = keys.index('infohash')
         for result in results:
             result = list(result)  # We convert the result to a mutable list since we have to decode the infohash
             result[infohash_index] = str2bin(result[infohash_index])
-            matchinfo = result[len(keys)]  # The matchinfo is the last element in the results tuple
-            self.latest_matchinfo_torrent = matchinfo, keywords
-            num_phrases, num_cols, num_rows = unpack_from('III', matchinfo)
-
-            unpack_str = 'I' * (3 * num_cols * num_phrases)
-            matchinfo = unpack_from('I' * 9 + unpack_str, matchinfo)[9:]
-
-            scores = []
-
-            for col_ind in xrange(num_cols):
-                score = 0
-                for phrase_ind in xrange(num_phrases):
-                    # Fetch info about the current matching term. This number is fetched from the matchinfo object.
-                    # See https://www.sqlite.org/fts3.html#matchinfo for info about the offset calculation.
-                    base_term_offset = 3 * (col_ind + phrase_ind * num_cols)
-                    rows_with_term = matchinfo[base_term_offset + 2]
-                    term_freq = matchinfo[base_term_offset]
+            search_results.append(result)
 
-                    inv_doc_freq = math.log((num_rows - rows_with_term + 0.5) / (rows_with_term + 0.5), 2)
-                    right_side = ((term_freq * (1.2 + 1)) / (term_freq + 1.2))
-
-                    score += inv_doc_freq * right_side
-
-                scores.append(score)
-
-            # Our score is 80% dependent on matching in the name of the torrent, 10% on the names of the files in the
-            # torrent and 10% on the extensions of files in the torrent.
-            extended_result = result + [0.8 * scores[0] + 0.1 * scores[1] + 0.1 * scores[2]]
-            search_results.append(extended_result)
+        # The matchinfo is the second last element in the results. The document frequencies in it are the same
+        # for every result, so any result can be used to score remote torrents.
+        self.latest_matchinfo_torrent = (search_results[-1][len(keys)], keywords) if search_results else None
 
         return search_results
 
     def searchNames(self, kws, local=True, keys=None, doSort=True):
-        assert 'infohash' in keys
-        assert not doSort or ('num_seeders' in keys or 'T.num_seeders' in keys)
+        sql, args = self._get_search_names_query(kws, local, keys, doSort)
+        return self._on_names_found(self._db.fetchall(sql, args), kws, local, keys, doSort)
 
-        infohash_index = keys.index('infohash')
-        num_seeders_index = keys.index('num_seeders') if 'num_seeders' in keys else -1
+    def searchNames_async(self, kws, local=True, keys=None, doSort=True):
+        """
+        Same as searchNames, but the full text search runs on the read pool, so only committed torrents are found.
+        :return: a Deferred that fires with the search results
+        """
+        sql, args = self._get_search_names_query(kws, local, keys, doSort)
+        return self._db.fetchall_async(sql, args).addCallback(self._on_names_found, kws, local, keys, doSort)
 
-        if num_seeders_index == -1:
-            doSort = False
+    def _get_search_names_query(self, kws, local, keys, doSort):
+        assert 'infohash' in keys
+        assert not doSort or ('num_seeders' in keys or 'T.num_seeders' in keys)
 
         values = ", ".join(keys)
         mainsql = "SELECT " + values + ", C.channel_id, Matchinfo(FullTextIndex) FROM"
@@ -949,10 +1115,16 @@ class TorrentDBHandler(BasicDBHandler):
         if not local:
             mainsql += "AND T.secret is not 1 LIMIT 250"
 
-        query = " ".join(filter_keywords(kws))
-        not_negated = [kw for kw in filter_keywords(kws) if kw[0] != '-']
+        return mainsql, (" ".join(filter_keywords(kws)),)
 
-        results = self._db.fetchall(mainsql, (query,))
+    def _on_names_found(self, results, kws, local, keys, doSort):
+        infohash_index = keys.index('infohash')
+        num_seeders_index = keys.index('num_seeders') if 'num_seeders' in keys else -1
+
+        if num_seeders_index == -1:
+            doSort = False
+
+        not_negated = [kw for kw in filter_keywords(kws) if kw[0] != '-']
 
         channels = set()
         channel_dict = {}
@@ -1062,6 +1234,13 @@ class TorrentDBHandler(BasicDBHandler):
         return results
 
     def getAutoCompleteTerms(self, keyword, max_terms, limit=100):
+        if self.autocomplete_index is not None:
+            # Complete the last word of the keyword using the in-memory index, without querying the database
+            words = keyword.split(u" ")
+            prefix = u"".join(word + u" " for word in words[:-1])
+            completions = self.autocomplete_index.complete(words[-1], max_terms + 1)
+            return [prefix + term for term in completions if term != words[-1]][:max_terms]
+
         sql = "SELECT swarmname FROM FullTextIndex WHERE swarmname MATCH ? LIMIT ?"
         result = self._db.fetchall(sql, ('"%s*"' % keyword, limit))
 
@@ -1080,48 +1259,41 @@ class TorrentDBHandler(BasicDBHandler):
 
         return list(all_terms)
 
+    def _get_closest_search_term(self, keyword):
+        """
+        Returns the term in the search term dictionary with the smallest edit distance to a keyword, or None if no
+        term shares a trigram with it. Only the terms sharing the most trigrams with the keyword are compared. At most
+        SEARCH_TERM_TRIGRAM_ROWS terms are read per trigram, so common trigrams do not make the query scan the whole
+        trigram index.
+        """
+        # Every trigram takes two parameters and a SELECT in the compound query, keep both within the SQLite limits
+        trigrams = list(get_trigrams(keyword))[:MAX_SQL_PARAMETERS // 2]
+        trigram_sql = u" UNION ALL ".join([u"SELECT term_id FROM (SELECT term_id FROM SearchTermTrigrams "
+                                           u"WHERE trigram = ? LIMIT ?)"] * len(trigrams))
+        sql = u"SELECT T.term, T.frequency FROM (%s) G, SearchTerms T WHERE T.term_id = G.term_id " \
+              u"GROUP BY G.term_id ORDER BY COUNT(*) DESC, T.frequency DESC LIMIT ?" % trigram_sql
+        args = []
+        for trigram in trigrams:
+            args += [trigram, SEARCH_TERM_TRIGRAM_ROWS]
+        candidates = self._db.fetchall(sql, args + [SEARCH_TERM_CANDIDATES])
+        if not candidates:
+            return None
+        return min(candidates, key=lambda candidate: (levenshtein(keyword, candidate[0]), -candidate[1]))[0]
+
     def getSearchSuggestion(self, keywords, limit=1):
         match = [keyword.lower() for keyword in keywords if len(keyword) > 3]
+        if not match:
+            return []
 
-        def lev(a, b):
-            "Calculates the Levenshtein distance between a and b."
-            n, m = len(a), len(b)
-            if n > m:
-                # Make sure n <= m, to use O(min(n,m)) space
-                a, b = b, a
-                n, m = m, n
-
-            current = range(n + 1)
-            for i in range(1, m + 1):
-                previous, current = current, [i] + [0] * n
-                for j in range(1, n + 1):
-                    add, delete = previous[j] + 1, current[j - 1] + 1
-                    change = previous[j - 1]
-                    if a[j - 1] != b[i - 1]:
-                        change = change + 1
-                    current[j] = min(add, delete, change)
-
-            return current[n]
-
-        def levcollate(s1, s2):
-            l1 = sum(sorted([lev(a, b) for a in s1.split() for b in match])[:len(match)])
-            l2 = sum(sorted([lev(a, b) for a in s2.split() for b in match])[:len(match)])
-
-            # return -1 if s1<s2, +1 if s1>s2 else 0
-            if l1 < l2:
-                return -1
-            if l1 > l2:
-                return 1
-            return 0
+        # Correct the keywords using the search term dictionary and only rank the swarm names containing these terms
+        terms = set(self._get_closest_search_term(keyword) or keyword for keyword in match)
+        sql = u"SELECT swarmname FROM FullTextIndex WHERE swarmname MATCH ? LIMIT ?"
+        results = self._db.fetchall(sql, (u" OR ".join(terms), SEARCH_SUGGESTION_CANDIDATES))
 
-        cursor = self._db.get_cursor()
-        connection = cursor.getconnection()
-        connection.createcollation("leven", levcollate)
+        def distance(swarmname):
+            return sum(sorted([levenshtein(a, b) for a in swarmname.split() for b in match])[:len(match)])
 
-        sql = "SELECT swarmname FROM FullTextIndex WHERE swarmname MATCH ? ORDER By swarmname collate leven ASC LIMIT ?"
-        results = self._db.fetchall(sql, (' OR '.join(['*%s*' % m for m in match]), limit))
-        connection.createcollation("leven", None)
-        return [result[0] for result in results]
+        return sorted((result[0] for result in results), key=distance)[:limit]
 
 
 class MyPreferenceDBHandler(BasicDBHandler):
@@ -1506,8 +1678,8 @@ ORDER BY CMD.time_stamp DESC LIMIT ?;
                                                              u'channel_torrent_id': channel_torrent_id})
 
         sql_update_channel = "UPDATE _Channels SET modified = strftime('%s','now'), nr_torrents = nr_torrents+? WHERE id = ?"
-        update_channels = [(new_torrents, channel_id) for channel_id, new_torrents in updated_channels.iteritems()]
-        self._db.executemany(sql_update_channel, update_channels)
+        for channel_id, new_torrents in updated_channels.iteritems():
+            self._db.queue_write(sql_update_channel, (new_torrents, channel_id))
 
         for channel_id in updated_channels.keys():
             self.notifier.notify(NTFY_CHANNELCAST, NTFY_UPDATE, channel_id)
@@ -1961,6 +2133,20 @@ ORDER BY CMD.time_stamp DESC LIMIT ?;
             return self.__fixTorrent(keys, result)
 
     def getTorrentsFromChannelId(self, channel_id, isDispersy, keys, limit=None):
+        sql, args = self._get_torrents_from_channel_id_query(channel_id, isDispersy, keys, limit)
+        return self._on_channel_torrents_found(self._db.fetchall(sql, args), channel_id, keys, limit)
+
+    def getTorrentsFromChannelId_async(self, channel_id, isDispersy, keys, limit=None):
+        """
+        Same as getTorrentsFromChannelId, but the torrents are fetched on the read pool. The pending writes are
+        committed first, so torrents that have just been added to the channel are returned as well.
+        :return: a Deferred that fires with the torrents
+        """
+        sql, args = self._get_torrents_from_channel_id_query(channel_id, isDispersy, keys, limit)
+        return self._db.fetchall_async(sql, args, commit_pending=True).addCallback(self._on_channel_torrents_found,
+                                                                                   channel_id, keys, limit)
+
+    def _get_torrents_from_channel_id_query(self, channel_id, isDispersy, keys, limit):
         if isDispersy:
             sql = "SELECT " + ", ".join(keys) + """ FROM Torrent, ChannelTorrents
                   WHERE Torrent.torrent_id = ChannelTorrents.torrent_id"""
@@ -1975,11 +2161,9 @@ ORDER BY CMD.time_stamp DESC LIMIT ?;
         if limit:
             sql += " LIMIT %d" % limit
 
-        if channel_id:
-            results = self._db.fetchall(sql, (channel_id,))
-        else:
-            results = self._db.fetchall(sql)
+        return sql, (channel_id,) if channel_id else None
 
+    def _on_channel_torrents_found(self, results, channel_id, keys, limit):
         if limit is None and channel_id:
             # use this possibility to update nrtorrent in channel
 
@@ -8,6 +8,8 @@
 # 26 is used by Tribler 6.5-git (with database upgrade scripts)
 # 27 is used by Tribler 6.5-git (TorrentStatus and Category tables are removed)
 # 28 is used by Tribler 6.5-git (cleanup Metadata stuff)
+# 29 is used by Tribler 6.6 (FTS4 full text index)
+# 30 is used by Tribler 7.0-git (search term dictionary for search suggestions)
 
 TRIBLER_59_DB_VERSION = 17
 TRIBLER_60_DB_VERSION = 17
@@ -28,8 +30,10 @@ TRIBLER_65PRE4_DB_VERSION = 28
 
 TRIBLER_66_DB_VERSION = 29
 
+TRIBLER_70_DB_VERSION = 30
+
 # the lowest supported database version number
 LOWEST_SUPPORTED_DB_VERSION = TRIBLER_59_DB_VERSION
 
 # the latest database version number
-LATEST_DB_VERSION = TRIBLER_66_DB_VERSION
+LATEST_DB_VERSION = TRIBLER_70_DB_VERSION
@@ -269,6 +269,19 @@ CREATE INDEX IF NOT EXISTS TorMarkIndex ON _TorrentMarkings(channeltorrent_id);
 
 CREATE VIRTUAL TABLE FullTextIndex USING fts4(swarmname, filenames, fileextensions);
 
+CREATE TABLE IF NOT EXISTS SearchTerms (
+  term_id               integer PRIMARY KEY AUTOINCREMENT NOT NULL,
+  term                  text    NOT NULL,
+  frequency             integer DEFAULT 0,
+  UNIQUE (term)
+);
+
+CREATE TABLE IF NOT EXISTS SearchTermTrigrams (
+  trigram               text    NOT NULL,
+  term_id               integer NOT NULL,
+  PRIMARY KEY (trigram, term_id)
+);
+
 -------------------------------------
 
 COMMIT TRANSACTION create_table;
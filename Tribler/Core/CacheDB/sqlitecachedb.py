@@ -5,10 +5,16 @@ Author(s): Jie Yang
 """
 import logging
 import os
+import time
 from apsw import CantOpenError, SQLError
 from base64 import encodestring, decodestring
-from threading import currentThread, RLock
+from threading import currentThread, local, RLock
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, maybeDeferred
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.failure import Failure
 from twisted.python.threadable import isInIOThread
+from twisted.python.threadpool import ThreadPool
 
 import apsw
 
@@ -16,6 +22,7 @@ from Tribler.dispersy.taskmanager import TaskManager
 from Tribler.dispersy.util import blocking_call_on_reactor_thread, call_on_reactor_thread
 
 from Tribler.Core.CacheDB.db_versions import LATEST_DB_VERSION
+from Tribler.Core.Utilities.search_utils import bm25_relevance
 
 
 DB_SCRIPT_NAME = "schema_sdb_v%s.sql" % str(LATEST_DB_VERSION)
@@ -26,6 +33,12 @@ DB_FILE_RELATIVE_PATH = os.path.join(DB_DIR_NAME, DB_FILE_NAME)
 DB_SCRIPT_ABSOLUTE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), DB_SCRIPT_NAME)
 
 DEFAULT_BUSY_TIMEOUT = 10000
+DEFAULT_READ_POOL_SIZE = 3
+DEFAULT_WRITE_QUEUE_MAX_SIZE = 1000
+DEFAULT_WRITE_QUEUE_MAX_DELAY = 1.0
+
+# Python functions that are available in the SQL statements of every connection: (name, function, number of args)
+SQL_FUNCTIONS = [(u"tribler_bm25", bm25_relevance, 1)]
 
 forceDBThread = call_on_reactor_thread
 forceAndReturnDBThread = blocking_call_on_reactor_thread
@@ -43,9 +56,300 @@ def str2bin(str_data):
     return decodestring(str_data)
 
 
+def register_sql_functions(connection):
+    for name, function, num_args in SQL_FUNCTIONS:
+        connection.createscalarfunction(name, function, num_args)
+
+
+def _fetchone_from_rows(rows):
+    """
+    Reduces a list of result rows to the value returned by fetchone: None if there are no rows, the single column
+    value if the first row has one column, or the first row otherwise.
+    """
+    if not rows:
+        return None
+    row = rows[0]
+    if len(row) > 1:
+        return row
+    return row[0]
+
+
+class SQLiteReadPool(object):
+    """
+    A pool of read-only connections to a WAL-mode database.
+
+    Every worker thread of the pool lazily opens its own read-only connection, so queries run concurrently with each
+    other and with the writer connection on the reactor thread. Note that WAL readers only see committed data: rows
+    written on the writer connection become visible to the pool after the next commit.
+    """
+
+    def __init__(self, db_path, size=DEFAULT_READ_POOL_SIZE, busytimeout=DEFAULT_BUSY_TIMEOUT):
+        assert size > 0, u"Invalid read pool size: %s" % size
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self.db_path = db_path
+        self.size = size
+        self._busytimeout = busytimeout
+
+        self._threadpool = ThreadPool(minthreads=0, maxthreads=size, name=u"SQLiteReadPool")
+        self._thread_local = local()
+        self._connections_lock = RLock()
+        self._connections = []
+
+        self.queries_served = 0
+
+    @property
+    def running(self):
+        return self._threadpool.started
+
+    def start(self):
+        self._threadpool.start()
+
+    def stop(self):
+        """
+        Stops the worker threads, waiting for queries that are still running, and closes all read connections.
+        """
+        self._threadpool.stop()
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+
+    def _get_connection(self):
+        connection = getattr(self._thread_local, "connection", None)
+        if connection is None:
+            connection = apsw.Connection(self.db_path, flags=apsw.SQLITE_OPEN_READONLY)
+            connection.setbusytimeout(self._busytimeout)
+            register_sql_functions(connection)
+            self._thread_local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _fetchall(self, sql, args):
+        cursor = self._get_connection().cursor()
+        try:
+            rows = list(cursor.execute(sql) if args is None else cursor.execute(sql, args))
+        except Exception:
+            self._logger.exception(u"read pool: ===%s===\n%s\n-----\n%s\n======\n",
+                                   currentThread().getName(), sql, args)
+            raise
+        finally:
+            cursor.close()
+        self.queries_served += 1
+        return rows
+
+    def fetchall(self, sql, args=None):
+        """
+        Runs a read query on one of the worker threads.
+        :return: a Deferred that fires with the list of result rows
+        """
+        return deferToThreadPool(reactor, self._threadpool, self._fetchall, sql, args)
+
+
+class WriteBehindQueue(object):
+    """
+    Coalesces queued write statements into executemany batches and commits them as a group.
+
+    Writes are queued as groups of statements that belong together, such as deleting and inserting a row of a full
+    text index. Consecutive groups with the same statements end up in one batch, in which every statement is executed
+    once with executemany, unless the batch already holds a group with the same key. Apart from that, the order of
+    all queued writes is preserved. The queue is flushed before any other statement runs on the writer connection, so
+    reads always see the queued writes. A commit is triggered when max_size writes are waiting for one, or max_delay
+    seconds after the first uncommitted write was queued, whichever comes first.
+
+    Every batch is executed within a savepoint. If a batch fails, it is rolled back and its groups are executed one by
+    one, each within a savepoint of its own, so only the failing groups are discarded. Failing groups are logged
+    without affecting the caller that triggered the flush, and the callers waiting for the next commit get an error.
+    """
+
+    def __init__(self, db, max_size=DEFAULT_WRITE_QUEUE_MAX_SIZE, max_delay=DEFAULT_WRITE_QUEUE_MAX_DELAY):
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self.db = db
+        self.max_size = max_size
+        self.max_delay = max_delay
+
+        # list of (statements, [arguments of every group], keys of the groups) batches
+        self._batches = []
+        self._depth = 0
+        self._num_uncommitted = 0
+        self._first_uncommitted_time = None
+        self._commit_waiters = []
+        # the writes that were discarded since the last commit
+        self._num_discarded = 0
+
+        self.num_queued = 0
+        self.num_batches = 0
+        self.num_failed_batches = 0
+        self.num_failed_groups = 0
+        self.num_commits = 0
+        self.last_commit_latency = 0.0
+        self.total_commit_latency = 0.0
+
+    @property
+    def depth(self):
+        """
+        The number of queued writes that have not been executed yet.
+        """
+        return self._depth
+
+    def enqueue(self, sql, args):
+        self.enqueue_group((sql,), (args,))
+
+    def enqueue_group(self, statements, args, key=None):
+        """
+        Queues a group of write statements.
+        :param statements: a tuple with the SQL of the statements
+        :param args: a tuple with the arguments of every statement
+        :param key: identifies what the group writes to, groups with the same key are never reordered
+        """
+        if self._batches and self._batches[-1][0] == statements and (key is None or key not in self._batches[-1][2]):
+            batch = self._batches[-1]
+        else:
+            batch = (statements, [], set())
+            self._batches.append(batch)
+        batch[1].append(args)
+        if key is not None:
+            batch[2].add(key)
+        self._depth += len(statements)
+        self.num_queued += len(statements)
+
+        if self._first_uncommitted_time is None:
+            self._first_uncommitted_time = time.time()
+        self._num_uncommitted += len(statements)
+
+        if self._num_uncommitted >= self.max_size:
+            self.commit()
+        elif not self.db.is_pending_task_active(u"write queue commit"):
+            self.db.register_task(u"write queue commit", reactor.callLater(self.max_delay, self.commit))
+
+    def flush(self):
+        """
+        Executes all queued writes on the writer connection, without committing them.
+        """
+        if not self._batches:
+            return
+
+        batches, self._batches = self._batches, []
+        self._depth = 0
+
+        cursor = self.db.get_cursor()
+        for statements, args_list, _ in batches:
+            cursor.execute(u"SAVEPOINT write_queue")
+            try:
+                for index, sql in enumerate(statements):
+                    cursor.executemany(sql, [args[index] for args in args_list])
+                    self.num_batches += 1
+            except Exception:
+                self._logger.warning(u"write queue: failed to execute batch of %d, executing its groups one by one",
+                                     len(args_list))
+                cursor.execute(u"ROLLBACK TO write_queue")
+                self.num_failed_batches += 1
+                self._execute_groups(cursor, statements, args_list)
+            cursor.execute(u"RELEASE write_queue")
+        self.db.mark_uncommitted()
+
+    def _execute_groups(self, cursor, statements, args_list):
+        """
+        Executes the groups of a batch one by one, discarding the groups that fail.
+        """
+        for args in args_list:
+            cursor.execute(u"SAVEPOINT write_queue_group")
+            try:
+                for index, sql in enumerate(statements):
+                    cursor.execute(sql, args[index])
+            except Exception:
+                self._logger.exception(u"write queue: discarding group\n%s\n%s", u"\n".join(statements), args)
+                cursor.execute(u"ROLLBACK TO write_queue_group")
+                self.num_failed_groups += 1
+                self._num_discarded += len(statements)
+            cursor.execute(u"RELEASE write_queue_group")
+
+    def commit(self):
+        """
+        Flushes the queue and commits the current transaction. If the connection is in autocommit mode, the flushed
+        writes are already durable and no explicit commit is needed.
+        """
+        self.db.cancel_pending_task(u"write queue commit")
+        self.flush()
+        if self.db.connection.getautocommit():
+            self.on_committed()
+        else:
+            self.db.commit_now()
+
+    def on_committed(self):
+        """
+        Called after a commit of the writer connection: updates the commit latency and fires the Deferreds of callers
+        that are waiting for their writes to become durable. If writes were discarded since the last commit, the
+        Deferreds fail instead.
+        """
+        if self._first_uncommitted_time is not None:
+            self.last_commit_latency = time.time() - self._first_uncommitted_time
+            self.total_commit_latency += self.last_commit_latency
+            self.num_commits += 1
+        self._first_uncommitted_time = None
+        self._num_uncommitted = 0
+
+        num_discarded, self._num_discarded = self._num_discarded, 0
+        if num_discarded:
+            self._fail_waiters(RuntimeError(u"%d queued writes failed and were not committed" % num_discarded))
+            return
+
+        waiters, self._commit_waiters = self._commit_waiters, []
+        for deferred in waiters:
+            deferred.callback(None)
+
+    def _fail_waiters(self, exception):
+        waiters, self._commit_waiters = self._commit_waiters, []
+        for deferred in waiters:
+            deferred.errback(Failure(exception))
+
+    def close(self):
+        """
+        Executes and commits the queued writes before the connection is closed. The callers that are still waiting
+        for a commit afterwards get an error.
+        """
+        self.db.cancel_pending_task(u"write queue commit")
+        try:
+            self.flush()
+            if self.db.connection.getautocommit():
+                self.on_committed()
+            else:
+                self.db.commit_now(exiting=True)
+        finally:
+            self._fail_waiters(RuntimeError(u"the database was closed before the queued writes were committed"))
+
+    def wait_for_commit(self):
+        """
+        Returns a Deferred that fires once all writes queued so far have been committed.
+        """
+        if self._first_uncommitted_time is None:
+            deferred = Deferred()
+            deferred.callback(None)
+            return deferred
+
+        deferred = Deferred()
+        self._commit_waiters.append(deferred)
+        return deferred
+
+    def get_statistics(self):
+        return {"depth": self._depth,
+                "uncommitted": self._num_uncommitted,
+                "num_queued": self.num_queued,
+                "num_batches": self.num_batches,
+                "num_failed_batches": self.num_failed_batches,
+                "num_failed_groups": self.num_failed_groups,
+                "num_commits": self.num_commits,
+                "last_commit_latency": self.last_commit_latency,
+                "avg_commit_latency": self.total_commit_latency / self.num_commits if self.num_commits else 0.0}
+
+
 class SQLiteCacheDB(TaskManager):
 
-    def __init__(self, db_path, db_script_path=DB_SCRIPT_ABSOLUTE_PATH, busytimeout=DEFAULT_BUSY_TIMEOUT):
+    def __init__(self, db_path, db_script_path=DB_SCRIPT_ABSOLUTE_PATH, busytimeout=DEFAULT_BUSY_TIMEOUT,
+                 read_pool_size=DEFAULT_READ_POOL_SIZE, write_queue_max_size=DEFAULT_WRITE_QUEUE_MAX_SIZE,
+                 write_queue_max_delay=DEFAULT_WRITE_QUEUE_MAX_DELAY):
         super(SQLiteCacheDB, self).__init__()
 
         self._logger = logging.getLogger(self.__class__.__name__)
@@ -58,6 +362,12 @@ class SQLiteCacheDB(TaskManager):
         self.db_script_path = db_script_path
         self._busytimeout = busytimeout  # busytimeout is in milliseconds
 
+        # Read-only connections used by the *_async read methods. All writes go through self._connection.
+        self._read_pool_size = read_pool_size
+        self._read_pool = None
+
+        self._write_queue = WriteBehindQueue(self, write_queue_max_size, write_queue_max_delay)
+
         self._version = None
 
         self._should_commit = False
@@ -76,6 +386,20 @@ class SQLiteCacheDB(TaskManager):
         """
         return self._connection
 
+    @property
+    def read_pool(self):
+        """
+        Returns the pool of read-only connections, which is None for in-memory databases or if the pool is disabled.
+        """
+        return self._read_pool
+
+    @property
+    def write_queue(self):
+        """
+        Returns the write-behind queue used by queue_write.
+        """
+        return self._write_queue
+
     @blocking_call_on_reactor_thread
     def initialize(self):
         """ Initializes the database. If the database doesn't exist, we create a new one. Otherwise, we check the
@@ -85,12 +409,22 @@ class SQLiteCacheDB(TaskManager):
         # open a connection to the database
         self._open_connection()
 
+        # an in-memory database is private to its connection, so it cannot be shared with reader connections
+        if self.sqlite_db_path != u":memory:" and self._read_pool_size > 0:
+            self._read_pool = SQLiteReadPool(self.sqlite_db_path, self._read_pool_size, self._busytimeout)
+            self._read_pool.start()
+
     @blocking_call_on_reactor_thread
     def close(self):
         """
-        Cancels all pending tasks and closes all cursors. Then, it closes the connection.
+        Commits the write queue, cancels all pending tasks and closes all cursors. Then, it closes the connection.
         """
+        if self._connection:
+            self._write_queue.close()
         self.cancel_all_pending_tasks()
+        if self._read_pool:
+            self._read_pool.stop()
+            self._read_pool = None
         with self._cursor_lock:
             for cursor in self._cursor_table.itervalues():
                 cursor.close()
@@ -120,6 +454,7 @@ class SQLiteCacheDB(TaskManager):
         try:
             self._connection = apsw.Connection(self.sqlite_db_path)
             self._connection.setbusytimeout(self._busytimeout)
+            register_sql_functions(self._connection)
         except CantOpenError as e:
             msg = u"Failed to open connection to %s: %s" % (self.sqlite_db_path, e)
             raise CantOpenError(msg)
@@ -216,8 +551,12 @@ class SQLiteCacheDB(TaskManager):
         self.commit_now()
         self._version = version
 
+    def mark_uncommitted(self):
+        self._should_commit = True
+
     @call_on_reactor_thread
     def commit_now(self, vacuum=False, exiting=False):
+        self._write_queue.flush()
         if self._should_commit and isInIOThread():
             try:
                 self._logger.info(u"Start committing...")
@@ -226,6 +565,7 @@ class SQLiteCacheDB(TaskManager):
                 self._logger.exception(u"COMMIT FAILED")
                 raise
             self._should_commit = False
+            self._write_queue.on_committed()
 
             if vacuum:
                 self._logger.info(u"Start vacuuming...")
@@ -259,6 +599,8 @@ class SQLiteCacheDB(TaskManager):
 
     @blocking_call_on_reactor_thread
     def execute(self, sql, args=None):
+        # queued writes have to be executed first, both to preserve the write order and to make them visible
+        self._write_queue.flush()
         cur = self.get_cursor()
 
         if self._show_execute:
@@ -286,6 +628,7 @@ class SQLiteCacheDB(TaskManager):
     def executemany(self, sql, args=None):
         self._should_commit = True
 
+        self._write_queue.flush()
         cur = self.get_cursor()
         if self._show_execute:
             thread_name = currentThread().getName()
@@ -313,6 +656,26 @@ class SQLiteCacheDB(TaskManager):
 
         self.execute(sql, args)
 
+    @blocking_call_on_reactor_thread
+    def queue_write(self, sql, args=()):
+        """
+        Queues a write statement in the write-behind queue. Consecutive statements with the same SQL are executed as
+        one executemany batch. Use wait_for_commit to find out when the write has been committed.
+        """
+        self._write_queue.enqueue(sql, args)
+
+    def queue_write_group(self, statements, args, key=None):
+        """
+        Queues a group of write statements in the write-behind queue, see WriteBehindQueue.enqueue_group.
+        """
+        self._write_queue.enqueue_group(statements, args, key)
+
+    def wait_for_commit(self):
+        """
+        Returns a Deferred that fires once all writes queued so far have been committed.
+        """
+        return self._write_queue.wait_for_commit()
+
     def insert_or_ignore(self, table_name, **argv):
         if len(argv) == 1:
             sql = u'INSERT OR IGNORE INTO %s (%s) VALUES (?);' % (table_name, argv.keys()[0])
@@ -383,17 +746,10 @@ class SQLiteCacheDB(TaskManager):
             return
         else:
             find = list(find)
-            if len(find) > 0:
-                if len(find) > 1:
-                    self._logger.debug(
-                        u"FetchONE resulted in many more rows than one, consider putting a LIMIT 1 in the sql statement %s, %s", sql, len(find))
-                find = find[0]
-            else:
-                return
-        if len(find) > 1:
-            return find
-        else:
-            return find[0]
+            if len(find) > 1:
+                self._logger.debug(
+                    u"FetchONE resulted in many more rows than one, consider putting a LIMIT 1 in the sql statement %s, %s", sql, len(find))
+        return _fetchone_from_rows(find)
 
     @blocking_call_on_reactor_thread
     def fetchall(self, sql, args=None):
@@ -404,6 +760,26 @@ class SQLiteCacheDB(TaskManager):
         else:
             return []  # should it return None?
 
+    def fetchall_async(self, sql, args=None, commit_pending=False):
+        """
+        Runs a read query on the read pool, off the reactor thread. Only committed data is visible to these queries.
+        If there is no read pool (i.e. for in-memory databases), the query runs on the writer connection instead.
+        :param commit_pending: whether to commit the pending writes first, so the query sees them as well
+        :return: a Deferred that fires with the list of result rows
+        """
+        if self._read_pool is None:
+            return maybeDeferred(self.fetchall, sql, args)
+        if commit_pending:
+            self.commit_now()
+        return self._read_pool.fetchall(sql, args)
+
+    def fetchone_async(self, sql, args=None, commit_pending=False):
+        """
+        Same as fetchone, but runs on the read pool.
+        :return: a Deferred that fires with the result value, row or None
+        """
+        return self.fetchall_async(sql, args, commit_pending).addCallback(_fetchone_from_rows)
+
     def getOne(self, table_name, value_name, where=None, conj=u"AND", **kw):
         """ value_name could be a string, a tuple of strings, or '*'
         """
@@ -56,6 +56,8 @@ store_dir = string(default=collected_torrents)
 enabled = boolean(default=True)
 max_torrents = integer(default=50000)
 directory = string(default='')
+tftp_window_size = integer(min=1, max=64, default=16)
+max_tftp_requests = integer(min=1, default=4)
 
 [libtorrent]
 enabled = boolean(default=True)
@@ -67,6 +69,8 @@ max_connections_download = integer(default=-1)
 max_download_rate = integer(default=0)
 max_upload_rate = integer(default=0)
 utp = boolean(default=True)
+resume_store_enabled = boolean(default=False)
+resume_store_dir = string(default=dlresume)
 
 anon_listen_port = integer(min=-1, max=65536, default=-1)
 anon_proxy_type = integer(min=0, max=5, default=0)
@@ -275,6 +275,18 @@ class TriblerConfig(object):
     def get_libtorrent_utp(self):
         return self.config['libtorrent']['utp']
 
+    def set_libtorrent_resume_store_enabled(self, value):
+        self.config['libtorrent']['resume_store_enabled'] = value
+
+    def get_libtorrent_resume_store_enabled(self):
+        return self.config['libtorrent']['resume_store_enabled']
+
+    def set_libtorrent_resume_store_dir(self, value):
+        self.config['libtorrent']['resume_store_dir'] = value
+
+    def get_libtorrent_resume_store_dir(self):
+        return os.path.join(self.get_state_dir(), self.config['libtorrent']['resume_store_dir'])
+
     def set_libtorrent_port(self, port):
         self.config['libtorrent']['port'] = port
 
@@ -548,6 +560,18 @@ class TriblerConfig(object):
     def get_torrent_collecting_dir(self):
         return self.config['torrent_collecting']['directory']
 
+    def set_torrent_collecting_tftp_window_size(self, value):
+        self.config['torrent_collecting']['tftp_window_size'] = value
+
+    def get_torrent_collecting_tftp_window_size(self):
+        return self.config['torrent_collecting']['tftp_window_size']
+
+    def set_torrent_collecting_max_tftp_requests(self, value):
+        self.config['torrent_collecting']['max_tftp_requests'] = value
+
+    def get_torrent_collecting_max_tftp_requests(self):
+        return self.config['torrent_collecting']['max_tftp_requests']
+
     # Search Community
 
     def set_torrent_search_enabled(self, mode):
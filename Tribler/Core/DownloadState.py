@@ -41,6 +41,8 @@ class DownloadState(object):
         self.haveslice = None
         self.stats = None
         self.length = None
+        # The statistics reported by libtorrent, which are also available when not downloading or seeding
+        self.lt_stats = stats.get('stats', None) if stats else None
 
         name = self.download.get_def().get_name()
 
@@ -99,24 +101,15 @@ class DownloadState(object):
                 selected_files = self.download.get_selected_files()
                 # Show only pieces complete for the selected ranges of files
                 totalpieces = 0
+                haveslice = []
                 for t, tl, o, f in self.filepieceranges:
                     if f in selected_files or not selected_files:
-                        diff = tl - t
-                        totalpieces += diff
+                        totalpieces += tl - t
+                        haveslice.extend(stats['stats'].have[t:tl])
 
-                haveslice = [False] * totalpieces
-                have = 0
-                index = 0
-                for t, tl, o, f in self.filepieceranges:
-                    if f in selected_files or not selected_files:
-                        for piece in range(t, tl):
-                            haveslice[index] = stats['stats'].have[piece]
-                            if haveslice[index]:
-                                have += 1
-
-                            index += 1
+                have = len(haveslice) - haveslice.count(False)
                 self.haveslice = haveslice
-                if have == len(haveslice) and self.status == DLSTATUS_DOWNLOADING:
+                if have == totalpieces and self.status == DLSTATUS_DOWNLOADING:
                     # we have all pieces of the selected files
                     self.status = DLSTATUS_SEEDING
                     self.progress = 1.0
@@ -161,6 +154,13 @@ class DownloadState(object):
         else:
             return self.stats['down']
 
+    def get_libtorrent_statistics(self):
+        """
+        Returns the statistics (seeders, leechers, totals transferred) reported by libtorrent.
+        @return A LibtorrentStatisticsResponse or None if the download is not running.
+        """
+        return self.lt_stats
+
     def get_total_transferred(self, direct):
         """
         Returns the total amount of up or downloaded bytes.
@@ -296,10 +296,8 @@ class DownloadState(object):
                     # niels: ranges are from-to (inclusive ie if a file consists one piece t and tl will be the same)
                     total_pieces = tl - t
                     if total_pieces and getattr(self, 'haveslice_total', False):
-                        completed = 0
-                        for index in range(t, tl):
-                            if self.haveslice_total[index]:
-                                completed += 1
+                        pieces = self.haveslice_total[t:tl]
+                        completed = len(pieces) - pieces.count(False)
 
                         completion.append((f, completed / (total_pieces * 1.0)))
                     elif f in files:
@@ -332,7 +330,7 @@ class DownloadState(object):
         of this + the average of all additional pieces.
         """
         nr_seeders_complete = 0
-        merged_bitfields = None
+        leecher_bitfields = []
 
         peers = self.get_peerlist()
         for peer in peers:
@@ -341,20 +339,17 @@ class DownloadState(object):
 
             if completed == 1 or have and all(have):
                 nr_seeders_complete += 1
-            else:
-                if merged_bitfields is None:
-                    merged_bitfields = [0] * len(have)
-
-                for i in range(len(have)):
-                    if have[i]:
-                        merged_bitfields[i] += 1
+            elif have:
+                leecher_bitfields.append(have)
 
-        if merged_bitfields:
+        if leecher_bitfields:
+            # the number of leechers that have each piece, summed column by column
+            merged_bitfields = map(sum, zip(*leecher_bitfields))
             # count the number of complete copies due to overlapping leecher bitfields
             nr_leechers_complete = min(merged_bitfields)
 
             # detect remainder of bitfields which are > 0
-            nr_more_than_min = len([x for x in merged_bitfields if x > nr_leechers_complete])
+            nr_more_than_min = len(merged_bitfields) - merged_bitfields.count(nr_leechers_complete)
             fraction_additonal = float(nr_more_than_min) / len(merged_bitfields)
 
             return nr_seeders_complete + nr_leechers_complete + fraction_additonal
@@ -3,7 +3,6 @@ A wrapper around a libtorrent download.
 
 Author(s): Arno Bakker, Egbert Bouman
 """
-import base64
 import logging
 import os
 import random
@@ -21,6 +20,7 @@ from Tribler.Core import NoDispersyRLock
 from Tribler.Core.DownloadConfig import DownloadStartupConfig, DownloadConfigInterface
 from Tribler.Core.DownloadState import DownloadState
 from Tribler.Core.Libtorrent import checkHandleAndSynchronize
+from Tribler.Core.Libtorrent.PieceMap import PieceMap
 from Tribler.Core.TorrentDef import TorrentDefNoMetainfo, TorrentDef
 from Tribler.Core.Utilities import maketorrent
 from Tribler.Core.Utilities.torrent_utils import get_info_from_handle
@@ -142,6 +142,10 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
         self.pause_after_next_hashcheck = False
         self.checkpoint_after_next_hashcheck = False
         self.tracker_status = {}  # {url: [num_peers, status_str]}
+        # The last torrent_status we got from libtorrent, either pushed by a state_update_alert or queried by us
+        self.lt_status = None
+        # The pieces we have according to lt_status
+        self.piece_map = None
 
         self.prebuffsize = 5 * 1024 * 1024
         self.endbuffsize = 0
@@ -160,6 +164,17 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
         self.deferreds_resume = []
         self.deferreds_handle = []
 
+        self.alert_handlers = {'tracker_reply_alert': self.on_tracker_reply_alert,
+                               'tracker_error_alert': self.on_tracker_error_alert,
+                               'tracker_warning_alert': self.on_tracker_warning_alert,
+                               'metadata_received_alert': self.on_metadata_received_alert,
+                               'file_renamed_alert': self.on_file_renamed_alert,
+                               'performance_alert': self.on_performance_alert,
+                               'torrent_checked_alert': self.on_torrent_checked_alert,
+                               'torrent_finished_alert': self.on_torrent_finished_alert,
+                               'save_resume_data_alert': self.on_save_resume_data_alert,
+                               'save_resume_data_failed_alert': self.on_save_resume_data_failed_alert}
+
         self.handle_check_lc = self.register_task("handle_check", LoopingCall(self.check_handle))
 
     def __str__(self):
@@ -337,6 +352,8 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
                 atp["name"] = self.tdef.get_name_as_unicode()
 
             self.handle = self.ltmgr.add_torrent(self, atp)
+            self.lt_status = None
+            self.piece_map = None
             # assert self.handle.status().share_mode == share_mode
             if self.handle.is_valid():
 
@@ -416,39 +433,32 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
             return file_entry.size
         return 0
 
+    @checkHandleAndSynchronize()
+    def get_piece_map(self):
+        """
+        Returns the PieceMap of the last status snapshot, or a PieceMap of the current status if there is none yet.
+        """
+        if self.piece_map is not None:
+            return self.piece_map
+
+        status = self.handle.status()
+        return PieceMap(status.pieces) if status else None
+
     @checkHandleAndSynchronize(0.0)
     def get_piece_progress(self, pieces, consecutive=False):
         if not pieces:
             return 1.0
-        elif consecutive:
-            pieces.sort()
 
-        status = self.handle.status()
-        if status:
-            pieces_have = 0
-            pieces_all = len(pieces)
-            bitfield = status.pieces
-            for pieceindex in pieces:
-                if pieceindex < len(bitfield) and bitfield[pieceindex]:
-                    pieces_have += 1
-                elif consecutive:
-                    break
-            return float(pieces_have) / pieces_all
-        return 0.0
+        piece_map = self.get_piece_map()
+        return piece_map.get_piece_progress(pieces, consecutive) if piece_map else 0.0
 
     @checkHandleAndSynchronize('')
     def get_pieces_base64(self):
         """
         Returns a base64 encoded bitmask of the pieces that we have.
         """
-        bitstr = ""
-        for bit in self.handle.status().pieces:
-            bitstr += '1' if bit else '0'
-
-        encoded_str = ""
-        for i in range(0, len(bitstr), 8):
-            encoded_str += chr(int(bitstr[i:i+8].ljust(8, '0'), 2))
-        return base64.b64encode(encoded_str)
+        piece_map = self.get_piece_map()
+        return piece_map.to_base64() if piece_map else ''
 
     @checkHandleAndSynchronize(0)
     def get_num_pieces(self):
@@ -460,7 +470,7 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
 
     @checkHandleAndSynchronize(0.0)
     def get_byte_progress(self, byteranges, consecutive=False):
-        pieces = []
+        pieceranges = []
         for fileindex, bytes_begin, bytes_end in byteranges:
             if fileindex >= 0:
                 # Ensure the we remain within the file's boundaries
@@ -474,21 +484,24 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
                 startpiece = max(startpiece, 0)
                 endpiece = min(endpiece, get_info_from_handle(self.handle).num_pieces())
 
-                pieces += range(startpiece, endpiece)
+                pieceranges.append((startpiece, endpiece))
             else:
                 self._logger.info("LibtorrentDownloadImpl: could not get progress for incorrect fileindex")
 
-        pieces = list(set(pieces))
-        return self.get_piece_progress(pieces, consecutive)
+        if not any(startpiece < endpiece for startpiece, endpiece in pieceranges):
+            return 1.0
+
+        piece_map = self.get_piece_map()
+        return piece_map.get_range_progress(pieceranges, consecutive) if piece_map else 0.0
 
     @checkHandleAndSynchronize()
     def set_piece_priority(self, pieces_need, priority):
         do_prio = False
-        pieces_have = self.handle.status().pieces
+        piece_map = self.get_piece_map()
         piecepriorities = self.handle.piece_priorities()
         for piece in pieces_need:
             if piece < len(piecepriorities):
-                if piecepriorities[piece] != priority and not pieces_have[piece]:
+                if piecepriorities[piece] != priority and not piece_map.has(piece):
                     piecepriorities[piece] = priority
                     do_prio = True
             else:
@@ -528,14 +541,9 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
         if alert.category() in [lt.alert.category_t.error_notification, lt.alert.category_t.performance_warning]:
             self._logger.debug("LibtorrentDownloadImpl: alert %s with message %s", alert_type, alert)
 
-        alert_types = ('tracker_reply_alert', 'tracker_error_alert', 'tracker_warning_alert', 'metadata_received_alert',
-                       'file_renamed_alert', 'performance_alert', 'torrent_checked_alert', 'torrent_finished_alert',
-                       'save_resume_data_alert', 'save_resume_data_failed_alert')
-
-        if alert_type in alert_types:
-            getattr(self, 'on_' + alert_type)(alert)
-        else:
-            self.update_lt_stats()
+        handler = self.alert_handlers.get(alert_type)
+        if handler:
+            handler(alert)
 
     def on_save_resume_data_alert(self, alert):
         """
@@ -548,13 +556,8 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
         self.pstate_for_restart.set('state', 'engineresumedata', resume_data)
         self._logger.debug("%s get resume data %s", hexlify(resume_data['info-hash']), resume_data)
 
-        # save it to file
-        basename = hexlify(resume_data['info-hash']) + '.state'
-        filename = os.path.join(self.session.get_downloads_pstate_dir(), basename)
-
-        self._logger.debug("tlm: network checkpointing: to file %s", filename)
-
-        self.pstate_for_restart.write_file(filename)
+        # save it to file or to the resume store
+        self.session.lm.write_download_pstate(resume_data['info-hash'], self.pstate_for_restart)
 
         # fire callback for all deferreds_resume
         for deferred_r in self.deferreds_resume:
@@ -680,9 +683,21 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
                 self.set_byte_priority([(self.get_vod_fileindex(), 0, -1)], 1)
                 self.endbuffsize = 0
 
-    def update_lt_stats(self):
-        """ Update libtorrent stats and check if the download should be stopped."""
-        status = self.handle.status()
+    @checkHandleAndSynchronize()
+    def on_state_update(self, status):
+        """
+        Called by the LibtorrentMgr with the torrent_status of this download, when libtorrent reports it has changed.
+        """
+        self.update_lt_stats(status)
+
+    def update_lt_stats(self, status=None):
+        """
+        Update libtorrent stats and check if the download should be stopped.
+        :param status: the torrent_status to update from, if None it is queried from the handle
+        """
+        status = status or self.handle.status()
+        self.lt_status = status
+        self.piece_map = PieceMap(status.pieces)
         self.dlstate = self.dlstates[status.state] if not status.paused else DLSTATUS_STOPPED
         self.dlstate = DLSTATUS_STOPPED_ON_ERROR if self.dlstate == DLSTATUS_STOPPED and status.error else self.dlstate
         if self.get_mode() == DLMODE_VOD:
@@ -895,7 +910,7 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
 
     @checkHandleAndSynchronize()
     def network_create_statistics_reponse(self):
-        status = self.handle.status()
+        status = self.lt_status or self.handle.status()
         numTotSeeds = status.num_complete if status.num_complete >= 0 else status.list_seeds
         numTotPeers = status.num_incomplete if status.num_incomplete >= 0 else status.list_peers
         numleech = max(status.num_peers - status.num_seeds, 0)  # When anon downloading, this might become negative
@@ -1008,6 +1023,16 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
         with self.dllock:
             reactor.callFromThread(lambda: self.network_get_state(usercallback, getpeerlist))
 
+    def get_state_key(self):
+        """
+        Returns a key that only changes when the state of this download may have changed, or None if the state
+        should always be rebuilt. An active download only changes when libtorrent pushes a new torrent_status.
+        """
+        with self.dllock:
+            if self.dlstate == DLSTATUS_CIRCUITS or (self.handle is not None and self.lt_status is None):
+                return None
+            return self.handle, self.lt_status, self.dlstate, self.error
+
     def network_get_state(self, usercallback, getpeerlist):
         """ Called by network thread """
         with self.dllock:
@@ -1069,6 +1094,8 @@ class LibtorrentDownloadImpl(DownloadConfigInterface, TaskManager):
                 if removestate:
                     self.ltmgr.remove_torrent(self, removecontent)
                     self.handle = None
+                    self.lt_status = None
+                    self.piece_map = None
                 else:
                     self.set_vod_mode(False)
                     self.handle.pause()
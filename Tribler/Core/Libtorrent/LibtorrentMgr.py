@@ -140,8 +140,7 @@ class LibtorrentMgr(TaskManager):
             ltsession.add_extension(lt.create_smart_ban_plugin)
 
         ltsession.set_settings(settings)
-        ltsession.set_alert_mask(lt.alert.category_t.stats_notification |
-                                 lt.alert.category_t.error_notification |
+        ltsession.set_alert_mask(lt.alert.category_t.error_notification |
                                  lt.alert.category_t.status_notification |
                                  lt.alert.category_t.storage_notification |
                                  lt.alert.category_t.performance_warning |
@@ -317,7 +316,11 @@ class LibtorrentMgr(TaskManager):
             self._logger.warning("port mapping method not exposed in libtorrent")
 
     def process_alert(self, alert):
-        alert_type = str(type(alert)).split("'")[1].split(".")[-1]
+        alert_type = type(alert).__name__
+        if alert_type == 'state_update_alert':
+            self.on_state_update_alert(alert)
+            return
+
         handle = getattr(alert, 'handle', None)
         if handle:
             if handle.is_valid():
@@ -332,6 +335,15 @@ class LibtorrentMgr(TaskManager):
             else:
                 self._logger.debug("Alert for invalid torrent")
 
+    def on_state_update_alert(self, alert):
+        """
+        Passes the status of every torrent that changed since the last call to post_torrent_updates to its download.
+        """
+        for status in alert.status:
+            infohash = str(status.info_hash)
+            if infohash in self.torrents:
+                self.torrents[infohash][0].on_state_update(status)
+
     def get_metainfo(self, infohash_or_magnet, callback, timeout=30, timeout_callback=None, notify=True):
         if not self.is_dht_ready() and timeout > 5:
             self._logger.info("DHT not ready, rescheduling get_metainfo")
@@ -480,6 +492,8 @@ class LibtorrentMgr(TaskManager):
             if ltsession:
                 for alert in ltsession.pop_alerts():
                     self.process_alert(alert)
+                # Ask for the status of the torrents that changed, it arrives as a state_update_alert on the next tick
+                ltsession.post_torrent_updates()
 
     def _check_reachability(self):
         if self.get_session() and self.get_session().status().has_incoming_connections:
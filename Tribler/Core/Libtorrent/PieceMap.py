@@ -0,0 +1,117 @@
+"""
+A compact map of the pieces of a torrent that we have.
+"""
+import base64
+import binascii
+
+HAVE = '\x01'
+MISSING = '\x00'
+
+# Translates the piece bytes to the characters of a binary number, so the whole map can be packed by int()
+_BIT_CHARS = bytearray('01' + '\x00' * 254)
+
+
+class PieceMap(object):
+    """
+    Keeps the pieces bitfield of a torrent status as a bytearray with one byte (0 or 1) per piece.
+
+    Counting, searching and packing ranges of pieces then runs in the C implementation of bytearray, instead of in
+    Python loops over the list of booleans we get from libtorrent. The map is built once per status snapshot and
+    can be queried many times.
+    """
+
+    def __init__(self, pieces=()):
+        try:
+            self._map = bytearray(pieces)
+        except ValueError:
+            self._map = None
+        if self._map is None or self._map.count(HAVE) + self._map.count(MISSING) != len(self._map):
+            # The bitfield contained other truthy values than True, fall back to converting them one by one
+            self._map = bytearray(1 if piece else 0 for piece in pieces)
+
+    def __len__(self):
+        return len(self._map)
+
+    def has(self, index):
+        return 0 <= index < len(self._map) and self._map[index] == 1
+
+    def num_have(self, start=0, end=None):
+        """
+        Returns the number of pieces we have in the range [start, end).
+        """
+        return self._map.count(HAVE, start, len(self._map) if end is None else end)
+
+    def first_missing(self, start=0, end=None):
+        """
+        Returns the index of the first piece in the range [start, end) we do not have, or -1 if we have all of them.
+        """
+        return self._map.find(MISSING, start, len(self._map) if end is None else end)
+
+    @staticmethod
+    def merge_ranges(ranges):
+        """
+        Sorts piece ranges and merges the ones that overlap, so no piece is counted twice.
+        :param ranges: a list of (start, end) tuples, end is exclusive
+        """
+        merged = []
+        for start, end in sorted(ranges):
+            if start >= end:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return merged
+
+    def get_range_progress(self, ranges, consecutive=False):
+        """
+        Returns the fraction of the pieces in the given ranges that we have.
+        :param ranges: a list of (start, end) tuples, end is exclusive
+        :param consecutive: only count the pieces up to the first one we do not have
+        """
+        merged = self.merge_ranges(ranges)
+        total = sum(end - start for start, end in merged)
+        if not total:
+            return 1.0
+
+        have = 0
+        for start, end in merged:
+            if not consecutive:
+                have += self.num_have(start, end)
+                continue
+
+            missing = self.first_missing(start, end)
+            if missing < 0 and end <= len(self._map):
+                have += end - start
+            else:
+                have += max((missing if missing >= 0 else len(self._map)) - start, 0)
+                break
+        return float(have) / total
+
+    def get_piece_progress(self, pieces, consecutive=False):
+        """
+        Returns the fraction of the given piece indices that we have.
+        """
+        if consecutive:
+            pieces = sorted(pieces)
+
+        have = 0
+        for index in pieces:
+            if self.has(index):
+                have += 1
+            elif consecutive:
+                break
+        return float(have) / len(pieces) if pieces else 1.0
+
+    def to_bytes(self):
+        """
+        Packs the map into a bitfield, with the first piece in the most significant bit of the first byte.
+        """
+        if not self._map:
+            return ''
+        bits = str(self._map.translate(_BIT_CHARS))
+        bits += '0' * (-len(bits) % 8)
+        return binascii.unhexlify('%0*x' % (len(bits) // 4, int(bits, 2)))
+
+    def to_base64(self):
+        return base64.b64encode(self.to_bytes())
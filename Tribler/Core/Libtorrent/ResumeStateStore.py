@@ -0,0 +1,84 @@
+"""
+A store that keeps the persistent state of all downloads together.
+"""
+import logging
+from StringIO import StringIO
+
+from Tribler.Core.Utilities.configparser import CallbackConfigParser
+
+
+class ResumeStateStore(object):
+    """
+    Keeps the pstates of all downloads (including their libtorrent resume data) in a single LevelDB store, keyed by
+    infohash. This replaces the directory with one .state file per download, which takes a file system lookup, open
+    and read for every download when starting and a file write for every checkpoint.
+    """
+
+    def __init__(self, store_dir, store=None):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        if store is None:
+            from Tribler.Core.leveldbstore import LevelDbStore
+            store = LevelDbStore(store_dir)
+        self._store = store
+
+    def __contains__(self, infohash):
+        return infohash in self._store
+
+    def __len__(self):
+        return len(self._store)
+
+    def get_infohashes(self):
+        """
+        Returns the infohashes of all downloads that have a stored pstate.
+        """
+        return list(self._store.iterkeys())
+
+    def get(self, infohash):
+        """
+        Returns the pstate of a download as a CallbackConfigParser, or None if there is none. Called on the reactor
+        thread, which is also where the store is flushed.
+        """
+        return self.parse(self.get_data(infohash))
+
+    def get_data(self, infohash):
+        """
+        Returns the pstate of a download as it was stored, or None if there is none. Called on the reactor thread.
+        """
+        return self._store.get(infohash)
+
+    @staticmethod
+    def parse(data):
+        """
+        Parses a pstate returned by get_data. Called by any thread.
+        """
+        if data is None:
+            return None
+
+        pstate = CallbackConfigParser()
+        pstate.readfp(StringIO(data.decode('utf-8')))
+        return pstate
+
+    def put(self, infohash, pstate):
+        """
+        Stores the pstate of a download. It is kept in the write cache of the store until the store is flushed, which
+        happens periodically and when the store is closed, so a checkpoint does not cost a disk write.
+        """
+        data = StringIO()
+        pstate.write(data)
+        self._store.put(infohash, data.getvalue().encode('utf-8'))
+
+    def remove(self, infohash):
+        """
+        Removes the pstate of a download. This is written to disk right away.
+        """
+        if infohash in self._store:
+            del self._store[infohash]
+
+    def flush(self):
+        """
+        Writes the cached pstates to disk.
+        """
+        self._store.flush()
+
+    def close(self):
+        return self._store.close()
@@ -67,23 +67,30 @@ class ChannelsTorrentsEndpoint(BaseChannelsEndpoint):
 
         torrent_db_columns = ['Torrent.torrent_id', 'infohash', 'Torrent.name', 'length', 'Torrent.category',
                               'num_seeders', 'num_leechers', 'last_tracker_check', 'ChannelTorrents.inserted']
-        results_local_torrents_channel = self.channel_db_handler\
-            .getTorrentsFromChannelId(channel_info[0], True, torrent_db_columns)
 
         should_filter = self.session.config.get_family_filter_enabled()
         if 'disable_filter' in request.args and len(request.args['disable_filter']) > 0 \
                 and request.args['disable_filter'][0] == "1":
             should_filter = False
 
-        results_json = []
-        for torrent_result in results_local_torrents_channel:
-            torrent_json = convert_db_torrent_to_json(torrent_result)
-            if torrent_json['name'] is None or (should_filter and torrent_json['category'] == 'xxx'):
-                continue
+        def on_torrents_found(results_local_torrents_channel):
+            results_json = []
+            for torrent_result in results_local_torrents_channel:
+                torrent_json = convert_db_torrent_to_json(torrent_result)
+                if torrent_json['name'] is None or (should_filter and torrent_json['category'] == 'xxx'):
+                    continue
 
-            results_json.append(torrent_json)
+                results_json.append(torrent_json)
 
-        return json.dumps({"torrents": results_json})
+            request.write(json.dumps({"torrents": results_json}))
+            request.finish()
+
+        def on_torrents_failed(failure):
+            request.processingFailed(failure)
+
+        self.channel_db_handler.getTorrentsFromChannelId_async(channel_info[0], True, torrent_db_columns)\
+            .addCallbacks(on_torrents_found, on_torrents_failed)
+        return NOT_DONE_YET
 
     def render_PUT(self, request):
         """
@@ -1,12 +1,18 @@
 import json
 import logging
+import time
+
 from twisted.web import http, resource
 from twisted.web.server import NOT_DONE_YET
 
 from Tribler.Core.DownloadConfig import DownloadStartupConfig
 from Tribler.Core.Libtorrent.LibtorrentDownloadImpl import LibtorrentStatisticsResponse
+from Tribler.Core.Modules.restapi.util import get_parameter
 from Tribler.Core.simpledefs import DOWNLOAD, UPLOAD, dlstatus_strings, DLMODE_VOD
 
+# Number of seconds during which a snapshot of the state of a download is reused
+DOWNLOAD_SNAPSHOT_INTERVAL = 1.0
+
 
 class DownloadBaseEndpoint(resource.Resource):
     """
@@ -66,12 +72,111 @@ class DownloadBaseEndpoint(resource.Resource):
         return download_config, None
 
 
+class DownloadSnapshots(object):
+    """
+    Keeps a JSON snapshot of the state of every download. A snapshot is refreshed at most once every
+    DOWNLOAD_SNAPSHOT_INTERVAL seconds and shared by all requests in between. Whenever the snapshot of a download
+    changes, it gets a new version number so clients can ask for the downloads that changed since a given version.
+    """
+
+    def __init__(self, session, interval=DOWNLOAD_SNAPSHOT_INTERVAL):
+        self.session = session
+        self.interval = interval
+        self.version = 0
+        # infohash -> [time of the snapshot, version, download, download json]
+        self._snapshots = {}
+        # infohash -> version at which the removal of the download was noticed
+        self._removed = {}
+
+    def get_snapshots(self, downloads):
+        """
+        Returns a (version, download, download json) tuple for every download, refreshing outdated snapshots.
+        """
+        now = time.time()
+        snapshots = []
+        for download in downloads:
+            infohash = download.get_def().get_infohash()
+            snapshot = self._snapshots.get(infohash)
+            if snapshot is None or snapshot[2] is not download or now - snapshot[0] >= self.interval:
+                download_json = self.create_download_json(download)
+                if snapshot is None or snapshot[2] is not download or snapshot[3] != download_json:
+                    self.version += 1
+                    snapshot = self._snapshots[infohash] = [now, self.version, download, download_json]
+                    self._removed.pop(infohash, None)
+                else:
+                    snapshot[0] = now
+            snapshots.append((snapshot[1], download, snapshot[3]))
+
+        if len(snapshots) != len(self._snapshots):
+            current = set(download.get_def().get_infohash() for download in downloads)
+            for infohash in [infohash for infohash in self._snapshots if infohash not in current]:
+                del self._snapshots[infohash]
+                self.version += 1
+                self._removed[infohash] = self.version
+
+        return snapshots
+
+    def get_removed_since(self, version):
+        """
+        Returns the infohashes of the downloads that were removed after the given version.
+        """
+        return [infohash.encode('hex') for infohash, removed in self._removed.iteritems() if removed > version]
+
+    def create_download_json(self, download):
+        state = download.network_get_state(None, False)
+        stats = state.get_libtorrent_statistics() or LibtorrentStatisticsResponse(0, 0, 0, 0, 0, 0, 0)
+
+        # Create files information of the download
+        files_completion = dict((name, progress) for name, progress in state.get_files_completion())
+        selected_files = download.get_selected_files()
+        files_array = []
+        file_index = 0
+        for file, size in download.get_def().get_files_with_length():
+            files_array.append({"index": file_index, "name": file, "size": size,
+                                "included": (file in selected_files or not selected_files),
+                                "progress": files_completion.get(file, 0.0)})
+            file_index += 1
+
+        # Create tracker information of the download
+        tracker_info = []
+        for url, url_info in download.network_tracker_status().iteritems():
+            tracker_info.append({"url": url, "peers": url_info[0], "status": url_info[1]})
+
+        ratio = 0.0
+        if stats.downTotal > 0:
+            ratio = stats.upTotal / float(stats.downTotal)
+
+        return {"name": download.get_def().get_name(), "progress": download.get_progress(),
+                "infohash": download.get_def().get_infohash().encode('hex'),
+                "speed_down": download.get_current_speed(DOWNLOAD),
+                "speed_up": download.get_current_speed(UPLOAD),
+                "status": dlstatus_strings[download.get_status()],
+                "size": download.get_def().get_length(), "eta": download.network_calc_eta(),
+                "num_peers": stats.numPeers, "num_seeds": stats.numSeeds, "total_up": stats.upTotal,
+                "total_down": stats.downTotal, "ratio": ratio,
+                "files": files_array, "trackers": tracker_info, "hops": download.get_hops(),
+                "anon_download": download.get_anon_mode(), "safe_seeding": download.get_safe_seeding(),
+                # Maximum upload/download rates are set for entire sessions
+                "max_upload_speed": self.session.config.get_libtorrent_max_upload_rate(),
+                "max_download_speed": self.session.config.get_libtorrent_max_download_rate(),
+                "destination": download.get_dest_dir(), "availability": state.get_availability(),
+                "total_pieces": download.get_num_pieces(), "vod_mode": download.get_mode() == DLMODE_VOD,
+                "vod_prebuffering_progress": state.get_vod_prebuffering_progress(),
+                "vod_prebuffering_progress_consec": state.get_vod_prebuffering_progress_consec(),
+                "error": repr(state.get_error()) if state.get_error() else "",
+                "time_added": download.get_time_added()}
+
+
 class DownloadsEndpoint(DownloadBaseEndpoint):
     """
     This endpoint is responsible for all requests regarding downloads. Examples include getting all downloads,
     starting, pausing and stopping downloads.
     """
 
+    def __init__(self, session):
+        DownloadBaseEndpoint.__init__(self, session)
+        self.snapshots = DownloadSnapshots(session)
+
     def getChild(self, path, request):
         return DownloadSpecificEndpoint(self.session, path)
 
@@ -88,6 +193,14 @@ class DownloadsEndpoint(DownloadBaseEndpoint):
         Note that setting this flag has a negative impact on performance and should only be used in situations
         where this data is required.
 
+        The state of every download is taken at most once per second and shared between requests. The following optional
+        parameters can be used to reduce the size of the response:
+        - fields: a comma-separated list of the fields to return for every download (the infohash is always returned)
+        - offset and limit: only return the downloads in this range, ordered by the time they were added
+        - since: only return the downloads that changed after this version. The response then also contains the
+          current version, to be used as since parameter of the next request, and the infohashes of the downloads
+          that have been removed. Use since=0 to get all downloads and the current version.
+
             **Example request**:
 
             .. sourcecode:: none
@@ -159,66 +272,58 @@ class DownloadsEndpoint(DownloadBaseEndpoint):
                 and request.args['get_pieces'][0] == "1":
             get_pieces = True
 
+        fields = None
+        if get_parameter(request.args, 'fields'):
+            fields = set(get_parameter(request.args, 'fields').split(','))
+            fields.add("infohash")
+
+        try:
+            offset = int(get_parameter(request.args, 'offset') or 0)
+            limit = int(get_parameter(request.args, 'limit')) if get_parameter(request.args, 'limit') else None
+            since = int(get_parameter(request.args, 'since')) if get_parameter(request.args, 'since') else None
+        except ValueError:
+            request.setResponseCode(http.BAD_REQUEST)
+            return json.dumps({"error": "the offset, limit and since parameters must be numbers"})
+
+        if offset < 0 or (limit is not None and limit <= 0):
+            request.setResponseCode(http.BAD_REQUEST)
+            return json.dumps({"error": "the offset must not be negative and the limit must be a positive number"})
+
+        snapshots = self.snapshots.get_snapshots(self.session.get_downloads())
+        if since is not None:
+            snapshots = [snapshot for snapshot in snapshots if snapshot[0] > since]
+        # Order the downloads so paging through them gives consistent results
+        snapshots.sort(key=lambda snapshot: (snapshot[1].get_time_added(), snapshot[2]["infohash"]))
+        snapshots = snapshots[offset:offset + limit if limit is not None else None]
+
         downloads_json = []
-        downloads = self.session.get_downloads()
-        for download in downloads:
-            stats = download.network_create_statistics_reponse() or LibtorrentStatisticsResponse(0, 0, 0, 0, 0, 0, 0)
-            state = download.network_get_state(None, get_peers)
-
-            # Create files information of the download
-            files_completion = dict((name, progress) for name, progress in state.get_files_completion())
-            selected_files = download.get_selected_files()
-            files_array = []
-            file_index = 0
-            for file, size in download.get_def().get_files_with_length():
-                files_array.append({"index": file_index, "name": file, "size": size,
-                                    "included": (file in selected_files or not selected_files),
-                                    "progress": files_completion.get(file, 0.0)})
-                file_index += 1
-
-            # Create tracker information of the download
-            tracker_info = []
-            for url, url_info in download.network_tracker_status().iteritems():
-                tracker_info.append({"url": url, "peers": url_info[0], "status": url_info[1]})
-
-            ratio = 0.0
-            if stats.downTotal > 0:
-                ratio = stats.upTotal / float(stats.downTotal)
-
-            download_json = {"name": download.get_def().get_name(), "progress": download.get_progress(),
-                             "infohash": download.get_def().get_infohash().encode('hex'),
-                             "speed_down": download.get_current_speed(DOWNLOAD),
-                             "speed_up": download.get_current_speed(UPLOAD),
-                             "status": dlstatus_strings[download.get_status()],
-                             "size": download.get_def().get_length(), "eta": download.network_calc_eta(),
-                             "num_peers": stats.numPeers, "num_seeds": stats.numSeeds, "total_up": stats.upTotal,
-                             "total_down": stats.downTotal, "ratio": ratio,
-                             "files": files_array, "trackers": tracker_info, "hops": download.get_hops(),
-                             "anon_download": download.get_anon_mode(), "safe_seeding": download.get_safe_seeding(),
-                             # Maximum upload/download rates are set for entire sessions
-                             "max_upload_speed": self.session.config.get_libtorrent_max_upload_rate(),
-                             "max_download_speed": self.session.config.get_libtorrent_max_download_rate(),
-                             "destination": download.get_dest_dir(), "availability": state.get_availability(),
-                             "total_pieces": download.get_num_pieces(), "vod_mode": download.get_mode() == DLMODE_VOD,
-                             "vod_prebuffering_progress": state.get_vod_prebuffering_progress(),
-                             "vod_prebuffering_progress_consec": state.get_vod_prebuffering_progress_consec(),
-                             "error": repr(state.get_error()) if state.get_error() else "",
-                             "time_added": download.get_time_added()}
+        for _, download, snapshot_json in snapshots:
+            if fields is None:
+                download_json = dict(snapshot_json)
+            else:
+                download_json = {key: value for key, value in snapshot_json.iteritems() if key in fields}
 
             # Add peers information if requested
             if get_peers:
+                state = download.network_get_state(None, True)
                 peer_list = state.get_peerlist()
                 for peer_info in peer_list:  # Remove have field since it is very large to transmit.
                     del peer_info['have']
                     peer_info['id'] = peer_info['id'].encode('hex')
 
                 download_json["peers"] = peer_list
+                if fields is None or "availability" in fields:
+                    download_json["availability"] = state.get_availability()
 
             # Add piece information if requested
             if get_pieces:
                 download_json["pieces"] = download.get_pieces_base64()
 
             downloads_json.append(download_json)
+
+        if since is not None:
+            return json.dumps({"downloads": downloads_json, "version": self.snapshots.version,
+                               "removed": self.snapshots.get_removed_since(since)})
         return json.dumps({"downloads": downloads_json})
 
     def render_PUT(self, request):
@@ -7,6 +7,9 @@ from Tribler.Core.exceptions import OperationNotEnabledByConfigurationException
 from Tribler.Core.simpledefs import NTFY_CHANNELCAST, NTFY_TORRENTS, SIGNAL_TORRENT, SIGNAL_ON_SEARCH_RESULTS, \
     SIGNAL_CHANNEL
 
+# The maximum number of (most relevant) torrents returned when searching in the local database
+LOCAL_TORRENT_SEARCH_LIMIT = 250
+
 
 class SearchEndpoint(resource.Resource):
     """
@@ -75,16 +78,27 @@ class SearchEndpoint(resource.Resource):
 
         torrent_db_columns = ['T.torrent_id', 'infohash', 'T.name', 'length', 'category',
                               'num_seeders', 'num_leechers', 'last_tracker_check']
-        results_local_torrents = self.torrent_db_handler.search_in_local_torrents_db(query, keys=torrent_db_columns)
-        results_dict = {"keywords": keywords, "result_list": results_local_torrents}
-        self.session.notifier.notify(SIGNAL_TORRENT, SIGNAL_ON_SEARCH_RESULTS, None, results_dict)
-
-        # Create remote searches
-        try:
-            self.session.search_remote_torrents(keywords)
-            self.session.search_remote_channels(keywords)
-        except OperationNotEnabledByConfigurationException as exc:
-            self._logger.error(exc)
+
+        def on_local_torrents_found(results_local_torrents):
+            results_dict = {"keywords": keywords, "result_list": results_local_torrents}
+            self.session.notifier.notify(SIGNAL_TORRENT, SIGNAL_ON_SEARCH_RESULTS, None, results_dict)
+
+        def on_local_torrents_search_failed(failure):
+            self._logger.error("Error while searching the local torrents: %s", failure.getErrorMessage())
+
+        def start_remote_searches(_):
+            # Remote torrents are scored using the matchinfo of the local search, so they are searched for afterwards
+            try:
+                self.session.search_remote_torrents(keywords)
+                self.session.search_remote_channels(keywords)
+            except OperationNotEnabledByConfigurationException as exc:
+                self._logger.error(exc)
+
+        # The full text search runs on the read pool, the results are sent to the events endpoint once they are found
+        self.torrent_db_handler.search_in_local_torrents_db_async(query, keys=torrent_db_columns,
+                                                                  limit=LOCAL_TORRENT_SEARCH_LIMIT)\
+            .addCallbacks(on_local_torrents_found, on_local_torrents_search_failed)\
+            .addCallback(start_remote_searches)
 
         return json.dumps({"queried": True})
 
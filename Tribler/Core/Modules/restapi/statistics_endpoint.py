@@ -54,7 +54,11 @@ class StatisticsTriblerEndpoint(resource.Resource):
                             "type": "TFTP",
                             "pending": 1,
                             "success": 6
-                        }, ...]
+                        }, ...],
+                        "remote_search": {
+                            "result_cache": {"size": 12, "hits": 30, "misses": 12, "hit_rate": 0.71},
+                            "admission": {"peers": 25, "admitted": 42, "shed": 3}
+                        }
                     }
                 }
         """
@@ -125,6 +125,23 @@ class TrackerManager(object):
         next_check_time = tracker_info[u'last_check'] + self._tracker_retry_interval * (2**tracker_info[u'failures'])
         return next_check_time <= current_time
 
+    @call_on_reactor_thread
+    def get_next_trackers_for_auto_check(self, limit, exclude=()):
+        """
+        Gets the trackers that should be checked right now, the ones that were checked the longest ago first.
+        :param limit: The maximum number of trackers to return.
+        :param exclude: Trackers that should not be returned, e.g. because they are being checked already.
+        :return: A list of tracker URLs.
+        """
+        tracker_urls = []
+        for tracker_url, _ in sorted(self._tracker_dict.items(), key=lambda d: d[1][u'last_check']):
+            if len(tracker_urls) >= limit:
+                break
+            if tracker_url not in (u'DHT', u'no-DHT') and tracker_url not in exclude \
+                    and self.should_check_tracker(tracker_url):
+                tracker_urls.append(tracker_url)
+        return tracker_urls
+
     @call_on_reactor_thread
     def get_next_tracker_for_auto_check(self):
         """
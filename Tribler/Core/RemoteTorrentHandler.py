@@ -24,6 +24,7 @@ TORRENT_OVERFLOW_CHECKING_INTERVAL = 30 * 60
 LOW_PRIO_COLLECTING = 0
 MAGNET_TIMEOUT = 5.0
 MAX_PRIORITY = 1
+DEFAULT_MAX_ACTIVE_TFTP_REQUESTS = 4
 
 @decorator
 def pass_when_stopped(f, self, *argv, **kwargs):
@@ -66,13 +67,16 @@ class RemoteTorrentHandler(TaskManager):
 
         self.running = True
 
+        max_tftp_requests = self.session.config.get_torrent_collecting_max_tftp_requests()
         for priority in (0, 1):
             self.magnet_requesters[priority] = MagnetRequester(self.session, self, priority)
             self.torrent_requesters[priority] = TftpRequester(u"tftp_torrent_%s" % priority,
-                                                              self.session, self, priority)
+                                                              self.session, self, priority,
+                                                              max_active_requests=max_tftp_requests)
             self.torrent_message_requesters[priority] = TorrentMessageRequester(self.session, self, priority)
 
-        self.metadata_requester = TftpRequester(u"tftp_metadata_%s" % 0, self.session, self, 0)
+        self.metadata_requester = TftpRequester(u"tftp_metadata_%s" % 0, self.session, self, 0,
+                                                max_active_requests=max_tftp_requests)
 
 
     def shutdown(self):
@@ -500,10 +504,12 @@ class MagnetRequester(Requester):
 
 class TftpRequester(Requester):
 
-    def __init__(self, name, session, remote_torrent_handler, priority):
+    def __init__(self, name, session, remote_torrent_handler, priority,
+                 max_active_requests=DEFAULT_MAX_ACTIVE_TFTP_REQUESTS):
         super(TftpRequester, self).__init__(name, session, remote_torrent_handler, priority)
 
         self.REQUEST_INTERVAL = 5.0
+        self.max_active_requests = max_active_requests
 
         self._active_request_list = []
         self._untried_sources = {}
@@ -536,16 +542,21 @@ class TftpRequester(Requester):
             self._untried_sources[key] = deque([candidate])
             self._tried_sources[key] = deque()
 
-        # start pending tasks if there is no task running
-        if not self._active_request_list:
+        # start pending tasks if there is a free slot
+        if len(self._active_request_list) < self.max_active_requests:
             self._start_pending_requests()
 
     @pass_when_stopped
     def _do_request(self):
-        assert not self._active_request_list, "active_request_list is not empty = %s" % repr(self._active_request_list)
+        # start downloads until all slots are taken, every download runs in its own TFTP session
+        while self._pending_request_queue and len(self._active_request_list) < self.max_active_requests:
+            # do not download if TFTP has been shutdown
+            if self._session.lm.tftp_handler is None:
+                return
+            self._start_download(self._pending_request_queue.popleft())
 
+    def _start_download(self, key):
         # starts to download a torrent
-        key = self._pending_request_queue.popleft()
 
         candidate = self._untried_sources[key].popleft()
         self._tried_sources[key].append(candidate)
@@ -565,9 +576,6 @@ class TftpRequester(Requester):
 
         self._logger.debug(u"start TFTP download for %s from %s:%s", file_name, ip, port)
 
-        # do not download if TFTP has been shutdown
-        if self._session.lm.tftp_handler is None:
-            return
         self._session.lm.tftp_handler.download_file(file_name, ip, port, extra_info=extra_info,
                                                     success_callback=self._on_download_successful,
                                                     failure_callback=self._on_download_failed)
@@ -622,7 +630,8 @@ class TftpRequester(Requester):
 
             self._pending_request_queue.appendleft(key)
             self._active_request_list.remove(key)
-            self.schedule_task(self._do_request)
+            if not self._remote_torrent_handler.is_pending_task_active(self._name):
+                self.schedule_task(self._do_request)
 
         else:
             # no more available candidates, download the next requested infohash
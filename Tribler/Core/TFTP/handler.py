@@ -14,7 +14,7 @@ from Tribler.dispersy.util import call_on_reactor_thread, blocking_call_on_react
 from .exception import InvalidPacketException, FileNotFound
 from .packet import (encode_packet, decode_packet, OPCODE_RRQ, OPCODE_WRQ, OPCODE_ACK, OPCODE_DATA, OPCODE_OACK,
                      OPCODE_ERROR, ERROR_DICT)
-from .session import Session, DEFAULT_BLOCK_SIZE, DEFAULT_TIMEOUT
+from .session import Session, DEFAULT_BLOCK_SIZE, DEFAULT_TIMEOUT, DEFAULT_WINDOW_SIZE
 
 MAX_INT16 = 2 ** 16 - 1
 
@@ -31,7 +31,7 @@ class TftpHandler(TaskManager):
     """
 
     def __init__(self, session, endpoint, prefix, block_size=DEFAULT_BLOCK_SIZE, timeout=DEFAULT_TIMEOUT,
-                 max_retries=DEFAULT_RETIES):
+                 max_retries=DEFAULT_RETIES, window_size=DEFAULT_WINDOW_SIZE):
         """ The constructor.
         :param session:     The tribler session.
         :param endpoint:    The endpoint to use.
@@ -39,6 +39,7 @@ class TftpHandler(TaskManager):
         :param block_size:  Transmission block size.
         :param timeout:     Transmission timeout.
         :param max_retries: Transmission maximum retries.
+        :param window_size: The maximum number of blocks in flight (RFC 7440), 1 for lock-step transfers.
         """
         super(TftpHandler, self).__init__()
         self._logger = logging.getLogger(self.__class__.__name__)
@@ -51,6 +52,7 @@ class TftpHandler(TaskManager):
         self._block_size = block_size
         self._timeout = timeout
         self._max_retries = max_retries
+        self._window_size = window_size
 
         self._timeout_check_interval = 0.5
 
@@ -125,7 +127,8 @@ class TftpHandler(TaskManager):
         self._logger.debug(u"start downloading %s from %s:%s, sid = %s", file_name, ip, port, session_id)
         session = Session(True, session_id, (ip, port), OPCODE_RRQ, file_name, '', None, None,
                           extra_info=extra_info, block_size=self._block_size, timeout=self._timeout,
-                          success_callback=success_callback, failure_callback=failure_callback)
+                          window_size=self._window_size, success_callback=success_callback,
+                          failure_callback=failure_callback)
 
         self._add_new_session(session)
         self._send_request_packet(session)
@@ -166,9 +169,20 @@ class TftpHandler(TaskManager):
         timeout = session.timeout * (2**session.retries)
         if session.last_contact_time + timeout < time():
             # we do NOT resend packets that are not data-related
-            if session.retries < self._max_retries and session.last_sent_packet['opcode'] in (OPCODE_ACK, OPCODE_DATA):
+            if session.retries < self._max_retries and session.last_sent_packet['opcode'] == OPCODE_DATA:
+                # go back to the first block that has not been acknowledged and send the window again
+                self._send_window(session)
+                session.retries += 1
+            elif session.retries < self._max_retries and session.last_sent_packet['opcode'] == OPCODE_ACK:
                 self._send_packet(session, session.last_sent_packet)
                 session.retries += 1
+            elif session.retries < self._max_retries and session.last_sent_packet['opcode'] == OPCODE_RRQ \
+                    and session.window_size > 1:
+                # peers that only support lock-step transfers drop requests with the windowsize option
+                self._logger.info(u"%s no answer to windowed request, falling back to lock-step", session)
+                session.window_size = 1
+                self._send_request_packet(session)
+                session.retries += 1
             else:
                 has_failed = True
         return has_failed
@@ -283,6 +297,7 @@ class TftpHandler(TaskManager):
         file_name = packet['file_name'].decode('utf8')
         block_size = packet['options']['blksize']
         timeout = packet['options']['timeout']
+        window_size = min(packet['options'].get('windowsize', 1), self._window_size)
 
         # check session_id
         if (ip, port, packet['session_id']) in self._session_dict:
@@ -292,6 +307,13 @@ class TftpHandler(TaskManager):
             self._handle_error(dummy_session, 50)
             return
 
+        if window_size < 1:
+            self._logger.warn(u"Invalid windowsize %s from %s:%s", packet['options']['windowsize'], ip, port)
+            dummy_session = Session(False, packet['session_id'], (ip, port), packet['opcode'],
+                                    file_name, None, None, None, block_size=block_size, timeout=timeout)
+            self._handle_error(dummy_session, 8)
+            return
+
         # read the file/directory into memory
         try:
             if file_name.startswith(METADATA_PREFIX):
@@ -318,14 +340,15 @@ class TftpHandler(TaskManager):
 
         # create a session object
         session = Session(False, packet['session_id'], (ip, port), packet['opcode'],
-                          file_name, file_data, file_size, checksum, block_size=block_size, timeout=timeout)
+                          file_name, file_data, file_size, checksum, block_size=block_size, timeout=timeout,
+                          window_size=window_size)
 
         # insert session_id and session
         self._add_new_session(session)
         self._logger.debug(u"got new request: %s", session)
 
-        # send back OACK now
-        self._send_oack_packet(session)
+        # send back OACK now, only mentioning the window size if the client asked for it
+        self._send_oack_packet(session, with_window_size='windowsize' in packet['options'])
 
     def _load_metadata(self, thumb_hash):
         """ Loads a thumbnail into memory.
@@ -353,6 +376,17 @@ class TftpHandler(TaskManager):
 
         return file_data, len(file_data)
 
+    def _send_window(self, session):
+        """ Sends the blocks following the last acknowledged one, as many as the window size allows.
+        Blocks that were sent already after the last acknowledged one are sent again.
+        """
+        session.block_number = session.last_acked_block_number
+        session.is_waiting_for_last_ack = False
+        while session.block_number < session.last_acked_block_number + session.window_size \
+                and not session.is_waiting_for_last_ack:
+            data = self._get_next_data(session)
+            self._send_data_packet(session, session.block_number, data)
+
     def _get_next_data(self, session):
         """ Gets the next block of data to be uploaded. This method is only used for data uploading.
         :return The data to transfer.
@@ -408,6 +442,16 @@ class TftpHandler(TaskManager):
                     self._handle_error(session, 0, error_msg=msg)  # Error: timeout mismatch
                     return
 
+                # peers that do not support windows do not mention the option, the transfer is lock-step then
+                window_size = packet['options'].get('windowsize', 1)
+                if not 1 <= window_size <= session.window_size:
+                    msg = "%s OACK windowsize %s out of range, requested %s" %\
+                          (session, window_size, session.window_size)
+                    self._logger.error(msg)
+                    self._handle_error(session, 8, error_msg=msg)  # Error: failed to negotiate options
+                    return
+                session.window_size = window_size
+
                 session.file_size = packet['options']['tsize']
                 session.checksum = packet['options']['checksum']
 
@@ -435,22 +479,35 @@ class TftpHandler(TaskManager):
         if packet['block_number'] < session.block_number:
             self._logger.warn(u"%s ignore old block number DATA %s < %s",
                               session, packet['block_number'], session.block_number)
+            if session.window_size > 1:
+                # the sender retransmits blocks we have, so our last ACK probably got lost. Acknowledge the blocks we
+                # have again, otherwise the sender keeps retransmitting the same window until it gives up.
+                self._send_ack_packet(session, session.block_number - 1)
             return
 
         if packet['block_number'] != session.block_number:
+            if session.window_size > 1:
+                # a block got lost, acknowledge the blocks we have so the sender goes back to the first one we are
+                # missing. This may be the block we acknowledged at the end of the previous window already.
+                self._logger.debug(u"%s missing DATA %s, got %s", session, session.block_number, packet['block_number'])
+                self._send_gap_ack_packet(session)
+                return
+
             msg = "%s Got ACK with block# %s while expecting %s" %\
                   (session, packet['block_number'], session.block_number)
             self._logger.error(msg)
             self._handle_error(session, 0, error_msg=msg)  # Error: block_number mismatch
             return
 
-        # save data
+        # save data, and acknowledge it at the end of the window or the end of the file
         session.file_data += packet['data']
-        self._send_ack_packet(session, session.block_number)
+        is_last_block = len(packet['data']) < session.block_size
+        if is_last_block or session.block_number - session.last_acked_block_number >= session.window_size:
+            self._send_ack_packet(session, session.block_number)
         session.block_number += 1
 
         # check if it is the end
-        if len(packet['data']) < session.block_size:
+        if is_last_block:
             self._logger.info(u"%s transfer finished. checking data integrity...", session)
             # check file size and checksum
             if session.file_size != len(session.file_data):
@@ -480,26 +537,38 @@ class TftpHandler(TaskManager):
             return
 
         # check block number
-        # ignore old ones, they may be retransmissions
-        if packet['block_number'] < session.block_number:
-            self._logger.warn(u"%s ignore old block number ACK %s < %s",
-                              session, packet['block_number'], session.block_number)
-            return
-
-        if packet['block_number'] != session.block_number:
+        if packet['block_number'] > session.block_number:
             msg = "%s got ACK with block# %s while expecting %s" %\
                   (session, packet['block_number'], session.block_number)
             self._logger.error(msg)
             self._handle_error(session, 0, error_msg=msg)  # Error: block_number mismatch
             return
 
-        if session.is_waiting_for_last_ack:
+        # in windowed mode, an ACK for the last acknowledged block while blocks after it are in flight means the
+        # receiver is missing the next one, so the window is sent again. The receiver may acknowledge a retransmitted
+        # window once for every block in it, so this is only done once per block number.
+        if packet['block_number'] == session.last_acked_block_number and session.window_size > 1 \
+                and session.block_number > session.last_acked_block_number \
+                and session.last_resent_block_number != packet['block_number']:
+            self._logger.debug(u"%s got ACK %s again, sending the window again", session, packet['block_number'])
+            session.last_resent_block_number = packet['block_number']
+            self._send_window(session)
+            return
+
+        # ignore old ones, they may be retransmissions
+        if packet['block_number'] <= session.last_acked_block_number:
+            self._logger.warn(u"%s ignore old block number ACK %s <= %s",
+                              session, packet['block_number'], session.last_acked_block_number)
+            return
+        session.last_acked_block_number = packet['block_number']
+
+        if session.is_waiting_for_last_ack and packet['block_number'] == session.block_number:
             session.is_done = True
             return
 
-        data = self._get_next_data(session)
-        # send DATA
-        self._send_data_packet(session, session.block_number, data)
+        # send the next window of DATA, starting right after the acknowledged block. In lock-step mode this is
+        # the next block, in windowed mode the receiver may have acknowledged less than we sent if blocks got lost.
+        self._send_window(session)
 
     def _handle_error(self, session, error_code, error_msg=""):
         """ Handles an error during packet processing.
@@ -531,6 +600,8 @@ class TftpHandler(TaskManager):
                   'options': {'blksize': session.block_size,
                               'timeout': session.timeout,
                               }}
+        if session.window_size > 1:
+            packet['options']['windowsize'] = session.window_size
         self._send_packet(session, packet)
 
     def _send_data_packet(self, session, block_number, data):
@@ -545,6 +616,15 @@ class TftpHandler(TaskManager):
                   'session_id': session.session_id,
                   'block_number': block_number}
         self._send_packet(session, packet)
+        session.last_acked_block_number = block_number
+
+    def _send_gap_ack_packet(self, session):
+        """ Acknowledges the last block received in order, after receiving a block out of order. This is only done once
+        per block number, not for every block of the window that arrives after the gap.
+        """
+        if session.last_gap_acked_block_number != session.block_number - 1:
+            session.last_gap_acked_block_number = session.block_number - 1
+            self._send_ack_packet(session, session.block_number - 1)
 
     def _send_error_packet(self, session, error_code, error_msg):
         packet = {'opcode': OPCODE_ERROR,
@@ -554,7 +634,7 @@ class TftpHandler(TaskManager):
                   }
         self._send_packet(session, packet)
 
-    def _send_oack_packet(self, session):
+    def _send_oack_packet(self, session, with_window_size=False):
         packet = {'opcode': OPCODE_OACK,
                   'session_id': session.session_id,
                   'block_number': session.block_number,
@@ -563,4 +643,6 @@ class TftpHandler(TaskManager):
                               'tsize': session.file_size,
                               'checksum': session.checksum,
                               }}
+        if with_window_size:
+            packet['options']['windowsize'] = session.window_size
         self._send_packet(session, packet)
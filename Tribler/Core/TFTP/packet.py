@@ -12,7 +12,7 @@ OPCODE_ERROR = 5
 OPCODE_OACK = 6
 
 # supported options
-OPTIONS = ("blksize", "timeout", "tsize", "checksum")
+OPTIONS = ("blksize", "timeout", "tsize", "checksum", "windowsize")
 
 # error codes and messages
 ERROR_DICT = {
@@ -74,9 +74,9 @@ def _decode_options(packet, buff, start_idx):
         if k not in OPTIONS:
             raise InvalidOptionException(u"Unknown option[%s]" % repr(k))
 
-        # blksize, timeout, and tsize are all integers
+        # blksize, timeout, tsize, and windowsize are all integers
         try:
-            if k in ("blksize", "timeout", "tsize"):
+            if k in ("blksize", "timeout", "tsize", "windowsize"):
                 packet['options'][k] = int(v)
             else:
                 packet['options'][k] = v
@@ -7,12 +7,15 @@ DEFAULT_BLOCK_SIZE = 512
 # default timeout and maximum retries
 DEFAULT_TIMEOUT = 2
 
+# default number of blocks sent before waiting for an ACK (RFC 7440), 1 is the lock-step mode of plain TFTP
+DEFAULT_WINDOW_SIZE = 1
+
 
 class Session(object):
 
     def __init__(self, is_client, session_id, address, request, file_name, file_data, file_size, checksum,
                  extra_info=None, block_size=DEFAULT_BLOCK_SIZE, timeout=DEFAULT_TIMEOUT,
-                 success_callback=None, failure_callback=None):
+                 window_size=DEFAULT_WINDOW_SIZE, success_callback=None, failure_callback=None):
         self.is_client = is_client
         self.session_id = session_id
         self.address = address
@@ -27,6 +30,13 @@ class Session(object):
         self.block_number = 0
         self.block_size = block_size
         self.timeout = timeout
+        self.window_size = window_size
+        # the last block number the receiver acknowledged, -1 if it did not acknowledge anything yet
+        self.last_acked_block_number = -1
+        # the last block number the receiver acknowledged because a block was missing, so every gap is acknowledged once
+        self.last_gap_acked_block_number = -1
+        # the last acknowledged block number the sender sent the window again for after getting the same ACK again
+        self.last_resent_block_number = -1
         self.success_callback = success_callback
         self.failure_callback = failure_callback
 
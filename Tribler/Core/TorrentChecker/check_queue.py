@@ -0,0 +1,135 @@
+"""
+The queue of torrent health checks that still have to be sent to the trackers.
+"""
+import heapq
+from itertools import count
+
+# Lower values are checked first
+PRIORITY_GUI = 0
+PRIORITY_DOWNLOAD = 1
+PRIORITY_CHANNEL = 2
+PRIORITY_RANDOM = 3
+
+TRACKER_MIN_CHECK_INTERVAL = 5  # minimum time between two sessions to the same tracker
+TRACKER_FAILURE_BACKOFF = 60  # time we leave a tracker alone after a failed session, doubles with every failure
+TRACKER_MAX_BACKOFF = 3600
+
+
+class TorrentCheckQueue(object):
+    """
+    Keeps the torrents that should be checked in a priority queue per tracker.
+
+    A tracker is only handed out when no session to it is running, it has not been contacted in the last min_interval
+    seconds, and it is not backing off after failed sessions. From the trackers that can be contacted, the one with the
+    most urgent torrent goes first, together with its other queued torrents (most urgent first) so they are scraped
+    with a single request.
+    """
+
+    def __init__(self, min_interval=TRACKER_MIN_CHECK_INTERVAL, failure_backoff=TRACKER_FAILURE_BACKOFF,
+                 max_backoff=TRACKER_MAX_BACKOFF):
+        self.min_interval = min_interval
+        self.failure_backoff = failure_backoff
+        self.max_backoff = max_backoff
+
+        # tracker url -> heap of (priority, sequence number, infohash), entries that are not in _queued are stale
+        self._heaps = {}
+        # tracker url -> {infohash: (priority, sequence number)}
+        self._queued = {}
+        self._sequence = count()
+
+        # tracker url -> time before which we do not contact the tracker
+        self._next_check = {}
+        # tracker url -> number of failed sessions in a row
+        self._failures = {}
+        self.in_flight = set()
+
+    def __len__(self):
+        return sum(len(queued) for queued in self._queued.itervalues())
+
+    def is_queued(self, tracker_url, infohash):
+        return infohash in self._queued.get(tracker_url, {})
+
+    def add(self, tracker_url, infohash, priority):
+        """
+        Queues a check of the torrent on the tracker. A torrent that is queued already keeps its place, unless the new
+        priority is more urgent.
+        :return: True if the torrent has been (re)queued
+        """
+        queued = self._queued.setdefault(tracker_url, {})
+        if infohash in queued and queued[infohash][0] <= priority:
+            return False
+
+        sequence = next(self._sequence)
+        queued[infohash] = (priority, sequence)
+        heapq.heappush(self._heaps.setdefault(tracker_url, []), (priority, sequence, infohash))
+        return True
+
+    def is_ready(self, tracker_url, now):
+        return tracker_url not in self.in_flight and self._next_check.get(tracker_url, 0) <= now
+
+    def is_backing_off(self, tracker_url, now):
+        return self._failures.get(tracker_url, 0) > 0 and self._next_check.get(tracker_url, 0) > now
+
+    def _peek(self, tracker_url):
+        heap = self._heaps[tracker_url]
+        queued = self._queued[tracker_url]
+        while heap and queued.get(heap[0][2]) != heap[0][:2]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def pop_batch(self, now, max_size):
+        """
+        Takes the queued torrents of the tracker with the most urgent torrent, from the trackers that can be contacted.
+        :return: a tuple (tracker url, [(infohash, priority), ...]) with the most urgent torrent first, or None if no
+        tracker can be contacted right now
+        """
+        best = None
+        for tracker_url in self._queued.keys():
+            if not self.is_ready(tracker_url, now):
+                continue
+            top = self._peek(tracker_url)
+            if top is None:
+                del self._queued[tracker_url]
+                del self._heaps[tracker_url]
+            elif best is None or top < best[0]:
+                best = (top, tracker_url)
+
+        if best is None:
+            return None
+
+        tracker_url = best[1]
+        heap = self._heaps[tracker_url]
+        queued = self._queued[tracker_url]
+        batch = []
+        while heap and len(batch) < max_size:
+            priority, sequence, infohash = heapq.heappop(heap)
+            if queued.get(infohash) == (priority, sequence):
+                del queued[infohash]
+                batch.append((infohash, priority))
+
+        if not queued:
+            del self._queued[tracker_url]
+            del self._heaps[tracker_url]
+        return tracker_url, batch
+
+    def on_session_started(self, tracker_url):
+        self.in_flight.add(tracker_url)
+
+    def on_session_finished(self, tracker_url, success, now):
+        """
+        Sets the time at which the tracker can be contacted again, backing off exponentially after failures.
+        """
+        self.in_flight.discard(tracker_url)
+        if success:
+            self._failures.pop(tracker_url, None)
+            delay = self.min_interval
+        else:
+            failures = self._failures[tracker_url] = self._failures.get(tracker_url, 0) + 1
+            delay = min(self.failure_backoff * 2 ** (failures - 1), self.max_backoff)
+        self._next_check[tracker_url] = now + delay
+
+    def get_statistics(self):
+        return {"queued": len(self),
+                "trackers": len(self._queued),
+                "in_flight": len(self.in_flight),
+                "backing_off": len(self._failures)}
@@ -10,6 +10,7 @@ from twisted.internet.protocol import DatagramProtocol
 from twisted.python.failure import Failure
 from twisted.web.client import Agent, readBody, RedirectAgent, HTTPConnectionPool
 
+from Tribler.Core.Utilities.dns_cache import DnsCache
 from Tribler.Core.Utilities.encoding import add_url_params
 from Tribler.Core.Utilities.tracker_utils import parse_tracker_url
 from Tribler.dispersy.taskmanager import TaskManager
@@ -24,6 +25,7 @@ TRACKER_ACTION_SCRAPE = 2
 MAX_INT32 = 2 ** 16 - 1
 
 UDP_TRACKER_INIT_CONNECTION_ID = 0x41727101980
+UDP_TRACKER_CONNECTION_ID_TTL = 60  # BEP 15: a connection id can be used for one minute after receiving it
 UDP_TRACKER_RECHECK_INTERVAL = 15
 UDP_TRACKER_MAX_RETRIES = 8
 
@@ -36,17 +38,18 @@ DHT_TRACKER_MAX_RETRIES = 8
 MAX_TRACKER_MULTI_SCRAPE = 74
 
 
-def create_tracker_session(tracker_url, timeout):
+def create_tracker_session(tracker_url, timeout, udp_scraper=None):
     """
     Creates a tracker session with the given tracker URL.
     :param tracker_url: The given tracker URL.
     :param timeout: The timeout for the session.
+    :param udp_scraper: The UDPScraper shared by the UDP tracker sessions.
     :return: The tracker session.
     """
     tracker_type, tracker_address, announce_page = parse_tracker_url(tracker_url)
 
     if tracker_type == u'udp':
-        return UdpTrackerSession(tracker_url, tracker_address, announce_page, timeout)
+        return UdpTrackerSession(tracker_url, tracker_address, announce_page, timeout, scraper=udp_scraper)
     else:
         return HttpTrackerSession(tracker_url, tracker_address, announce_page, timeout)
 
@@ -336,114 +339,147 @@ class HttpTrackerSession(TrackerSession):
 
 class UDPScraper(DatagramProtocol):
     """
-    The UDP scraper connects to a UDP tracker and queries
-    seeders and leechers for every infohash appended to the UDPsession.
-    All data received is given to the UDP session it's associated with.
-    """
+    The UDP scraper is a single UDP socket that is shared by all UDP tracker sessions of the torrent checker.
 
-    _reactor = reactor
+    Replies are routed to the session that is waiting for them by their transaction id. The scraper also remembers
+    the connection ids that trackers hand out (BEP 15 allows a client to reuse them for a minute) and the addresses
+    the tracker hostnames resolve to, so a session can send its scrape request right away when the same tracker
+    has been contacted recently.
+    """
 
-    def __init__(self, udpsession, ip_address, port, timeout):
+    def __init__(self, dns_cache=None):
         self._logger = logging.getLogger(self.__class__.__name__)
-        self.udpsession = udpsession
-        self.ip_address = ip_address
-        self.port = port
-        self.expect_connection_response = True
-        # Timeout after x seconds if nothing received.
-        self.timeout = timeout
-        self.timeout_call = self._reactor.callLater(self.timeout, self.on_error)
+        self.dns_cache = dns_cache or DnsCache()
+        self.listening_port = None
+
+        # transaction id -> the UdpTrackerSession waiting for the reply
+        self._sessions = {}
+        # (ip address, port) -> (connection id, time at which we received it)
+        self._connection_ids = {}
 
-    def on_error(self):
+        self.packets_sent = 0
+        self.packets_received = 0
+
+    def start(self):
         """
-        This method handles everything that needs to be done when something during
-        the UDP scraping went wrong.
+        Opens the socket, if this has not been done already.
         """
-        self.udpsession.failed()
+        if self.listening_port is None:
+            self.listening_port = reactor.listenUDP(0, self)
+        return self.listening_port
 
     def stop(self):
         """
         Stops the UDP scraper and closes the socket.
-        :return: A deferred that fires once it has closed the connection.
+        :return: A deferred that fires once it has closed the socket.
         """
-        self._logger.info("Shutting down scraper which was connected to ip %s, port %s", self.ip_address, self.port)
-        if self.timeout_call.active():
-            self.timeout_call.cancel()
+        self._sessions.clear()
+        self._connection_ids.clear()
 
-        if self.transport and self.numPorts and self.transport.connected:
-            return maybeDeferred(self.transport.stopListening)
+        listening_port, self.listening_port = self.listening_port, None
+        if listening_port:
+            self._logger.info("Shutting down UDP scraper")
+            return maybeDeferred(listening_port.stopListening)
         return defer.succeed(True)
 
-    def startProtocol(self):
+    def resolve(self, hostname):
         """
-        This function is called when the scraper is initialized.
-        Initiates the connection with the tracker.
+        Resolves the hostname of a tracker, using the cached address if we looked it up recently.
+        :return: A deferred that fires with the ip address.
         """
-        self.transport.connect(self.ip_address, self.port)
-        self._logger.info("UDP health scraper connected to host %s port %d", self.ip_address, self.port)
-        self.udpsession.on_start()
+        return self.dns_cache.resolve(hostname)
 
-    def write_data(self, data):
+    def get_connection_id(self, address):
         """
-        This function can be called to send serialized data to the tracker.
-        :param data: The serialized data to be send.
+        Returns the connection id we got from the tracker at this (ip address, port), or None if we do not have one
+        that can still be used.
         """
-        self.transport.write(data)  # no need to pass the ip and port
+        entry = self._connection_ids.get(address)
+        if entry:
+            connection_id, received = entry
+            if time.time() - received < UDP_TRACKER_CONNECTION_ID_TTL:
+                return connection_id
+            del self._connection_ids[address]
+        return None
 
-    def datagramReceived(self, data, (_host, _port)):
+    def set_connection_id(self, address, connection_id):
+        self._connection_ids[address] = (connection_id, time.time())
+
+    def forget_connection_id(self, address):
+        self._connection_ids.pop(address, None)
+
+    def add_transaction(self, session):
         """
-        This function dispatches data received from a UDP tracker.
-        If it's the first response, it will dispatch the data to the handle_connection_response
-        function of the UDP session.
-        All subsequent data will be send to the _handle_response function of the UDP session.
-        :param data: The data received from the UDP tracker.
+        Generates a transaction id that is not in use by any other session and routes its replies to this session.
+        :return: The transaction id.
         """
-        # If we expect a connection response, pass it to handle connection response
-        if self.expect_connection_response:
-            # Cancel the timeout
-            if self.timeout_call.active():
-                self.timeout_call.cancel()
+        while True:
+            transaction_id = random.randint(0, MAX_INT32)
+            if transaction_id not in self._sessions:
+                self._sessions[transaction_id] = session
+                return transaction_id
 
-            # Pass the response to the udp tracker session
-            self.udpsession.handle_connection_response(data)
-            self.expect_connection_response = False
-        # else it is our scraper payload. Give it to handle response
-        else:
-            self.udpsession.handle_response(data)
+    def remove_transaction(self, transaction_id, session):
+        if self._sessions.get(transaction_id) is session:
+            del self._sessions[transaction_id]
 
-    # Possibly invoked if there is no server listening on the
-    # address to which we are sending.
-    def connectionRefused(self):
+    def write_data(self, data, address):
         """
-        Handles the case of a connection being refused by a tracker.
+        This function can be called to send serialized data to a tracker.
+        :param data: The serialized data to be send.
+        :param address: The (ip address, port) of the tracker.
         """
-        self._logger.info("UDP Scraper could not connect to %s %s", self.ip_address, self.port)
-        self.on_error()
+        self.start()
+        self.packets_sent += 1
+        self.transport.write(data, address)
+
+    def datagramReceived(self, data, address):
+        """
+        This function dispatches data received from a UDP tracker to the session that sent the request.
+        :param data: The data received from the UDP tracker.
+        :param address: The (ip address, port) the data was received from.
+        """
+        self.packets_received += 1
+        if len(data) < 8:
+            self._logger.debug("Dropping UDP tracker reply of %d bytes from %s", len(data), address)
+            return
+
+        transaction_id = struct.unpack_from('!i', data, 4)[0]
+        session = self._sessions.get(transaction_id)
+        if session is None or session.address != address:
+            self._logger.debug("Dropping UDP tracker reply from %s for unknown transaction %d", address, transaction_id)
+            return
+        session.datagram_received(data)
 
 
 class UdpTrackerSession(TrackerSession):
     """
-    The UDPTrackerSession makes a connection with a UDP tracker by making use
-    of a UDPScraper object. It handles the message serialization and communication
-    with the torrent checker by making use of Deferred (asynchronously).
+    The UDPTrackerSession scrapes a UDP tracker through the UDPScraper it has been given. It handles the message
+    serialization and communication with the torrent checker by making use of Deferred (asynchronously).
     """
 
-    # A list of transaction IDs that have been used in order to avoid conflict.
-    _active_session_dict = dict()
+    _reactor = reactor
 
-    def __init__(self, tracker_url, tracker_address, announce_page, timeout):
+    def __init__(self, tracker_url, tracker_address, announce_page, timeout, scraper=None):
         super(UdpTrackerSession, self).__init__(u'udp', tracker_url, tracker_address, announce_page, timeout)
-        self._connection_id = 0
         self._transaction_id = 0
         self.port = tracker_address[1]
         self.ip_address = None
-        self.scraper = None
         self.ip_resolve_deferred = None
         self.clean_defer_list = []
 
+        # Sessions that are not created by the torrent checker use a socket of their own
+        self._owns_scraper = scraper is None
+        self.scraper = scraper or UDPScraper()
+
         # prepare connection message
         self._connection_id = UDP_TRACKER_INIT_CONNECTION_ID
         self._action = TRACKER_ACTION_CONNECT
-        self.generate_transaction_id()
+        self._reused_connection_id = False
+
+    @property
+    def address(self):
+        return self.ip_address, self.port
 
     def on_error(self, failure):
         """
@@ -453,6 +489,13 @@ class UdpTrackerSession(TrackerSession):
         self._logger.info("Error when querying UDP tracker: %s %s", str(failure), self.tracker_url)
         self.failed(msg=failure.getErrorMessage())
 
+    def on_timeout(self):
+        """
+        Handles the case of the tracker not answering (in time).
+        """
+        self._is_timed_out = True
+        self.failed(msg="timeout")
+
     def _on_cancel(self, _):
         """
         :param _: The deferred which we ignore.
@@ -464,18 +507,24 @@ class UdpTrackerSession(TrackerSession):
             "The result deferred of this UDP tracker session is being cancelled due to a session cleanup. UDP url: %s",
             self.tracker_url)
 
-    def on_ip_address_resolved(self, ip_address, start_scraper=True):
+    def on_ip_address_resolved(self, ip_address, send_request=True):
         """
         Called when a hostname has been resolved to an ip address.
-        Constructs a scraper and opens a UDP port to listen on.
-        Removes an old scraper if present.
+        Skips the connect step if we still have a connection id for this tracker.
         :param ip_address: The ip address that matches the hostname of the tracker_url.
-        :param start_scraper: Whether we should start the scraper immediately.
+        :param send_request: Whether we should send the first request immediately.
         """
         self.ip_address = ip_address
-        self.scraper = UDPScraper(self, self.ip_address, self.port, self.timeout)
-        if start_scraper:
-            reactor.listenUDP(0, self.scraper)
+        if not send_request:
+            return
+
+        connection_id = self.scraper.get_connection_id(self.address)
+        if connection_id is None:
+            self.send_connect()
+        else:
+            self._connection_id = connection_id
+            self._reused_connection_id = True
+            self.send_scrape()
 
     def failed(self, msg=None):
         """
@@ -483,9 +532,8 @@ class UdpTrackerSession(TrackerSession):
         in the session has failed and thus no data can be obtained.
         """
         self._is_failed = True
-        if self.scraper:
-            self.scraper.stop()
-            self.scraper = None
+        self.cancel_pending_task("timeout")
+        self.remove_transaction_id()
 
         if self.result_deferred:
             result_msg = "UDP tracker failed for url %s" % self._tracker_url
@@ -495,24 +543,16 @@ class UdpTrackerSession(TrackerSession):
 
     def generate_transaction_id(self):
         """
-        Generates a unique transaction id and stores this in the _active_session_dict set.
+        Replaces the transaction id of this session by a new one that is unique for the scraper.
         """
-        while True:
-            # make sure there is no duplicated transaction IDs
-            transaction_id = random.randint(0, MAX_INT32)
-            if transaction_id not in UdpTrackerSession._active_session_dict.items():
-                UdpTrackerSession._active_session_dict[self] = transaction_id
-                self._transaction_id = transaction_id
-                break
+        self.remove_transaction_id()
+        self._transaction_id = self.scraper.add_transaction(self)
 
-    @staticmethod
-    def remove_transaction_id(session):
+    def remove_transaction_id(self):
         """
-        Removes an session and its corresponding id from the _active_session_dict set.
-        :param session: The session that needs to be removed from the set.
+        Stops routing the replies to our transaction id to this session.
         """
-        if session in UdpTrackerSession._active_session_dict:
-            del UdpTrackerSession._active_session_dict[session]
+        self.scraper.remove_transaction(self._transaction_id, self)
 
     @inlineCallbacks
     def cleanup(self):
@@ -521,16 +561,15 @@ class UdpTrackerSession(TrackerSession):
         :return: A deferred that fires once the cleanup is done.
         """
         yield super(UdpTrackerSession, self).cleanup()
-        UdpTrackerSession.remove_transaction_id(self)
+        self.remove_transaction_id()
         # Cleanup deferred that fires when everything has been cleaned
         # Cancel the resolving ip deferred.
         self.ip_resolve_deferred = None
 
         self.result_deferred = None
 
-        if self.scraper:
+        if self._owns_scraper:
             self.clean_defer_list.append(self.scraper.stop())
-            self.scraper = None
 
         # Return a deferredlist with all clean deferreds we have to wait on
         res = yield DeferredList(self.clean_defer_list)
@@ -562,9 +601,13 @@ class UdpTrackerSession(TrackerSession):
         # clean old deferreds if present
         self.cancel_pending_task("result")
         self.cancel_pending_task("resolve")
+        self.cancel_pending_task("timeout")
+
+        # Timeout after x seconds if nothing received.
+        self.register_task("timeout", self._reactor.callLater(self.timeout, self.on_timeout))
 
         # Resolve the hostname to an IP address if not done already
-        self.ip_resolve_deferred = self.register_task("resolve", reactor.resolve(self._tracker_address[0]))
+        self.ip_resolve_deferred = self.register_task("resolve", self.scraper.resolve(self._tracker_address[0]))
         self.ip_resolve_deferred.addCallbacks(self.on_ip_address_resolved, self.on_error)
 
         self._last_contact = int(time.time())
@@ -572,14 +615,39 @@ class UdpTrackerSession(TrackerSession):
         self.result_deferred = Deferred(self._on_cancel)
         return self.result_deferred
 
-    def on_start(self):
+    def send_connect(self):
         """
-        Called by the UDPScraper when it is connected to the tracker.
         Creates a connection message and calls the scraper to send it.
         """
-        # Initiate the connection
+        self._connection_id = UDP_TRACKER_INIT_CONNECTION_ID
+        self._action = TRACKER_ACTION_CONNECT
+        self._reused_connection_id = False
+        self.generate_transaction_id()
+
         message = struct.pack('!qii', self._connection_id, self._action, self._transaction_id)
-        self.scraper.write_data(message)
+        self.scraper.write_data(message, self.address)
+
+    def send_scrape(self):
+        """
+        Creates a scrape message for all infohashes of this session and calls the scraper to send it.
+        """
+        self._action = TRACKER_ACTION_SCRAPE
+        self.generate_transaction_id()
+
+        fmt = '!qii' + ('20s' * len(self._infohash_list))
+        message = struct.pack(fmt, self._connection_id, self._action, self._transaction_id, *self._infohash_list)
+        self.scraper.write_data(message, self.address)
+
+        self._last_contact = int(time.time())
+
+    def datagram_received(self, data):
+        """
+        Called by the UDPScraper with the replies to our current transaction id.
+        """
+        if self._action == TRACKER_ACTION_CONNECT:
+            self.handle_connection_response(data)
+        else:
+            self.handle_response(data)
 
     def handle_connection_response(self, response):
         """
@@ -608,19 +676,10 @@ class UdpTrackerSession(TrackerSession):
             self.failed(msg=''.join(error_message))
             return
 
-        # update action and IDs
+        # remember the connection id for the other sessions to this tracker, and send the scrape message
         self._connection_id = struct.unpack_from('!q', response, 8)[0]
-        self._action = TRACKER_ACTION_SCRAPE
-        self.generate_transaction_id()
-
-        # pack and send the message
-        fmt = '!qii' + ('20s' * len(self._infohash_list))
-        message = struct.pack(fmt, self._connection_id, self._action, self._transaction_id, *self._infohash_list)
-
-        # Send the scrape message
-        self.scraper.write_data(message)
-
-        self._last_contact = int(time.time())
+        self.scraper.set_connection_id(self.address, self._connection_id)
+        self.send_scrape()
 
     def handle_response(self, response):
         """
@@ -643,6 +702,14 @@ class UdpTrackerSession(TrackerSession):
             errmsg_length = len(response) - 8
             error_message = struct.unpack_from('!' + str(errmsg_length) + 's', response, 8)
 
+            if self._reused_connection_id:
+                # The tracker may have expired the connection id before we did, get a new one and try again
+                self._logger.info(u"%s Error response for UDP SCRAPE with a reused connection id: [%s]",
+                                  self, repr(error_message))
+                self.scraper.forget_connection_id(self.address)
+                self.send_connect()
+                return
+
             self._logger.info(u"%s Error response for UDP SCRAPE: [%s] [%s]",
                               self, repr(response), repr(error_message))
             self.failed(msg=''.join(error_message))
@@ -667,13 +734,12 @@ class UdpTrackerSession(TrackerSession):
             #  - https://wiki.theory.org/BitTorrentSpecification#Tracker_.27scrape.27_Convention
             response_list.append({'infohash': infohash.encode('hex'), 'seeders': complete, 'leechers': incomplete})
 
-        # close this socket and remove its transaction ID from the list
-        UdpTrackerSession.remove_transaction_id(self)
+        # stop waiting for replies and remove our transaction ID from the scraper
+        self.remove_transaction_id()
+        self.cancel_pending_task("timeout")
         self._is_finished = True
 
-        # Stop the scraper and call the callback of the deferred with the result
-        self.scraper.stop()
-        self.scraper = None
+        # Call the callback of the deferred with the result
         self.result_deferred.callback({self.tracker_url: response_list})
 
 
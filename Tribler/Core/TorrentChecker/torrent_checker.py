@@ -2,11 +2,15 @@ import logging
 import time
 from binascii import hexlify
 from twisted.internet import reactor
-from twisted.internet.defer import DeferredList, CancelledError, fail, succeed
+from twisted.internet.defer import Deferred, DeferredList, CancelledError, fail, succeed
 from twisted.internet.error import ConnectingCancelledError
+from twisted.internet.task import LoopingCall
 from twisted.python.failure import Failure
 
-from Tribler.Core.TorrentChecker.session import create_tracker_session, FakeDHTSession
+from Tribler.Core.TorrentChecker.check_queue import TorrentCheckQueue, PRIORITY_GUI, PRIORITY_DOWNLOAD, \
+    PRIORITY_CHANNEL, PRIORITY_RANDOM
+from Tribler.Core.TorrentChecker.session import create_tracker_session, FakeDHTSession, UDPScraper, \
+    MAX_TRACKER_MULTI_SCRAPE
 from Tribler.Core.Utilities.tracker_utils import MalformedTrackerURLException
 from Tribler.Core.simpledefs import NTFY_TORRENTS
 from Tribler.dispersy.taskmanager import TaskManager
@@ -19,6 +23,14 @@ DEFAULT_TORRENT_CHECK_INTERVAL = 900  # base multiplier for the check delay
 DEFAULT_MAX_TORRENT_CHECK_RETRIES = 8  # max check delay increments when failed.
 DEFAULT_TORRENT_CHECK_RETRY_INTERVAL = 30  # interval when the torrent was successfully checked for the last time
 
+DEFAULT_MAX_CONCURRENT_SESSIONS = 10  # max number of tracker sessions running at the same time
+DEFAULT_TRACKER_CHECK_TIMEOUT = 30  # timeout of the sessions that are not started by a GUI request
+
+CHECK_SCHEDULE_INTERVAL = 1  # interval for starting the checks that were held back by the limits
+GUI_REQUEST_BATCH_DELAY = 0.2  # GUI requests to the same tracker within this time are sent in a single scrape
+RESULT_FLUSH_INTERVAL = 5  # results are written to the database at least this often
+RESULT_FLUSH_SIZE = 100  # or as soon as we have this many of them
+
 
 class TorrentChecker(TaskManager):
 
@@ -38,6 +50,19 @@ class TorrentChecker(TaskManager):
         self._session_list = {'DHT': []}
         self._last_torrent_selection_time = 0
 
+        # All UDP tracker sessions share a single socket, connection ids and resolved addresses
+        self.udp_scraper = UDPScraper()
+
+        # The checks that still have to be sent, with the per-tracker rate limits and back-off
+        self._check_queue = TorrentCheckQueue()
+        self._max_concurrent_sessions = DEFAULT_MAX_CONCURRENT_SESSIONS
+
+        # (tracker url, infohash) -> (timeout, [deferreds of the GUI requests waiting for the result])
+        self._gui_requests = {}
+
+        # infohash -> result that still has to be written to the database, combining the results of all trackers
+        self._pending_results = {}
+
         # Track all session cleanups
         self.session_stop_defer_list = []
 
@@ -45,6 +70,10 @@ class TorrentChecker(TaskManager):
     def initialize(self):
         self._torrent_db = self.tribler_session.open_dbhandler(NTFY_TORRENTS)
         self._reschedule_tracker_select()
+        self.register_task(u"torrent_checker_schedule_checks",
+                           LoopingCall(self._schedule_checks)).start(CHECK_SCHEDULE_INTERVAL, now=False)
+        self.register_task(u"torrent_checker_flush_results",
+                           LoopingCall(self._flush_torrent_results)).start(RESULT_FLUSH_INTERVAL, now=False)
 
     def shutdown(self):
         """
@@ -63,6 +92,12 @@ class TorrentChecker(TaskManager):
             for session in self._session_list[tracker_url]:
                 self.session_stop_defer_list.append(session.cleanup())
 
+        self._gui_requests = {}
+        self.session_stop_defer_list.append(self.udp_scraper.stop())
+
+        if self._torrent_db:
+            self._flush_torrent_results()
+
         defer_stop_list = DeferredList(self.session_stop_defer_list)
 
         self._session_list = None
@@ -89,44 +124,154 @@ class TorrentChecker(TaskManager):
 
     def _task_select_tracker(self):
         """
-        The regularly scheduled task that selects torrents associated with a specific tracker to check.
+        The regularly scheduled task that selects the torrents to check: the torrents we are downloading, and the
+        torrents of the trackers that are due for a check.
+        :return: A deferred that fires once the sessions that were started have finished.
         """
 
         # update the torrent selection interval
         self._reschedule_tracker_select()
 
-        # start selecting torrents
-        result = self.tribler_session.lm.tracker_manager.get_next_tracker_for_auto_check()
-        if result is None:
+        self._queue_download_checks()
+
+        # select a tracker for every session we can start
+        tracker_manager = self.tribler_session.lm.tracker_manager
+        max_trackers = max(self._max_concurrent_sessions - len(self._check_queue.in_flight), 1)
+        tracker_urls = tracker_manager.get_next_trackers_for_auto_check(max_trackers,
+                                                                        exclude=self._check_queue.in_flight)
+        if not tracker_urls:
             self._logger.warn(u"No tracker to select from, skip")
-            return succeed(None)
 
-        tracker_url, _ = result
-        self._logger.debug(u"Start selecting torrents on tracker %s.", tracker_url)
+        current_time = int(time.time())
+        for tracker_url in tracker_urls:
+            # get the torrents that should be checked
+            infohashes = self._torrent_db.getTorrentsOnTracker(tracker_url, current_time,
+                                                              limit=MAX_TRACKER_MULTI_SCRAPE)
+            if len(infohashes) == 0:
+                # We have not torrent to recheck for this tracker. Still update the last_check for this tracker.
+                self._logger.info("No torrent to check for tracker %s", tracker_url)
+                tracker_manager.update_tracker_info(tracker_url, True)
+                continue
 
-        # get the torrents that should be checked
-        infohashes = self._torrent_db.getTorrentsOnTracker(tracker_url, int(time.time()))
+            channel_infohashes = self._torrent_db.getChannelTorrentInfohashes(infohashes)
+            for infohash in infohashes:
+                self._check_queue.add(tracker_url, infohash,
+                                      PRIORITY_CHANNEL if infohash in channel_infohashes else PRIORITY_RANDOM)
+            self._logger.info(u"Selected %d new torrents to check on tracker: %s", len(infohashes), tracker_url)
 
-        if len(infohashes) == 0:
-            # We have not torrent to recheck for this tracker. Still update the last_check for this tracker.
-            self._logger.info("No torrent to check for tracker %s", tracker_url)
-            self.tribler_session.lm.tracker_manager.update_tracker_info(tracker_url, True)
-            return succeed(None)
-        elif tracker_url != u'DHT' and tracker_url != u'no-DHT'\
-                and self.tribler_session.lm.tracker_manager.should_check_tracker(tracker_url):
+        return self._schedule_checks()
 
-            try:
-                session = self._create_session_for_request(tracker_url, timeout=30)
-            except MalformedTrackerURLException as e:
-                self._logger.error(e)
-                return succeed(None)
+    def _queue_download_checks(self):
+        """
+        Queues the torrents we are downloading that have not been checked recently.
+        """
+        current_time = time.time()
+        for download in self.tribler_session.get_downloads():
+            infohash = download.get_def().get_infohash()
+            result = self._torrent_db.getTorrent(infohash, (u'torrent_id', u'last_tracker_check'), False)
+            if result is None or current_time - result[u'last_tracker_check'] < self._torrent_check_interval:
+                continue
 
-            for infohash in infohashes:
+            for tracker_url in self._torrent_db.getTrackerListByTorrentID(result[u'torrent_id']):
+                if tracker_url not in (u'DHT', u'no-DHT'):
+                    self._check_queue.add(tracker_url, infohash, PRIORITY_DOWNLOAD)
+
+    def _schedule_checks(self):
+        """
+        Starts sessions for the most urgent queued checks, as far as the session limit and the tracker rate limits
+        allow it.
+        :return: A deferred that fires once the sessions that were started have finished.
+        """
+        deferreds = []
+        while not self._should_stop and len(self._check_queue.in_flight) < self._max_concurrent_sessions:
+            batch = self._check_queue.pop_batch(time.time(), MAX_TRACKER_MULTI_SCRAPE)
+            if batch is None:
+                break
+            deferreds.append(self._start_session(*batch))
+        return DeferredList(deferreds)
+
+    def _start_session(self, tracker_url, checks):
+        """
+        Starts a session that checks the given torrents on the tracker.
+        :param checks: a list of (infohash, priority) tuples, most urgent first
+        """
+        timeouts = [self._gui_requests[(tracker_url, infohash)][0] for infohash, _ in checks
+                    if (tracker_url, infohash) in self._gui_requests]
+        try:
+            session = self._create_session_for_request(tracker_url,
+                                                       timeout=min(timeouts or [DEFAULT_TRACKER_CHECK_TIMEOUT]))
+        except MalformedTrackerURLException as e:
+            self._logger.error(e)
+            self._on_checks_failed(tracker_url, [infohash for infohash, _ in checks], Failure(e))
+            return succeed(None)
+
+        infohashes = []
+        for infohash, priority in checks:
+            if session.can_add_request():
                 session.add_infohash(infohash)
+                infohashes.append(infohash)
+            else:
+                # trackers that do not support scraping multiple torrents at once get them one by one
+                self._check_queue.add(tracker_url, infohash, priority)
 
-            self._logger.info(u"Selected %d new torrents to check on tracker: %s", len(infohashes), tracker_url)
-            return session.connect_to_tracker().addCallbacks(*self.get_callbacks_for_session(session))\
-                .addErrback(lambda _: None)
+        self._check_queue.on_session_started(tracker_url)
+        return session.connect_to_tracker().addCallbacks(*self.get_callbacks_for_session(session))\
+            .addCallbacks(self._on_checks_completed, self._on_session_failed,
+                          callbackArgs=(tracker_url, session, infohashes),
+                          errbackArgs=(tracker_url, session, infohashes))
+
+    def _on_checks_completed(self, result, tracker_url, session, infohashes):
+        if result is None:
+            # we are shutting down
+            return
+        self._check_queue.on_session_finished(tracker_url, True, time.time())
+
+        last_check = time.time()
+        response_list = result[session.tracker_url]
+        responses = dict((response['infohash'], response) for response in response_list)
+        missing = []
+        for infohash in infohashes:
+            response = responses.get(infohash.encode('hex'))
+            if response is None:
+                # the tracker does not know the torrent, that says nothing about the swarm, so the results of the
+                # other trackers stand
+                missing.append(infohash)
+                continue
+
+            gui_request = self._gui_requests.pop((tracker_url, infohash), None)
+            if gui_request:
+                # the result is written once the results from all trackers of the torrent are in
+                for result_deferred in gui_request[1]:
+                    result_deferred.callback({tracker_url: [response]})
+            else:
+                self._update_torrent_result({'infohash': infohash, 'seeders': response['seeders'],
+                                             'leechers': response['leechers'], 'last_check': last_check})
+
+        if missing:
+            failure = Failure(RuntimeError("Tracker %s has no result for the torrent" % tracker_url))
+            self._on_checks_failed(tracker_url, missing, failure)
+        self._schedule_checks()
+
+    def _on_session_failed(self, failure, tracker_url, session, infohashes):
+        if self._should_stop:
+            return
+        self._check_queue.on_session_finished(tracker_url, False, time.time())
+
+        # the tracker manager has been updated by on_session_error already
+        if session in self._session_list.get(tracker_url, []):
+            self._session_list[tracker_url].remove(session)
+            self.session_stop_defer_list.append(session.cleanup())
+
+        self._on_checks_failed(tracker_url, infohashes, failure)
+        self._schedule_checks()
+
+    def _on_checks_failed(self, tracker_url, infohashes, failure):
+        failure.tracker_url = tracker_url
+        for infohash in infohashes:
+            gui_request = self._gui_requests.pop((tracker_url, infohash), None)
+            if gui_request:
+                for result_deferred in gui_request[1]:
+                    result_deferred.errback(failure)
 
     def get_callbacks_for_session(self, session):
         success_lambda = lambda info_dict: self._on_result_from_session(session, info_dict)
@@ -198,14 +343,33 @@ class TorrentChecker(TaskManager):
                 deferred_list.append(session.connect_to_tracker().
                                      addCallbacks(*self.get_callbacks_for_session(session)))
             elif tracker_url != u'no-DHT':
-                session = self._create_session_for_request(tracker_url, timeout=timeout)
-                session.add_infohash(infohash)
-                deferred_list.append(session.connect_to_tracker().
-                                     addCallbacks(*self.get_callbacks_for_session(session)))
+                deferred_list.append(self._queue_gui_request(tracker_url, infohash, timeout))
+
+        # wait a moment before starting the sessions, so more GUI requests to the same trackers can join them
+        if not self.is_pending_task_active(u"torrent_checker_gui_requests"):
+            self.register_task(u"torrent_checker_gui_requests",
+                               reactor.callLater(GUI_REQUEST_BATCH_DELAY, self._schedule_checks))
 
         return DeferredList(deferred_list, consumeErrors=True).addCallback(
             lambda res: self.on_gui_request_completed(infohash, res))
 
+    def _queue_gui_request(self, tracker_url, infohash, timeout):
+        """
+        Queues a check of the torrent on the tracker with the highest priority.
+        :return: A deferred that fires with the result for this torrent on this tracker.
+        """
+        result_deferred = Deferred()
+        if self._check_queue.is_backing_off(tracker_url, time.time()):
+            failure = Failure(RuntimeError("Tracker %s failed recently" % tracker_url))
+            failure.tracker_url = tracker_url
+            result_deferred.errback(failure)
+            return result_deferred
+
+        self._check_queue.add(tracker_url, infohash, PRIORITY_GUI)
+        gui_request = self._gui_requests.setdefault((tracker_url, infohash), (timeout, []))
+        gui_request[1].append(result_deferred)
+        return result_deferred
+
     def on_session_error(self, session, failure):
         """
         Handles the scenario of when a tracker session has failed by calling the
@@ -226,7 +390,7 @@ class TorrentChecker(TaskManager):
         return failure
 
     def _create_session_for_request(self, tracker_url, timeout=20):
-        session = create_tracker_session(tracker_url, timeout)
+        session = create_tracker_session(tracker_url, timeout, udp_scraper=self.udp_scraper)
 
         if tracker_url not in self._session_list:
             self._session_list[tracker_url] = []
@@ -251,34 +415,59 @@ class TorrentChecker(TaskManager):
         return result_list
 
     def _update_torrent_result(self, response):
-        infohash = response['infohash']
-        seeders = response['seeders']
-        leechers = response['leechers']
-        last_check = response['last_check']
-
-        # the torrent status logic, TODO: do it in other way
-        self._logger.debug(u"Update result %s/%s for %s", seeders, leechers, hexlify(infohash))
+        """
+        Queues the result of a check, the results are written to the database in batches. The results of the trackers
+        of a torrent are combined, keeping the highest numbers of seeders and leechers, so one tracker that does not
+        know the swarm well does not overwrite the results of the others.
+        """
+        self._logger.debug(u"Update result %s/%s for %s", response['seeders'], response['leechers'],
+                           hexlify(response['infohash']))
+        pending = self._pending_results.get(response['infohash'])
+        if pending:
+            response = {'infohash': response['infohash'],
+                        'seeders': max(pending['seeders'], response['seeders']),
+                        'leechers': max(pending['leechers'], response['leechers']),
+                        'last_check': max(pending['last_check'], response['last_check'])}
+        self._pending_results[response['infohash']] = response
+        if len(self._pending_results) >= RESULT_FLUSH_SIZE:
+            self._flush_torrent_results()
+
+    def _flush_torrent_results(self):
+        """
+        Writes the queued results to the database, looking up the retry counts of all torrents at once. Every torrent is
+        written once, so its retry count is increased at most once.
+        """
+        if not self._pending_results:
+            return
+        results, self._pending_results = self._pending_results, {}
 
-        result = self._torrent_db.getTorrent(infohash, (u'torrent_id', u'tracker_check_retries'), include_mypref=False)
-        torrent_id = result[u'torrent_id']
-        retries = result[u'tracker_check_retries']
-
-        # the status logic
-        if seeders > 0:
-            retries = 0
-            status = u'good'
-        else:
-            retries += 1
-            if retries < self._max_torrent_check_retries:
-                status = u'unknown'
-            else:
-                status = u'dead'
-                # prevent retries from exceeding the maximum
-                retries = self._max_torrent_check_retries
+        check_info = self._torrent_db.getTorrentCheckRetriesInBatch(results.keys())
+        for response in results.itervalues():
+            infohash = response['infohash']
+            seeders = response['seeders']
+            leechers = response['leechers']
+            last_check = response['last_check']
 
-        # calculate next check time: <last-time> + <interval> * (2 ^ <retries>)
-        next_check = last_check + self._torrent_check_retry_interval * (2 ** retries)
+            if infohash not in check_info:
+                continue
+            torrent_id, retries = check_info[infohash]
 
-        self._torrent_db.updateTorrentCheckResult(torrent_id,
-                                                  infohash, seeders, leechers, last_check, next_check,
-                                                  status, retries)
+            # the torrent status logic, TODO: do it in other way
+            if seeders > 0:
+                retries = 0
+                status = u'good'
+            else:
+                retries += 1
+                if retries < self._max_torrent_check_retries:
+                    status = u'unknown'
+                else:
+                    status = u'dead'
+                    # prevent retries from exceeding the maximum
+                    retries = self._max_torrent_check_retries
+
+            # calculate next check time: <last-time> + <interval> * (2 ^ <retries>)
+            next_check = last_check + self._torrent_check_retry_interval * (2 ** retries)
+
+            self._torrent_db.updateTorrentCheckResult(torrent_id,
+                                                      infohash, seeders, leechers, last_check, next_check,
+                                                      status, retries)
@@ -82,6 +82,10 @@ class DBUpgrader(object):
         if self.db.version == 28:
             self._upgrade_28_to_29()
 
+        # version 29 -> 30
+        if self.db.version == 29:
+            self._upgrade_29_to_30()
+
         # check if we managed to upgrade to the latest DB version.
         if self.db.version == LATEST_DB_VERSION:
             self.status_update_func(u"Database upgrade finished.")
@@ -533,6 +537,34 @@ CREATE VIRTUAL TABLE FullTextIndex USING fts4(swarmname, filenames, fileextensio
         # update database version
         self.db.write_version(29)
 
+    def _upgrade_29_to_30(self):
+        self.status_update_func(u"Creating search term dictionary...")
+
+        self.db.execute(u"""
+CREATE TABLE IF NOT EXISTS SearchTerms (
+  term_id               integer PRIMARY KEY AUTOINCREMENT NOT NULL,
+  term                  text    NOT NULL,
+  frequency             integer DEFAULT 0,
+  UNIQUE (term)
+);
+
+CREATE TABLE IF NOT EXISTS SearchTermTrigrams (
+  trigram               text    NOT NULL,
+  term_id               integer NOT NULL,
+  PRIMARY KEY (trigram, term_id)
+);
+        """)
+
+        torrent_db_handler = TorrentDBHandler(self.session)
+        try:
+            torrent_db_handler.rebuild_search_terms()
+        finally:
+            torrent_db_handler.close()
+        self.db.commit_now()
+
+        # update database version
+        self.db.write_version(30)
+
     def reimport_torrents(self):
         """Import all torrent files in the collected torrent dir, all the files already in the database will be ignored.
         """
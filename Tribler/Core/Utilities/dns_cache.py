@@ -0,0 +1,103 @@
+"""
+A resolver cache for hostname lookups, shared by the exit sockets of the tunnel community and the tracker sessions.
+"""
+import logging
+import time
+from collections import OrderedDict
+
+from twisted.internet import reactor
+from twisted.internet.abstract import isIPAddress
+from twisted.internet.defer import Deferred, succeed, fail
+
+DNS_CACHE_TTL = 300
+DNS_CACHE_NEGATIVE_TTL = 30
+DNS_CACHE_MAX_SIZE = 1000
+
+
+class DnsCache(object):
+    """
+    Caches the results of hostname lookups for a limited amount of time.
+
+    IP literals are returned right away without touching the cache. Failed lookups are cached as well (for a shorter
+    amount of time), so a peer sending to a bogus hostname does not make us hit the resolver for every datagram.
+    Concurrent lookups for the same hostname share a single resolver request.
+    """
+
+    def __init__(self, ttl=DNS_CACHE_TTL, negative_ttl=DNS_CACHE_NEGATIVE_TTL, max_size=DNS_CACHE_MAX_SIZE,
+                 resolve=None):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._resolve = resolve or reactor.resolve
+
+        # hostname -> (expiration time, ip address or None, failure or None)
+        self._entries = OrderedDict()
+        # hostname -> list of Deferreds waiting for the lookup in progress
+        self._pending = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.literals = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def resolve(self, hostname):
+        """
+        Resolves a hostname to an IPv4 address.
+        :return: a Deferred that fires with the IP address, this Deferred has already been fired if the answer was
+        known
+        """
+        if isIPAddress(hostname):
+            self.literals += 1
+            return succeed(hostname)
+
+        entry = self._entries.get(hostname)
+        if entry:
+            expires, ip_address, failure = entry
+            if expires > time.time():
+                if ip_address:
+                    self.hits += 1
+                    return succeed(ip_address)
+                self.negative_hits += 1
+                return fail(failure)
+            del self._entries[hostname]
+
+        self.misses += 1
+        deferred = Deferred()
+        if hostname in self._pending:
+            self._pending[hostname].append(deferred)
+        else:
+            self._pending[hostname] = [deferred]
+            self._resolve(hostname).addCallbacks(self._on_resolved, self._on_resolve_failed,
+                                                 callbackArgs=(hostname,), errbackArgs=(hostname,))
+        return deferred
+
+    def _store(self, hostname, ttl, ip_address, failure):
+        if len(self._entries) >= self.max_size:
+            self._entries.popitem(last=False)
+        self._entries[hostname] = (time.time() + ttl, ip_address, failure)
+
+    def _on_resolved(self, ip_address, hostname):
+        self._store(hostname, self.ttl, ip_address, None)
+        for deferred in self._pending.pop(hostname, []):
+            deferred.callback(ip_address)
+
+    def _on_resolve_failed(self, failure, hostname):
+        self._logger.debug("Failed to resolve %s: %s", hostname, failure.getErrorMessage())
+        failure.cleanFailure()
+        self._store(hostname, self.negative_ttl, None, failure)
+        for deferred in self._pending.pop(hostname, []):
+            deferred.errback(failure)
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_statistics(self):
+        return {"size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "negative_hits": self.negative_hits,
+                "literals": self.literals}
@@ -0,0 +1,79 @@
+"""
+Frequency-weighted prefix index of terms.
+"""
+from bisect import bisect_left, insort
+from heapq import nlargest
+
+DEFAULT_MAX_TERMS = 100000
+
+
+class PrefixIndex(object):
+    """
+    An in-memory index of terms and their frequencies that returns the most frequent terms starting with a prefix.
+
+    The terms are kept in a sorted list, so the terms with a given prefix form a contiguous range that is found with
+    two binary searches. The index holds at most max_terms terms: when it grows beyond that, the least frequent tenth
+    of the terms is evicted.
+    """
+
+    def __init__(self, max_terms=DEFAULT_MAX_TERMS):
+        self.max_terms = max_terms
+        self._terms = []
+        self._frequencies = {}
+
+    def __len__(self):
+        return len(self._terms)
+
+    def __contains__(self, term):
+        return term in self._frequencies
+
+    def get_frequency(self, term):
+        return self._frequencies.get(term, 0)
+
+    def add(self, term, count=1):
+        """
+        Adds a term to the index, or increases its frequency if it is already in the index.
+        """
+        if term in self._frequencies:
+            self._frequencies[term] += count
+            return
+
+        insort(self._terms, term)
+        self._frequencies[term] = count
+        if len(self._terms) > self.max_terms:
+            self._evict()
+
+    def remove(self, term, count=1):
+        """
+        Decreases the frequency of a term in the index, the term is removed once its frequency drops to zero.
+        """
+        if term not in self._frequencies:
+            return
+
+        self._frequencies[term] -= count
+        if self._frequencies[term] <= 0:
+            del self._frequencies[term]
+            del self._terms[bisect_left(self._terms, term)]
+
+    def add_many(self, term_frequencies):
+        """
+        Adds (term, frequency) pairs to the index. This is more efficient than calling add for every term.
+        """
+        for term, count in term_frequencies:
+            self._frequencies[term] = self._frequencies.get(term, 0) + count
+        self._terms = sorted(self._frequencies)
+        if len(self._terms) > self.max_terms:
+            self._evict()
+
+    def _evict(self):
+        keep = nlargest(self.max_terms - self.max_terms // 10, self._terms, key=self._frequencies.get)
+        self._frequencies = {term: self._frequencies[term] for term in keep}
+        self._terms = sorted(keep)
+
+    def complete(self, prefix, max_terms):
+        """
+        Returns at most max_terms terms starting with prefix, most frequent first.
+        """
+        start = bisect_left(self._terms, prefix)
+        end = bisect_left(self._terms, prefix + u"\uffff", start)
+        return nlargest(max_terms, self._terms[start:end], key=self._frequencies.get)
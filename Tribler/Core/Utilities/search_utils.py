@@ -3,11 +3,22 @@ Search utilities.
 
 Author(s): Jelle Roozenburg, Arno Bakker
 """
+import math
 import re
+from struct import Struct
 
 RE_KEYWORD_SPLIT = re.compile(r"[\W_]", re.UNICODE)
 DIALOG_STOPWORDS = {'an', 'and', 'by', 'for', 'from', 'of', 'the', 'to', 'with'}
 
+# The relevance of a torrent depends for 80% on matches in its name, for 10% on matches in the names of its files
+# and for 10% on matches in the extensions of its files (the columns of the FullTextIndex table).
+RELEVANCE_COLUMN_WEIGHTS = (0.8, 0.1, 0.1)
+
+BM25_K1 = 1.2
+MATCHINFO_HEADER = Struct('III')
+_matchinfo_structs = {}
+_inv_doc_freq_cache = {}
+
 
 def split_into_keywords(string, to_filter_stopwords=False):
     """
@@ -27,3 +38,77 @@ def split_into_keywords(string, to_filter_stopwords=False):
 
 def filter_keywords(keywords):
     return [kw for kw in keywords if len(kw) > 0 and kw not in DIALOG_STOPWORDS]
+
+
+def _get_inv_doc_freq(num_rows, rows_with_term):
+    inv_doc_freq = _inv_doc_freq_cache.get((num_rows, rows_with_term))
+    if inv_doc_freq is None:
+        if len(_inv_doc_freq_cache) > 4096:
+            _inv_doc_freq_cache.clear()
+        inv_doc_freq = math.log((num_rows - rows_with_term + 0.5) / (rows_with_term + 0.5), 2)
+        _inv_doc_freq_cache[(num_rows, rows_with_term)] = inv_doc_freq
+    return inv_doc_freq
+
+
+def bm25_relevance(matchinfo):
+    """
+    Calculates the relevance score of a full text search result from its matchinfo('pcnalx') blob.
+    The algorithm is based on BM25. The document length factor is regarded since our "documents" are very small
+    (often a few keywords). The scores of the columns are combined using RELEVANCE_COLUMN_WEIGHTS.
+    See https://en.wikipedia.org/wiki/Okapi_BM25 and https://www.sqlite.org/fts3.html#matchinfo for more information.
+
+    This function is registered as the tribler_bm25 SQL function, so results can be ranked inside the database.
+    """
+    num_phrases, num_cols, num_rows = MATCHINFO_HEADER.unpack_from(matchinfo)
+
+    # The 'x' values follow the header and the 'a' and 'l' values (one per column each)
+    unpacker = _matchinfo_structs.get((num_phrases, num_cols))
+    if unpacker is None:
+        unpacker = Struct('I' * (3 + 2 * num_cols + 3 * num_cols * num_phrases))
+        _matchinfo_structs[(num_phrases, num_cols)] = unpacker
+    values = unpacker.unpack_from(matchinfo)[3 + 2 * num_cols:]
+
+    score = 0.0
+    for col_ind, weight in zip(xrange(num_cols), RELEVANCE_COLUMN_WEIGHTS):
+        col_score = 0.0
+        for phrase_ind in xrange(num_phrases):
+            base_term_offset = 3 * (col_ind + phrase_ind * num_cols)
+            term_freq = values[base_term_offset]
+            if term_freq:
+                col_score += _get_inv_doc_freq(num_rows, values[base_term_offset + 2]) * \
+                    ((term_freq * (BM25_K1 + 1)) / (term_freq + BM25_K1))
+        score += weight * col_score
+
+    return score
+
+
+def get_trigrams(term):
+    """
+    Returns the set of trigrams of a term. The term is padded with spaces, so the start and end of the term also
+    count as (partial) trigrams, like in PostgreSQL's pg_trgm.
+    """
+    padded = u"  %s " % term
+    return {padded[i:i + 3] for i in xrange(len(padded) - 2)}
+
+
+def levenshtein(a, b):
+    """
+    Calculates the Levenshtein distance between a and b.
+    """
+    n, m = len(a), len(b)
+    if n > m:
+        # Make sure n <= m, to use O(min(n,m)) space
+        a, b = b, a
+        n, m = m, n
+
+    current = range(n + 1)
+    for i in xrange(1, m + 1):
+        previous, current = current, [i] + [0] * n
+        for j in xrange(1, n + 1):
+            add, delete = previous[j] + 1, current[j - 1] + 1
+            change = previous[j - 1]
+            if a[j - 1] != b[i - 1]:
+                change += 1
+            current[j] = min(add, delete, change)
+
+    return current[n]
@@ -5,7 +5,7 @@ Author(s): Elric Milon
 """
 import os
 from collections import MutableMapping
-from itertools import chain
+from struct import pack, unpack
 
 from shutil import rmtree
 
@@ -42,6 +42,11 @@ from Tribler.dispersy.taskmanager import TaskManager
 
 
 WRITEBACK_PERIOD = 120
+# maximum number of pending writes, larger caches are written in batches of this size
+WRITEBACK_BATCH_SIZE = 1000
+
+# The number of keys in the store is kept in the store itself, under a key that is skipped when iterating
+KEY_COUNT_KEY = "\x00\x00leveldbstore:key_count"
 
 # TODO(emilon): Make sure the caching makes an actual difference in IO and kill
 # it if it doesn't as it complicates the code.
@@ -57,6 +62,8 @@ class LevelDbStore(MutableMapping, TaskManager):
 
         self._store_dir = store_dir
         self._pending_torrents = {}
+        # the keys in the cache that are not in the database, they are added to the key count when they are written
+        self._pending_new_keys = set()
         self._logger = logging.getLogger(self.__class__.__name__)
         # This is done to work around LevelDB's inability to deal with non-ascii paths on windows.
         try:
@@ -75,69 +82,153 @@ class LevelDbStore(MutableMapping, TaskManager):
                 os.makedirs(self._store_dir)
                 self._db = self._leveldb(os.path.relpath(store_dir, os.getcwdu()))
 
+        # number of keys written to the database, the cached keys are counted when they are written
+        self._db_key_count = self._load_key_count()
+
         self._writeback_lc = self.register_task("flush cache ", LoopingCall(self.flush))
         self._writeback_lc.clock = self._reactor
         self._writeback_lc.start(WRITEBACK_PERIOD)
 
+    def _load_key_count(self):
+        """
+        Reads the number of keys in the database. Stores written before the count was kept are counted once.
+        """
+        try:
+            return unpack(">Q", self._db.Get(KEY_COUNT_KEY))[0]
+        except KeyError:
+            count = sum(1 for key in self._db.RangeIter(include_value=False) if key != KEY_COUNT_KEY)
+            self._db.Put(KEY_COUNT_KEY, pack(">Q", count))
+            return count
+
+    def _db_contains(self, key):
+        """
+        Checks whether a key is in the database, without reading its value.
+        """
+        for db_key in self._db.RangeIter(key_from=key, include_value=False):
+            return db_key == key
+        return False
+
     def __getitem__(self, key):
+        if key == KEY_COUNT_KEY:
+            raise KeyError(key)
         try:
             return self._pending_torrents[key]
         except KeyError:
             return self._db.Get(key)
 
     def __setitem__(self, key, value):
+        if key == KEY_COUNT_KEY:
+            raise KeyError(key)
+        if key not in self._pending_torrents and not self._db_contains(key):
+            self._pending_new_keys.add(key)
         self._pending_torrents[key] = value
-        # self._db.Put(key, value)
+
+        if len(self._pending_torrents) >= WRITEBACK_BATCH_SIZE:
+            self.flush()
 
     def __delitem__(self, key):
-        if key in self._pending_torrents:
-            self._pending_torrents.pop(key)
-        self._db.Delete(key)
+        if key in self._pending_new_keys:
+            self._pending_new_keys.discard(key)
+            del self._pending_torrents[key]
+            return
+
+        self._pending_torrents.pop(key, None)
+        if self._db_contains(key):
+            self._db_key_count -= 1
+            write_batch = self._writebatch(self._db)
+            write_batch.Delete(key)
+            write_batch.Put(KEY_COUNT_KEY, pack(">Q", self._db_key_count))
+            self._db.Write(write_batch)
 
     def __iter__(self):
-        for k in self._pending_torrents.iterkeys():
-            yield k
-        for k, _ in self._db.RangeIter():
-            yield k
+        return self.iterkeys()
 
     def __contains__(self, key):
         if key in self._pending_torrents:
             return True
-        try:
-            self.__getitem__(key)
-            return True
-        except KeyError:
-            pass
-
-        return False
+        return key != KEY_COUNT_KEY and self._db_contains(key)
 
     def __len__(self):
-        return len(self._pending_torrents) + len(list(self.keys()))
-
-    def keys(self):
-        return [k for k, _ in self._db.RangeIter()]
-
-    def iteritems(self):
-        return chain(self._pending_torrents, self._db.RangeIter())
+        return self._db_key_count + len(self._pending_new_keys)
+
+    def _iter_db(self, prefix=None, include_value=True):
+        """
+        Iterates over the (key, value) pairs in the database, or over the keys if include_value is False. When a prefix
+        is given, only the range of keys starting with it is read.
+        """
+        if prefix is None:
+            items = self._db.RangeIter(include_value=include_value)
+        else:
+            items = self._db.RangeIter(key_from=prefix, include_value=include_value)
+
+        for item in items:
+            key = item[0] if include_value else item
+            if prefix is not None and not key.startswith(prefix):
+                break
+            if key != KEY_COUNT_KEY:
+                yield item
+
+    def _pending_keys(self, prefix=None):
+        return [key for key in self._pending_torrents.keys() if prefix is None or key.startswith(prefix)]
+
+    def iterkeys(self, prefix=None):
+        """
+        Iterates over the keys in the store, or over the keys that start with prefix.
+        """
+        pending_keys = self._pending_keys(prefix)
+        for key in pending_keys:
+            yield key
+        pending_keys = set(pending_keys)
+        for key in self._iter_db(prefix, include_value=False):
+            if key not in pending_keys:
+                yield key
+
+    def iteritems(self, prefix=None):
+        """
+        Iterates over the (key, value) pairs in the store, or over the ones with keys that start with prefix.
+        """
+        pending_keys = self._pending_keys(prefix)
+        for key in pending_keys:
+            if key in self._pending_torrents:
+                yield key, self._pending_torrents[key]
+        pending_keys = set(pending_keys)
+        for key, value in self._iter_db(prefix):
+            if key not in pending_keys:
+                yield key, value
+
+    def keys(self, prefix=None):
+        return self.iterkeys(prefix)
 
     def put(self, k, v):
         self.__setitem__(k, v)
 
     def rangescan(self, start=None, end=None):
         if start is None and end is None:
-            return self._db.RangeIter()
+            items = self._db.RangeIter()
         elif end is None:
-            return self._db.RangeIter(key_from=start)
+            items = self._db.RangeIter(key_from=start)
         else:
-            return self._db.RangeIter(key_from=start, key_to=end)
+            items = self._db.RangeIter(key_from=start, key_to=end)
+        return ((key, value) for key, value in items if key != KEY_COUNT_KEY)
 
     def flush(self):
-        if self._pending_torrents:
+        """
+        Writes the cached values to the database, in batches of at most WRITEBACK_BATCH_SIZE values. The keys of a batch
+        that are not in the database yet are added to the key count.
+        """
+        pending_items = self._pending_torrents.items()
+        self._pending_torrents.clear()
+        new_keys = self._pending_new_keys
+        self._pending_new_keys = set()
+        for start in xrange(0, len(pending_items), WRITEBACK_BATCH_SIZE):
             write_batch = self._writebatch(self._db)
-            for k, v in self._pending_torrents.iteritems():
+            for k, v in pending_items[start:start + WRITEBACK_BATCH_SIZE]:
+                if k in new_keys:
+                    self._db_key_count += 1
                 write_batch.Put(k, v)
-            self._pending_torrents.clear()
-            return self._db.Write(write_batch)
+            # the count is written in the same batch, so it always matches the keys in the database
+            write_batch.Put(KEY_COUNT_KEY, pack(">Q", self._db_key_count))
+            self._db.Write(write_batch)
 
     def close(self):
         self.cancel_all_pending_tasks()
@@ -31,7 +31,8 @@ class TriblerStatistics(object):
 
                       "num_channels": channel_db_handler.getNrChannels(),
                       "database_size": os.path.getsize(
-                          os.path.join(self.session.config.get_state_dir(), DB_FILE_RELATIVE_PATH))}
+                          os.path.join(self.session.config.get_state_dir(), DB_FILE_RELATIVE_PATH)),
+                      "database_write_queue": self.session.sqlite_db.write_queue.get_statistics()}
 
         if self.session.lm.rtorrent_handler:
             torrent_queue_stats = self.session.lm.rtorrent_handler.get_queue_stats()
@@ -42,6 +43,15 @@ class TriblerStatistics(object):
             stats_dict["torrent_queue_size_stats"] = torrent_queue_size_stats
             stats_dict["torrent_queue_bandwidth_stats"] = torrent_queue_bandwidth_stats
 
+        if self.session.lm.startup_metrics:
+            stats_dict["startup"] = self.session.lm.startup_metrics
+
+        if self.session.config.get_dispersy_enabled() and self.session.lm.dispersy:
+            from Tribler.community.search.community import SearchCommunity
+            for community in self.session.lm.dispersy.get_communities():
+                if isinstance(community, SearchCommunity):
+                    stats_dict["remote_search"] = community.get_statistics()
+
         return stats_dict
 
     def get_dispersy_statistics(self):
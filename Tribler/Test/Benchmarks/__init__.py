@@ -0,0 +1,4 @@
+"""
+This package contains benchmark scripts for performance-sensitive parts of Tribler. They are not run as part of the
+unit tests; run them as modules, e.g. python -m Tribler.Test.Benchmarks.benchmark_sqlite_read_pool.
+"""
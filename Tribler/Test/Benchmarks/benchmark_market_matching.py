@@ -0,0 +1,100 @@
+"""
+Replays a stream of synthetic asks and bids through the matching engine of the market community and reports how many
+ticks and matches it handles per second.
+
+Every incoming tick is first matched against the order book. Ticks it matches with are considered filled and leave the
+book, a tick without any match is added to the book. Prices are spread around a mid price with a cent resolution, so the
+book holds a few thousand price levels.
+
+Usage: python -m Tribler.Test.Benchmarks.benchmark_market_matching [num_ticks]
+"""
+import random
+import sys
+import time
+
+from Tribler.community.market.core.matching_engine import MatchingEngine, PriceTimeStrategy
+from Tribler.community.market.core.message import TraderId, MessageNumber, MessageId
+from Tribler.community.market.core.message_repository import MemoryMessageRepository
+from Tribler.community.market.core.order import Order, OrderId, OrderNumber
+from Tribler.community.market.core.orderbook import OrderBook
+from Tribler.community.market.core.price import Price
+from Tribler.community.market.core.quantity import Quantity
+from Tribler.community.market.core.tick import Ask, Bid
+from Tribler.community.market.core.timeout import Timeout
+from Tribler.community.market.core.timestamp import Timestamp
+
+MID_PRICE = 100.0
+PRICE_SPREAD = 10.0
+TICK_TIMEOUT = 3600
+
+
+def generate_ticks(num_ticks, seed=42):
+    """
+    Returns a list of (is_ask, price, quantity) tuples.
+    """
+    rand = random.Random(seed)
+    ticks = []
+    for _ in xrange(num_ticks):
+        is_ask = rand.random() < 0.5
+        # asks are a bit more expensive than bids on average, so only part of the ticks match right away
+        offset = PRICE_SPREAD / 4 if is_ask else -PRICE_SPREAD / 4
+        price = max(round(rand.gauss(MID_PRICE + offset, PRICE_SPREAD), 2), 0.01)
+        ticks.append((is_ask, price, rand.randint(1, 100)))
+    return ticks
+
+
+def replay(order_book, matching_engine, ticks):
+    """
+    Matches and inserts the ticks one by one.
+    :return: the number of proposed trades
+    """
+    num_matches = 0
+    for index, (is_ask, price, quantity) in enumerate(ticks):
+        trader_id = TraderId("%x" % (index + 1))
+        order_id = OrderId(trader_id, OrderNumber(1))
+        timestamp = Timestamp.now()
+        order = Order(order_id, Price(price, 'BTC'), Quantity(quantity, 'MC'), Timeout(TICK_TIMEOUT), timestamp,
+                      is_ask)
+
+        proposed_trades = matching_engine.match_order(order)
+        num_matches += len(proposed_trades)
+        for proposed_trade in proposed_trades:
+            order_book.remove_tick(proposed_trade.recipient_order_id)
+
+        if not proposed_trades:
+            tick_class = Ask if is_ask else Bid
+            tick = tick_class(MessageId(trader_id, MessageNumber(str(index))), order_id, Price(price, 'BTC'),
+                              Quantity(quantity, 'MC'), Timeout(TICK_TIMEOUT), timestamp)
+            if is_ask:
+                order_book.insert_ask(tick)
+            else:
+                order_book.insert_bid(tick)
+    return num_matches
+
+
+def run_benchmark(num_ticks):
+    ticks = generate_ticks(num_ticks)
+    order_book = OrderBook(MemoryMessageRepository('0'))
+    matching_engine = MatchingEngine(PriceTimeStrategy(order_book))
+    try:
+        start = time.time()
+        num_matches = replay(order_book, matching_engine, ticks)
+        duration = time.time() - start
+    finally:
+        order_book.cancel_all_pending_tasks()
+
+    print "%d ticks in %.2f s: %.0f ticks/s, %d matches, %.0f matches/s" % (
+        num_ticks, duration, num_ticks / duration, num_matches, num_matches / duration)
+    print "order book: %d asks, %d bids, %d ask price levels, %d bid price levels" % (
+        len(order_book.asks), len(order_book.bids),
+        len(order_book.asks.get_price_level_list('BTC', 'MC').items()),
+        len(order_book.bids.get_price_level_list('BTC', 'MC').items()))
+
+
+def main(argv):
+    num_ticks = int(argv[1]) if len(argv) > 1 else 100000
+    run_benchmark(num_ticks)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,90 @@
+"""
+Measures how long the market community needs to refresh the reputation of traders for a growing number of TradeChain
+blocks, when one percent of the blocks is new since the previous computation.
+
+The "full rebuild" column builds a networkx graph from all blocks and runs the PageRank on it, as the community used to
+do every five minutes. The "incremental" column adds the new blocks to the sparse interaction graph of the
+IncrementalPagerankReputationManager and runs the PageRank starting from the previous result. The "initial" column is
+the time the incremental manager needs to build its graph from scratch the first time.
+
+Usage: python -m Tribler.Test.Benchmarks.benchmark_market_reputation [max_full_rebuild_blocks]
+"""
+import random
+import sys
+import time
+
+from Tribler.community.market.reputation.incremental_pagerank_manager import IncrementalPagerankReputationManager
+from Tribler.community.market.reputation.pagerank_manager import PagerankReputationManager
+
+BLOCK_COUNTS = (10000, 100000, 1000000)
+NEW_BLOCKS_FRACTION = 0.01
+
+
+class SyntheticBlock(object):
+    """
+    Has the attributes of a TradeChain block that are used to compute the reputation.
+    """
+
+    def __init__(self, public_key, link_public_key, asset1_amount, asset2_amount):
+        self.public_key = public_key
+        self.link_public_key = link_public_key
+        self.transaction = {"asset1_amount": asset1_amount, "asset2_amount": asset2_amount}
+
+
+def generate_blocks(num_blocks, seed=42):
+    """
+    Generates trades between num_blocks / 10 traders, a few of which are much more active than the others.
+    """
+    rand = random.Random(seed)
+    num_traders = max(num_blocks / 10, 2)
+    blocks = []
+    for _ in xrange(num_blocks):
+        public_key = "%x" % int(rand.paretovariate(1.2) * 7919 % num_traders)
+        link_public_key = "%x" % rand.randrange(num_traders)
+        blocks.append(SyntheticBlock(public_key, link_public_key, rand.randint(1, 100), rand.randint(1, 100)))
+    return blocks
+
+
+def measure(blocks, num_new_blocks, full_rebuild):
+    """
+    :return: a tuple (full rebuild time, initial time, incremental time) in seconds, the full rebuild time is None when
+    it is skipped
+    """
+    old_blocks, new_blocks = blocks[:-num_new_blocks], blocks[-num_new_blocks:]
+    own_public_key = blocks[0].public_key
+
+    full_time = None
+    if full_rebuild:
+        start = time.time()
+        PagerankReputationManager(blocks).compute(own_public_key)
+        full_time = time.time() - start
+
+    start = time.time()
+    rep_manager = IncrementalPagerankReputationManager(old_blocks)
+    rep_manager.compute(own_public_key)
+    initial_time = time.time() - start
+
+    start = time.time()
+    rep_manager.add_blocks(new_blocks)
+    rep_manager.compute(own_public_key)
+    incremental_time = time.time() - start
+    return full_time, initial_time, incremental_time
+
+
+def run_benchmark(max_full_rebuild_blocks):
+    print "%10s %18s %14s %18s" % ("blocks", "full rebuild (s)", "initial (s)", "incremental (s)")
+    for num_blocks in BLOCK_COUNTS:
+        blocks = generate_blocks(num_blocks)
+        full_time, initial_time, incremental_time = measure(blocks, int(num_blocks * NEW_BLOCKS_FRACTION),
+                                                            num_blocks <= max_full_rebuild_blocks)
+        print "%10d %18s %14.3f %18.3f" % (num_blocks, "%.3f" % full_time if full_time is not None else "-",
+                                           initial_time, incremental_time)
+
+
+def main(argv):
+    max_full_rebuild_blocks = int(argv[1]) if len(argv) > 1 else 100000
+    run_benchmark(max_full_rebuild_blocks)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,108 @@
+"""
+Measures the time the market community spends matching its own orders when a remote tick arrives, for a growing number
+of local orders. Most local orders are priced far away from the incoming ticks, as in a market where a node keeps many
+open orders at different prices.
+
+The "all orders" column matches every valid local ask for every tick, as the community used to do. The "crossing" column
+only matches the local orders on the other side whose price crosses the incoming tick, found through the order index
+of the OrderManager.
+
+Usage: python -m Tribler.Test.Benchmarks.benchmark_market_tick_matching [num_ticks]
+"""
+import random
+import sys
+import time
+
+from Tribler.community.market.core.matching_engine import MatchingEngine, PriceTimeStrategy
+from Tribler.community.market.core.message import TraderId, MessageNumber, MessageId
+from Tribler.community.market.core.message_repository import MemoryMessageRepository
+from Tribler.community.market.core.order import OrderId, OrderNumber
+from Tribler.community.market.core.order_manager import OrderManager
+from Tribler.community.market.core.order_repository import MemoryOrderRepository
+from Tribler.community.market.core.orderbook import OrderBook
+from Tribler.community.market.core.price import Price
+from Tribler.community.market.core.quantity import Quantity
+from Tribler.community.market.core.tick import Ask, Bid
+from Tribler.community.market.core.timeout import Timeout
+from Tribler.community.market.core.timestamp import Timestamp
+
+LOCAL_ORDER_COUNTS = (10, 100, 1000, 10000)
+TICK_TIMEOUT = 3600
+
+
+def create_order_manager(num_orders, rand):
+    """
+    Creates the orders of this node: asks priced above the incoming bids and bids priced below the incoming asks,
+    except for a handful that cross.
+    """
+    order_manager = OrderManager(MemoryOrderRepository('0'))
+    for index in xrange(num_orders):
+        crossing = index < 5
+        if index % 2:
+            price = rand.uniform(90, 100) if crossing else rand.uniform(200, 300)
+            order_manager.create_ask_order(Price(price, 'BTC'), Quantity(10, 'MC'), Timeout(TICK_TIMEOUT))
+        else:
+            price = rand.uniform(100, 110) if crossing else rand.uniform(1, 10)
+            order_manager.create_bid_order(Price(price, 'BTC'), Quantity(10, 'MC'), Timeout(TICK_TIMEOUT))
+    return order_manager
+
+
+def create_ticks(num_ticks, rand):
+    ticks = []
+    for index in xrange(num_ticks):
+        trader_id = TraderId("%x" % (index + 1))
+        tick_class = Ask if index % 2 else Bid
+        ticks.append(tick_class(MessageId(trader_id, MessageNumber(str(index))), OrderId(trader_id, OrderNumber(1)),
+                                Price(rand.uniform(95, 105), 'BTC'), Quantity(rand.randint(1, 5), 'MC'),
+                                Timeout(TICK_TIMEOUT), Timestamp.now()))
+    return ticks
+
+
+def match_all_orders(order_manager, matching_engine, _):
+    for order in order_manager.order_repository.find_all():
+        if order.is_ask() and order.is_valid():
+            matching_engine.match_order(order)
+
+
+def match_crossing_orders(order_manager, matching_engine, tick):
+    for order in order_manager.find_crossing_orders(tick):
+        matching_engine.match_order(order)
+
+
+def measure(num_orders, ticks, match_method):
+    """
+    Inserts the ticks in an order book one by one and matches the local orders after every tick.
+    :return: the mean time per tick in milliseconds
+    """
+    rand = random.Random(42)
+    order_manager = create_order_manager(num_orders, rand)
+    order_book = OrderBook(MemoryMessageRepository('0'))
+    matching_engine = MatchingEngine(PriceTimeStrategy(order_book))
+    try:
+        start = time.time()
+        for tick in ticks:
+            if tick.is_ask():
+                order_book.insert_ask(tick)
+            else:
+                order_book.insert_bid(tick)
+            match_method(order_manager, matching_engine, tick)
+        return 1000 * (time.time() - start) / len(ticks)
+    finally:
+        order_book.cancel_all_pending_tasks()
+
+
+def run_benchmark(num_ticks):
+    ticks = create_ticks(num_ticks, random.Random(1))
+    print "%12s %18s %18s" % ("local orders", "all orders (ms)", "crossing (ms)")
+    for num_orders in LOCAL_ORDER_COUNTS:
+        print "%12d %18.3f %18.3f" % (num_orders, measure(num_orders, ticks, match_all_orders),
+                                      measure(num_orders, ticks, match_crossing_orders))
+
+
+def main(argv):
+    num_ticks = int(argv[1]) if len(argv) > 1 else 1000
+    run_benchmark(num_ticks)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
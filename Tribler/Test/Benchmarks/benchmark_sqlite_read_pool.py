@@ -0,0 +1,119 @@
+"""
+Measures how much the reactor is delayed while full text searches run against the Tribler database, once with the
+queries executed on the reactor thread and once with the queries executed by the read pool.
+
+Usage: python -m Tribler.Test.Benchmarks.benchmark_sqlite_read_pool [num_torrents] [num_searches]
+"""
+import os
+import random
+import shutil
+import sys
+import time
+from binascii import hexlify
+from tempfile import mkdtemp
+
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks, DeferredList
+from twisted.internet.task import LoopingCall, deferLater
+
+from Tribler.Core.CacheDB.sqlitecachedb import SQLiteCacheDB, DB_SCRIPT_ABSOLUTE_PATH, bin2str
+
+PROBE_INTERVAL = 0.01
+WORDS = [u"ubuntu", u"debian", u"linux", u"iso", u"amd64", u"i386", u"live", u"desktop", u"server", u"mint",
+         u"fedora", u"arch", u"gentoo", u"tribler", u"video", u"music", u"album", u"season", u"episode", u"hd"]
+SEARCH_QUERY = u"SELECT T.torrent_id, T.infohash, T.name, Matchinfo(FullTextIndex, 'pcnalx') " \
+               u"FROM Torrent T, FullTextIndex WHERE T.torrent_id = FullTextIndex.rowid AND FullTextIndex MATCH ?"
+
+
+class ReactorLagProbe(object):
+    """
+    Periodically schedules itself on the reactor and records how late each call was.
+    """
+
+    def __init__(self, interval=PROBE_INTERVAL):
+        self.interval = interval
+        self.lags = []
+        self._last_call = None
+        self._lc = LoopingCall(self._probe)
+
+    def _probe(self):
+        now = time.time()
+        if self._last_call is not None:
+            self.lags.append(max(0.0, now - self._last_call - self.interval))
+        self._last_call = now
+
+    def start(self):
+        self.lags = []
+        self._last_call = None
+        self._lc.start(self.interval, now=True)
+
+    def stop(self):
+        self._lc.stop()
+
+    def report(self, label):
+        lags = sorted(self.lags) or [0.0]
+        print "%-12s probes: %5d  mean lag: %7.2f ms  p99 lag: %7.2f ms  max lag: %7.2f ms" % (
+            label, len(lags), 1000 * sum(lags) / len(lags), 1000 * lags[int(len(lags) * 0.99)], 1000 * lags[-1])
+
+
+def fill_database(db, num_torrents):
+    for torrent_id in xrange(1, num_torrents + 1):
+        name = u" ".join(random.sample(WORDS, 4))
+        db.execute_write(u"INSERT INTO Torrent (torrent_id, infohash, name) VALUES (?, ?, ?)",
+                         (torrent_id, bin2str(os.urandom(20)), name))
+        db.execute_write(u"INSERT INTO FullTextIndex (rowid, swarmname, filenames, fileextensions) "
+                         u"VALUES (?, ?, ?, ?)", (torrent_id, name, hexlify(os.urandom(8)), u"iso"))
+    db.commit_now()
+
+
+@inlineCallbacks
+def run_benchmark(num_torrents, num_searches):
+    state_dir = mkdtemp(suffix="_tribler_benchmark")
+    db = SQLiteCacheDB(os.path.join(state_dir, u"tribler.sdb"), DB_SCRIPT_ABSOLUTE_PATH)
+    try:
+        db.initialize()
+        db.initial_begin()
+        print "Filling database with %d torrents..." % num_torrents
+        fill_database(db, num_torrents)
+
+        probe = ReactorLagProbe()
+        queries = [(random.choice(WORDS),) for _ in xrange(num_searches)]
+
+        # Queries on the reactor thread: yield to the reactor between queries so the probe gets a chance to run.
+        probe.start()
+        start = time.time()
+        for args in queries:
+            db.fetchall(SEARCH_QUERY, args)
+            yield deferLater(reactor, 0, lambda: None)
+        reactor_duration = time.time() - start
+        probe.stop()
+        probe.report("reactor")
+
+        # Queries on the read pool, keeping every pool thread busy.
+        probe.start()
+        start = time.time()
+        pending = list(queries)
+        while pending:
+            batch, pending = pending[:db.read_pool.size], pending[db.read_pool.size:]
+            yield DeferredList([db.fetchall_async(SEARCH_QUERY, args) for args in batch])
+        pool_duration = time.time() - start
+        probe.stop()
+        probe.report("read pool")
+
+        print "%d searches: %.2f s on the reactor, %.2f s on the read pool" % (num_searches, reactor_duration,
+                                                                               pool_duration)
+    finally:
+        db.close()
+        shutil.rmtree(state_dir, ignore_errors=True)
+        reactor.stop()
+
+
+def main(argv):
+    num_torrents = int(argv[1]) if len(argv) > 1 else 100000
+    num_searches = int(argv[2]) if len(argv) > 2 else 200
+    reactor.callWhenRunning(run_benchmark, num_torrents, num_searches)
+    reactor.run()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,138 @@
+"""
+Measures how many received TrustChain blocks per second can be validated and stored, as a crawler does with the blocks
+in crawl responses.
+
+The "per block" run validates every block against the database and stores it on its own, as the community used to do.
+The "batched" run fetches the blocks needed to validate a whole crawl response at once and stores the new blocks in a
+single transaction. The last runs also check the signatures of a crawl response on a number of worker threads before
+validating it.
+
+Usage: python -m Tribler.Test.Benchmarks.benchmark_trustchain_ingest [num_peers] [chain_length] [max_workers]
+"""
+import random
+import shutil
+import sys
+import tempfile
+import time
+from os import path, makedirs
+
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks, returnValue
+
+from Tribler.community.trustchain.block import TrustChainBlock, ValidationResult
+from Tribler.community.trustchain.block_cache import BlockCache
+from Tribler.community.trustchain.database import TrustChainDB, DATABASE_DIRECTORY
+from Tribler.community.trustchain.signature_workers import SignatureWorkerPool
+from Tribler.dispersy.crypto import ECCrypto
+
+CRAWL_RESPONSE_SIZE = 100
+
+
+def generate_chains(num_peers, chain_length, seed=42):
+    """
+    Creates the signed chains of a number of peers that interact with each other.
+    :return: a list with the blocks of every crawl response
+    """
+    rand = random.Random(seed)
+    crypto = ECCrypto()
+    keys = [crypto.generate_key(u"curve25519") for _ in xrange(num_peers)]
+    public_keys = [key.pub().key_to_bin() for key in keys]
+
+    responses = []
+    for index, key in enumerate(keys):
+        chain = []
+        for sequence_number in xrange(1, chain_length + 1):
+            block = TrustChainBlock()
+            block.transaction = {"id": sequence_number}
+            block.public_key = public_keys[index]
+            block.sequence_number = sequence_number
+            block.link_public_key = public_keys[(index + rand.randrange(1, num_peers)) % num_peers]
+            if chain:
+                block.previous_hash = chain[-1].hash
+            block.sign(key)
+            chain.append(block)
+        responses.extend(chain[offset:offset + CRAWL_RESPONSE_SIZE]
+                         for offset in xrange(0, chain_length, CRAWL_RESPONSE_SIZE))
+    rand.shuffle(responses)
+    return responses
+
+
+def copy_blocks(responses):
+    """
+    Returns fresh copies of the blocks, without the outcome of earlier signature checks.
+    """
+    return [[TrustChainBlock.unpack(block.pack()) for block in blocks] for blocks in responses]
+
+
+def ingest_per_block(database, blocks):
+    for block in blocks:
+        validation = block.validate(database)
+        if validation[0] != ValidationResult.invalid and not database.contains(block):
+            database.add_block(block)
+
+
+def ingest_batch(database, blocks):
+    cache = BlockCache(database, blocks)
+    new_blocks = []
+    for block in blocks:
+        validation = block.validate(cache)
+        if validation[0] != ValidationResult.invalid and not cache.contains(block):
+            cache.add_block(block)
+            new_blocks.append(block)
+    database.add_blocks(new_blocks)
+
+
+@inlineCallbacks
+def measure(responses, ingest_method, num_workers=0):
+    """
+    :return: the number of blocks per second that was stored
+    """
+    state_dir = tempfile.mkdtemp()
+    makedirs(path.join(state_dir, DATABASE_DIRECTORY))
+    database = TrustChainDB(state_dir, u"trustchain")
+    pool = SignatureWorkerPool(num_workers) if num_workers else None
+    if pool:
+        pool.start()
+    try:
+        start = time.time()
+        for blocks in responses:
+            if pool:
+                yield pool.verify(blocks)
+            ingest_method(database, blocks)
+        duration = time.time() - start
+        num_blocks = database.execute(u"SELECT COUNT(*) FROM trustchain").fetchone()[0]
+    finally:
+        if pool:
+            pool.stop()
+        database.close()
+        shutil.rmtree(state_dir)
+    assert num_blocks == sum(len(blocks) for blocks in responses)
+    returnValue(num_blocks / duration)
+
+
+@inlineCallbacks
+def run_benchmark(num_peers, chain_length, max_workers):
+    try:
+        responses = generate_chains(num_peers, chain_length)
+        print "%d blocks in %d crawl responses" % (num_peers * chain_length, len(responses))
+        rate = yield measure(copy_blocks(responses), ingest_per_block)
+        print "%-20s %9.0f blocks/s" % ("per block", rate)
+        rate = yield measure(copy_blocks(responses), ingest_batch)
+        print "%-20s %9.0f blocks/s" % ("batched", rate)
+        for num_workers in xrange(1, max_workers + 1):
+            rate = yield measure(copy_blocks(responses), ingest_batch, num_workers)
+            print "%-20s %9.0f blocks/s" % ("batched, %d worker(s)" % num_workers, rate)
+    finally:
+        reactor.stop()
+
+
+def main(argv):
+    num_peers = int(argv[1]) if len(argv) > 1 else 50
+    chain_length = int(argv[2]) if len(argv) > 2 else 200
+    max_workers = int(argv[3]) if len(argv) > 3 else 4
+    reactor.callWhenRunning(run_benchmark, num_peers, chain_length, max_workers)
+    reactor.run()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
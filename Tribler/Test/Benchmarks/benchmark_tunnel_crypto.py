@@ -0,0 +1,99 @@
+"""
+Measures how many cells per second can be onion encrypted by the originator of a circuit and peeled again by the
+hops, for circuits of 1, 2 and 3 hops. The results are compared with building a new GCM cipher for every cell. Finally, it measures how many cells
+per second a relay can process when the crypto is done by a pool of crypto workers.
+
+Usage: python -m Tribler.Test.Benchmarks.benchmark_tunnel_crypto [num_cells] [cell_size] [max_workers]
+"""
+import os
+import struct
+import sys
+import time
+
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks, gatherResults
+
+from Tribler.community.tunnel.crypto.cryptoworkers import CryptoWorkerPool, process_cell
+from Tribler.community.tunnel.crypto.cryptowrapper import Cipher, algorithms, modes, default_backend
+from Tribler.community.tunnel.crypto.tunnelcrypto import TunnelCrypto
+
+
+class UncachedTunnelCrypto(TunnelCrypto):
+    """
+    TunnelCrypto that sets up a new cipher for every cell.
+    """
+
+    def encrypt_str(self, content, key, salt, salt_explicit):
+        cipher = Cipher(algorithms.AES(key),
+                        modes.GCM(initialization_vector=self._bulid_iv(salt, salt_explicit)),
+                        backend=default_backend()).encryptor()
+        ciphertext = cipher.update(content) + cipher.finalize()
+        return struct.pack('!q16s', salt_explicit, cipher.tag) + ciphertext
+
+    def decrypt_str(self, content, key, salt):
+        salt_explicit, gcm_tag = struct.unpack_from('!q16s', content)
+        cipher = Cipher(algorithms.AES(key),
+                        modes.GCM(initialization_vector=self._bulid_iv(salt, salt_explicit), tag=gcm_tag),
+                        backend=default_backend()).decryptor()
+        return cipher.update(content[24:]) + cipher.finalize()
+
+
+def run_circuit(crypto, hops, num_cells, cell_size):
+    session_keys = [crypto.generate_session_keys(os.urandom(64)) for _ in xrange(hops)]
+    payload = os.urandom(cell_size)
+
+    start = time.time()
+    for salt_explicit in xrange(1, num_cells + 1):
+        content = payload
+        for kf, _, sf, _, _, _ in reversed(session_keys):
+            content = crypto.encrypt_str(content, kf, sf, salt_explicit)
+        for kf, _, sf, _, _, _ in session_keys:
+            content = crypto.decrypt_str(content, kf, sf)
+        assert content == payload
+    return num_cells / (time.time() - start)
+
+
+@inlineCallbacks
+def run_workers(num_workers, num_cells, cell_size, num_circuits=64):
+    """
+    Relays cells for a number of circuits through a crypto worker pool, like a relay with many circuits would.
+    """
+    pool = CryptoWorkerPool(num_workers)
+    pool.start()
+    key, _, salt, _, _, _ = TunnelCrypto().generate_session_keys(os.urandom(64))
+    payload = os.urandom(cell_size)
+
+    start = time.time()
+    yield gatherResults([pool.submit(salt_explicit % num_circuits, process_cell, "encrypt_str",
+                                     (key, salt, salt_explicit), "", payload)
+                         for salt_explicit in xrange(1, num_cells + 1)])
+    duration = time.time() - start
+    pool.stop()
+    print "%d worker(s): %9.0f cells/s" % (num_workers, num_cells / duration)
+
+
+@inlineCallbacks
+def run_benchmark(num_cells, cell_size, max_workers):
+    try:
+        for hops in (1, 2, 3):
+            uncached = run_circuit(UncachedTunnelCrypto(), hops, num_cells, cell_size)
+            cached = run_circuit(TunnelCrypto(), hops, num_cells, cell_size)
+            print "%d hop(s): %9.0f cells/s per-cell cipher, %9.0f cells/s cached cipher (%.2fx)" % (
+                hops, uncached, cached, cached / uncached)
+
+        for num_workers in xrange(1, max_workers + 1):
+            yield run_workers(num_workers, num_cells, cell_size)
+    finally:
+        reactor.stop()
+
+
+def main(argv):
+    num_cells = int(argv[1]) if len(argv) > 1 else 20000
+    cell_size = int(argv[2]) if len(argv) > 2 else 1024
+    max_workers = int(argv[3]) if len(argv) > 3 else 4
+    reactor.callWhenRunning(run_benchmark, num_cells, cell_size, max_workers)
+    reactor.run()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
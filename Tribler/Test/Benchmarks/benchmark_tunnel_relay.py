@@ -0,0 +1,53 @@
+"""
+Measures the throughput (in MB/s) of the work a relay does for every data packet: splitting off the plaintext
+header, adding or removing a layer of encryption and rewriting the circuit id. The current code is compared with
+the previous approach of rewriting the circuit id in the reassembled packet.
+
+Usage: python -m Tribler.Test.Benchmarks.benchmark_tunnel_relay [num_packets] [packet_size]
+"""
+import os
+import sys
+import time
+from struct import pack
+
+from Tribler.community.tunnel.conversion import TunnelConversion
+from Tribler.community.tunnel.crypto.tunnelcrypto import TunnelCrypto
+
+MESSAGE_TYPE = u"data"
+
+
+def relay_swap_packet(crypto, packet, keys, salt_explicit):
+    plaintext, encrypted = TunnelConversion.split_encrypted_packet(packet, MESSAGE_TYPE)
+    packet = plaintext + crypto.encrypt_str(encrypted, keys[0], keys[2], salt_explicit)
+    return TunnelConversion.swap_circuit_id(packet, MESSAGE_TYPE, 1, 2)
+
+
+def relay_swap_header(crypto, packet, keys, salt_explicit):
+    plaintext, encrypted = TunnelConversion.split_encrypted_packet(packet, MESSAGE_TYPE)
+    plaintext = TunnelConversion.swap_circuit_id(plaintext, MESSAGE_TYPE, 1, 2)
+    return plaintext + crypto.encrypt_str(encrypted, keys[0], keys[2], salt_explicit)
+
+
+def run(relay, crypto, num_packets, packet_size):
+    keys = crypto.generate_session_keys(os.urandom(64))
+    packet = pack("!I", 1) + os.urandom(packet_size - 4)
+
+    start = time.time()
+    for salt_explicit in xrange(1, num_packets + 1):
+        relay(crypto, packet, keys, salt_explicit)
+    return num_packets * packet_size / (time.time() - start) / 1024 / 1024
+
+
+def main(argv):
+    num_packets = int(argv[1]) if len(argv) > 1 else 100000
+    packet_size = int(argv[2]) if len(argv) > 2 else 1400
+    crypto = TunnelCrypto()
+
+    before = run(relay_swap_packet, crypto, num_packets, packet_size)
+    after = run(relay_swap_header, crypto, num_packets, packet_size)
+    print "%d packets of %d bytes: %.1f MB/s swapping the packet, %.1f MB/s swapping the header (%.2fx)" % (
+        num_packets, packet_size, before, after, after / before)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,101 @@
+from Tribler.Test.Community.Market.Reputation.test_reputation_base import TestReputationBase
+from Tribler.community.market.database import MarketDB
+from Tribler.community.market.reputation.incremental_pagerank_manager import IncrementalPagerankReputationManager
+
+
+class TestReputationIncrementalPagerank(TestReputationBase):
+    """
+    Contains tests to test the reputation based on a pagerank that is updated with new blocks
+    """
+
+    def setUp(self, annotate=True):
+        super(TestReputationIncrementalPagerank, self).setUp(annotate=annotate)
+        self.market_db = MarketDB(self.session_base_dir)
+
+    def insert_transactions(self):
+        self.insert_transaction('a', 'b', 1, 20, 2, 20)
+        self.insert_transaction('a', 'b', 1, 20, 2, 20)
+        self.insert_transaction('b', 'c', 1, 20, 2, 20)
+        self.insert_transaction('b', 'd', 1, 20, 2, 20)
+        self.insert_transaction('d', 'e', 1, 10, 2, 10)
+
+    def assert_reputation_equal(self, rep1, rep2):
+        self.assertEqual(sorted(rep1.keys()), sorted(rep2.keys()))
+        for public_key, reputation in rep1.iteritems():
+            self.assertAlmostEqual(reputation, rep2[public_key], places=4)
+
+    def test_empty(self):
+        rep_manager = IncrementalPagerankReputationManager()
+        self.assertEqual(rep_manager.update(self.tradechain_db), 0)
+        self.assertEqual(rep_manager.compute(own_public_key='a'), {})
+
+    def test_pagerank(self):
+        self.insert_transactions()
+        rep_manager = IncrementalPagerankReputationManager(self.tradechain_db.get_all_blocks())
+        rep = rep_manager.compute(own_public_key='a')
+        self.assertIsInstance(rep, dict)
+        self.assertEqual(len(rep), 5)
+        self.assertAlmostEqual(sum(rep.values()), 1.0)
+        self.assertGreater(rep['a'], rep['c'])
+        self.assertGreater(rep['b'], rep['e'])
+
+    def test_update(self):
+        """
+        Test whether updating the graph with new blocks gives the same reputation as building it from all blocks
+        """
+        self.insert_transactions()
+        rep_manager = IncrementalPagerankReputationManager()
+        self.assertEqual(rep_manager.update(self.tradechain_db), 5)
+        rep_manager.compute(own_public_key='a')
+
+        self.insert_transaction('c', 'f', 1, 30, 2, 5)
+        self.insert_transaction('a', 'e', 1, 5, 2, 5)
+        self.assertEqual(rep_manager.update(self.tradechain_db), 2)
+        rep = rep_manager.compute(own_public_key='a')
+
+        self.assert_reputation_equal(rep, IncrementalPagerankReputationManager(
+            self.tradechain_db.get_all_blocks()).compute(own_public_key='a'))
+
+    def test_persistence(self):
+        """
+        Test whether the graph is restored from the market database
+        """
+        self.insert_transactions()
+        rep_manager = IncrementalPagerankReputationManager(database=self.market_db)
+        rep_manager.update(self.tradechain_db)
+        rep = rep_manager.compute(own_public_key='a')
+
+        restored_manager = IncrementalPagerankReputationManager(database=self.market_db)
+        self.assertEqual(restored_manager.update(self.tradechain_db), 0)
+        self.assert_reputation_equal(restored_manager.compute(own_public_key='a'), rep)
+
+    def test_update_max_blocks(self):
+        """
+        Test whether the graph can be updated with a limited number of blocks at a time
+        """
+        self.insert_transactions()
+        rep_manager = IncrementalPagerankReputationManager()
+        self.assertEqual(rep_manager.update(self.tradechain_db, max_blocks=3), 3)
+        self.assertEqual(rep_manager.update(self.tradechain_db, max_blocks=3), 2)
+        self.assertEqual(rep_manager.update(self.tradechain_db, max_blocks=3), 0)
+        self.assert_reputation_equal(rep_manager.compute(own_public_key='a'), IncrementalPagerankReputationManager(
+            self.tradechain_db.get_all_blocks()).compute(own_public_key='a'))
+
+    def test_update_changed_database(self):
+        """
+        Test whether the graph is rebuilt when the TradeChain database has been recreated
+        """
+        self.insert_transactions()
+        rep_manager = IncrementalPagerankReputationManager(database=self.market_db)
+        rep_manager.update(self.tradechain_db)
+
+        self.tradechain_db.execute(u"DELETE FROM tradechain")
+        for _ in xrange(3):
+            self.insert_transaction('e', 'f', 1, 20, 2, 20)
+            self.insert_transaction('f', 'g', 1, 10, 2, 10)
+
+        restored_manager = IncrementalPagerankReputationManager(database=self.market_db)
+        self.assertEqual(restored_manager.update(self.tradechain_db), 6)
+        self.assertNotIn('a', restored_manager.compute(own_public_key='e'))
+        self.assert_reputation_equal(restored_manager.compute(own_public_key='e'), IncrementalPagerankReputationManager(
+            self.tradechain_db.get_all_blocks()).compute(own_public_key='e'))
@@ -394,14 +394,15 @@ class CommunityTestSuite(AbstractTestCommunity):
         self.assertEqual(len(self.market_community.order_book.bids), 1)
 
     @blocking_call_on_reactor_thread
+    @inlineCallbacks
     def test_compute_reputation(self):
         """
         Test the compute_reputation method
         """
         self.market_community.tradechain_community = MockObject()
         self.market_community.tradechain_community.persistence = MockObject()
-        self.market_community.tradechain_community.persistence.get_all_blocks = lambda: []
-        self.market_community.compute_reputation()
+        self.market_community.tradechain_community.persistence.get_blocks_since = lambda block_id, limit: []
+        yield self.market_community.compute_reputation()
         self.assertFalse(self.market_community.reputation_dict)
 
     @blocking_call_on_reactor_thread
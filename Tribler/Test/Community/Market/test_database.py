@@ -176,3 +176,23 @@ class TestDatabase(AbstractServer):
         Test the check of the database
         """
         self.assertEqual(self.database.check_database(unicode(LATEST_DB_VERSION)), LATEST_DB_VERSION)
+
+    @blocking_call_on_reactor_thread
+    def test_check_database_upgrade(self):
+        """
+        Test whether a version 1 database gets the reputation tables
+        """
+        self.database.execute(u"DROP TABLE reputation_interactions")
+        self.assertEqual(self.database.check_database(u"1"), LATEST_DB_VERSION)
+        self.assertEqual(self.database.get_reputation_interactions(), [])
+
+    @blocking_call_on_reactor_thread
+    def test_add_get_reputation_interactions(self):
+        """
+        Test whether the weights of the interaction graph are added up in the database
+        """
+        self.assertEqual(self.database.get_reputation_last_block_id(), 0)
+        self.database.add_reputation_interactions({('a', 'b'): 10, ('b', 'a'): 5}, 2)
+        self.database.add_reputation_interactions({('a', 'b'): 3}, 3)
+        self.assertEqual(sorted(self.database.get_reputation_interactions()), [('a', 'b', 13), ('b', 'a', 5)])
+        self.assertEqual(self.database.get_reputation_last_block_id(), 3)
@@ -0,0 +1,61 @@
+import unittest
+
+from Tribler.community.market.core.message import TraderId
+from Tribler.community.market.core.order import Order, OrderId, OrderNumber
+from Tribler.community.market.core.order_index import OrderIndex
+from Tribler.community.market.core.price import Price
+from Tribler.community.market.core.quantity import Quantity
+from Tribler.community.market.core.timeout import Timeout
+from Tribler.community.market.core.timestamp import Timestamp
+
+
+class OrderIndexTestSuite(unittest.TestCase):
+    """OrderIndex test cases."""
+
+    def setUp(self):
+        # Object creation
+        self.order_index = OrderIndex()
+        self.ask_order = self.create_order(1, 100, True)
+        self.ask_order2 = self.create_order(2, 50, True)
+        self.ask_order3 = self.create_order(3, 100, True)
+        self.bid_order = self.create_order(4, 40, False)
+        self.bid_order2 = self.create_order(5, 60, False)
+
+        for order in [self.ask_order, self.ask_order2, self.ask_order3, self.bid_order, self.bid_order2]:
+            self.order_index.add(order)
+
+    @staticmethod
+    def create_order(order_number, price, is_ask, quantity_wallet_id='MC'):
+        return Order(OrderId(TraderId("0"), OrderNumber(order_number)), Price(price, 'BTC'),
+                     Quantity(30, quantity_wallet_id), Timeout(3600), Timestamp.now(), is_ask)
+
+    def test_len(self):
+        # Test for len
+        self.assertEquals(5, len(self.order_index))
+        self.assertTrue(self.ask_order.order_id in self.order_index)
+
+    def test_find_crossing_bid(self):
+        # Test for find crossing when a bid comes in
+        self.assertEquals([], self.order_index.find_crossing(False, Price(49, 'BTC'), 'MC'))
+        self.assertEquals([self.ask_order2.order_id], self.order_index.find_crossing(False, Price(50, 'BTC'), 'MC'))
+        self.assertEquals([self.ask_order2.order_id, self.ask_order.order_id, self.ask_order3.order_id],
+                          self.order_index.find_crossing(False, Price(200, 'BTC'), 'MC'))
+
+    def test_find_crossing_ask(self):
+        # Test for find crossing when an ask comes in
+        self.assertEquals([], self.order_index.find_crossing(True, Price(61, 'BTC'), 'MC'))
+        self.assertEquals([self.bid_order2.order_id, self.bid_order.order_id],
+                          self.order_index.find_crossing(True, Price(40, 'BTC'), 'MC'))
+
+    def test_find_crossing_other_type(self):
+        # Test for find crossing with other price or quantity types
+        self.assertEquals([], self.order_index.find_crossing(False, Price(200, 'MC'), 'MC'))
+        self.assertEquals([], self.order_index.find_crossing(False, Price(200, 'BTC'), 'BTC'))
+
+    def test_remove(self):
+        # Test for remove
+        self.assertTrue(self.order_index.remove(self.ask_order3))
+        self.assertFalse(self.order_index.remove(self.ask_order3))
+        self.assertFalse(self.order_index.remove(self.create_order(6, 100, True, 'BTC')))
+        self.assertEquals([self.ask_order2.order_id, self.ask_order.order_id],
+                          self.order_index.find_crossing(False, Price(200, 'BTC'), 'MC'))
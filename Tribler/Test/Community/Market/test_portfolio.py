@@ -1,12 +1,14 @@
 import unittest
 
-from Tribler.community.market.core.message import TraderId
+from Tribler.community.market.core.message import TraderId, MessageId, MessageNumber
 from Tribler.community.market.core.order import OrderId, OrderNumber
 from Tribler.community.market.core.order_manager import OrderManager
 from Tribler.community.market.core.order_repository import MemoryOrderRepository
 from Tribler.community.market.core.price import Price
 from Tribler.community.market.core.quantity import Quantity
+from Tribler.community.market.core.tick import Ask, Bid
 from Tribler.community.market.core.timeout import Timeout
+from Tribler.community.market.core.timestamp import Timestamp
 
 
 class PortfolioTestSuite(unittest.TestCase):
@@ -38,3 +40,35 @@ class PortfolioTestSuite(unittest.TestCase):
         # test for cancel order
         order = self.order_manager.create_ask_order(Price(100, 'BTC'), Quantity(10, 'MC'), Timeout(0.0))
         self.order_manager.cancel_order(order.order_id)
+
+    def test_find_crossing_orders(self):
+        # Test for find crossing orders
+        ask_order = self.order_manager.create_ask_order(Price(100, 'BTC'), Quantity(10, 'MC'), Timeout(3600))
+        ask_order2 = self.order_manager.create_ask_order(Price(90, 'BTC'), Quantity(10, 'MC'), Timeout(3600))
+        self.order_manager.create_ask_order(Price(110, 'BTC'), Quantity(10, 'MC'), Timeout(3600))
+        bid_order = self.order_manager.create_bid_order(Price(95, 'BTC'), Quantity(10, 'MC'), Timeout(3600))
+
+        bid = Bid(MessageId(TraderId("1"), MessageNumber("1")), OrderId(TraderId("1"), OrderNumber(1)),
+                  Price(100, 'BTC'), Quantity(10, 'MC'), Timeout(3600), Timestamp.now())
+        self.assertEquals([ask_order2.order_id, ask_order.order_id],
+                          [order.order_id for order in self.order_manager.find_crossing_orders(bid)])
+
+        ask = Ask(MessageId(TraderId("1"), MessageNumber("2")), OrderId(TraderId("1"), OrderNumber(2)),
+                  Price(95, 'BTC'), Quantity(10, 'MC'), Timeout(3600), Timestamp.now())
+        self.assertEquals([bid_order.order_id],
+                          [order.order_id for order in self.order_manager.find_crossing_orders(ask)])
+
+        other_ask = Ask(MessageId(TraderId("1"), MessageNumber("3")), OrderId(TraderId("1"), OrderNumber(3)),
+                        Price(95, 'BTC'), Quantity(10, 'BTC'), Timeout(3600), Timestamp.now())
+        self.assertEquals([], self.order_manager.find_crossing_orders(other_ask))
+
+    def test_find_crossing_orders_cancelled(self):
+        # Test for find crossing orders when orders are cancelled or expired
+        ask_order = self.order_manager.create_ask_order(Price(100, 'BTC'), Quantity(10, 'MC'), Timeout(3600))
+        self.order_manager.create_ask_order(Price(100, 'BTC'), Quantity(10, 'MC'), Timeout(0.0))
+        self.order_manager.cancel_order(ask_order.order_id)
+
+        bid = Bid(MessageId(TraderId("1"), MessageNumber("1")), OrderId(TraderId("1"), OrderNumber(1)),
+                  Price(100, 'BTC'), Quantity(10, 'MC'), Timeout(3600), Timestamp.now())
+        self.assertEquals([], self.order_manager.find_crossing_orders(bid))
+        self.assertEquals(0, len(self.order_manager.order_index))
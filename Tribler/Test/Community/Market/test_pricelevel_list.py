@@ -102,3 +102,18 @@ class PriceLevelListTestSuite(unittest.TestCase):
     def test_items_reverse_empty(self):
         # Test for items when empty with reverse attribute
         self.assertEquals([], self.price_level_list2.items(reverse=True))
+
+    def test_insert_unsorted(self):
+        # Test for insert when the prices do not arrive in order
+        self.price_level_list2.insert(self.price3, self.price_level3)
+        self.price_level_list2.insert(self.price, self.price_level)
+        self.price_level_list2.insert(self.price4, self.price_level4)
+        self.price_level_list2.insert(self.price2, self.price_level2)
+        self.assertEquals(self.price_level_list.items(), self.price_level_list2.items())
+        self.assertEquals((self.price3, self.price_level3), self.price_level_list2.succ_item(self.price2))
+        self.assertEquals((self.price, self.price_level), self.price_level_list2.prev_item(self.price2))
+
+    def test_succ_item_unknown(self):
+        # Test for succ item of a price that is not in the list
+        with self.assertRaises(ValueError):
+            self.price_level_list.succ_item(Price(2.5, 'BTC'))
@@ -0,0 +1,45 @@
+from Tribler.Test.Core.base_test import TriblerCoreTest
+from Tribler.community.search.admission import SearchAdmission, TokenBucket
+
+
+class TestTokenBucket(TriblerCoreTest):
+
+    def test_consume(self):
+        """
+        Test whether a bucket allows a burst of requests and refills over time
+        """
+        bucket = TokenBucket(1, 2, 0)
+        self.assertTrue(bucket.consume(0))
+        self.assertTrue(bucket.consume(0))
+        self.assertFalse(bucket.consume(0.5))
+        self.assertTrue(bucket.consume(1))
+        self.assertTrue(bucket.consume(100))
+        self.assertTrue(bucket.consume(100))
+        self.assertFalse(bucket.consume(100))
+
+
+class TestSearchAdmission(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        super(TestSearchAdmission, self).setUp(annotate=annotate)
+        self.admission = SearchAdmission(rate=1, burst=1, max_peers=2)
+
+    def test_admit_per_peer(self):
+        """
+        Test whether every peer has its own bucket
+        """
+        self.assertTrue(self.admission.admit(("1.2.3.4", 1), now=0))
+        self.assertFalse(self.admission.admit(("1.2.3.4", 1), now=0))
+        self.assertTrue(self.admission.admit(("1.2.3.5", 1), now=0))
+        self.assertTrue(self.admission.admit(("1.2.3.4", 1), now=1))
+        self.assertEqual(self.admission.get_statistics(), {"peers": 2, "admitted": 3, "shed": 1})
+
+    def test_forget_least_recently_used(self):
+        """
+        Test whether only the buckets of the most recent peers are kept
+        """
+        for port in xrange(3):
+            self.admission.admit(("1.2.3.4", port), now=0)
+        self.assertEqual(self.admission.get_statistics()["peers"], 2)
+        self.assertTrue(self.admission.admit(("1.2.3.4", 0), now=0))
+        self.assertFalse(self.admission.admit(("1.2.3.4", 2), now=0))
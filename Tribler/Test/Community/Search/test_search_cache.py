@@ -0,0 +1,46 @@
+from Tribler.Test.Core.base_test import TriblerCoreTest
+from Tribler.community.search.search_cache import SearchResultCache, normalize_keywords
+
+
+class TestSearchResultCache(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        super(TestSearchResultCache, self).setUp(annotate=annotate)
+        self.cache = SearchResultCache(max_size=2)
+
+    def test_normalize_keywords(self):
+        """
+        Test whether the order and case of the keywords do not matter
+        """
+        self.assertEqual(normalize_keywords([u"Ubuntu", u"iso"]), normalize_keywords([u"iso", u"ubuntu", u"ISO"]))
+
+    def test_get_cached(self):
+        """
+        Test whether cached results are returned for the same version of the collected torrents only
+        """
+        self.assertIsNone(self.cache.get([u"ubuntu"], 1))
+        self.cache.put([u"ubuntu"], 1, ["result"])
+        self.assertEqual(self.cache.get([u"Ubuntu"], 1), ["result"])
+        self.assertIsNone(self.cache.get([u"ubuntu"], 2))
+        self.assertEqual(self.cache.get_statistics()["hits"], 1)
+        self.assertEqual(self.cache.get_statistics()["misses"], 2)
+
+    def test_get_expired(self):
+        """
+        Test whether expired results are not returned
+        """
+        self.cache.ttl = -1
+        self.cache.put([u"ubuntu"], 1, ["result"])
+        self.assertIsNone(self.cache.get([u"ubuntu"], 1))
+
+    def test_evict_least_recently_used(self):
+        """
+        Test whether the least recently used results are evicted when the cache is full
+        """
+        self.cache.put([u"a"], 1, [])
+        self.cache.put([u"b"], 1, [])
+        self.cache.get([u"a"], 1)
+        self.cache.put([u"c"], 1, [])
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get([u"b"], 1))
+        self.assertEqual(self.cache.get([u"a"], 1), [])
@@ -1,6 +1,6 @@
 import os
 from nose.tools import raises
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import inlineCallbacks, succeed
 
 from Tribler.Test.Community.AbstractTestCommunity import AbstractTestCommunity
 from Tribler.Test.Core.base_test import MockObject
@@ -43,10 +43,11 @@ class TestSearchCommunity(AbstractTestCommunity):
         create_search_response.called = False
 
         def search_names(keywords, local=False, keys=None):
-            return []
+            return succeed([])
 
         self.search_community._torrent_db = MockObject()
-        self.search_community._torrent_db.searchNames = search_names
+        self.search_community._torrent_db.searchNames_async = search_names
+        self.search_community._torrent_db.collected_torrents_version = 0
 
         fake_message = MockObject()
         fake_message.candidate = MockObject()
@@ -62,6 +63,56 @@ class TestSearchCommunity(AbstractTestCommunity):
         self.assertTrue(log_incoming_searches.called)
         self.assertTrue(create_search_response.called)
 
+    def create_fake_search(self, sock_addr, keywords):
+        fake_message = MockObject()
+        fake_message.candidate = MockObject()
+        fake_message.candidate.sock_addr = sock_addr
+        fake_message.payload = MockObject()
+        fake_message.payload.keywords = keywords
+        fake_message.payload.identifier = "abc"
+        return fake_message
+
+    def test_on_search_cached(self):
+        """
+        Test whether the results of a search are reused until the collected torrents change
+        """
+        search_names_calls = []
+        responses = []
+
+        def search_names(keywords, local=False, keys=None):
+            search_names_calls.append(keywords)
+            return succeed([])
+
+        self.search_community._torrent_db = MockObject()
+        self.search_community._torrent_db.searchNames_async = search_names
+        self.search_community._torrent_db.collected_torrents_version = 0
+        self.search_community._create_search_response = lambda *args: responses.append(args)
+
+        self.search_community.on_search([self.create_fake_search("1234", [u"ubuntu", u"iso"]),
+                                         self.create_fake_search("5678", [u"ISO", u"ubuntu"])])
+        self.assertEqual(len(search_names_calls), 1)
+        self.assertEqual(len(responses), 2)
+
+        self.search_community._torrent_db.collected_torrents_version = 1
+        self.search_community.on_search([self.create_fake_search("1234", [u"ubuntu", u"iso"])])
+        self.assertEqual(len(search_names_calls), 2)
+        self.assertEqual(self.search_community.get_statistics()["result_cache"]["hits"], 1)
+
+    def test_on_search_shed(self):
+        """
+        Test whether a peer sending too many search requests is ignored
+        """
+        responses = []
+        self.search_community._torrent_db = MockObject()
+        self.search_community._torrent_db.searchNames_async = lambda keywords, local=False, keys=None: succeed([])
+        self.search_community._torrent_db.collected_torrents_version = 0
+        self.search_community._create_search_response = lambda *args: responses.append(args)
+
+        burst = self.search_community.search_admission.burst
+        self.search_community.on_search([self.create_fake_search("1234", [u"ubuntu"])] * (burst + 1))
+        self.assertEqual(len(responses), burst)
+        self.assertEqual(self.search_community.get_statistics()["admission"]["shed"], 1)
+
     @raises(DropPacket)
     def test_decode_response_invalid(self):
         """
@@ -3,6 +3,7 @@ import os
 from twisted.internet.defer import inlineCallbacks
 
 from Tribler.Test.Community.Trustchain.test_trustchain_utilities import TrustChainTestCase, TestBlock
+from Tribler.community.triblerchain import database
 from Tribler.community.triblerchain.database import TriblerChainDB
 from Tribler.community.trustchain.database import DATABASE_DIRECTORY
 from Tribler.dispersy.util import blocking_call_on_reactor_thread
@@ -33,3 +34,52 @@ class TestDatabase(TrustChainTestCase):
         self.db.add_block(self.block1)
         self.db.add_block(self.block2)
         self.assertEqual((2, 2), self.db.get_num_unique_interactors(self.block1.public_key))
+
+    @blocking_call_on_reactor_thread
+    def test_get_num_interactors_add_blocks(self):
+        """
+        Test whether the interactors are counted once when blocks are added in a batch
+        """
+        self.block2 = TestBlock(previous=self.block1, transaction={'up': 0, 'down': 42})
+        block3 = TestBlock(previous=self.block2, transaction={'up': 10, 'down': 0})
+        block3.link_public_key = self.block1.link_public_key
+        self.db.add_blocks([self.block1, self.block2, block3])
+        self.assertEqual((1, 2), self.db.get_num_unique_interactors(self.block1.public_key))
+
+    @blocking_call_on_reactor_thread
+    def test_get_num_interactors_unknown(self):
+        """
+        Test whether no interactors are returned for an unknown public key
+        """
+        self.assertEqual((0, 0), self.db.get_num_unique_interactors(self.block1.public_key))
+
+    @blocking_call_on_reactor_thread
+    def test_upgrade_interactors(self):
+        """
+        Test whether the interactors of the blocks in a version 4 database are counted after upgrading it
+        """
+        self.db.add_block(self.block1)
+        self.db.execute(u"DROP TABLE triblerchain_interactors")
+        self.db.execute(u"DROP TABLE triblerchain_interactor_count")
+        self.db.execute(u"UPDATE option SET value = '4' WHERE key = 'database_version'")
+        self.db.close()
+        self.db = TriblerChainDB(self.getStateDir(), u'triblerchain')
+        self.assertEqual((1, 1), self.db.get_num_unique_interactors(self.block1.public_key))
+
+    @blocking_call_on_reactor_thread
+    def test_rebuild_interactors_batches(self):
+        """
+        Test whether the interactors are counted correctly when the blocks are read in several batches
+        """
+        self.block2 = TestBlock(previous=self.block1, transaction={'up': 0, 'down': 42})
+        block3 = TestBlock(previous=self.block2, transaction={'up': 10, 'down': 0})
+        block3.link_public_key = self.block1.link_public_key
+        self.db.add_blocks([self.block1, self.block2, block3])
+
+        old_batch_size = database.REBUILD_BATCH_SIZE
+        database.REBUILD_BATCH_SIZE = 2
+        try:
+            self.db._rebuild_interactors()
+        finally:
+            database.REBUILD_BATCH_SIZE = old_batch_size
+        self.assertEqual((1, 2), self.db.get_num_unique_interactors(self.block1.public_key))
@@ -486,3 +486,19 @@ class TestBlocks(TrustChainTestCase):
         self.assertIsNone(ValidationResult.partial_next())
         self.assertIsNone(ValidationResult.partial_previous())
         self.assertIsNone(ValidationResult.valid())
+
+    def test_verify_signature(self):
+        block = TestBlock()
+        self.assertTrue(block.verify_signature())
+        block.signature = EMPTY_SIG
+        self.assertFalse(block.verify_signature())
+
+    def test_validate_verified_block_changed(self):
+        db = MockDatabase()
+        (block1, _, _, _) = TestBlocks.setup_validate()
+        self.assertTrue(block1.verify_signature())
+        # Act
+        block1.transaction = {"id": 43}
+        result = block1.validate(db)
+        self.assertEqual(result[0], ValidationResult.invalid)
+        self.assertIn("Invalid signature", result[1])
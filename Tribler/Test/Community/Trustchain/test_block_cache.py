@@ -0,0 +1,62 @@
+import os
+
+from twisted.internet.defer import inlineCallbacks
+
+from Tribler.Test.Community.Trustchain.test_trustchain_utilities import TestBlock, TrustChainTestCase
+from Tribler.community.trustchain.block_cache import BlockCache
+from Tribler.community.trustchain.database import TrustChainDB, DATABASE_DIRECTORY
+from Tribler.dispersy.util import blocking_call_on_reactor_thread
+
+
+class TestBlockCache(TrustChainTestCase):
+    """
+    Tests whether the BlockCache answers the validation queries like the TrustChain database does.
+    """
+
+    @blocking_call_on_reactor_thread
+    @inlineCallbacks
+    def setUp(self, **kwargs):
+        yield super(TestBlockCache, self).setUp()
+        path = os.path.join(self.getStateDir(), DATABASE_DIRECTORY)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.db = TrustChainDB(self.getStateDir(), u'trustchain')
+
+        self.block1 = TestBlock()
+        self.block2 = TestBlock(previous=self.block1)
+        self.block3 = TestBlock(previous=self.block2)
+        self.block4 = TestBlock(previous=self.block3)
+        self.linked = TestBlock.create({"id": 42}, self.db, self.block1.link_public_key, link=self.block2)
+
+    def assertSameAnswers(self, cache, block):
+        for method in ("get_block_before", "get_block_after", "get_linked", "contains"):
+            expected = getattr(self.db, method)(block)
+            actual = getattr(cache, method)(block)
+            if method == "contains" or expected is None:
+                self.assertEqual(actual, expected)
+            else:
+                self.assertEqual_block(actual, expected)
+
+    @blocking_call_on_reactor_thread
+    def test_queries(self):
+        self.db.add_blocks([self.block1, self.block2, self.block4, self.linked])
+        cache = BlockCache(self.db, [self.block3, self.linked])
+        for block in (self.block1, self.block2, self.block3, self.block4, self.linked):
+            self.assertSameAnswers(cache, block)
+        self.assertEqual_block(cache.get(self.block1.public_key, self.block1.sequence_number), self.block1)
+
+    @blocking_call_on_reactor_thread
+    def test_add_block(self):
+        self.db.add_blocks([self.block1, self.block4])
+        cache = BlockCache(self.db, [self.block2, self.block3])
+        cache.add_block(self.block2)
+        cache.add_block(self.block3)
+        self.db.add_blocks([self.block2, self.block3])
+        for block in (self.block1, self.block2, self.block3, self.block4):
+            self.assertSameAnswers(cache, block)
+
+    @blocking_call_on_reactor_thread
+    def test_validate(self):
+        self.db.add_blocks([self.block1, self.block2, self.block4])
+        cache = BlockCache(self.db, [self.block3])
+        self.assertEqual(self.block3.validate(cache), self.block3.validate(self.db))
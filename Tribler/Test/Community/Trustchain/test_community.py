@@ -7,10 +7,10 @@ from twisted.internet import reactor
 from twisted.internet.defer import inlineCallbacks, returnValue
 from twisted.internet.threads import blockingCallFromThread
 
-from Tribler.Test.Community.Trustchain.test_trustchain_utilities import TrustChainTestCase
+from Tribler.Test.Community.Trustchain.test_trustchain_utilities import TrustChainTestCase, TestBlock
 from Tribler.Test.Core.base_test import MockObject
 from Tribler.Test.test_as_server import AbstractServer
-from Tribler.community.trustchain.block import GENESIS_SEQ
+from Tribler.community.trustchain.block import GENESIS_SEQ, EMPTY_SIG, ValidationResult
 from Tribler.community.trustchain.community import (TrustChainCommunity, HALF_BLOCK, CRAWL)
 from Tribler.dispersy.candidate import Candidate
 from Tribler.dispersy.message import DelayPacketByMissingMember
@@ -359,6 +359,42 @@ class TestTrustChainCommunity(BaseTestTrustChainCommunity):
         self.assertBlocksAreEqual(node, crawler)
         self.assertBlocksAreEqual(other, crawler)
 
+    def test_validate_and_store_blocks(self):
+        """
+        Test validating and storing a batch of blocks, in which blocks depend on earlier blocks of the batch.
+        """
+        node, = self.create_nodes(1)
+        block1 = TestBlock()
+        block2 = TestBlock(previous=block1)
+        invalid_block = TestBlock()
+        invalid_block.signature = EMPTY_SIG
+
+        # Act
+        validations = node.call(node.community.validate_and_store_blocks, [block1, block2, invalid_block, block2])
+
+        # Assert
+        self.assertEqual([validation[0] for validation in validations],
+                         [ValidationResult.no_info, ValidationResult.partial_next, ValidationResult.invalid,
+                          ValidationResult.partial_next])
+        self.assertBlocksInDatabase(node, 2)
+        self.assertEqual(node.community.blocks_ingested, 2)
+        self.assertGreater(node.community.get_ingest_rate(), 0)
+
+    def test_half_blocks_verified_after_unload(self):
+        """
+        Test that half blocks verified by the signature workers are dropped when the community is unloading.
+        """
+        node, = self.create_nodes(1)
+        processed = []
+        node.community.process_half_blocks = processed.append
+        node.community._shutting_down = True
+
+        # Act
+        node.call(node.community.on_half_blocks_verified, [MockObject()])
+
+        # Assert
+        self.assertEqual(processed, [])
+
     def test_get_trust(self):
         """
         Test that the trust nodes have for each other is the sum of the length of both chains.
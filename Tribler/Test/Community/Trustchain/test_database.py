@@ -178,3 +178,26 @@ class TestDatabase(TrustChainTestCase):
         block_dict = dict(self.block1)
         self.assertDictEqual(block_dict["transaction"], {"id": 42})
         self.assertEqual(block_dict["insert_time"], self.block1.insert_time)
+
+    @blocking_call_on_reactor_thread
+    def test_add_blocks(self):
+        self.db.add_blocks([self.block1, self.block2])
+        self.assertTrue(self.db.contains(self.block1))
+        self.assertTrue(self.db.contains(self.block2))
+
+    @blocking_call_on_reactor_thread
+    def test_get_validation_blocks(self):
+        block2 = TestBlock(previous=self.block1)
+        block3 = TestBlock(previous=block2)
+        block4 = TestBlock(previous=block3)
+        linked = TestBlock.create({"id": 42}, self.db, block2.link_public_key, link=block2)
+        self.db.add_blocks([self.block1, block2, block3, block4, linked, self.block2])
+        sequence_ranges = {block3.public_key: (block3.sequence_number, block3.sequence_number)}
+        blocks = self.db.get_validation_blocks(sequence_ranges, [], [])
+        self.assertItemsEqual([block.sequence_number for block in blocks],
+                              [block2.sequence_number, block3.sequence_number, block4.sequence_number])
+        blocks = self.db.get_validation_blocks({}, [(self.block2.public_key, self.block2.sequence_number)],
+                                               [(block2.public_key, block2.sequence_number)])
+        self.assertItemsEqual([(block.public_key, block.sequence_number) for block in blocks],
+                              [(self.block2.public_key, self.block2.sequence_number),
+                               (linked.public_key, linked.sequence_number)])
@@ -0,0 +1,36 @@
+from Tribler.Test.Community.Trustchain.test_trustchain_utilities import TestBlock
+from Tribler.Test.Core.base_test import TriblerCoreTest
+from Tribler.Test.twisted_thread import deferred
+from Tribler.community.trustchain.block import EMPTY_SIG
+from Tribler.community.trustchain.signature_workers import SignatureWorkerPool
+
+
+class TestSignatureWorkerPool(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        super(TestSignatureWorkerPool, self).setUp(annotate=annotate)
+        self.pool = SignatureWorkerPool(3)
+        self.pool.start()
+
+    def tearDown(self, annotate=True):
+        self.pool.stop()
+        super(TestSignatureWorkerPool, self).tearDown(annotate=annotate)
+
+    @deferred(timeout=10)
+    def test_verify(self):
+        """
+        Test whether the signatures of all blocks are checked
+        """
+        self.assertTrue(self.pool.running)
+        blocks = [TestBlock() for _ in xrange(10)]
+        blocks[4].signature = EMPTY_SIG
+
+        def check_result(num_valid):
+            self.assertEqual(num_valid, 9)
+            self.assertTrue(all(block._signature_check for block in blocks))
+
+        return self.pool.verify(blocks).addCallback(check_result)
+
+    @deferred(timeout=10)
+    def test_verify_no_blocks(self):
+        return self.pool.verify([]).addCallback(self.assertEqual, 0)
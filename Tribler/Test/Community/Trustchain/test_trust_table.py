@@ -0,0 +1,71 @@
+import unittest
+
+from Tribler.Test.Community.Trustchain.test_trustchain_utilities import TestBlock
+from Tribler.community.trustchain.trust_table import TrustTable, DEFAULT_TRUST
+
+
+class TestTrustTable(unittest.TestCase):
+    """
+    This class contains tests for the TrustTable object.
+    """
+
+    def setUp(self):
+        self.trust_table = TrustTable(lambda block: block.sequence_number)
+        self.block1 = TestBlock()
+        self.block2 = TestBlock(previous=self.block1)
+
+    def test_load(self):
+        """
+        Test loading the trust in a member with and without blocks
+        """
+        self.assertIsNone(self.trust_table.get(self.block1.public_key))
+        self.trust_table.load(self.block1.public_key, self.block1)
+        self.trust_table.load('a', None)
+        self.assertEqual(self.trust_table.get(self.block1.public_key), self.block1.sequence_number)
+        self.assertEqual(self.trust_table.get('a'), DEFAULT_TRUST)
+        self.assertEqual(len(self.trust_table), 2)
+
+    def test_update(self):
+        """
+        Test whether the trust only follows newer blocks of members in the table
+        """
+        self.trust_table.update(self.block2)
+        self.assertNotIn(self.block2.public_key, self.trust_table)
+
+        self.trust_table.load(self.block1.public_key, self.block1)
+        self.trust_table.update(self.block2)
+        self.assertEqual(self.trust_table.get(self.block1.public_key), self.block2.sequence_number)
+        self.trust_table.update(self.block1)
+        self.assertEqual(self.trust_table.get(self.block1.public_key), self.block2.sequence_number)
+
+    def test_choose(self):
+        """
+        Test whether members are chosen in proportion to their trust
+        """
+        self.trust_table.load('a', None)
+        self.trust_table.load(self.block1.public_key, self.block1)
+        counts = [0, 0]
+        for _ in xrange(1000):
+            counts[self.trust_table.choose(['a', self.block1.public_key])] += 1
+        self.assertGreater(counts[1], counts[0])
+
+    def test_choose_without_trust(self):
+        """
+        Test choosing between members without any trust
+        """
+        trust_table = TrustTable(lambda block: 0)
+        trust_table.load(self.block1.public_key, self.block1)
+        self.assertIsNone(trust_table.choose([self.block1.public_key]))
+        self.assertIsNone(trust_table.choose([]))
+
+    def test_choose_after_update(self):
+        """
+        Test whether a trust update is taken into account when choosing again
+        """
+        trust_table = TrustTable(lambda block: block.sequence_number - self.block1.sequence_number)
+        trust_table.load('a', None)
+        trust_table.load(self.block1.public_key, self.block1)
+        self.assertEqual(trust_table.choose(['a', self.block1.public_key]), 0)
+        trust_table.update(self.block2)
+        trust_table.load('a', self.block1)
+        self.assertEqual(trust_table.choose(['a', self.block1.public_key]), 1)
@@ -0,0 +1,119 @@
+from struct import pack
+
+from Tribler.Test.Core.base_test import TriblerCoreTest
+from Tribler.community.tunnel.conversion import (TunnelConversion, PROTOCOL_DHT, PROTOCOL_DISPERSY,
+                                                 PROTOCOL_UDP_TRACKER, PROTOCOL_UTP)
+from Tribler.dispersy.endpoint import TUNNEL_PREFIX
+
+NODE_ID = "\x01" * 20
+INFOHASH = "\x02" * 20
+
+# Datagrams as they are sent by libtorrent and dispersy, together with the protocol they should be classified as
+PACKET_CORPUS = [
+    # uTP SYN, STATE (with selective ack extension) and DATA packets
+    (pack("!BBHIIIHH", 0x41, 0, 1234, 1000000, 0, 1048576, 1, 0), PROTOCOL_UTP),
+    (pack("!BBHIIIHH", 0x21, 1, 1235, 1000100, 2500, 1048576, 5, 1) + "\x00\x04\x01\x00\x00\x00", PROTOCOL_UTP),
+    (pack("!BBHIIIHH", 0x01, 0, 1235, 1000200, 2500, 1048576, 6, 1) + "x" * 1000, PROTOCOL_UTP),
+    # UDP tracker connect, announce and scrape requests, and connect, announce and error responses
+    (pack("!QII", 0x41727101980, 0, 42), PROTOCOL_UDP_TRACKER),
+    (pack("!QII20s20sQQQIIIiH", 1337, 1, 43, INFOHASH, "-LT1100-" + "3" * 12, 0, 1000, 0, 2, 0, 0, -1, 6881),
+     PROTOCOL_UDP_TRACKER),
+    (pack("!QII20s", 1337, 2, 44, INFOHASH), PROTOCOL_UDP_TRACKER),
+    (pack("!IIQ", 0, 42, 1337), PROTOCOL_UDP_TRACKER),
+    (pack("!IIIII", 1, 43, 1800, 3, 12) + "\x7f\x00\x00\x01\x1a\xe1", PROTOCOL_UDP_TRACKER),
+    (pack("!II", 3, 44) + "unregistered torrent", PROTOCOL_UDP_TRACKER),
+    # DHT queries, responses and errors
+    ("d1:ad2:id20:%se1:q4:ping1:t2:aa1:y1:qe" % NODE_ID, PROTOCOL_DHT),
+    ("d1:ad2:id20:%s9:info_hash20:%se1:q9:get_peers1:t2:ab1:v4:LT\x01\x001:y1:qe" % (NODE_ID, INFOHASH),
+     PROTOCOL_DHT),
+    ("d1:rd2:id20:%s5:nodes26:%s5:token8:abcdefghe1:t2:ab1:y1:re" % (NODE_ID, "n" * 26), PROTOCOL_DHT),
+    ("d1:eli201e23:A Generic Error Ocurrede1:t2:ac1:y1:ee", PROTOCOL_DHT),
+    # Dispersy messages exchanged over the tunnels
+    (TUNNEL_PREFIX + "\x00" * 22 + "\x02\xf6" + "x" * 100, PROTOCOL_DISPERSY),
+    # Traffic that should not leave an exit node
+    ("GET /announce?info_hash=abc HTTP/1.1\r\nHost: tracker.example.org\r\n\r\n", None),
+    ("d4:spam4:eggse", None),
+    ("d4:spam21:1:y1:q and some eggse", None),
+    ("SSDP NOTIFY * HTTP/1.1", None),
+    ("\xff" * 10, None),
+    ("", None),
+]
+
+
+class TestTunnelConversion(TriblerCoreTest):
+
+    def test_swap_circuit_id(self):
+        """
+        Test whether the circuit id can be swapped in a full packet and in just the plaintext header of a packet
+        """
+        packet = TunnelConversion.encode_data(42, ("1.2.3.4", 1234), ("2.3.4.5", 2345), "payload")
+        swapped = TunnelConversion.swap_circuit_id(packet, u"data", 42, 43)
+        self.assertEqual(TunnelConversion.get_circuit_id(swapped, u"data"), 43)
+
+        plaintext, encrypted = TunnelConversion.split_encrypted_packet(packet, u"data")
+        plaintext = TunnelConversion.swap_circuit_id(plaintext, u"data", 42, 43)
+        self.assertEqual(plaintext + encrypted, swapped)
+
+    def test_swap_circuit_id_cell(self):
+        """
+        Test whether the circuit id of a cell is swapped in its plaintext header
+        """
+        packet = "\x00" * 31 + pack("!I", 42) + "\x01" + "encrypted"
+        plaintext, encrypted = TunnelConversion.split_encrypted_packet(packet, u"cell")
+        plaintext = TunnelConversion.swap_circuit_id(plaintext, u"cell", 42, 43)
+        self.assertEqual(TunnelConversion.get_circuit_id(plaintext + encrypted, u"cell"), 43)
+        self.assertEqual(encrypted, "encrypted")
+
+    def test_convert_cell(self):
+        """
+        Test whether converting a message to a cell and back results in the original message
+        """
+        packet = "".join(chr(i) for i in xrange(22)) + "\x07" + "".join(chr(i) for i in xrange(23, 31)) + \
+                 pack("!I", 42) + "payload"
+        cell = TunnelConversion.convert_to_cell(packet)
+        self.assertEqual(cell[22], "\x01")
+        self.assertEqual(cell[35], "\x07")
+        self.assertEqual(TunnelConversion.convert_from_cell(cell), packet)
+
+    def test_decode_data(self):
+        """
+        Test whether encoded data packets are decoded correctly
+        """
+        packet = TunnelConversion.encode_data(42, ("1.2.3.4", 1234), ("tribler.org", 2345), "payload")
+        self.assertEqual(TunnelConversion.decode_data(packet),
+                         (42, ("1.2.3.4", 1234), ("tribler.org", 2345), "payload"))
+
+    def test_could_be_dht_malformed(self):
+        """
+        Test whether datagrams that are not bencoded dictionaries with a valid "y" key are not considered DHT traffic
+        """
+        self.assertTrue(TunnelConversion.could_be_dht("d1:t2:aa1:y1:qe"))
+        self.assertFalse(TunnelConversion.could_be_dht("d1:y1:xe"))
+        self.assertFalse(TunnelConversion.could_be_dht("d1:t2:aa1:y1:q"))
+        self.assertFalse(TunnelConversion.could_be_dht("d1:a99:ab1:y1:qe"))
+        self.assertFalse(TunnelConversion.could_be_dht("d1:aix1:y1:qe"))
+        self.assertFalse(TunnelConversion.could_be_dht("di42e1:y1:qe"))
+        self.assertFalse(TunnelConversion.could_be_dht("d1:a%s1:y1:qe" % ("l" * 20 + "e" * 20)))
+        self.assertFalse(TunnelConversion.could_be_dht("l1:y1:qe"))
+
+    def test_could_be_dht_trailing_data(self):
+        """
+        Test whether a valid "y" key does not make the rest of the datagram pass as DHT traffic
+        """
+        self.assertFalse(TunnelConversion.could_be_dht("d1:y1:qGET / HTTP/1.1 arbitrary payload e"))
+        self.assertFalse(TunnelConversion.could_be_dht("d1:y1:q1:t2:aaeGET / HTTP/1.1e"))
+        self.assertFalse(TunnelConversion.could_be_dht("d1:y1:q1:t2:aaee"))
+        self.assertFalse(TunnelConversion.could_be_dht("d1:y1:q1:ti--5ee"))
+        self.assertFalse(TunnelConversion.could_be_dht("d1:y1:q1:ti-0ee"))
+        self.assertFalse(TunnelConversion.could_be_dht("d1:y1:q1:ti05ee"))
+        self.assertFalse(TunnelConversion.could_be_dht("d1:y1:q1:t02:aae"))
+        self.assertTrue(TunnelConversion.could_be_dht("d1:y1:q1:ti-5ee"))
+        self.assertTrue(TunnelConversion.could_be_dht("d1:y1:q1:ti0ee"))
+
+    def test_classify_corpus(self):
+        """
+        Test whether the datagrams in the corpus are classified as the right protocol
+        """
+        for packet, protocol in PACKET_CORPUS:
+            self.assertEqual(TunnelConversion.classify(packet), protocol, repr(packet))
+            self.assertEqual(TunnelConversion.is_allowed(packet), protocol is not None, repr(packet))
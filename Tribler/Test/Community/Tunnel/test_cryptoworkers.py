@@ -0,0 +1,69 @@
+from cryptography.exceptions import InvalidTag
+from twisted.internet.defer import inlineCallbacks, gatherResults
+
+from Tribler.Test.Core.base_test import TriblerCoreTest
+from Tribler.Test.twisted_thread import deferred
+from Tribler.community.tunnel.crypto.cryptoworkers import CryptoWorkerPool, process_cell
+from Tribler.community.tunnel.crypto.tunnelcrypto import TunnelCrypto
+
+
+class TestCryptoWorkerPool(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        super(TestCryptoWorkerPool, self).setUp(annotate=annotate)
+        self.pool = CryptoWorkerPool(3)
+        self.pool.start()
+        self.key, _, self.salt, _, _, _ = TunnelCrypto().generate_session_keys("a" * 64)
+
+    def tearDown(self, annotate=True):
+        self.pool.stop()
+        super(TestCryptoWorkerPool, self).tearDown(annotate=annotate)
+
+    def test_shards(self):
+        """
+        Test whether circuits are spread over the workers
+        """
+        self.assertTrue(self.pool.running)
+        self.assertEqual(self.pool.get_shard(3), self.pool.get_shard(6))
+        self.assertNotEqual(self.pool.get_shard(3), self.pool.get_shard(4))
+
+    @deferred(timeout=10)
+    @inlineCallbacks
+    def test_process_cell(self):
+        """
+        Test whether a cell encrypted by a worker can be decrypted by another worker
+        """
+        encrypted = yield self.pool.submit(1, process_cell, "encrypt_str", (self.key, self.salt, 1), "plain", "data")
+        self.assertTrue(encrypted.startswith("plain"))
+        decrypted = yield self.pool.submit(2, process_cell, "decrypt_str", (self.key, self.salt), "plain",
+                                           encrypted[5:])
+        self.assertEqual(decrypted, "plaindata")
+
+    @deferred(timeout=10)
+    def test_circuit_order(self):
+        """
+        Test whether the results for a circuit are delivered in the order the jobs were submitted
+        """
+        results = []
+        deferreds = []
+        for salt_explicit in xrange(1, 101):
+            d = self.pool.submit(1, process_cell, "encrypt_str", (self.key, self.salt, salt_explicit), "", "data")
+            d.addCallback(lambda _, index=salt_explicit: results.append(index))
+            deferreds.append(d)
+
+        def check_order(_):
+            self.assertEqual(results, range(1, 101))
+            self.assertEqual(self.pool.jobs_submitted[self.pool.get_shard(1)], 100)
+
+        return gatherResults(deferreds).addCallback(check_order)
+
+    @deferred(timeout=10)
+    def test_process_cell_error(self):
+        """
+        Test whether errors raised by a worker end up in the errback
+        """
+        def on_error(failure):
+            self.assertTrue(failure.check(InvalidTag))
+
+        d = self.pool.submit(1, process_cell, "decrypt_str", (self.key, self.salt), "", "x" * 30)
+        return d.addCallbacks(lambda _: self.fail("Decrypting garbage should fail"), on_error)
@@ -3,7 +3,7 @@ from twisted.internet.defer import inlineCallbacks, returnValue
 
 from Tribler.Test.Community.Tunnel.test_tunnel_base import AbstractTestTunnelCommunity
 from Tribler.Test.twisted_thread import deferred
-from Tribler.community.tunnel.conversion import TunnelConversion
+from Tribler.community.tunnel.conversion import TunnelConversion, PROTOCOL_DISPERSY
 from Tribler.community.tunnel.crypto.tunnelcrypto import CryptoException, TunnelCrypto
 from Tribler.community.tunnel.routing import Circuit, Hop, RelayRoute
 from Tribler.community.tunnel.tunnel_community import (TunnelSettings, TunnelExitSocket, CircuitRequestCache,
@@ -105,6 +105,7 @@ class TestTunnelCommunity(AbstractTestTunnelCommunity):
         exit_tunnel.ips[("127.0.0.1", 8080)] = -1
         data = "ffffffff".decode("HEX") + "1" * 25
         exit_tunnel.sendto(data, ("127.0.0.1", 8080))
+        self.assertEqual(exit_tunnel.packets_out[PROTOCOL_DISPERSY], 1)
         res = yield exit_tunnel.close()
         returnValue(res)
 
@@ -0,0 +1,55 @@
+from cryptography.exceptions import InvalidTag
+
+from Tribler.Test.Core.base_test import TriblerCoreTest
+from Tribler.community.tunnel.crypto import tunnelcrypto
+from Tribler.community.tunnel.crypto.cryptowrapper import Cipher, algorithms, modes, default_backend
+from Tribler.community.tunnel.crypto.tunnelcrypto import TunnelCrypto, CryptoException
+
+
+class TestTunnelCrypto(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        super(TestTunnelCrypto, self).setUp(annotate=annotate)
+        self.crypto = TunnelCrypto()
+        self.key, _, self.salt, _, _, _ = self.crypto.generate_session_keys("a" * 64)
+
+    def test_encrypt_decrypt(self):
+        """
+        Test whether encrypted content can be decrypted again with the same session key
+        """
+        for salt_explicit in [1, 2, 1234567]:
+            encrypted = self.crypto.encrypt_str("hello world", self.key, self.salt, salt_explicit)
+            self.assertEqual(self.crypto.decrypt_str(encrypted, self.key, self.salt), "hello world")
+
+    def test_wire_format(self):
+        """
+        Test whether the encrypted content can still be decrypted by a peer building a new cipher for every cell
+        """
+        encrypted = self.crypto.encrypt_str("hello world", self.key, self.salt, 42)
+        decryptor = Cipher(algorithms.AES(self.key),
+                           modes.GCM(initialization_vector=self.salt + "42", tag=encrypted[8:24]),
+                           backend=default_backend()).decryptor()
+        self.assertEqual(decryptor.update(encrypted[24:]) + decryptor.finalize(), "hello world")
+
+    def test_decrypt_tampered(self):
+        """
+        Test whether decrypting tampered or truncated content fails
+        """
+        encrypted = self.crypto.encrypt_str("hello world", self.key, self.salt, 1)
+        self.assertRaises(InvalidTag, self.crypto.decrypt_str, encrypted[:-1] + "x", self.key, self.salt)
+        self.assertRaises(CryptoException, self.crypto.decrypt_str, encrypted[:20], self.key, self.salt)
+
+    def test_cipher_cache(self):
+        """
+        Test whether cipher contexts are reused per key and the cache does not grow unbounded
+        """
+        self.assertIs(self.crypto._get_cipher(self.key), self.crypto._get_cipher(self.key))
+
+        old_size = tunnelcrypto.CIPHER_CACHE_SIZE
+        tunnelcrypto.CIPHER_CACHE_SIZE = 2
+        try:
+            for i in xrange(5):
+                self.crypto._get_cipher(chr(i) * 16)
+            self.assertEqual(len(self.crypto._cipher_cache), 2)
+        finally:
+            tunnelcrypto.CIPHER_CACHE_SIZE = old_size
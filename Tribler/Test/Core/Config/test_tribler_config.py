@@ -192,6 +192,11 @@ class TestTriblerConfig(TriblerCoreTest):
         self.assertEqual(self.tribler_config.get_libtorrent_max_upload_rate(), True)
         self.tribler_config.set_libtorrent_max_download_rate(True)
         self.assertEqual(self.tribler_config.get_libtorrent_max_download_rate(), True)
+        self.tribler_config.set_libtorrent_resume_store_enabled(True)
+        self.assertEqual(self.tribler_config.get_libtorrent_resume_store_enabled(), True)
+        self.tribler_config.set_libtorrent_resume_store_dir("TESTDIR")
+        self.tribler_config.set_state_dir("TEST")
+        self.assertEqual(self.tribler_config.get_libtorrent_resume_store_dir(), os.path.join("TEST", "TESTDIR"))
 
     def test_get_set_methods_mainline_dht(self):
         """
@@ -278,6 +283,10 @@ class TestTriblerConfig(TriblerCoreTest):
         self.assertEqual(self.tribler_config.get_torrent_collecting_max_torrents(), True)
         self.tribler_config.set_torrent_collecting_dir(True)
         self.assertEqual(self.tribler_config.get_torrent_collecting_dir(), True)
+        self.tribler_config.set_torrent_collecting_tftp_window_size(8)
+        self.assertEqual(self.tribler_config.get_torrent_collecting_tftp_window_size(), 8)
+        self.tribler_config.set_torrent_collecting_max_tftp_requests(2)
+        self.assertEqual(self.tribler_config.get_torrent_collecting_max_tftp_requests(), 2)
 
     def test_get_set_methods_search_community(self):
         """
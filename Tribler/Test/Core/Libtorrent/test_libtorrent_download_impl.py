@@ -9,7 +9,7 @@ from Tribler.Core.Libtorrent.LibtorrentDownloadImpl import LibtorrentDownloadImp
 from Tribler.Core.TorrentDef import TorrentDef
 from Tribler.Core.Utilities.configparser import CallbackConfigParser
 from Tribler.Core.Utilities.torrent_utils import get_info_from_handle
-from Tribler.Core.simpledefs import DLSTATUS_DOWNLOADING, DLMODE_VOD
+from Tribler.Core.simpledefs import DLSTATUS_DOWNLOADING, DLMODE_VOD, UPLOAD
 from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
 from Tribler.Test.common import TESTS_DATA_DIR
 from Tribler.Test.test_as_server import TestAsServer
@@ -358,6 +358,48 @@ class TestLibtorrentDownloadImplNoSession(TriblerCoreTest):
         self.libtorrent_download_impl.process_alert(mock_alert, 'tracker_warning_alert')
         self.assertEqual(self.libtorrent_download_impl.tracker_status[url][1], 'Warning: test')
 
+    def test_process_unknown_alert(self):
+        """
+        Testing whether an alert without a handler does not query the status of the torrent
+        """
+        self.libtorrent_download_impl.handle.status = lambda: self.fail("status() should not be called")
+        mock_alert = MockObject()
+        mock_alert.category = lambda: lt.alert.category_t.stats_notification
+        self.libtorrent_download_impl.process_alert(mock_alert, 'stats_alert')
+
+    def test_on_state_update(self):
+        """
+        Testing whether a pushed torrent status is used without querying the handle again
+        """
+        status = MockObject()
+        status.paused = False
+        status.state = 3
+        status.progress = 0.5
+        status.error = None
+        status.total_wanted = 1000
+        status.download_payload_rate = 10
+        status.upload_payload_rate = 20
+        status.all_time_upload = 30
+        status.all_time_download = 40
+        status.finished_time = 0
+        status.num_complete = 5
+        status.num_incomplete = 6
+        status.num_peers = 3
+        status.num_seeds = 1
+        status.pieces = [True, False]
+
+        self.libtorrent_download_impl.dlconfig = DownloadStartupConfig().dlconfig.copy()
+        self.libtorrent_download_impl.handle.status = lambda: self.fail("status() should not be called")
+        self.libtorrent_download_impl.on_state_update(status)
+
+        self.assertEqual(self.libtorrent_download_impl.get_status(), DLSTATUS_DOWNLOADING)
+        self.assertEqual(self.libtorrent_download_impl.get_progress(), 0.5)
+        self.assertEqual(self.libtorrent_download_impl.get_current_speed(UPLOAD), 20.0)
+
+        stats = self.libtorrent_download_impl.network_create_statistics_reponse()
+        self.assertEqual(stats.numPeers, 2)
+        self.assertEqual(stats.have, [True, False])
+
     @deferred(timeout=10)
     def test_on_metadata_received_alert(self):
         """
@@ -212,3 +212,23 @@ class TestLibtorrentMgr(AbstractServer):
         mock_lt_session.set_proxy = on_proxy_set
         self.ltmgr.metadata_tmpdir = tempfile.mkdtemp(suffix=u'tribler_metainfo_tmpdir')
         self.ltmgr.set_proxy_settings(mock_lt_session, 0, ('a', "1234"), ('abc', 'def'))
+
+    def test_process_state_update_alert(self):
+        """
+        Test whether the statuses in a state update alert are passed to the right downloads
+        """
+        updated = []
+        mock_download = MockObject()
+        mock_download.on_state_update = updated.append
+        self.ltmgr.torrents['a' * 20] = (mock_download, None)
+
+        known_status = MockObject()
+        known_status.info_hash = 'a' * 20
+        unknown_status = MockObject()
+        unknown_status.info_hash = 'b' * 20
+
+        mock_alert = type('state_update_alert', (MockObject,), {})()
+        mock_alert.status = [known_status, unknown_status]
+        self.ltmgr.metadata_tmpdir = tempfile.mkdtemp(suffix=u'tribler_metainfo_tmpdir')
+        self.ltmgr.process_alert(mock_alert)
+        self.assertEqual(updated, [known_status])
@@ -0,0 +1,61 @@
+from Tribler.Core.Libtorrent.PieceMap import PieceMap
+from Tribler.Test.Core.base_test import TriblerCoreTest
+
+
+class TestPieceMap(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        TriblerCoreTest.setUp(self, annotate=annotate)
+        self.piece_map = PieceMap([True, False, True, True, False, True, True, True, True, False])
+
+    def test_counts(self):
+        """
+        Testing whether pieces are counted and found correctly
+        """
+        self.assertEqual(len(self.piece_map), 10)
+        self.assertTrue(self.piece_map.has(0))
+        self.assertFalse(self.piece_map.has(1))
+        self.assertFalse(self.piece_map.has(10))
+        self.assertFalse(self.piece_map.has(-1))
+        self.assertEqual(self.piece_map.num_have(), 7)
+        self.assertEqual(self.piece_map.num_have(2, 6), 3)
+        self.assertEqual(self.piece_map.first_missing(2), 4)
+        self.assertEqual(self.piece_map.first_missing(5, 9), -1)
+
+    def test_truthy_pieces(self):
+        """
+        Testing whether a bitfield with other truthy values than True is converted correctly
+        """
+        self.assertEqual(PieceMap([16, 0, 300]).num_have(), 2)
+
+    def test_merge_ranges(self):
+        """
+        Testing whether overlapping and empty piece ranges are merged
+        """
+        self.assertEqual(PieceMap.merge_ranges([(5, 8), (0, 2), (1, 3), (7, 9), (4, 4)]), [[0, 3], [5, 9]])
+
+    def test_range_progress(self):
+        """
+        Testing whether the progress over piece ranges is calculated correctly
+        """
+        self.assertEqual(self.piece_map.get_range_progress([]), 1.0)
+        self.assertEqual(self.piece_map.get_range_progress([(0, 4), (2, 4)]), 0.75)
+        self.assertEqual(self.piece_map.get_range_progress([(0, 4)], consecutive=True), 0.25)
+        self.assertEqual(self.piece_map.get_range_progress([(5, 9), (2, 4)], consecutive=True), 1.0)
+        self.assertEqual(self.piece_map.get_range_progress([(8, 12)], consecutive=True), 0.25)
+
+    def test_piece_progress(self):
+        """
+        Testing whether the progress over a list of pieces is calculated correctly
+        """
+        self.assertEqual(self.piece_map.get_piece_progress([]), 1.0)
+        self.assertEqual(self.piece_map.get_piece_progress([3, 1, 0, 20]), 0.5)
+        self.assertEqual(self.piece_map.get_piece_progress([3, 1, 0, 20], consecutive=True), 0.25)
+
+    def test_to_base64(self):
+        """
+        Testing whether the map is packed into the right bitfield
+        """
+        self.assertEqual(PieceMap().to_base64(), '')
+        self.assertEqual(self.piece_map.to_bytes(), '\xb7\x80')
+        self.assertEqual(PieceMap([True] * 8 + [False] * 7 + [True]).to_base64(), '/wE=')
@@ -0,0 +1,66 @@
+import os
+
+from Tribler.Core.Libtorrent.ResumeStateStore import ResumeStateStore
+from Tribler.Core.Utilities.configparser import CallbackConfigParser
+from Tribler.Test.Core.base_test import TriblerCoreTest
+
+
+class TestResumeStateStore(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        TriblerCoreTest.setUp(self, annotate=annotate)
+        self.store = ResumeStateStore(os.path.join(self.session_base_dir, 'dlresume'))
+
+    def tearDown(self, annotate=True):
+        self.store.close()
+        TriblerCoreTest.tearDown(self, annotate=annotate)
+
+    def create_pstate(self):
+        pstate = CallbackConfigParser()
+        pstate.add_section('state')
+        pstate.set('state', 'metainfo', {'infohash': 'a' * 20, 'name': u'test\u2603'})
+        pstate.set('state', 'engineresumedata', {'info-hash': 'a' * 20})
+        return pstate
+
+    def test_put_get(self):
+        """
+        Testing whether a stored pstate is returned unchanged
+        """
+        self.assertIsNone(self.store.get('a' * 20))
+
+        self.store.put('a' * 20, self.create_pstate())
+        pstate = self.store.get('a' * 20)
+        self.assertEqual(pstate.get('state', 'metainfo'), {'infohash': 'a' * 20, 'name': u'test\u2603'})
+        self.assertEqual(pstate.get('state', 'engineresumedata'), {'info-hash': 'a' * 20})
+
+    def test_infohashes(self):
+        """
+        Testing whether every download is listed once
+        """
+        self.store.put('a' * 20, self.create_pstate())
+        self.store.put('b' * 20, self.create_pstate())
+        self.store.put('b' * 20, self.create_pstate())
+        self.assertEqual(sorted(self.store.get_infohashes()), ['a' * 20, 'b' * 20])
+        self.assertEqual(len(self.store), 2)
+
+    def test_remove(self):
+        """
+        Testing whether a removed pstate is gone
+        """
+        self.store.put('a' * 20, self.create_pstate())
+        self.store.remove('a' * 20)
+        self.store.remove('b' * 20)
+        self.assertNotIn('a' * 20, self.store)
+        self.assertIsNone(self.store.get('a' * 20))
+
+    def test_put_cached(self):
+        """
+        Testing whether a stored pstate is cached until the store is flushed
+        """
+        self.store.put('a' * 20, self.create_pstate())
+        self.assertIn('a' * 20, self.store._store._pending_torrents)
+        self.assertIsNotNone(ResumeStateStore.parse(self.store.get_data('a' * 20)))
+
+        self.store.flush()
+        self.assertFalse(self.store._store._pending_torrents)
+        self.assertIsNotNone(ResumeStateStore.parse(self.store.get_data('a' * 20)))
@@ -4,8 +4,10 @@ from binascii import hexlify
 from urllib import pathname2url
 
 from Tribler.Core.DownloadConfig import DownloadStartupConfig
+from Tribler.Core.Modules.restapi.downloads_endpoint import DownloadSnapshots
 from Tribler.Core.Utilities.network_utils import get_random_port
 from Tribler.Test.Core.Modules.RestApi.base_api_test import AbstractApiTest
+from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
 from Tribler.Test.common import UBUNTU_1504_INFOHASH, TESTS_DATA_DIR
 from Tribler.Test.twisted_thread import deferred
 
@@ -41,6 +43,56 @@ class TestDownloadsEndpoint(AbstractApiTest):
         self.should_check_equality = False
         return self.do_request('downloads?get_peers=1&get_pieces=1', expected_code=200).addCallback(verify_download)
 
+    @deferred(timeout=20)
+    def test_get_downloads_fields(self):
+        """
+        Testing whether the API only returns the requested fields of the downloads
+        """
+        def verify_download(downloads):
+            downloads_json = json.loads(downloads)
+            self.assertEqual(len(downloads_json['downloads']), 1)
+            self.assertEqual(set(downloads_json['downloads'][0].keys()), {"infohash", "name", "progress"})
+
+        video_tdef, _ = self.create_local_torrent(os.path.join(TESTS_DATA_DIR, 'video.avi'))
+        self.session.start_download_from_tdef(video_tdef, DownloadStartupConfig())
+
+        self.should_check_equality = False
+        return self.do_request('downloads?fields=name,progress', expected_code=200).addCallback(verify_download)
+
+    @deferred(timeout=20)
+    def test_get_downloads_paging(self):
+        """
+        Testing whether the API returns the requested page of downloads
+        """
+        def verify_download(downloads):
+            downloads_json = json.loads(downloads)
+            self.assertEqual(len(downloads_json['downloads']), 1)
+
+        video_tdef, _ = self.create_local_torrent(os.path.join(TESTS_DATA_DIR, 'video.avi'))
+        self.session.start_download_from_tdef(video_tdef, DownloadStartupConfig())
+        self.session.start_download_from_uri("file:" + pathname2url(
+            os.path.join(TESTS_DATA_DIR, "bak_single.torrent")))
+
+        self.should_check_equality = False
+        return self.do_request('downloads?offset=1&limit=5', expected_code=200).addCallback(verify_download)
+
+    @deferred(timeout=10)
+    def test_get_downloads_bad_paging(self):
+        """
+        Testing whether the API returns an error when invalid paging parameters are passed
+        """
+        self.should_check_equality = False
+        return self.do_request('downloads?limit=0', expected_code=400)\
+            .addCallback(lambda _: self.do_request('downloads?since=abc', expected_code=400))
+
+    @deferred(timeout=10)
+    def test_get_downloads_since(self):
+        """
+        Testing whether the API returns the current version when asking for the downloads that changed
+        """
+        return self.do_request('downloads?since=0', expected_code=200,
+                               expected_json={"downloads": [], "version": 0, "removed": []})
+
     @deferred(timeout=10)
     def test_start_download_no_uri(self):
         """
@@ -312,6 +364,57 @@ class TestDownloadsEndpoint(AbstractApiTest):
                                expected_code=200, request_type='GET').addCallback(verify_exported_data)
 
 
+class TestDownloadSnapshots(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        super(TestDownloadSnapshots, self).setUp(annotate=annotate)
+        self.snapshots = DownloadSnapshots(None, interval=0)
+        self.snapshots.create_download_json = lambda download: {"infohash": download.infohash.encode('hex'),
+                                                                "progress": download.progress}
+
+    @staticmethod
+    def create_download(infohash):
+        download = MockObject()
+        download.infohash = infohash
+        download.progress = 0.0
+        download.get_def = lambda: download
+        download.get_infohash = lambda: download.infohash
+        return download
+
+    def test_versions(self):
+        """
+        Test whether a download only gets a new version when its snapshot changes
+        """
+        download1, download2 = self.create_download("a" * 20), self.create_download("b" * 20)
+        snapshots = self.snapshots.get_snapshots([download1, download2])
+        self.assertEqual([version for version, _, _ in snapshots], [1, 2])
+
+        download2.progress = 0.5
+        snapshots = self.snapshots.get_snapshots([download1, download2])
+        self.assertEqual([version for version, _, _ in snapshots], [1, 3])
+        self.assertEqual(snapshots[1][2]["progress"], 0.5)
+
+    def test_shared_snapshot(self):
+        """
+        Test whether snapshots are reused until they are outdated
+        """
+        self.snapshots.interval = 1000
+        download = self.create_download("a" * 20)
+        self.snapshots.get_snapshots([download])
+        download.progress = 0.5
+        self.assertEqual(self.snapshots.get_snapshots([download])[0][2]["progress"], 0.0)
+
+    def test_removed(self):
+        """
+        Test whether removed downloads are reported
+        """
+        download1, download2 = self.create_download("a" * 20), self.create_download("b" * 20)
+        self.snapshots.get_snapshots([download1, download2])
+        self.snapshots.get_snapshots([download1])
+        self.assertEqual(self.snapshots.get_removed_since(2), [("b" * 20).encode("hex")])
+        self.assertEqual(self.snapshots.get_removed_since(3), [])
+
+
 class TestDownloadsDispersyEndpoint(AbstractApiTest):
 
     def setUpPreSession(self):
@@ -94,3 +94,23 @@ class TestTrackerManager(TriblerCoreTest):
         self.tracker_manager._tracker_dict["http://test1.com/announce"]['last_check'] = 0
         self.tracker_manager._tracker_dict["DHT"]['last_check'] = 1000
         self.assertEqual('http://test1.com/announce', self.tracker_manager.get_next_tracker_for_auto_check()[0])
+
+    @blocking_call_on_reactor_thread
+    def test_get_trackers_for_check(self):
+        """
+        Test whether the trackers that are due for a check are returned, the longest unchecked first
+        """
+        self.tracker_manager.initialize()
+        self.assertEqual(self.tracker_manager.get_next_trackers_for_auto_check(10), [])
+
+        self.tracker_manager.add_tracker("http://test1.com:80/announce")
+        self.tracker_manager.add_tracker("http://test2.com:80/announce")
+        self.tracker_manager.add_tracker("http://test3.com:80/announce")
+        self.tracker_manager._tracker_dict["http://test1.com/announce"]['last_check'] = 10
+        self.tracker_manager.update_tracker_info("http://test3.com/announce", False)
+
+        self.assertEqual(self.tracker_manager.get_next_trackers_for_auto_check(10),
+                         ["http://test2.com/announce", "http://test1.com/announce"])
+        self.assertEqual(self.tracker_manager.get_next_trackers_for_auto_check(1), ["http://test2.com/announce"])
+        self.assertEqual(self.tracker_manager.get_next_trackers_for_auto_check(
+            10, exclude=["http://test2.com/announce"]), ["http://test1.com/announce"])
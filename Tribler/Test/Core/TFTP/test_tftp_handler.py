@@ -1,9 +1,13 @@
+from base64 import b64encode
+from hashlib import sha1
+
 from nose.tools import raises
 from twisted.internet.defer import inlineCallbacks
 
 from Tribler.Core.TFTP.exception import FileNotFound
 from Tribler.Core.TFTP.handler import TftpHandler, METADATA_PREFIX
-from Tribler.Core.TFTP.packet import OPCODE_OACK, OPCODE_ERROR, OPCODE_RRQ
+from Tribler.Core.TFTP.packet import OPCODE_OACK, OPCODE_ERROR, OPCODE_RRQ, OPCODE_ACK, OPCODE_DATA
+from Tribler.Core.TFTP.session import Session
 from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
 from Tribler.dispersy.util import blocking_call_on_reactor_thread
 
@@ -221,3 +225,210 @@ class TestTFTPHandler(TriblerCoreTest):
         mock_session = MockObject()
         mock_session.session_id = 42
         self.handler._send_error_packet(mock_session, 43, "test")
+
+    def _create_transfer(self, file_data, window_size):
+        """
+        Creates a sender and a receiver session for file_data that negotiated the given window size.
+        """
+        sender = Session(False, 1, ("127.0.0.1", 1234), OPCODE_RRQ, u"test", file_data, len(file_data), "abc",
+                         block_size=4, window_size=window_size)
+        receiver = Session(True, 1, ("127.0.0.1", 1235), OPCODE_RRQ, u"test", None, None, None,
+                           block_size=4, window_size=window_size)
+        receiver.last_received_packet = True
+        receiver.block_number = 1
+        receiver.last_acked_block_number = 0
+        receiver.file_data = ""
+        receiver.file_size = len(file_data)
+        return sender, receiver
+
+    def test_send_window(self):
+        """
+        Testing whether a sender sends a whole window of blocks after an ACK, and goes back to the first
+        block that has not been acknowledged
+        """
+        sent = []
+        self.handler._send_packet = lambda _, packet: sent.append(packet)
+        sender, _ = self._create_transfer("a" * 4 * 5, 3)
+
+        self.handler._handle_packet_as_sender(sender, {'opcode': OPCODE_ACK, 'block_number': 0})
+        self.assertEqual([packet['block_number'] for packet in sent], [1, 2, 3])
+        self.assertEqual(sent[1]['data'], "aaaa")
+
+        # the receiver lost block 2
+        sent[:] = []
+        self.handler._handle_packet_as_sender(sender, {'opcode': OPCODE_ACK, 'block_number': 1})
+        self.assertEqual([packet['block_number'] for packet in sent], [2, 3, 4])
+
+        # old ACKs are ignored
+        sent[:] = []
+        self.handler._handle_packet_as_sender(sender, {'opcode': OPCODE_ACK, 'block_number': 0})
+        self.assertFalse(sent)
+
+        # the receiver lost block 2 again, and acknowledges block 1 again
+        self.handler._handle_packet_as_sender(sender, {'opcode': OPCODE_ACK, 'block_number': 1})
+        self.assertEqual([packet['block_number'] for packet in sent], [2, 3, 4])
+
+        sent[:] = []
+        self.handler._handle_packet_as_sender(sender, {'opcode': OPCODE_ACK, 'block_number': 4})
+        self.assertEqual([packet['block_number'] for packet in sent], [5, 6])
+        self.assertEqual(sent[-1]['data'], "")
+        self.assertTrue(sender.is_waiting_for_last_ack)
+
+        self.handler._handle_packet_as_sender(sender, {'opcode': OPCODE_ACK, 'block_number': 6})
+        self.assertTrue(sender.is_done)
+
+    def test_receive_window(self):
+        """
+        Testing whether a receiver only acknowledges the end of a window, and the last block before a gap
+        """
+        sent = []
+        self.handler._send_packet = lambda _, packet: sent.append(packet)
+        _, receiver = self._create_transfer("a" * 4 * 5, 3)
+
+        for block_number in (1, 2, 3):
+            self.handler._handle_packet_as_receiver(receiver, {'opcode': OPCODE_DATA, 'block_number': block_number,
+                                                               'data': "aaaa"})
+        self.assertEqual([packet['block_number'] for packet in sent], [3])
+
+        # block 5 got lost, we acknowledge block 4 once
+        for block_number in (4, 6, 7):
+            self.handler._handle_packet_as_receiver(receiver, {'opcode': OPCODE_DATA, 'block_number': block_number,
+                                                               'data': "aaaa"})
+        self.assertEqual([packet['block_number'] for packet in sent], [3, 4])
+        self.assertFalse(receiver.is_failed)
+        self.assertEqual(receiver.block_number, 5)
+
+    def test_receive_window_first_block_lost(self):
+        """
+        Testing whether a receiver acknowledges the previous window again when the first block of a window got lost,
+        so the sender sends the window again
+        """
+        sent = []
+        self.handler._send_packet = lambda _, packet: sent.append(packet)
+        sender, receiver = self._create_transfer("a" * 4 * 7, 3)
+
+        self.handler._handle_packet_as_sender(sender, {'opcode': OPCODE_ACK, 'block_number': 0})
+        for packet in sent[:]:
+            self.handler._handle_packet_as_receiver(receiver, packet)
+        self.assertEqual([packet['block_number'] for packet in sent[3:]], [3])
+        self.handler._handle_packet_as_sender(sender, sent[3])
+
+        # block 4 got lost, we acknowledge block 3 once
+        window = sent[4:]
+        self.assertEqual([packet['block_number'] for packet in window], [4, 5, 6])
+        del sent[:]
+        for packet in window[1:]:
+            self.handler._handle_packet_as_receiver(receiver, packet)
+        self.assertEqual([packet['block_number'] for packet in sent], [3])
+
+        # the sender sends the window again
+        self.handler._handle_packet_as_sender(sender, sent[0])
+        self.assertEqual([packet['block_number'] for packet in sent[1:]], [4, 5, 6])
+        for packet in sent[1:]:
+            self.handler._handle_packet_as_receiver(receiver, packet)
+        self.assertEqual(receiver.block_number, 7)
+        self.assertEqual(receiver.file_data, "a" * 4 * 6)
+
+    def test_receive_window_retransmission(self):
+        """
+        Testing whether a receiver acknowledges a retransmitted window again, in case its ACK got lost
+        """
+        sent = []
+        self.handler._send_packet = lambda _, packet: sent.append(packet)
+        _, receiver = self._create_transfer("a" * 4 * 5, 3)
+
+        for block_number in (1, 2, 3, 1):
+            self.handler._handle_packet_as_receiver(receiver, {'opcode': OPCODE_DATA, 'block_number': block_number,
+                                                               'data': "aaaa"})
+        self.assertEqual([packet['block_number'] for packet in sent], [3, 3])
+        self.assertEqual(receiver.block_number, 4)
+        self.assertEqual(receiver.file_data, "a" * 4 * 3)
+
+    def test_windowed_transfer_with_loss(self):
+        """
+        Testing whether a windowed transfer completes when the link drops some of the packets
+        """
+        file_data = "".join(chr(index % 256) for index in xrange(4 * 20 + 2))
+        sender, receiver = self._create_transfer(file_data, 4)
+        receiver.checksum = b64encode(sha1(file_data).digest())
+
+        to_receiver = []
+        to_sender = []
+        self.handler._send_packet = lambda session, packet: \
+            (to_receiver if session is sender else to_sender).append(packet)
+
+        sent_count = [0]
+
+        def deliver(packets, session, handle):
+            while packets:
+                packet = packets.pop(0)
+                sent_count[0] += 1
+                # drop every 7th packet
+                if sent_count[0] % 7:
+                    handle(session, packet)
+
+        self.handler._handle_packet_as_sender(sender, {'opcode': OPCODE_ACK, 'block_number': 0})
+        for _ in xrange(100):
+            if receiver.is_done:
+                break
+            deliver(to_receiver, receiver, self.handler._handle_packet_as_receiver)
+            deliver(to_sender, sender, self.handler._handle_packet_as_sender)
+            if not to_receiver and not to_sender:
+                # nothing in flight, both sides time out and retransmit
+                self.handler._send_window(sender)
+                if receiver.last_sent_packet:
+                    self.handler._send_packet(receiver, receiver.last_sent_packet)
+
+        self.assertTrue(receiver.is_done)
+        self.assertFalse(receiver.is_failed)
+        self.assertEqual(receiver.file_data, file_data)
+
+    def test_window_size_negotiation(self):
+        """
+        Testing whether a client accepts a smaller window from the OACK, and falls back to lock-step
+        transfers if the peer does not know the windowsize option
+        """
+        self.handler._send_packet = lambda _dummy1, _dummy2: None
+        session = Session(True, 1, ("127.0.0.1", 1234), OPCODE_RRQ, u"test", None, None, None,
+                          block_size=42, timeout=44, window_size=16)
+        packet = {'opcode': OPCODE_OACK, 'options': {'blksize': 42, 'timeout': 44, 'tsize': 10, 'checksum': "abc",
+                                                     'windowsize': 8}}
+        self.handler._handle_packet_as_receiver(session, packet)
+        self.assertEqual(session.window_size, 8)
+
+        session = Session(True, 1, ("127.0.0.1", 1234), OPCODE_RRQ, u"test", None, None, None,
+                          block_size=42, timeout=44, window_size=16)
+        del packet['options']['windowsize']
+        self.handler._handle_packet_as_receiver(session, packet)
+        self.assertEqual(session.window_size, 1)
+        self.assertFalse(session.is_failed)
+
+    def test_window_size_larger_than_requested(self):
+        """
+        Testing whether a client fails the session if the OACK contains a larger window than requested
+        """
+        self.handler._send_error_packet = lambda _dummy1, _dummy2, _dummy3: None
+        session = Session(True, 1, ("127.0.0.1", 1234), OPCODE_RRQ, u"test", None, None, None,
+                          block_size=42, timeout=44, window_size=4)
+        packet = {'opcode': OPCODE_OACK, 'options': {'blksize': 42, 'timeout': 44, 'tsize': 10, 'checksum': "abc",
+                                                     'windowsize': 8}}
+        self.handler._handle_packet_as_receiver(session, packet)
+        self.assertTrue(session.is_failed)
+
+    def test_request_timeout_falls_back_to_lock_step(self):
+        """
+        Testing whether a windowed request that is not answered is sent again without the windowsize option
+        """
+        sent = []
+        self.handler._send_packet = lambda _, packet: sent.append(packet)
+        self.handler._max_retries = 3
+        session = Session(True, 1, ("127.0.0.1", 1234), OPCODE_RRQ, u"test", None, None, None, window_size=16)
+
+        self.handler._send_request_packet(session)
+        self.assertEqual(sent[-1]['options']['windowsize'], 16)
+
+        session.last_sent_packet = sent[-1]
+        session.last_contact_time = 0
+        self.assertFalse(self.handler._check_session_timeout(session))
+        self.assertEqual(session.window_size, 1)
+        self.assertNotIn('windowsize', sent[-1]['options'])
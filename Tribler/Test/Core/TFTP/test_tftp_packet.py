@@ -102,3 +102,11 @@ class TestTFTPPacket(TriblerCoreTest):
         encoded = encode_packet({'opcode': OPCODE_ERROR, 'session_id': 123, 'error_code': 1, 'error_msg': 'hi'})
         self.assertEqual(encoded[-3], 'h')
         self.assertEqual(encoded[-2], 'i')
+
+    def test_decode_options_windowsize(self):
+        """
+        Testing whether the windowsize option is decoded as an integer
+        """
+        packet = {}
+        _decode_options(packet, "windowsize\x0016\x00", 0)
+        self.assertEqual(packet['options']['windowsize'], 16)
@@ -0,0 +1,76 @@
+from Tribler.Core.TorrentChecker.check_queue import TorrentCheckQueue, PRIORITY_GUI, PRIORITY_CHANNEL, \
+    PRIORITY_RANDOM
+from Tribler.Test.Core.base_test import TriblerCoreTest
+
+
+class TestTorrentCheckQueue(TriblerCoreTest):
+    """
+    This class contains tests for the queue of torrent health checks.
+    """
+
+    def setUp(self, annotate=True):
+        super(TestTorrentCheckQueue, self).setUp(annotate=annotate)
+        self.queue = TorrentCheckQueue(min_interval=5, failure_backoff=60, max_backoff=100)
+
+    def test_pop_most_urgent_tracker(self):
+        """
+        Test whether the tracker with the most urgent torrent is handed out first, with all its torrents
+        """
+        self.queue.add("tracker1", 'a' * 20, PRIORITY_RANDOM)
+        self.queue.add("tracker2", 'b' * 20, PRIORITY_CHANNEL)
+        self.queue.add("tracker1", 'c' * 20, PRIORITY_GUI)
+        self.assertEqual(len(self.queue), 3)
+
+        self.assertEqual(self.queue.pop_batch(0, 74),
+                         ("tracker1", [('c' * 20, PRIORITY_GUI), ('a' * 20, PRIORITY_RANDOM)]))
+        self.assertEqual(self.queue.pop_batch(0, 74), ("tracker2", [('b' * 20, PRIORITY_CHANNEL)]))
+        self.assertIsNone(self.queue.pop_batch(0, 74))
+        self.assertEqual(len(self.queue), 0)
+
+    def test_add_raise_priority(self):
+        """
+        Test whether queueing a torrent again only changes its priority if it becomes more urgent
+        """
+        self.assertTrue(self.queue.add("tracker1", 'a' * 20, PRIORITY_CHANNEL))
+        self.assertFalse(self.queue.add("tracker1", 'a' * 20, PRIORITY_RANDOM))
+        self.assertTrue(self.queue.add("tracker1", 'a' * 20, PRIORITY_GUI))
+        self.assertEqual(self.queue.pop_batch(0, 74), ("tracker1", [('a' * 20, PRIORITY_GUI)]))
+
+    def test_pop_batch_size(self):
+        """
+        Test whether a batch holds at most max_size torrents
+        """
+        for index in xrange(3):
+            self.queue.add("tracker1", chr(index) * 20, PRIORITY_RANDOM)
+        self.assertEqual(len(self.queue.pop_batch(0, 2)[1]), 2)
+        self.assertEqual(len(self.queue.pop_batch(0, 2)[1]), 1)
+
+    def test_rate_limit(self):
+        """
+        Test whether a tracker is not handed out while it is being checked or was checked very recently
+        """
+        self.queue.add("tracker1", 'a' * 20, PRIORITY_RANDOM)
+        self.queue.on_session_started("tracker1")
+        self.assertIsNone(self.queue.pop_batch(0, 74))
+
+        self.queue.on_session_finished("tracker1", True, 100)
+        self.assertIsNone(self.queue.pop_batch(104, 74))
+        self.assertFalse(self.queue.is_backing_off("tracker1", 104))
+        self.assertEqual(self.queue.pop_batch(105, 74)[0], "tracker1")
+
+    def test_backoff(self):
+        """
+        Test whether the back-off of a failing tracker doubles up to the maximum, and is reset by a success
+        """
+        self.queue.on_session_finished("tracker1", False, 0)
+        self.assertTrue(self.queue.is_backing_off("tracker1", 59))
+        self.assertFalse(self.queue.is_backing_off("tracker1", 60))
+
+        self.queue.on_session_finished("tracker1", False, 0)
+        self.assertTrue(self.queue.is_backing_off("tracker1", 99))
+        self.assertFalse(self.queue.is_ready("tracker1", 99))
+        self.assertTrue(self.queue.is_ready("tracker1", 100))
+
+        self.queue.on_session_finished("tracker1", True, 100)
+        self.assertFalse(self.queue.is_backing_off("tracker1", 101))
+        self.assertEqual(self.queue.get_statistics()["backing_off"], 0)
@@ -1,5 +1,5 @@
 import time
-from twisted.internet.defer import Deferred
+from twisted.internet.defer import Deferred, DeferredList
 
 from Tribler.Core.CacheDB.SqliteCacheDBHandler import TorrentDBHandler
 from Tribler.Core.Category.Category import Category
@@ -36,6 +36,11 @@ class TestTorrentChecker(TriblerCoreTest):
         self.torrent_checker._torrent_db = self.session.open_dbhandler(NTFY_TORRENTS)
         self.torrent_checker._torrent_db.category = Category()
 
+    def remove_dht_tracker(self):
+        self.torrent_checker._torrent_db._db.execute_write(
+            u"DELETE FROM TorrentTrackerMapping WHERE tracker_id IN "
+            u"(SELECT tracker_id FROM TrackerInfo WHERE tracker = 'DHT')")
+
     @blocking_call_on_reactor_thread
     def test_initialize(self):
         """
@@ -101,7 +106,7 @@ class TestTorrentChecker(TriblerCoreTest):
         self.torrent_checker._torrent_db.addExternalTorrentNoDef(
             'a' * 20, 'ubuntu.iso', [['a.test', 1234]], ['http://google.com/announce'], 5)
 
-        controlled_session = HttpTrackerSession(None, None, None, None)
+        controlled_session = HttpTrackerSession(u'http://google.com/announce', ('google.com', 80), '/announce', 5)
         controlled_session.connect_to_tracker = lambda: Deferred()
 
         self.torrent_checker._create_session_for_request = lambda *args, **kwargs: controlled_session
@@ -109,6 +114,101 @@ class TestTorrentChecker(TriblerCoreTest):
 
         self.assertEqual(len(controlled_session.infohash_list), 1)
 
+    @deferred(timeout=10)
+    def test_add_gui_request_batched(self):
+        """
+        Test whether GUI requests for torrents on the same tracker are sent in a single scrape
+        """
+        for infohash in ('a' * 20, 'b' * 20):
+            self.torrent_checker._torrent_db.addExternalTorrentNoDef(
+                infohash, 'ubuntu.iso', [['a.test', 1234]], ['http://google.com/announce'], 5)
+        self.remove_dht_tracker()
+
+        connect_deferred = Deferred()
+        controlled_session = HttpTrackerSession(u'http://google.com/announce', ('google.com', 80), '/announce', 5)
+        controlled_session.connect_to_tracker = lambda: connect_deferred
+        self.torrent_checker._create_session_for_request = lambda *args, **kwargs: controlled_session
+        self.torrent_checker._on_result_from_session = lambda _, result: result
+
+        request_a = self.torrent_checker.add_gui_request('a' * 20)
+        request_b = self.torrent_checker.add_gui_request('b' * 20)
+        self.torrent_checker.cancel_pending_task(u"torrent_checker_gui_requests")
+        self.torrent_checker._schedule_checks()
+        self.assertEqual(controlled_session.infohash_list, ['a' * 20, 'b' * 20])
+
+        connect_deferred.callback({controlled_session.tracker_url: [
+            {'infohash': ('a' * 20).encode('hex'), 'seeders': 1, 'leechers': 2},
+            {'infohash': ('b' * 20).encode('hex'), 'seeders': 3, 'leechers': 4}]})
+
+        def verify_results(results):
+            self.assertEqual(results[0][1].values()[0]['seeders'], 1)
+            self.assertEqual(results[1][1].values()[0]['seeders'], 3)
+
+        return DeferredList([request_a, request_b]).addCallback(verify_results)
+
+    @blocking_call_on_reactor_thread
+    def test_gui_request_tracker_backing_off(self):
+        """
+        Test whether a GUI request fails right away for a tracker that failed recently
+        """
+        self.torrent_checker._torrent_db.addExternalTorrentNoDef(
+            'a' * 20, 'ubuntu.iso', [['a.test', 1234]], ['http://google.com/announce'], 5)
+        self.remove_dht_tracker()
+        tracker_url = self.torrent_checker._torrent_db.getTrackerListByInfohash('a' * 20)[0]
+        self.torrent_checker._check_queue.on_session_finished(tracker_url, False, time.time())
+
+        result = self.torrent_checker.add_gui_request('a' * 20)
+        self.assertIn('error', result.result[tracker_url])
+
+    @blocking_call_on_reactor_thread
+    def test_flush_torrent_results(self):
+        """
+        Test whether the results of checks are written to the database in a batch
+        """
+        for infohash in ('a' * 20, 'b' * 20):
+            self.torrent_checker._torrent_db.addExternalTorrentNoDef(
+                infohash, 'ubuntu.iso', [['a.test', 1234]], [], 5)
+            self.torrent_checker._update_torrent_result({'infohash': infohash, 'seeders': 5, 'leechers': 3,
+                                                         'last_check': time.time()})
+        self.assertEqual(len(self.torrent_checker._pending_results), 2)
+
+        self.torrent_checker._flush_torrent_results()
+        self.assertFalse(self.torrent_checker._pending_results)
+        self.torrent_checker._torrent_db._db.commit_now()
+        torrent = self.torrent_checker._torrent_db.getTorrent('b' * 20, (u'num_seeders', u'status'), False)
+        self.assertEqual(torrent[u'num_seeders'], 5)
+        self.assertEqual(torrent[u'status'], u'good')
+
+    @blocking_call_on_reactor_thread
+    def test_flush_torrent_results_combined(self):
+        """
+        Test whether the results of several trackers for a torrent are combined before they are written
+        """
+        self.torrent_checker._torrent_db.addExternalTorrentNoDef('a' * 20, 'ubuntu.iso', [['a.test', 1234]], [], 5)
+        for seeders, leechers in ((5, 1), (0, 3), (0, 0)):
+            self.torrent_checker._update_torrent_result({'infohash': 'a' * 20, 'seeders': seeders,
+                                                         'leechers': leechers, 'last_check': time.time()})
+        self.assertEqual(len(self.torrent_checker._pending_results), 1)
+
+        self.torrent_checker._flush_torrent_results()
+        self.torrent_checker._torrent_db._db.commit_now()
+        torrent = self.torrent_checker._torrent_db.getTorrent('a' * 20, (u'num_seeders', u'num_leechers', u'status'),
+                                                              False)
+        self.assertEqual((torrent[u'num_seeders'], torrent[u'num_leechers']), (5, 3))
+        self.assertEqual(torrent[u'status'], u'good')
+
+    @blocking_call_on_reactor_thread
+    def test_checks_completed_missing_infohash(self):
+        """
+        Test whether a torrent that is missing from the reply of a tracker is not recorded as dead
+        """
+        controlled_session = HttpTrackerSession(u'http://google.com/announce', ('google.com', 80), '/announce', 5)
+        self.torrent_checker._check_queue.on_session_started(controlled_session.tracker_url)
+        self.torrent_checker._on_checks_completed({controlled_session.tracker_url: [
+            {'infohash': ('a' * 20).encode('hex'), 'seeders': 1, 'leechers': 2}]},
+            controlled_session.tracker_url, controlled_session, ['a' * 20, 'b' * 20])
+        self.assertEqual(self.torrent_checker._pending_results.keys(), ['a' * 20])
+
     @deferred(timeout=30)
     def test_tracker_test_error_resolve(self):
         """
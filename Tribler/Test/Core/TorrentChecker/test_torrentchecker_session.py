@@ -1,4 +1,5 @@
 import struct
+import time
 from libtorrent import bencode
 from twisted.internet.defer import Deferred, DeferredList
 from twisted.internet.task import Clock
@@ -7,29 +8,30 @@ from twisted.python.failure import Failure
 from Tribler.Core.Config.tribler_config import TriblerConfig
 from Tribler.Core.Session import Session
 from Tribler.Core.TorrentChecker.session import FakeDHTSession, DHT_TRACKER_MAX_RETRIES, DHT_TRACKER_RECHECK_INTERVAL, \
-    UdpTrackerSession, UDPScraper, HttpTrackerSession
-from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
+    UdpTrackerSession, UDPScraper, HttpTrackerSession, TRACKER_ACTION_CONNECT, TRACKER_ACTION_SCRAPE, \
+    UDP_TRACKER_CONNECTION_ID_TTL
+from Tribler.Test.Core.base_test import TriblerCoreTest
 from Tribler.Test.twisted_thread import deferred
 
 
-class ClockedUDPCrawler(UDPScraper):
+class ClockedUdpTrackerSession(UdpTrackerSession):
     _reactor = Clock()
 
 
-class FakeScraper(object):
-    def write_data(self, _):
-        pass
+class FakeScraper(UDPScraper):
+    """
+    A UDP scraper that keeps the packets it should send, instead of opening a socket.
+    """
 
-    def stop(self):
-        pass
+    def __init__(self):
+        super(FakeScraper, self).__init__()
+        self.sent = []
 
+    def write_data(self, data, address):
+        self.sent.append((data, address))
 
-class TestTorrentCheckerSession(TriblerCoreTest):
 
-    def setUp(self, annotate=True):
-        super(TestTorrentCheckerSession, self).setUp(annotate=annotate)
-        self.mock_transport = MockObject()
-        self.mock_transport.write = lambda *_: None
+class TestTorrentCheckerSession(TriblerCoreTest):
 
     def test_httpsession_scrape_no_body(self):
         session = HttpTrackerSession("localhost", ("localhost", 8475), "/announce", 5)
@@ -100,37 +102,86 @@ class TestTorrentCheckerSession(TriblerCoreTest):
         return session.cleanup()
 
     def test_udpsession_udp_tracker_timeout(self):
-        session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 5)
-        session.scraper = ClockedUDPCrawler(session, "127.0.0.1", 4782, 5)
-        # Advance 16 seconds so the timeout triggered
-        session.scraper._reactor.advance(session.scraper.timeout + 1)
-        self.assertIsNone(session.scraper)
+        session = ClockedUdpTrackerSession("127.0.0.1", ("127.0.0.1", 4782), "/announce", 5, scraper=FakeScraper())
+        session.connect_to_tracker().addErrback(lambda _: None)
+        self.assertEqual(len(session.scraper.sent), 1)
+        # Advance 6 seconds so the timeout triggered
+        session._reactor.advance(session.timeout + 1)
+        self.assertTrue(session.is_failed)
+        self.assertTrue(session.is_timed_out)
 
     @deferred(timeout=5)
     def test_udp_scraper_stop_no_connection(self):
         session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 5)
-        scraper = UDPScraper(session, "127.0.0.1", 4782, 5)
-        # Stop it manually, so the transport becomes inactive
+        scraper = UDPScraper()
+        # Stop it before it opened its socket
         stop_deferred = scraper.stop()
 
         return DeferredList([stop_deferred, session.cleanup()])
 
-    def test_udpsession_udp_tracker_connection_refused(self):
-        session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 5)
-        session.scraper = UDPScraper(session, "127.0.0.1", 4782, 5)
-        session.scraper.connectionRefused()
-        self.assertTrue(session.is_failed, "Session did not fail while it should")
+    def test_udp_scraper_route_by_transaction(self):
+        scraper = FakeScraper()
+        session1 = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 5, scraper=scraper)
+        session2 = UdpTrackerSession("localhost", ("localhost", 4783), "/announce", 5, scraper=scraper)
+        session1.on_ip_address_resolved("127.0.0.1")
+        session2.on_ip_address_resolved("127.0.0.1")
+        self.assertNotEqual(session1._transaction_id, session2._transaction_id)
+
+        # A reply from another address than the tracker of the transaction is dropped
+        packet = struct.pack("!iiq", TRACKER_ACTION_CONNECT, session2._transaction_id, 126)
+        scraper.datagramReceived(packet, ("127.0.0.1", 4782))
+        self.assertEqual(session2._action, TRACKER_ACTION_CONNECT)
+
+        scraper.datagramReceived(packet, ("127.0.0.1", 4783))
+        self.assertEqual(session1._action, TRACKER_ACTION_CONNECT)
+        self.assertEqual(session2._action, TRACKER_ACTION_SCRAPE)
+        self.assertEqual(scraper.get_connection_id(("127.0.0.1", 4783)), 126)
+        self.assertIsNone(scraper.get_connection_id(("127.0.0.1", 4782)))
+
+    def test_udp_scraper_connection_id_expired(self):
+        scraper = FakeScraper()
+        scraper.set_connection_id(("127.0.0.1", 4782), 126)
+        self.assertEqual(scraper.get_connection_id(("127.0.0.1", 4782)), 126)
+        scraper._connection_ids[("127.0.0.1", 4782)] = (126, time.time() - UDP_TRACKER_CONNECTION_ID_TTL)
+        self.assertIsNone(scraper.get_connection_id(("127.0.0.1", 4782)))
+
+    def test_udpsession_reuse_connection_id(self):
+        scraper = FakeScraper()
+        scraper.set_connection_id(("127.0.0.1", 4782), 126)
+        session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 5, scraper=scraper)
+        session.add_infohash('a' * 20)
+        session.on_ip_address_resolved("127.0.0.1")
+
+        # The scrape request is sent right away, with the connection id we already had
+        self.assertEqual(len(scraper.sent), 1)
+        connection_id, action, _, infohash = struct.unpack('!qii20s', scraper.sent[0][0])
+        self.assertEqual((connection_id, action, infohash), (126, TRACKER_ACTION_SCRAPE, 'a' * 20))
+
+    def test_udpsession_reused_connection_id_rejected(self):
+        scraper = FakeScraper()
+        scraper.set_connection_id(("127.0.0.1", 4782), 126)
+        session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 5, scraper=scraper)
+        session.on_ip_address_resolved("127.0.0.1")
+
+        packet = struct.pack("!ii4s", 3, session._transaction_id, "test")
+        scraper.datagramReceived(packet, ("127.0.0.1", 4782))
+
+        # The tracker did not accept the connection id anymore, so we connect again
+        self.assertFalse(session.is_failed)
+        self.assertEqual(session._action, TRACKER_ACTION_CONNECT)
+        self.assertEqual(len(scraper.sent), 2)
+        self.assertIsNone(scraper.get_connection_id(("127.0.0.1", 4782)))
 
     def test_udpsession_handle_response_wrong_len(self):
         session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 5)
-        session.on_ip_address_resolved("127.0.0.1", start_scraper=False)
+        session.on_ip_address_resolved("127.0.0.1", send_request=False)
         self.assertFalse(session.is_failed)
         session.handle_connection_response("too short")
         self.assertTrue(session.is_failed)
 
     def test_udpsession_handle_connection_wrong_action_transaction(self):
         session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 5)
-        session.on_ip_address_resolved("127.0.0.1", start_scraper=None)
+        session.on_ip_address_resolved("127.0.0.1", send_request=False)
         self.assertFalse(session.is_failed)
         packet = struct.pack("!qq4s", 123, 123, "test")
         session.handle_connection_response(packet)
@@ -148,7 +199,7 @@ class TestTorrentCheckerSession(TriblerCoreTest):
 
     def test_udpsession_handle_wrong_action_transaction(self):
         session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 5)
-        session.on_ip_address_resolved("127.0.0.1", start_scraper=None)
+        session.on_ip_address_resolved("127.0.0.1", send_request=False)
         self.assertFalse(session.is_failed)
         packet = struct.pack("!qq4s", 123, 123, "test")
         session.handle_connection_response(packet)
@@ -201,7 +252,7 @@ class TestTorrentCheckerSession(TriblerCoreTest):
     @deferred(timeout=5)
     def test_udpsession_correct_handle(self):
         session = UdpTrackerSession("localhost", ("localhost", 4782), "/announce", 5)
-        session.on_ip_address_resolved("127.0.0.1", start_scraper=False)
+        session.on_ip_address_resolved("127.0.0.1", send_request=False)
         session.result_deferred = Deferred()
         self.assertFalse(session.is_failed)
         session._infohash_list = ["test"]
@@ -222,17 +273,17 @@ class TestTorrentCheckerSession(TriblerCoreTest):
 
     @deferred(timeout=5)
     def test_big_correct_run(self):
-        session = UdpTrackerSession("localhost", ("192.168.1.1", 1234), "/announce", 1)
-        session.on_ip_address_resolved("192.168.1.1", start_scraper=False)
-        session.scraper.transport = self.mock_transport
+        session = UdpTrackerSession("localhost", ("192.168.1.1", 1234), "/announce", 1, scraper=FakeScraper())
+        session.add_infohash('a' * 20)
+        session.on_ip_address_resolved("192.168.1.1")
         session.result_deferred = Deferred()
         self.assertFalse(session.is_failed)
         packet = struct.pack("!iiq", session._action, session._transaction_id, 126)
-        session.scraper.datagramReceived(packet, (None, None))
-        session._infohash_list = ["test"]
+        session.scraper.datagramReceived(packet, ("192.168.1.1", 1234))
         packet = struct.pack("!iiiii", session._action, session._transaction_id, 0, 1, 2)
-        session.scraper.datagramReceived(packet, (None, None))
+        session.scraper.datagramReceived(packet, ("192.168.1.1", 1234))
         self.assertTrue(session.is_finished)
+        self.assertEqual(len(session.scraper.sent), 2)
 
         return session.result_deferred
 
@@ -42,6 +42,9 @@ class TestDBUpgrader(AbstractUpgrader):
         self.assertTrue('txt' in results[0][2])
         self.assertTrue('txt' in results[0][2])
 
+        # Check whether the search term dictionary is built from the reindexed torrents
+        self.assertEqual(self.sqlitedb.fetchone("SELECT frequency FROM SearchTerms WHERE term = 'test'"), 1)
+
     def test_upgrade_wrong_version(self):
         self.copy_and_initialize_upgrade_database('tribler_v17.sdb')
         db_migrator = DBUpgrader(self.session, self.sqlitedb, torrent_store=MockTorrentStore())
@@ -0,0 +1,83 @@
+from twisted.internet.defer import Deferred
+from twisted.internet.error import DNSLookupError
+
+from Tribler.Core.Utilities.dns_cache import DnsCache
+from Tribler.Test.Core.base_test import TriblerCoreTest
+
+
+class TestDnsCache(TriblerCoreTest):
+
+    def setUp(self, annotate=True):
+        super(TestDnsCache, self).setUp(annotate=annotate)
+        self.lookups = []
+        self.dns_cache = DnsCache(max_size=2, resolve=self.fake_resolve)
+
+    def fake_resolve(self, hostname):
+        deferred = Deferred()
+        self.lookups.append((hostname, deferred))
+        return deferred
+
+    def get_result(self, deferred):
+        results = []
+        deferred.addBoth(results.append)
+        return results[0] if results else None
+
+    def test_ip_literal(self):
+        """
+        Test whether IP literals are returned without doing a lookup
+        """
+        self.assertEqual(self.get_result(self.dns_cache.resolve("1.2.3.4")), "1.2.3.4")
+        self.assertFalse(self.lookups)
+        self.assertEqual(self.dns_cache.literals, 1)
+
+    def test_resolve_cached(self):
+        """
+        Test whether the result of a lookup is shared by pending requests and cached for later requests
+        """
+        first = self.dns_cache.resolve("tribler.org")
+        second = self.dns_cache.resolve("tribler.org")
+        self.assertEqual(len(self.lookups), 1)
+
+        self.lookups[0][1].callback("130.161.1.1")
+        self.assertEqual(self.get_result(first), "130.161.1.1")
+        self.assertEqual(self.get_result(second), "130.161.1.1")
+
+        third = self.dns_cache.resolve("tribler.org")
+        self.assertTrue(third.called)
+        self.assertEqual(self.get_result(third), "130.161.1.1")
+        self.assertEqual(len(self.lookups), 1)
+        self.assertEqual(self.dns_cache.get_statistics()["hits"], 1)
+        self.assertEqual(self.dns_cache.get_statistics()["misses"], 2)
+
+    def test_resolve_expired(self):
+        """
+        Test whether expired entries are looked up again
+        """
+        self.dns_cache.ttl = -1
+        self.dns_cache.resolve("tribler.org")
+        self.lookups[0][1].callback("130.161.1.1")
+        self.dns_cache.resolve("tribler.org")
+        self.assertEqual(len(self.lookups), 2)
+
+    def test_resolve_negative(self):
+        """
+        Test whether failed lookups are cached
+        """
+        self.dns_cache.resolve("invalid.tribler.org").addErrback(lambda _: None)
+        self.lookups[0][1].errback(DNSLookupError("invalid.tribler.org"))
+
+        result = self.get_result(self.dns_cache.resolve("invalid.tribler.org"))
+        self.assertTrue(result.check(DNSLookupError))
+        self.assertEqual(len(self.lookups), 1)
+        self.assertEqual(self.dns_cache.negative_hits, 1)
+
+    def test_max_size(self):
+        """
+        Test whether the oldest entries are evicted when the cache is full
+        """
+        for index, hostname in enumerate(["a.org", "b.org", "c.org"]):
+            self.dns_cache.resolve(hostname)
+            self.lookups[index][1].callback("1.1.1.%d" % index)
+        self.assertEqual(len(self.dns_cache), 2)
+        self.dns_cache.resolve("a.org")
+        self.assertEqual(len(self.lookups), 4)
@@ -0,0 +1,44 @@
+from Tribler.Core.Utilities.prefix_index import PrefixIndex
+from Tribler.Test.test_as_server import BaseTestCase
+
+
+class TestPrefixIndex(BaseTestCase):
+
+    def setUp(self):
+        self.index = PrefixIndex(max_terms=20)
+
+    def test_complete(self):
+        self.index.add(u"pioneer")
+        self.index.add(u"pioneer")
+        self.index.add(u"pirate")
+        self.index.add(u"ubuntu")
+        self.assertEqual(self.index.complete(u"pi", 5), [u"pioneer", u"pirate"])
+        self.assertEqual(self.index.complete(u"pi", 1), [u"pioneer"])
+        self.assertEqual(self.index.complete(u"pio", 5), [u"pioneer"])
+        self.assertEqual(self.index.complete(u"x", 5), [])
+        self.assertEqual(self.index.get_frequency(u"pioneer"), 2)
+
+    def test_add_many(self):
+        self.index.add_many([(u"linux", 3), (u"lion", 5)])
+        self.index.add(u"linux", 3)
+        self.assertEqual(self.index.complete(u"li", 5), [u"linux", u"lion"])
+        self.assertEqual(len(self.index), 2)
+
+    def test_remove(self):
+        self.index.add(u"pioneer", 2)
+        self.index.add(u"pirate")
+        self.index.remove(u"pioneer")
+        self.index.remove(u"pirate")
+        self.index.remove(u"ubuntu")
+        self.assertEqual(self.index.get_frequency(u"pioneer"), 1)
+        self.assertNotIn(u"pirate", self.index)
+        self.assertEqual(self.index.complete(u"pi", 5), [u"pioneer"])
+        self.assertEqual(len(self.index), 1)
+
+    def test_evict(self):
+        self.index.add_many([(u"term%02d" % i, i + 1) for i in xrange(20)])
+        self.index.add(u"new")
+        self.assertEqual(len(self.index), 18)
+        self.assertNotIn(u"new", self.index)
+        self.assertNotIn(u"term00", self.index)
+        self.assertIn(u"term19", self.index)
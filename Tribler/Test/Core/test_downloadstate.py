@@ -132,3 +132,7 @@ class TestDownloadState(TriblerCoreTest):
         self.assertEqual(download_state.get_availability(), 1.0)
         download_state.stats = {'spew': [{'completed': 0.6}]}
         self.assertEqual(download_state.get_availability(), 0.0)
+        download_state.stats = {'spew': [{'completed': 0.6, 'have': [True, False, True]},
+                                         {'completed': 0.6, 'have': [True, True, False]},
+                                         {'completed': 1.0}]}
+        self.assertAlmostEqual(download_state.get_availability(), 2 + 1.0 / 3)
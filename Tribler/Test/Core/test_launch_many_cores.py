@@ -3,12 +3,13 @@ from nose.tools import raises
 from twisted.internet.defer import Deferred
 
 from Tribler.Core import NoDispersyRLock
-from Tribler.Core.APIImplementation.LaunchManyCore import TriblerLaunchMany
+from Tribler.Core.APIImplementation.LaunchManyCore import (TriblerLaunchMany, RESUME_BATCH_SIZE,
+                                                           RESUME_BATCH_INTERVAL)
 from Tribler.Core.DownloadConfig import DefaultDownloadStartupConfig
 from Tribler.Core.TorrentDef import TorrentDef
 from Tribler.Core.Utilities.configparser import CallbackConfigParser
 from Tribler.Core.exceptions import DuplicateDownloadException
-from Tribler.Core.simpledefs import DLSTATUS_STOPPED_ON_ERROR, DLSTATUS_SEEDING
+from Tribler.Core.simpledefs import DLSTATUS_STOPPED_ON_ERROR, DLSTATUS_SEEDING, DLSTATUS_STOPPED
 from Tribler.Test.Core.base_test import TriblerCoreTest, MockObject
 from Tribler.Test.common import TESTS_DATA_DIR
 from Tribler.Test.test_as_server import TestAsServer
@@ -137,25 +138,107 @@ class TestLaunchManyCore(TriblerCoreTest):
 
         return readd_deferred
 
+    @deferred(timeout=10)
     def test_load_checkpoint(self):
         """
         Test whether we are resuming downloads after loading checkpoint
         """
-        def mocked_resume_download(filename, setupDelay=3):
-            self.assertTrue(filename.endswith('abcd.state'))
-            self.assertEqual(setupDelay, 0)
-            mocked_resume_download.called = True
+        resumed = []
+
+        def mocked_resume_parsed_download(infohash, tdef, dscfg, pstate, setupDelay=0):
+            self.assertIsNone(tdef)
+            self.assertIsNone(pstate)
+            resumed.append(infohash)
 
-        mocked_resume_download.called = False
         self.lm.session.get_downloads_pstate_dir = lambda: self.session_base_dir
 
         with open(os.path.join(self.lm.session.get_downloads_pstate_dir(), 'abcd.state'), 'wb') as state_file:
             state_file.write("hi")
 
         self.lm.initComplete = True
-        self.lm.resume_download = mocked_resume_download
-        self.lm.load_checkpoint()
-        self.assertTrue(mocked_resume_download.called)
+        self.lm.resume_parsed_download = mocked_resume_parsed_download
+        return self.lm.load_checkpoint().addCallback(lambda _: self.assertEqual(resumed, ['\xab\xcd']))
+
+    @deferred(timeout=10)
+    def test_resume_downloads_batches(self):
+        """
+        Test whether all downloads are resumed in batches and the startup metrics are recorded
+        """
+        infohashes = [chr(index) * 20 for index in xrange(RESUME_BATCH_SIZE * 2 + 1)]
+        resumed = []
+
+        def mocked_resume_parsed_download(infohash, *_):
+            resumed.append(infohash)
+            self.lm.resume_pending.discard(infohash)
+
+        def on_resumed(_):
+            self.assertEqual(sorted(resumed), infohashes)
+            self.assertEqual(self.lm.startup_metrics['downloads_to_resume'], len(infohashes))
+            self.assertGreaterEqual(self.lm.startup_metrics['time_to_all_added'], RESUME_BATCH_INTERVAL)
+            self.assertIn('time_to_all_active', self.lm.startup_metrics)
+
+        self.lm.load_resume_state = lambda *_: (None, None, None)
+        self.lm.resume_parsed_download = mocked_resume_parsed_download
+        return self.lm.resume_downloads(infohashes).addCallback(on_resumed)
+
+    def test_dlstates_cb_resume_active(self):
+        """
+        Test whether the time until all resumed downloads are active is recorded
+        """
+        tdef = TorrentDef()
+        tdef.get_infohash = lambda: 'aaaa'
+        tdef.get_name_as_unicode = lambda: "test.iso"
+        download = MockObject()
+        download.get_def = lambda: tdef
+        download_state = MockObject()
+        download_state.get_status = lambda: DLSTATUS_STOPPED
+        download_state.get_download = lambda: download
+
+        self.lm.resume_started_at = 0
+        self.lm.resume_pending = {'aaaa', 'bbbb'}
+        self.lm.sesscb_states_callback([download_state])
+        self.assertNotIn('time_to_all_active', self.lm.startup_metrics)
+
+        tdef.get_infohash = lambda: 'bbbb'
+        self.lm.sesscb_states_callback([download_state])
+        self.assertIn('time_to_all_active', self.lm.startup_metrics)
+
+    @deferred(timeout=10)
+    def test_invoke_states_cb_idle_download(self):
+        """
+        Test whether the state of an idle download is not rebuilt when invoking the download states callback
+        """
+        def create_download(infohash):
+            tdef = TorrentDef()
+            tdef.get_infohash = lambda: infohash
+            download = MockObject()
+            download.get_def = lambda: tdef
+            download.set_moreinfo_stats = lambda _: None
+            download.state_key = (infohash, 0)
+            download.get_state_key = lambda: download.state_key
+            download.num_get_state = 0
+
+            def mocked_network_get_state(*_):
+                download.num_get_state += 1
+                return MockObject()
+            download.network_get_state = mocked_network_get_state
+            return download
+
+        idle_download = create_download('aaaa')
+        active_download = create_download('bbbb')
+        self.lm.downloads = {'aaaa': idle_download, 'bbbb': active_download}
+
+        def on_first_invoke(_):
+            active_download.state_key = ('bbbb', 1)
+            return self.lm._invoke_states_cb(lambda dslist: [])
+
+        def on_second_invoke(_):
+            self.assertEqual(idle_download.num_get_state, 1)
+            self.assertEqual(active_download.num_get_state, 2)
+            self.assertEqual(len(self.lm.download_states), 2)
+
+        invoke_deferred = self.lm._invoke_states_cb(lambda dslist: [])
+        return invoke_deferred.addCallback(on_first_invoke).addCallback(on_second_invoke)
 
     def test_resume_download(self):
         with open(os.path.join(TESTS_DATA_DIR, "bak_single.torrent"), mode='rb') as torrent_file:
@@ -10,7 +10,7 @@ from shutil import rmtree
 from tempfile import mkdtemp
 from twisted.internet.task import Clock
 
-from Tribler.Core.leveldbstore import LevelDbStore, WRITEBACK_PERIOD, get_write_batch_leveldb
+from Tribler.Core.leveldbstore import LevelDbStore, WRITEBACK_PERIOD, WRITEBACK_BATCH_SIZE, get_write_batch_leveldb
 from Tribler.Test.test_as_server import BaseTestCase
 
 
@@ -101,13 +101,83 @@ class AbstractTestLevelDBStore(BaseTestCase):
     def test_iter_one_element(self):
         self.store[K] = V
         iteritems = self.store.iteritems()
-        self.assertEqual(iteritems.next(), K)
+        self.assertEqual(iteritems.next(), (K, V))
 
     def test_iter(self):
         self.store[K] = V
         for key in iter(self.store):
             self.assertTrue(key)
 
+    def test_iter_no_duplicates(self):
+        self.store[K] = V
+        self.store.flush()
+        self.store[K] = V + V
+        self.store["baz"] = V
+        self.assertEqual(sorted(self.store.keys()), ["baz", K])
+        self.assertEqual(sorted(self.store.iteritems()), [("baz", V), (K, V + V)])
+
+    def test_len_is_persistent(self):
+        self.store[K] = V
+        self.store["baz"] = V
+        self.store.flush()
+        self.store[K] = V + V
+        self.assertEqual(2, len(self.store))
+        del self.store["baz"]
+        del self.store["baz"]
+        self.assertEqual(1, len(self.store))
+
+        store_dir = self.store._store_dir
+        self.store.close()
+        self.openStore(store_dir)
+        self.assertEqual(1, len(self.store))
+        self.assertEqual([K], list(self.store))
+
+    def test_delete_pending(self):
+        self.store[K] = V
+        del self.store[K]
+        self.assertEqual(0, len(self.store))
+        self.store.flush()
+        self.assertEqual(0, len(self.store))
+        self.assertFalse(K in self.store)
+
+    def test_new_keys_counted_once(self):
+        self.store[K] = V
+        self.store.flush()
+        lookups = []
+        db_contains = self.store._db_contains
+        self.store._db_contains = lambda key: lookups.append(key) or db_contains(key)
+
+        self.store[K] = V + V
+        self.store["baz"] = V
+        self.store["baz"] = V + V
+        self.assertEqual(sorted(lookups), ["baz", K])
+        self.assertEqual(2, len(self.store))
+        self.store.flush()
+        self.assertEqual(sorted(lookups), ["baz", K])
+        self.assertEqual(2, len(self.store))
+
+    def test_prefix_iteration(self):
+        self.store["metadata:a"] = V
+        self.store["metadata:b"] = V
+        self.store.flush()
+        self.store["metadata:c"] = V
+        self.store["aaa"] = V
+        self.store["zzz"] = V
+        self.assertEqual(sorted(self.store.iterkeys(prefix="metadata:")),
+                         ["metadata:a", "metadata:b", "metadata:c"])
+        self.assertEqual([key for key, _ in self.store.iteritems(prefix="z")], ["zzz"])
+        self.assertEqual(list(self.store.iterkeys(prefix="nothing")), [])
+
+    def test_flush_in_batches(self):
+        for index in xrange(WRITEBACK_BATCH_SIZE + 10):
+            self.store["key%d" % index] = V
+        # reaching the batch size writes the cache
+        self.assertEqual(10, len(self.store._pending_torrents))
+        self.assertEqual(WRITEBACK_BATCH_SIZE + 10, len(self.store))
+        self.store.flush()
+        self.assertEqual(0, len(self.store._pending_torrents))
+        self.assertEqual(WRITEBACK_BATCH_SIZE + 10, len(list(self.store.rangescan())))
+
 
 class TestLevelDBStore(AbstractTestLevelDBStore):
     __test__ = True
@@ -1,4 +1,7 @@
-from Tribler.Core.Utilities.search_utils import split_into_keywords, filter_keywords
+import struct
+
+from Tribler.Core.Utilities.search_utils import split_into_keywords, filter_keywords, bm25_relevance, get_trigrams, \
+    levenshtein
 from Tribler.Test.Core.base_test import TriblerCoreTest
 
 
@@ -17,3 +20,22 @@ class TriblerCoreTestSearchUtils(TriblerCoreTest):
         result = filter_keywords(["to", "be", "or", "not", "to", "be"])
         self.assertIsInstance(result, list)
         self.assertEqual(len(result), 4)
+
+    def test_bm25_relevance(self):
+        # One phrase, three columns and 100 rows. The phrase occurs twice in the name and in 10 rows.
+        header = [1, 3, 100] + [1] * 6
+        name_match = bm25_relevance(struct.pack('I' * 18, *(header + [2, 2, 10, 0, 0, 10, 0, 0, 10])))
+        file_match = bm25_relevance(struct.pack('I' * 18, *(header + [0, 0, 10, 2, 2, 10, 0, 0, 10])))
+        no_match = bm25_relevance(struct.pack('I' * 18, *(header + [0, 0, 10, 0, 0, 10, 0, 0, 10])))
+        self.assertEqual(no_match, 0.0)
+        self.assertGreater(file_match, 0.0)
+        self.assertAlmostEqual(name_match, 8 * file_match)
+
+    def test_get_trigrams(self):
+        self.assertEqual(get_trigrams(u"cat"), {u"  c", u" ca", u"cat", u"at "})
+
+    def test_levenshtein(self):
+        self.assertEqual(levenshtein(u"ubuntu", u"ubuntu"), 0)
+        self.assertEqual(levenshtein(u"ubunto", u"ubuntu"), 1)
+        self.assertEqual(levenshtein(u"cont", u"content"), 3)
+        self.assertEqual(levenshtein(u"", u"abc"), 3)
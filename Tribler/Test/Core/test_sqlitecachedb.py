@@ -9,6 +9,7 @@ from twisted.internet.defer import inlineCallbacks
 
 from Tribler.Core.CacheDB.sqlitecachedb import SQLiteCacheDB, DB_SCRIPT_ABSOLUTE_PATH, CorruptedDatabaseError
 from Tribler.Test.Core.base_test import TriblerCoreTest
+from Tribler.Test.twisted_thread import deferred
 from Tribler.dispersy.util import blocking_call_on_reactor_thread
 
 
@@ -219,3 +220,191 @@ class TestSqliteCacheDB(TriblerCoreTest):
         self.sqlite_test.delete("person", lastname=("LIKE", "a"))
         one = self.sqlite_test.fetchone(u"SELECT * FROM person")
         self.assertEqual(one, ('x', 'z'))
+
+    @blocking_call_on_reactor_thread
+    def test_no_read_pool_in_memory(self):
+        """
+        Test whether no read pool is created for an in-memory database
+        """
+        self.assertIsNone(self.sqlite_test.read_pool)
+
+    @deferred(timeout=10)
+    @inlineCallbacks
+    def test_fetch_async_in_memory(self):
+        """
+        Test whether the async read methods fall back to the writer connection for an in-memory database
+        """
+        self.test_insertmany()
+        rows = yield self.sqlite_test.fetchall_async(u"SELECT * FROM person")
+        self.assertEqual(len(rows), 100)
+        one = yield self.sqlite_test.fetchone_async(u"SELECT firstname FROM person WHERE lastname == '2'")
+        self.assertEqual(one, '4')
+
+    @deferred(timeout=10)
+    @inlineCallbacks
+    def test_fetch_async_read_pool(self):
+        """
+        Test whether the read pool only sees committed data and serves queries off the reactor thread
+        """
+        sqlite_test_2 = SQLiteCacheDB(os.path.join(self.session_base_dir, "test_db.db"), DB_SCRIPT_ABSOLUTE_PATH)
+        sqlite_test_2.initialize()
+        sqlite_test_2.initial_begin()
+        self.assertTrue(sqlite_test_2.read_pool.running)
+
+        sqlite_test_2.execute_write(u"CREATE TABLE person(lastname, firstname);")
+        sqlite_test_2.commit_now()
+        sqlite_test_2.insert('person', lastname='a', firstname='b')
+
+        rows = yield sqlite_test_2.fetchall_async(u"SELECT * FROM person")
+        self.assertEqual(rows, [])
+
+        sqlite_test_2.commit_now()
+        one = yield sqlite_test_2.fetchone_async(u"SELECT * FROM person")
+        self.assertEqual(one, ('a', 'b'))
+        self.assertEqual(sqlite_test_2.read_pool.queries_served, 2)
+
+        sqlite_test_2.insert('person', lastname='c', firstname='d')
+        rows = yield sqlite_test_2.fetchall_async(u"SELECT * FROM person", commit_pending=True)
+        self.assertEqual(len(rows), 2)
+
+        sqlite_test_2.close()
+        self.assertIsNone(sqlite_test_2.read_pool)
+
+    @blocking_call_on_reactor_thread
+    def test_queue_write_batches(self):
+        """
+        Test whether consecutive queued writes with the same statement are executed as one batch
+        """
+        self.test_create_db()
+        for i in xrange(10):
+            self.sqlite_test.queue_write(u"INSERT INTO person VALUES (?, ?)", (str(i), str(i)))
+        self.sqlite_test.queue_write(u"DELETE FROM person WHERE lastname == ?", ('3',))
+        self.assertEqual(self.sqlite_test.write_queue.depth, 11)
+
+        # A read flushes the queue, so queued writes are always visible
+        self.assertEqual(self.sqlite_test.size('person'), 9)
+        self.assertEqual(self.sqlite_test.write_queue.depth, 0)
+        self.assertEqual(self.sqlite_test.write_queue.num_batches, 2)
+
+    @blocking_call_on_reactor_thread
+    def test_queue_write_group_batches(self):
+        """
+        Test whether queued groups of statements are executed as one batch per statement
+        """
+        self.test_create_db()
+        for i in xrange(10):
+            self.sqlite_test.queue_write_group((u"DELETE FROM person WHERE lastname == ?",
+                                                u"INSERT INTO person VALUES (?, ?)"),
+                                               ((str(i),), (str(i), str(i))), key=i)
+        self.sqlite_test.queue_write_group((u"DELETE FROM person WHERE lastname == ?",
+                                            u"INSERT INTO person VALUES (?, ?)"),
+                                           (('3',), ('3', 'x')), key=3)
+        self.assertEqual(self.sqlite_test.size('person'), 10)
+        self.assertEqual(self.sqlite_test.write_queue.num_batches, 4)
+        self.assertEqual(self.sqlite_test.fetchone(u"SELECT firstname FROM person WHERE lastname == '3'"), 'x')
+
+    @blocking_call_on_reactor_thread
+    def test_queue_write_failed_batch(self):
+        """
+        Test whether a failing batch is skipped without losing the other queued writes or raising an exception
+        """
+        self.test_create_db()
+        self.sqlite_test.queue_write(u"INSERT INTO person VALUES (?, ?)", ('a', 'a'))
+        self.sqlite_test.queue_write(u"INSERT INTO nonexistent VALUES (?)", ('b',))
+        self.sqlite_test.queue_write(u"DELETE FROM person WHERE lastname == ?", ('c',))
+        self.sqlite_test.queue_write(u"INSERT INTO person VALUES (?, ?)", ('d', 'd'))
+        self.assertEqual(self.sqlite_test.size('person'), 2)
+        self.assertEqual(self.sqlite_test.write_queue.num_failed_batches, 1)
+
+    @blocking_call_on_reactor_thread
+    def test_queue_write_failed_row(self):
+        """
+        Test whether a failing row of a batch does not discard the other rows of the batch
+        """
+        self.test_create_db()
+        for args in (('a', 'a'), ('b',), ('c', 'c')):
+            self.sqlite_test.queue_write(u"INSERT INTO person VALUES (?, ?)", args)
+        self.assertEqual(self.sqlite_test.size('person'), 2)
+        self.assertEqual(self.sqlite_test.write_queue.num_failed_batches, 1)
+        self.assertEqual(self.sqlite_test.write_queue.num_failed_groups, 1)
+
+    @blocking_call_on_reactor_thread
+    def test_wait_for_commit_failed(self):
+        """
+        Test whether the commit Deferred fails if queued writes could not be executed
+        """
+        self.test_create_db()
+        self.sqlite_test.initial_begin()
+        self.sqlite_test.queue_write(u"INSERT INTO nonexistent VALUES (?)", ('a',))
+
+        failures = []
+        self.sqlite_test.wait_for_commit().addErrback(failures.append)
+        self.sqlite_test.commit_now()
+        self.assertEqual(len(failures), 1)
+
+        # the next commit succeeds again
+        results = []
+        self.sqlite_test.queue_write(u"INSERT INTO person VALUES (?, ?)", ('a', 'b'))
+        self.sqlite_test.wait_for_commit().addCallback(results.append)
+        self.sqlite_test.commit_now()
+        self.assertEqual(results, [None])
+
+    @blocking_call_on_reactor_thread
+    def test_close_commits_queue(self):
+        """
+        Test whether closing the database commits the queued writes and fires the commit Deferreds
+        """
+        sqlite_test_2 = SQLiteCacheDB(os.path.join(self.session_base_dir, "test_close.db"), DB_SCRIPT_ABSOLUTE_PATH,
+                                      read_pool_size=0)
+        sqlite_test_2.initialize()
+        sqlite_test_2.execute(u"CREATE TABLE person(lastname, firstname);")
+        sqlite_test_2.initial_begin()
+        sqlite_test_2.queue_write(u"INSERT INTO person VALUES (?, ?)", ('a', 'b'))
+
+        results = []
+        sqlite_test_2.wait_for_commit().addCallback(results.append)
+        sqlite_test_2.close()
+        self.assertEqual(results, [None])
+
+        sqlite_test_2 = SQLiteCacheDB(os.path.join(self.session_base_dir, "test_close.db"), DB_SCRIPT_ABSOLUTE_PATH,
+                                      read_pool_size=0)
+        sqlite_test_2.initialize()
+        self.assertEqual(sqlite_test_2.size('person'), 1)
+        sqlite_test_2.close()
+
+    @deferred(timeout=10)
+    def test_wait_for_commit(self):
+        """
+        Test whether the commit Deferred fires once the queued writes are committed
+        """
+        self.test_create_db()
+        self.sqlite_test.initial_begin()
+        self.sqlite_test.queue_write(u"INSERT INTO person VALUES (?, ?)", ('a', 'b'))
+
+        commit_deferred = self.sqlite_test.wait_for_commit()
+        self.assertFalse(commit_deferred.called)
+        self.sqlite_test.commit_now()
+        self.assertTrue(commit_deferred.called)
+        self.assertEqual(self.sqlite_test.write_queue.get_statistics()["num_commits"], 1)
+        return commit_deferred
+
+    @blocking_call_on_reactor_thread
+    def test_write_queue_size_threshold(self):
+        """
+        Test whether the write queue commits once the maximum number of uncommitted writes is reached
+        """
+        sqlite_test_2 = SQLiteCacheDB(u":memory:", write_queue_max_size=5)
+        sqlite_test_2.initialize()
+        sqlite_test_2.execute(u"CREATE TABLE person(lastname, firstname);")
+        sqlite_test_2.initial_begin()
+
+        for i in xrange(4):
+            sqlite_test_2.queue_write(u"INSERT INTO person VALUES (?, ?)", (str(i), str(i)))
+        self.assertTrue(sqlite_test_2.is_pending_task_active(u"write queue commit"))
+        self.assertEqual(sqlite_test_2.write_queue.num_commits, 0)
+
+        sqlite_test_2.queue_write(u"INSERT INTO person VALUES (?, ?)", ('4', '4'))
+        self.assertFalse(sqlite_test_2.is_pending_task_active(u"write queue commit"))
+        self.assertEqual(sqlite_test_2.write_queue.num_commits, 1)
+        self.assertEqual(sqlite_test_2.size('person'), 5)
+        sqlite_test_2.close()
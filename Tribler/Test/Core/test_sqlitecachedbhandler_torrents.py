@@ -7,9 +7,11 @@ from Tribler.Core.CacheDB.SqliteCacheDBHandler import TorrentDBHandler, MyPrefer
 from Tribler.Core.CacheDB.sqlitecachedb import str2bin
 from Tribler.Core.Category.Category import Category
 from Tribler.Core.TorrentDef import TorrentDef
+from Tribler.Core.Utilities.prefix_index import PrefixIndex
 from Tribler.Core.leveldbstore import LevelDbStore
 from Tribler.Test.Core.test_sqlitecachedbhandler import AbstractDB
 from Tribler.Test.common import TESTS_DATA_DIR
+from Tribler.Test.twisted_thread import deferred
 from Tribler.dispersy.util import blocking_call_on_reactor_thread
 
 S_TORRENT_PATH_BACKUP = os.path.join(TESTS_DATA_DIR, 'bak_single.torrent')
@@ -248,10 +250,80 @@ class TestTorrentDBHandler(AbstractDB):
     def test_get_search_suggestions(self):
         self.assertEqual(self.tdb.getSearchSuggestion(["content", "cont"]), ["content 1"])
 
+    @blocking_call_on_reactor_thread
+    def test_get_search_suggestions_typo(self):
+        """
+        Test whether search suggestions correct typos using terms that are indexed incrementally
+        """
+        self.tdb._indexTorrent(1, u"ubuntu desktop", [])
+        self.assertEqual(self.sqlitedb.fetchone(u"SELECT frequency FROM SearchTerms WHERE term = 'ubuntu'"), 1)
+        self.assertEqual(self.tdb.getSearchSuggestion(["ubunto"]), ["ubuntu desktop"])
+        self.assertEqual(self.tdb.getSearchSuggestion(["ubu"]), [])
+
+    @blocking_call_on_reactor_thread
+    def test_get_search_suggestions_autocomplete_term(self):
+        """
+        Test whether the trigrams of a term are indexed when the term is in the autocomplete index already
+        """
+        self.tdb._on_search_terms_loaded([(u"ubuntu", 3)])
+        self.tdb._indexTorrent(1, u"ubuntu desktop", [])
+        self.assertEqual(self.tdb.getSearchSuggestion(["ubunto"]), ["ubuntu desktop"])
+
+    @blocking_call_on_reactor_thread
+    def test_index_search_terms_rename(self):
+        """
+        Test whether the search terms are only counted once per torrent, also when a torrent is indexed again
+        """
+        def get_frequency(term):
+            return self.sqlitedb.fetchone(u"SELECT frequency FROM SearchTerms WHERE term = ?", (term,))
+
+        self.tdb._indexTorrent(1, u"ubuntu desktop", [])
+        self.tdb._indexTorrent(1, u"ubuntu desktop", [], u"ubuntu desktop")
+        self.assertEqual(get_frequency(u"ubuntu"), 1)
+
+        self.tdb._indexTorrent(1, u"ubuntu server", [], self.tdb._get_indexed_swarmnames([1]).get(1))
+        self.assertEqual(get_frequency(u"ubuntu"), 1)
+        self.assertEqual(get_frequency(u"server"), 1)
+        self.assertIsNone(get_frequency(u"desktop"))
+        self.assertEqual(self.sqlitedb.fetchone(u"SELECT COUNT(*) FROM SearchTermTrigrams "
+                                                u"WHERE term_id NOT IN (SELECT term_id FROM SearchTerms)"), 0)
+
+    @blocking_call_on_reactor_thread
+    def test_rebuild_search_terms(self):
+        """
+        Test whether the search term dictionary can be rebuilt from the full text index
+        """
+        self.tdb.rebuild_search_terms()
+        self.assertEqual(self.sqlitedb.fetchone(u"SELECT frequency FROM SearchTerms WHERE term = 'content'"), 4848)
+        self.assertIsNone(self.sqlitedb.fetchone(u"SELECT frequency FROM SearchTerms WHERE term = '1'"))
+
     @blocking_call_on_reactor_thread
     def test_get_autocomplete_terms(self):
         self.assertEqual(len(self.tdb.getAutoCompleteTerms("content", 100)), 0)
 
+    @blocking_call_on_reactor_thread
+    def test_get_autocomplete_terms_index(self):
+        """
+        Test whether completions come from the autocomplete index once it is loaded and kept up to date
+        """
+        self.tdb._on_search_terms_loaded([(u"pioneer", 3), (u"pirate", 1), (u"content", 4849)])
+        self.tdb._index_search_terms([u"pirates", u"pirates", u"movie"])
+        self.assertIsInstance(self.tdb.autocomplete_index, PrefixIndex)
+        self.assertEqual(self.tdb.getAutoCompleteTerms(u"pi", 5), [u"pioneer", u"pirate", u"pirates"])
+        self.assertEqual(self.tdb.getAutoCompleteTerms(u"the pio", 5), [u"the pioneer"])
+        self.assertEqual(self.tdb.getAutoCompleteTerms(u"content", 5), [])
+
+    @blocking_call_on_reactor_thread
+    def test_get_autocomplete_terms_indexed_during_load(self):
+        """
+        Test whether the terms indexed while the autocomplete index is loading are added to it once it is loaded
+        """
+        self.tdb._index_search_terms([u"pirates", u"movie"])
+        self.tdb._index_search_terms([u"pioneer"], [u"pirates"])
+        self.tdb._on_search_terms_loaded([(u"pirate", 1)])
+        self.assertEqual(self.tdb.getAutoCompleteTerms(u"pi", 5), [u"pioneer", u"pirate"])
+        self.assertEqual(self.tdb.getAutoCompleteTerms(u"mov", 5), [u"movie"])
+
     @blocking_call_on_reactor_thread
     def test_get_recently_randomly_collected_torrents(self):
         self.assertEqual(len(self.tdb.getRecentlyCollectedTorrents(limit=10)), 10)
@@ -301,3 +373,35 @@ class TestTorrentDBHandler(AbstractDB):
         self.assertNotEqual(results[0][-1], 0.0)  # Relevance score of result should not be zero
         results = self.tdb.search_in_local_torrents_db('fdsafasfds', ['infohash'])
         self.assertEqual(len(results), 0)
+
+    @deferred(timeout=10)
+    @inlineCallbacks
+    def test_search_local_torrents_async(self):
+        """
+        Test whether the local torrent search can run on the read pool
+        """
+        results = yield self.tdb.search_in_local_torrents_db_async('content', ['infohash'], limit=10)
+        self.assertEqual(len(results), 10)
+        self.assertIsNotNone(self.tdb.latest_matchinfo_torrent)
+
+    @deferred(timeout=10)
+    @inlineCallbacks
+    def test_search_names_async(self):
+        """
+        Test whether the search for collected torrents can run on the read pool
+        """
+        columns = ['T.torrent_id', 'infohash', 'status', 'num_seeders']
+        self.tdb.channelcast_db = ChannelCastDBHandler(self.session)
+        results = yield self.tdb.searchNames_async(['content', '1'], keys=columns, doSort=False)
+        self.assertEqual(len(results), 1)
+
+    @blocking_call_on_reactor_thread
+    def test_search_local_torrents_limit(self):
+        """
+        Test whether the local torrent search returns the best scoring results first and respects the limit
+        """
+        results = self.tdb.search_in_local_torrents_db('content', ['infohash'], limit=10)
+        self.assertEqual(len(results), 10)
+        scores = [result[-1] for result in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertIsNotNone(self.tdb.latest_matchinfo_torrent)
@@ -4,6 +4,7 @@ from base64 import b64decode
 from twisted.internet import reactor
 from twisted.internet.defer import inlineCallbacks
 from twisted.internet.task import LoopingCall, deferLater
+from twisted.internet.threads import deferToThread
 
 from Tribler.Core.simpledefs import NTFY_MARKET_ON_ASK, NTFY_MARKET_ON_BID, NTFY_MARKET_ON_TRANSACTION_COMPLETE, \
     NTFY_MARKET_ON_ASK_TIMEOUT, NTFY_MARKET_ON_BID_TIMEOUT, NTFY_MARKET_ON_PAYMENT_RECEIVED, NTFY_MARKET_ON_PAYMENT_SENT
@@ -34,7 +35,8 @@ from Tribler.community.market.database import MarketDB
 from Tribler.community.market.payload import OfferPayload, TradePayload, DeclinedTradePayload,\
     StartTransactionPayload, TransactionPayload, WalletInfoPayload, MarketIntroPayload, OfferSyncPayload,\
     PaymentPayload, CancelOrderPayload
-from Tribler.community.market.reputation.pagerank_manager import PagerankReputationManager
+from Tribler.community.market.reputation.incremental_pagerank_manager import IncrementalPagerankReputationManager,\
+    BLOCK_BATCH_SIZE
 from Tribler.community.market.wallet.tc_wallet import TrustchainWallet
 from Tribler.dispersy.authentication import MemberAuthentication
 from Tribler.dispersy.bloomfilter import BloomFilter
@@ -111,6 +113,7 @@ class MarketCommunity(Community):
         self.tradechain_community = None
         self.wallets = None
         self.transaction_manager = None
+        self.reputation_manager = None
         self.reputation_dict = {}
         self.use_local_address = False
         self.matching_enabled = True
@@ -535,10 +538,9 @@ class MarketCommunity(Community):
                     subject = NTFY_MARKET_ON_ASK if isinstance(tick, Ask) else NTFY_MARKET_ON_BID
                     self.tribler_session.notifier.notify(subject, NTFY_UPDATE, None, tick.to_dictionary())
 
-                # Check for new matches against the orders of this node
-                for order in self.order_manager.order_repository.find_all():
-                    if order.is_ask() and order.is_valid():
-                        self.match(order)
+                # Check for new matches against the orders of this node that can trade with this tick
+                for order in self.order_manager.find_crossing_orders(tick):
+                    self.match(order)
             elif self.order_book.tick_exists(tick.order_id) and \
                     self.order_book.get_tick(tick.order_id).tick.timestamp < tick.timestamp:
                 # Update the tick with a newer one
@@ -1242,10 +1244,17 @@ class MarketCommunity(Community):
             self.tribler_session.notifier.notify(NTFY_MARKET_ON_TRANSACTION_COMPLETE, NTFY_UPDATE, None,
                                                  transaction.to_dictionary())
 
+    @inlineCallbacks
     def compute_reputation(self):
         """
         Compute the reputation of peers in the community
         """
         if self.tradechain_community:
-            rep_manager = PagerankReputationManager(self.tradechain_community.persistence.get_all_blocks())
-            self.reputation_dict = rep_manager.compute(self.my_member.public_key)
+            if not self.reputation_manager:
+                self.reputation_manager = IncrementalPagerankReputationManager(database=self.market_database)
+            # Only the blocks that were added since the previous computation are read from the database. The first
+            # time these are all blocks, so they are read in batches and the reactor gets to run in between.
+            persistence = self.tradechain_community.persistence
+            while self.reputation_manager.update(persistence, max_blocks=BLOCK_BATCH_SIZE) == BLOCK_BATCH_SIZE:
+                yield deferLater(reactor, 0, lambda: None)
+            self.reputation_dict = yield deferToThread(self.reputation_manager.compute, self.my_member.public_key)
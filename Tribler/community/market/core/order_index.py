@@ -0,0 +1,83 @@
+from bisect import bisect_left, bisect_right
+
+from Tribler.community.market.core.order import Order
+from Tribler.community.market.core.price import Price
+
+
+class OrderIndex(object):
+    """
+    Index of the orders of this node, sorted by price per side and per (price type, quantity type) pair.
+
+    The index only keeps the order ids, the orders themselves are read from the order repository when they are needed.
+    Orders that are no longer valid are not removed by the index itself, the user of the index should call remove.
+    """
+
+    def __init__(self):
+        super(OrderIndex, self).__init__()
+        # Dict of (is_ask, price_type, quantity_type) -> ([price values], [order ids]), sorted on price
+        self._sides = {}
+
+    def __len__(self):
+        return sum(len(order_ids) for _, order_ids in self._sides.itervalues())
+
+    def __contains__(self, order_id):
+        return any(order_id in order_ids for _, order_ids in self._sides.itervalues())
+
+    def add(self, order):
+        """
+        :type order: Order
+        """
+        assert isinstance(order, Order), type(order)
+
+        key = (order.is_ask(), order.price.wallet_id, order.total_quantity.wallet_id)
+        prices, order_ids = self._sides.setdefault(key, ([], []))
+        # Orders with the same price stay in the order they were added
+        index = bisect_right(prices, float(order.price))
+        prices.insert(index, float(order.price))
+        order_ids.insert(index, order.order_id)
+
+    def remove(self, order):
+        """
+        :type order: Order
+        :return: True if the order was in the index, False otherwise
+        :rtype: bool
+        """
+        assert isinstance(order, Order), type(order)
+
+        key = (order.is_ask(), order.price.wallet_id, order.total_quantity.wallet_id)
+        if key not in self._sides:
+            return False
+
+        prices, order_ids = self._sides[key]
+        price = float(order.price)
+        for index in xrange(bisect_left(prices, price), bisect_right(prices, price)):
+            if order_ids[index] == order.order_id:
+                del prices[index]
+                del order_ids[index]
+                return True
+        return False
+
+    def find_crossing(self, is_ask, price, quantity_wallet_id):
+        """
+        Returns the ids of the orders on the other side that can trade with an ask or bid at the given price, the best
+        priced order first. Asks at or below the price cross an incoming bid, bids at or above the price cross an
+        incoming ask.
+
+        :param is_ask: Whether the incoming tick is an ask
+        :param price: The price of the incoming tick
+        :param quantity_wallet_id: The quantity type of the incoming tick
+        :type is_ask: bool
+        :type price: Price
+        :type quantity_wallet_id: str
+        :rtype: [OrderId]
+        """
+        assert isinstance(price, Price), type(price)
+
+        key = (not is_ask, price.wallet_id, quantity_wallet_id)
+        if key not in self._sides:
+            return []
+
+        prices, order_ids = self._sides[key]
+        if is_ask:
+            return order_ids[bisect_left(prices, float(price)):][::-1]
+        return order_ids[:bisect_right(prices, float(price))]
@@ -1,9 +1,11 @@
 import logging
 
 from Tribler.community.market.core.order import OrderId, Order
+from Tribler.community.market.core.order_index import OrderIndex
 from Tribler.community.market.core.order_repository import OrderRepository
 from Tribler.community.market.core.price import Price
 from Tribler.community.market.core.quantity import Quantity
+from Tribler.community.market.core.tick import Tick
 from Tribler.community.market.core.timeout import Timeout
 from Tribler.community.market.core.timestamp import Timestamp
 
@@ -23,6 +25,12 @@ class OrderManager(object):
 
         self.order_repository = order_repository
 
+        # The open orders by price, to find the orders that can trade with an incoming tick
+        self.order_index = OrderIndex()
+        for order in self.order_repository.find_all():
+            if order.is_valid() and not order.is_complete():
+                self.order_index.add(order)
+
     def create_ask_order(self, price, quantity, timeout):
         """
         Create an ask order (sell order)
@@ -42,6 +50,7 @@ class OrderManager(object):
 
         order = Order(self.order_repository.next_identity(), price, quantity, timeout, Timestamp.now(), True)
         self.order_repository.add(order)
+        self.order_index.add(order)
 
         self._logger.info("Ask order created with id: " + str(order.order_id))
 
@@ -66,6 +75,7 @@ class OrderManager(object):
 
         order = Order(self.order_repository.next_identity(), price, quantity, timeout, Timestamp.now(), False)
         self.order_repository.add(order)
+        self.order_index.add(order)
 
         self._logger.info("Bid order created with id: " + str(order.order_id))
 
@@ -84,5 +94,29 @@ class OrderManager(object):
         if order:
             order.cancel()
             self.order_repository.update(order)
+            self.order_index.remove(order)
 
         self._logger.info("Order cancelled with id: " + str(order_id))
+
+    def find_crossing_orders(self, tick):
+        """
+        Find the open orders on the other side of the order book that can trade with a tick, the best priced first.
+        Orders that have expired or completed are dropped from the index on the way.
+
+        :param tick: The incoming tick
+        :type tick: Tick
+        :return: The orders that can trade with the tick
+        :rtype: [Order]
+        """
+        assert isinstance(tick, Tick), type(tick)
+
+        orders = []
+        for order_id in self.order_index.find_crossing(tick.is_ask(), tick.price, tick.quantity.wallet_id):
+            order = self.order_repository.find_by_id(order_id)
+            if order is None:
+                continue
+            if not order.is_valid() or order.is_complete():
+                self.order_index.remove(order)
+                continue
+            orders.append(order)
+        return orders
@@ -1,17 +1,36 @@
+from bisect import bisect_left
+
 from Tribler.community.market.core.price import Price
 from Tribler.community.market.core.pricelevel import PriceLevel
 
 
 class PriceLevelList(object):
     """
-    Sorted doubly linked dictionary implementation.
+    Sorted dictionary of price levels.
+
+    The prices are kept in a sorted list, next to a list with their float values that is searched with bisect. All
+    prices in a list have the same wallet id, so comparing their values gives the same order as comparing the prices.
     """
 
     def __init__(self):
         super(PriceLevelList, self).__init__()
         self._price_list = []
+        self._price_values = []
         self._price_level_dictionary = {}
 
+    def _index(self, price):
+        """
+        Returns the index of a price in the sorted price list.
+
+        :type price: Price
+        :rtype: int
+        :raises ValueError: Thrown when the price is not in the list
+        """
+        index = bisect_left(self._price_values, float(price))
+        if index == len(self._price_list) or self._price_list[index] != price:
+            raise ValueError("Price %s is not in the price level list" % price)
+        return index
+
     def insert(self, price, price_level):
         """
         :type price: Price
@@ -20,8 +39,10 @@ class PriceLevelList(object):
         assert isinstance(price, Price), type(price)
         assert isinstance(price_level, PriceLevel), type(price_level)
 
-        self._price_list.append(price)
-        self._price_list.sort()
+        value = float(price)
+        index = bisect_left(self._price_values, value)
+        self._price_list.insert(index, price)
+        self._price_values.insert(index, value)
         self._price_level_dictionary[price] = price_level
 
     def remove(self, price):
@@ -30,7 +51,9 @@ class PriceLevelList(object):
         """
         assert isinstance(price, Price), type(price)
 
-        self._price_list.remove(price)
+        index = self._index(price)
+        del self._price_list[index]
+        del self._price_values[index]
         del self._price_level_dictionary[price]
 
     def succ_item(self, price):
@@ -42,7 +65,7 @@ class PriceLevelList(object):
         """
         assert isinstance(price, Price), type(price)
 
-        index = self._price_list.index(price) + 1
+        index = self._index(price) + 1
         if index >= len(self._price_list):
             raise IndexError
         succ_price = self._price_list[index]
@@ -57,7 +80,7 @@ class PriceLevelList(object):
         """
         assert isinstance(price, Price), type(price)
 
-        index = self._price_list.index(price) - 1
+        index = self._index(price) - 1
         if index < 0:
             raise IndexError
         prev_price = self._price_list[index]
@@ -87,13 +110,8 @@ class PriceLevelList(object):
         :type reverse: bool
         :rtype: List[(Price, PriceLevel)]
         """
-        items = []
-        for price in self._price_list:
-            if reverse:
-                items.insert(0, (price, self._price_level_dictionary[price]))
-            else:
-                items.append((price, self._price_level_dictionary[price]))
-        return items
+        prices = reversed(self._price_list) if reverse else self._price_list
+        return [(price, self._price_level_dictionary[price]) for price in prices]
 
     def get_ticks_list(self):
         """
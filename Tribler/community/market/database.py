@@ -17,9 +17,26 @@ DATABASE_DIRECTORY = path.join(u"sqlite")
 # Path to the database location + dispersy._workingdirectory
 DATABASE_PATH = path.join(DATABASE_DIRECTORY, u"market.db")
 # Version to keep track if the db schema needs to be updated.
-LATEST_DB_VERSION = 1
+LATEST_DB_VERSION = 2
+# Tables of the interaction graph that is used to compute the reputation of traders, added in version 2.
+reputation_schema = u"""
+ CREATE TABLE IF NOT EXISTS reputation_interactions(
+  public_key           BLOB NOT NULL,
+  link_public_key      BLOB NOT NULL,
+  weight               DOUBLE NOT NULL,
+
+  PRIMARY KEY (public_key, link_public_key)
+ );
+
+ CREATE TABLE IF NOT EXISTS reputation_state(
+  key                  TEXT NOT NULL,
+  value                INTEGER NOT NULL,
+
+  PRIMARY KEY (key)
+ );
+"""
 # Schema for the Market DB.
-schema = u"""
+schema = reputation_schema + u"""
 CREATE TABLE IF NOT EXISTS orders(
  trader_id            TEXT NOT NULL,
  order_number         INTEGER NOT NULL,
@@ -321,6 +338,53 @@ class MarketDB(Database):
     def get_traders(self):
         return self.execute(u"SELECT * FROM traders").fetchall()
 
+    def get_reputation_interactions(self):
+        """
+        Get the (public key, link public key, weight) edges of the interaction graph.
+        """
+        return [(str(public_key), str(link_public_key), weight) for public_key, link_public_key, weight
+                in self.execute(u"SELECT public_key, link_public_key, weight FROM reputation_interactions")]
+
+    def get_reputation_last_block_id(self):
+        """
+        Get the id of the last TradeChain block that has been added to the interaction graph.
+        """
+        result = self.execute(u"SELECT value FROM reputation_state WHERE key = 'last_block_id'").fetchone()
+        return result[0] if result else 0
+
+    def get_reputation_last_block_hash(self):
+        """
+        Get the hash of the last TradeChain block that has been added to the interaction graph, or None if unknown.
+        """
+        result = self.execute(u"SELECT value FROM reputation_state WHERE key = 'last_block_hash'").fetchone()
+        return str(result[0]) if result else None
+
+    def add_reputation_interactions(self, weight_deltas, last_block_id, last_block_hash):
+        """
+        Add weight to edges of the interaction graph and remember up to which block the graph is complete.
+        :param weight_deltas: a dictionary of (public key, link public key) -> weight to add
+        :param last_block_id: the id of the last TradeChain block in the graph
+        :param last_block_hash: the hash of the last TradeChain block in the graph
+        """
+        updates = [(weight, buffer(public_key), buffer(link_public_key))
+                   for (public_key, link_public_key), weight in weight_deltas.iteritems()]
+        self.executemany(u"INSERT OR IGNORE INTO reputation_interactions VALUES(?,?,0)",
+                         [update[1:] for update in updates])
+        self.executemany(u"UPDATE reputation_interactions SET weight = weight + ? "
+                         u"WHERE public_key = ? AND link_public_key = ?", updates)
+        self.execute(u"INSERT OR REPLACE INTO reputation_state VALUES('last_block_id', ?)", (last_block_id,))
+        self.execute(u"INSERT OR REPLACE INTO reputation_state VALUES('last_block_hash', ?)",
+                     (buffer(last_block_hash),))
+        self.commit()
+
+    def clear_reputation_interactions(self):
+        """
+        Remove the interaction graph, so it can be rebuilt from the first TradeChain block.
+        """
+        self.execute(u"DELETE FROM reputation_interactions")
+        self.execute(u"DELETE FROM reputation_state")
+        self.commit()
+
     def open(self, initial_statements=True, prepare_visioning=True):
         return super(MarketDB, self).open(initial_statements, prepare_visioning)
 
@@ -335,8 +399,12 @@ class MarketDB(Database):
         assert int(database_version) >= 0
         database_version = int(database_version)
 
-        if database_version < LATEST_DB_VERSION:
+        if database_version == 0:
             self.executescript(schema)
             self.commit()
+        elif database_version < LATEST_DB_VERSION:
+            self.executescript(reputation_schema)
+            self.execute(u"UPDATE option SET value = ? WHERE key = 'database_version'", (unicode(LATEST_DB_VERSION),))
+            self.commit()
 
         return LATEST_DB_VERSION
@@ -0,0 +1,221 @@
+import logging
+from array import array
+
+import numpy as np
+from scipy import sparse
+
+from Tribler.community.market.reputation.reputation_manager import ReputationManager
+
+DEFAULT_ALPHA = 0.85
+DEFAULT_MAX_ITER = 100
+DEFAULT_TOL = 1.0e-6
+BLOCK_BATCH_SIZE = 10000
+
+
+class InteractionGraph(object):
+    """
+    Weighted directed graph of the trades between peers, stored as a sparse adjacency matrix.
+
+    Every TradeChain block adds an edge from the block owner to its counterparty (weighted with asset1_amount) and one
+    back (weighted with asset2_amount). New edges are appended to coordinate arrays, the duplicates are summed when the
+    matrix is needed. Nodes keep their index once added, so vectors over the nodes can be extended as the graph grows.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self._node_index = {}
+        self._rows = array('l')
+        self._cols = array('l')
+        self._weights = array('d')
+        self._matrix = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, public_key):
+        return public_key in self._node_index
+
+    def get_node_index(self, public_key):
+        index = self._node_index.get(public_key)
+        if index is None:
+            index = self._node_index[public_key] = len(self.nodes)
+            self.nodes.append(public_key)
+        return index
+
+    def add_edge(self, public_key, link_public_key, weight):
+        if weight <= 0 or public_key == link_public_key:
+            return
+        self._rows.append(self.get_node_index(public_key))
+        self._cols.append(self.get_node_index(link_public_key))
+        self._weights.append(weight)
+        self._matrix = None
+
+    def get_matrix(self):
+        """
+        Returns the adjacency matrix as a scipy CSR matrix, entry [i, j] is the total weight of the edges from node i to
+        node j.
+        """
+        if self._matrix is None:
+            size = len(self.nodes)
+            matrix = sparse.coo_matrix((np.frombuffer(self._weights, dtype=np.float64),
+                                        (np.frombuffer(self._rows, dtype=np.int_),
+                                         np.frombuffer(self._cols, dtype=np.int_))),
+                                       shape=(size, size)).tocsr()
+            matrix.sum_duplicates()
+
+            # Keep the summed edges only, so the arrays do not grow with every block between the same peers
+            compacted = matrix.tocoo()
+            self._rows = array('l', compacted.row.astype(np.int_).tostring())
+            self._cols = array('l', compacted.col.astype(np.int_).tostring())
+            self._weights = array('d', compacted.data.astype(np.float64).tostring())
+            self._matrix = matrix
+        return self._matrix
+
+
+class IncrementalPagerankReputationManager(ReputationManager):
+    """
+    Computes the personalised PageRank of peers on an interaction graph that is updated with the blocks that were added
+    since the last computation, instead of rebuilding the graph from all TradeChain blocks.
+
+    The graph is persisted in the market database together with the id and hash of the last block it contains. The
+    PageRank iteration starts from the previous result, so after a few new blocks it converges in a few iterations.
+    """
+
+    def __init__(self, blocks=(), database=None, alpha=DEFAULT_ALPHA, max_iter=DEFAULT_MAX_ITER, tol=DEFAULT_TOL):
+        super(IncrementalPagerankReputationManager, self).__init__(blocks)
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.database = database
+        self.alpha = alpha
+        self.max_iter = max_iter
+        self.tol = tol
+
+        self.graph = InteractionGraph()
+        self.last_block_id = 0
+        self.last_block_hash = None
+        self.iterations = 0
+        self._pending_weights = {}
+        self._scores = None
+        self._scores_personalization = None
+        self._result = None
+
+        if self.database:
+            for public_key, link_public_key, weight in self.database.get_reputation_interactions():
+                self.graph.add_edge(public_key, link_public_key, weight)
+            self.last_block_id = self.database.get_reputation_last_block_id()
+            self.last_block_hash = self.database.get_reputation_last_block_hash()
+
+        self.add_blocks(blocks)
+
+    def reset(self):
+        """
+        Removes all blocks from the interaction graph, also from the database.
+        """
+        self.graph = InteractionGraph()
+        self.last_block_id = 0
+        self.last_block_hash = None
+        self._pending_weights = {}
+        self._scores = None
+        self._scores_personalization = None
+        self._result = None
+        if self.database:
+            self.database.clear_reputation_interactions()
+
+    def add_block(self, block):
+        for public_key, link_public_key, weight in ((block.public_key, block.link_public_key,
+                                                     block.transaction["asset1_amount"]),
+                                                    (block.link_public_key, block.public_key,
+                                                     block.transaction["asset2_amount"])):
+            self.graph.add_edge(public_key, link_public_key, weight)
+            if weight > 0 and public_key != link_public_key:
+                edge = (public_key, link_public_key)
+                self._pending_weights[edge] = self._pending_weights.get(edge, 0) + weight
+        self._result = None
+
+    def add_blocks(self, blocks):
+        for block in blocks:
+            self.add_block(block)
+
+    def update(self, persistence, max_blocks=None):
+        """
+        Adds the blocks that were added to the TradeChain database since the last update, and stores the changes.
+        Block ids change when the database is recreated or vacuumed, so if the last block in the graph does not have
+        the same id anymore, the graph is rebuilt from the first block.
+        :param persistence: the TradeChainDB to read the blocks from
+        :param max_blocks: the maximum number of blocks to add, None to add all new blocks
+        :return: the number of added blocks
+        """
+        if self.last_block_id and persistence.get_block_hash(self.last_block_id) != self.last_block_hash:
+            self._logger.info("TradeChain block %d changed, rebuilding the interaction graph", self.last_block_id)
+            self.reset()
+
+        num_blocks = 0
+        while max_blocks is None or num_blocks < max_blocks:
+            limit = BLOCK_BATCH_SIZE if max_blocks is None else min(BLOCK_BATCH_SIZE, max_blocks - num_blocks)
+            blocks = persistence.get_blocks_since(self.last_block_id, limit=limit)
+            for block_id, block in blocks:
+                self.add_block(block)
+                self.last_block_id = block_id
+            if blocks:
+                self.last_block_hash = blocks[-1][1].hash
+            num_blocks += len(blocks)
+            if len(blocks) < limit:
+                break
+        self.save()
+        return num_blocks
+
+    def save(self):
+        """
+        Writes the edge weights that were added since the last save to the database.
+        """
+        if self.database and self._pending_weights:
+            self.database.add_reputation_interactions(self._pending_weights, self.last_block_id, self.last_block_hash)
+        self._pending_weights = {}
+
+    def compute(self, own_public_key):
+        """
+        Compute the reputation of all peers in the interaction graph, personalised on our own public key.
+        :return: a dictionary of public key -> reputation
+        """
+        if self._result is not None and self._scores_personalization == own_public_key:
+            return self._result
+
+        size = len(self.graph)
+        if not size:
+            return {}
+
+        matrix = self.graph.get_matrix()
+        out_weights = np.asarray(matrix.sum(axis=1)).flatten()
+        dangling = out_weights == 0
+        out_weights[dangling] = 1.0
+        # Row-normalised transition matrix, transposed so a multiplication spreads the scores along the edges
+        transition = (sparse.diags(1.0 / out_weights) * matrix).T.tocsr()
+
+        personalization = np.zeros(size)
+        if own_public_key in self.graph:
+            personalization[self.graph.get_node_index(own_public_key)] = 1.0  # You trust yourself the most
+        else:
+            personalization[:] = 1.0 / size
+
+        scores = self._get_start_vector(size, own_public_key, personalization)
+        for self.iterations in xrange(1, self.max_iter + 1):
+            previous = scores
+            scores = self.alpha * (transition * previous) + \
+                (self.alpha * previous[dangling].sum() + 1 - self.alpha) * personalization
+            if np.abs(scores - previous).sum() < size * self.tol:
+                break
+
+        self._scores = scores
+        self._scores_personalization = own_public_key
+        self._result = dict(zip(self.graph.nodes, scores.tolist()))
+        return self._result
+
+    def _get_start_vector(self, size, own_public_key, personalization):
+        """
+        Returns the previous scores extended to the current nodes, or the personalization vector if there are none.
+        """
+        if self._scores is None or self._scores_personalization != own_public_key:
+            return personalization.copy()
+
+        scores = np.zeros(size)
+        scores[:len(self._scores)] = self._scores
+        return scores / scores.sum()
@@ -0,0 +1,76 @@
+"""
+Limits the number of remote searches a single peer can make us do.
+"""
+from collections import OrderedDict
+from time import time
+
+SEARCH_RATE = 0.5
+SEARCH_BURST = 5
+MAX_TRACKED_PEERS = 1000
+
+
+class TokenBucket(object):
+    """
+    Allows a number of requests per second on average, with bursts of up to capacity requests.
+    """
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.timestamp = now
+
+    def consume(self, now):
+        """
+        Takes a token from the bucket, after adding the tokens that were earned since the last request.
+        :return: whether there was a token to take
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+        self.timestamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class SearchAdmission(object):
+    """
+    Decides whether an incoming search request is answered, using a token bucket per peer.
+
+    Only the buckets of the peers that searched most recently are kept. The bucket of the peer that searched least
+    recently is forgotten first, such a bucket has usually filled up again.
+    """
+
+    def __init__(self, rate=SEARCH_RATE, burst=SEARCH_BURST, max_peers=MAX_TRACKED_PEERS):
+        self.rate = rate
+        self.burst = burst
+        self.max_peers = max_peers
+
+        # peer address -> TokenBucket, least recently used first
+        self._buckets = OrderedDict()
+
+        self.admitted = 0
+        self.shed = 0
+
+    def admit(self, sock_addr, now=None):
+        """
+        :return: whether the search request of the peer at sock_addr should be answered
+        """
+        now = time() if now is None else now
+        bucket = self._buckets.pop(sock_addr, None)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) >= self.max_peers:
+                self._buckets.popitem(last=False)
+        self._buckets[sock_addr] = bucket
+
+        if bucket.consume(now):
+            self.admitted += 1
+            return True
+        self.shed += 1
+        return False
+
+    def get_statistics(self):
+        return {"peers": len(self._buckets),
+                "admitted": self.admitted,
+                "shed": self.shed}
@@ -13,10 +13,12 @@ from Tribler.Core.CacheDB.sqlitecachedb import bin2str
 from Tribler.Core.TorrentDef import TorrentDef
 from Tribler.community.channel.payload import TorrentPayload
 from Tribler.community.channel.preview import PreviewChannelCommunity
+from Tribler.community.search.admission import SearchAdmission
 from Tribler.community.search.conversion import SearchConversion
 from Tribler.community.search.payload import (SearchRequestPayload, SearchResponsePayload, TorrentRequestPayload,
                                               TorrentCollectRequestPayload, TorrentCollectResponsePayload,
                                               TasteIntroPayload)
+from Tribler.community.search.search_cache import SearchResultCache
 from Tribler.dispersy.authentication import MemberAuthentication
 from Tribler.dispersy.bloomfilter import BloomFilter
 from Tribler.dispersy.candidate import CANDIDATE_WALK_LIFETIME, WalkCandidate
@@ -76,6 +78,9 @@ class SearchCommunity(Community):
 
         self.torrent_cache = None
 
+        self.search_result_cache = SearchResultCache()
+        self.search_admission = SearchAdmission()
+
     def initialize(self, tribler_session=None, log_incoming_searches=False):
         self.tribler_session = tribler_session
         self.integrate_with_tribler = tribler_session is not None
@@ -337,33 +342,71 @@ class SearchCommunity(Community):
             if DEBUG:
                 self._logger.debug(u"got search request for %s", keywords)
 
+            if not self.search_admission.admit(message.candidate.sock_addr):
+                self._logger.debug(u"ignoring search request from %s, too many requests", message.candidate)
+                continue
+
             if self.log_incoming_searches:
                 self.log_incoming_searches(message.candidate.sock_addr, keywords)
 
-            results = []
-            dbresults = self._torrent_db.searchNames(keywords, local=False, keys=['infohash', 'T.name', 'T.length', 'T.num_files', 'T.category', 'T.creation_date', 'T.num_seeders', 'T.num_leechers'])
-            if len(dbresults) > 0:
-                for dbresult in dbresults:
-                    channel_details = dbresult[-10:]
-
-                    dbresult = list(dbresult[:8])
-                    dbresult[2] = long(dbresult[2])  # length
-                    dbresult[3] = int(dbresult[3])  # num_files
-                    dbresult[4] = [dbresult[4]]  # category
-                    dbresult[5] = long(dbresult[5])  # creation_date
-                    dbresult[6] = int(dbresult[6] or 0)  # num_seeders
-                    dbresult[7] = int(dbresult[7] or 0)  # num_leechers
-
-                    # cid
-                    if channel_details[1]:
-                        channel_details[1] = str(channel_details[1])
-                    dbresult.append(channel_details[1])
-
-                    results.append(tuple(dbresult))
-            elif DEBUG:
-                self._logger.debug(u"no results")
-
-            self._create_search_response(message.payload.identifier, results, message.candidate)
+            version = self._torrent_db.collected_torrents_version
+            results = self.search_result_cache.get(keywords, version)
+            if results is not None:
+                self._create_search_response(message.payload.identifier, results, message.candidate)
+                continue
+
+            # The full text search runs on the read pool, the response is sent once the results are found
+            self._search_collected_torrents(keywords).addCallbacks(self._on_collected_torrents_found,
+                                                                   self._on_collected_torrents_search_failed,
+                                                                   callbackArgs=(keywords, version, message),
+                                                                   errbackArgs=(keywords,))
+
+    def _on_collected_torrents_found(self, results, keywords, version, message):
+        self.search_result_cache.put(keywords, version, results)
+        self._create_search_response(message.payload.identifier, results, message.candidate)
+
+    def _on_collected_torrents_search_failed(self, failure, keywords):
+        self._logger.error(u"could not search the collected torrents for %s: %s", keywords, failure.getErrorMessage())
+
+    def _search_collected_torrents(self, keywords):
+        """
+        :return: a Deferred that fires with the collected torrents matching keywords, as sent in search responses
+        """
+        return self._torrent_db.searchNames_async(keywords, local=False,
+                                                  keys=['infohash', 'T.name', 'T.length', 'T.num_files', 'T.category',
+                                                        'T.creation_date', 'T.num_seeders', 'T.num_leechers'])\
+            .addCallback(self._convert_search_results)
+
+    def _convert_search_results(self, dbresults):
+        results = []
+        if len(dbresults) > 0:
+            for dbresult in dbresults:
+                channel_details = dbresult[-10:]
+
+                dbresult = list(dbresult[:8])
+                dbresult[2] = long(dbresult[2])  # length
+                dbresult[3] = int(dbresult[3])  # num_files
+                dbresult[4] = [dbresult[4]]  # category
+                dbresult[5] = long(dbresult[5])  # creation_date
+                dbresult[6] = int(dbresult[6] or 0)  # num_seeders
+                dbresult[7] = int(dbresult[7] or 0)  # num_leechers
+
+                # cid
+                if channel_details[1]:
+                    channel_details[1] = str(channel_details[1])
+                dbresult.append(channel_details[1])
+
+                results.append(tuple(dbresult))
+        elif DEBUG:
+            self._logger.debug(u"no results")
+        return results
+
+    def get_statistics(self):
+        """
+        Returns the statistics of the searches that other peers sent us.
+        """
+        return {"result_cache": self.search_result_cache.get_statistics(),
+                "admission": self.search_admission.get_statistics()}
 
     def _create_search_response(self, identifier, results, candidate):
         # create search-response message
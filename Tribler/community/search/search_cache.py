@@ -0,0 +1,70 @@
+"""
+A cache for the results of the remote searches that other peers send us.
+"""
+from collections import OrderedDict
+from time import time
+
+SEARCH_CACHE_TTL = 60
+SEARCH_CACHE_MAX_SIZE = 250
+
+
+def normalize_keywords(keywords):
+    """
+    Returns the key to cache the results of a search for keywords under. The full text search does not care about the
+    case or the order of the keywords, so neither does the key.
+    """
+    return tuple(sorted(set(keyword.lower() for keyword in keywords)))
+
+
+class SearchResultCache(object):
+    """
+    Caches the results of full text searches for remote peers, least recently used results are evicted first.
+
+    Every entry is stored with the version of the collected torrents it was computed for, see
+    TorrentDBHandler.collected_torrents_version. An entry is not used anymore once torrents have been collected, removed
+    or renamed since. The entries also expire after a while, as the seeders and channels of the results change without
+    the collected torrents changing.
+    """
+
+    def __init__(self, ttl=SEARCH_CACHE_TTL, max_size=SEARCH_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+
+        # normalized keywords -> (expiration time, version of the collected torrents, results)
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, keywords, version):
+        """
+        :return: the cached results of a search for keywords, or None if they are not known for this version
+        """
+        key = normalize_keywords(keywords)
+        entry = self._entries.pop(key, None)
+        if entry and entry[0] > time() and entry[1] == version:
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        return None
+
+    def put(self, keywords, version, results):
+        key = normalize_keywords(keywords)
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.max_size:
+            self._entries.popitem(last=False)
+        self._entries[key] = (time() + self.ttl, version, results)
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_statistics(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": float(self.hits) / lookups if lookups else 0.0}
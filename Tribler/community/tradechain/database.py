@@ -1,3 +1,4 @@
+from Tribler.community.trustchain.block import TrustChainBlock
 from Tribler.community.trustchain.database import TrustChainDB
 
 
@@ -13,6 +14,29 @@ class TradeChainDB(TrustChainDB):
         """
         return self._getall(u"", ())
 
+    def get_blocks_since(self, block_id, limit=1000):
+        """
+        Return the blocks that were added after the block with the given id, in the order they were added.
+        Block ids are the rowids of the blocks table, they only increase as blocks are added.
+        :param block_id: the id of the last block that is already known, 0 to start at the first block
+        :param limit: the maximum number of blocks to return
+        :return: a list of (block id, block) tuples
+        """
+        db_result = self.execute(u"SELECT rowid, tx, public_key, sequence_number, link_public_key, "
+                                 u"link_sequence_number, previous_hash, signature, insert_time FROM %s "
+                                 u"WHERE rowid > ? ORDER BY rowid ASC LIMIT ?" % self.db_name,
+                                 (block_id, limit)).fetchall()
+        return [(db_item[0], TrustChainBlock(db_item[1:])) for db_item in db_result]
+
+    def get_block_hash(self, block_id):
+        """
+        Return the hash of the block with the given id, or None if there is no such block. The ids of the blocks change
+        when the database is recreated or vacuumed, so this is used to check whether a block id is still valid.
+        :param block_id: the id of the block, as returned by get_blocks_since
+        """
+        db_result = self.execute(u"SELECT block_hash FROM %s WHERE rowid = ?" % self.db_name, (block_id,)).fetchone()
+        return str(db_result[0]) if db_result else None
+
     def get_upgrade_script(self, current_version):
         """
         Return the upgrade script for a specific version.
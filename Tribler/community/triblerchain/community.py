@@ -198,22 +198,17 @@ class TriblerChainCommunity(TrustChainCommunity):
                 self.pending_bytes[pk].clean.reset(0)
         yield super(TriblerChainCommunity, self).unload_community()
 
-    def get_trust(self, member):
+    def get_block_trust(self, block):
         """
-        Get the trust for another member.
+        Get the trust for the member that created a block, given that it is their latest block.
         Currently this is just the amount of MBs exchanged with them.
 
-        :param member: the member we interacted with
-        :type member: dispersy.member.Member
+        :param block: the latest block of the member
+        :type block: TriblerChainBlock
         :return: the trust value for this member
         :rtype: int
         """
-        block = self.persistence.get_latest(member.public_key)
-        if block:
-            return block.transaction['total_up'] + block.transaction['total_down']
-        else:
-            # We need a minimum of 1 trust to have a chance to be selected in the categorical distribution.
-            return 1
+        return block.transaction['total_up'] + block.transaction['total_down']
 
 
 class TriblerChainCommunityCrawler(TriblerChainCommunity):
@@ -1,11 +1,88 @@
+from Tribler.Core.Utilities.encoding import decode
 from Tribler.community.trustchain.database import TrustChainDB
 
+# The number of blocks that are read at a time when rebuilding the interactor tables
+REBUILD_BATCH_SIZE = 1000
+
 
 class TriblerChainDB(TrustChainDB):
     """
     Persistence layer for the TriblerChain Community.
+
+    Besides the blocks, the database keeps the number of bytes every public key exchanged with each of its
+    interactors and the number of unique interactors of every public key. These tables are updated as blocks are
+    inserted, so the statistics do not have to be computed from all blocks of a public key.
     """
-    LATEST_DB_VERSION = 4
+    LATEST_DB_VERSION = 5
+
+    def _insert_blocks(self, blocks):
+        super(TriblerChainDB, self)._insert_blocks(blocks)
+        self._update_interactors(blocks)
+
+    def _update_interactors(self, blocks):
+        """
+        Add the bytes exchanged in the blocks to the interactor tables.
+        """
+        exchanged = {}
+        for block in blocks:
+            self._add_exchanged(exchanged, block.public_key, block.link_public_key, block.transaction)
+        self._store_exchanged(exchanged)
+
+    @staticmethod
+    def _add_exchanged(exchanged, public_key, link_public_key, transaction):
+        """
+        Add the bytes exchanged in a transaction to a dictionary (public_key, link_public_key) -> (up, down).
+        """
+        up, down = exchanged.get((public_key, link_public_key), (0, 0))
+        exchanged[(public_key, link_public_key)] = (up + int(transaction.get("up", 0)),
+                                                    down + int(transaction.get("down", 0)))
+
+    def _store_exchanged(self, exchanged):
+        """
+        Add the bytes in a dictionary (public_key, link_public_key) -> (up, down) to the interactor tables.
+        """
+        new_interactors = {}
+        for (public_key, link_public_key), (up, down) in exchanged.iteritems():
+            row = self.execute(u"SELECT up, down FROM %s_interactors WHERE public_key = ? AND link_public_key = ?"
+                               % self.db_name, (buffer(public_key), buffer(link_public_key))).fetchone()
+            old_up, old_down = row if row else (0, 0)
+            self.execute(u"INSERT OR REPLACE INTO %s_interactors (public_key, link_public_key, up, down) "
+                         u"VALUES(?,?,?,?)" % self.db_name,
+                         (buffer(public_key), buffer(link_public_key), old_up + up, old_down + down))
+
+            helped, helped_by = new_interactors.get(public_key, (0, 0))
+            new_interactors[public_key] = (helped + (old_up == 0 and up > 0),
+                                           helped_by + (old_down == 0 and down > 0))
+
+        self.executemany(u"INSERT OR IGNORE INTO %s_interactor_count (public_key) VALUES(?)" % self.db_name,
+                         [(buffer(public_key),) for public_key in new_interactors])
+        self.executemany(u"UPDATE %s_interactor_count SET peers_helped = peers_helped + ?, "
+                         u"peers_helped_by = peers_helped_by + ? WHERE public_key = ?" % self.db_name,
+                         [(helped, helped_by, buffer(public_key))
+                          for public_key, (helped, helped_by) in new_interactors.iteritems()])
+
+    def _rebuild_interactors(self):
+        """
+        Fill the interactor tables from the blocks that are already in the database.
+        """
+        self.execute(u"DELETE FROM %s_interactors" % self.db_name)
+        self.execute(u"DELETE FROM %s_interactor_count" % self.db_name)
+
+        # The blocks are read in batches, only the totals per pair of public keys are kept in memory
+        exchanged = {}
+        last_rowid = 0
+        while True:
+            rows = self.execute(u"SELECT rowid, tx, public_key, link_public_key FROM %s WHERE rowid > ? "
+                                u"ORDER BY rowid LIMIT ?" % self.db_name, (last_rowid, REBUILD_BATCH_SIZE)).fetchall()
+            for _, tx, public_key, link_public_key in rows:
+                _, transaction = decode(str(tx))
+                self._add_exchanged(exchanged, str(public_key), str(link_public_key), transaction)
+            if len(rows) < REBUILD_BATCH_SIZE:
+                break
+            last_rowid = rows[-1][0]
+
+        self._store_exchanged(exchanged)
+        self.commit()
 
     def get_num_unique_interactors(self, public_key):
         """
@@ -13,14 +90,30 @@ class TriblerChainDB(TrustChainDB):
         :param public_key: The public key of the member of which we want the information
         :return: A tuple of unique number of interactors that helped you and that you have helped respectively
         """
-        peers_you_helped = set()
-        peers_helped_you = set()
-        for block in self.get_latest_blocks(public_key, limit=-1):
-            if int(block.transaction["up"]) > 0:
-                peers_you_helped.add(block.link_public_key)
-            if int(block.transaction["down"]) > 0:
-                peers_helped_you.add(block.link_public_key)
-        return len(peers_you_helped), len(peers_helped_you)
+        row = self.execute(u"SELECT peers_helped, peers_helped_by FROM %s_interactor_count WHERE public_key = ?"
+                           % self.db_name, (buffer(public_key),)).fetchone()
+        return row if row else (0, 0)
+
+    def get_schema(self):
+        """
+        Return the schema for the database.
+        """
+        return super(TriblerChainDB, self).get_schema() + u"""
+        CREATE TABLE IF NOT EXISTS %s_interactors(
+         public_key           TEXT NOT NULL,
+         link_public_key      TEXT NOT NULL,
+         up                   INTEGER NOT NULL,
+         down                 INTEGER NOT NULL,
+
+         PRIMARY KEY (public_key, link_public_key)
+         );
+
+        CREATE TABLE IF NOT EXISTS %s_interactor_count(
+         public_key           TEXT PRIMARY KEY,
+         peers_helped         INTEGER NOT NULL DEFAULT 0,
+         peers_helped_by      INTEGER NOT NULL DEFAULT 0
+         );
+        """ % (self.db_name, self.db_name)
 
     def get_upgrade_script(self, current_version):
         """
@@ -32,3 +125,14 @@ class TriblerChainDB(TrustChainDB):
             DROP TABLE IF EXISTS %s;
             DROP TABLE IF EXISTS option;
             """ % self.db_name
+        if current_version == 4:
+            # The schema, with the indexes and the interactor tables, is created again after the upgrade
+            return u"""
+            DROP TABLE IF EXISTS option;
+            """
+
+    def check_database(self, database_version):
+        version = super(TriblerChainDB, self).check_database(database_version)
+        if int(database_version) == 4:
+            self._rebuild_interactors()
+        return version
@@ -53,6 +53,9 @@ class TrustChainBlock(object):
             if isinstance(self.signature, buffer):
                 self.signature = str(self.signature)
 
+        # (packed block, signature, outcome) of the last signature check done by verify_signature
+        self._signature_check = None
+
     def __str__(self):
         # This makes debugging and logging easier
         return "Block {0} from ...{1}:{2} links ...{3}:{4} for {5}".format(
@@ -168,8 +171,7 @@ class TrustChainBlock(object):
                 pck = self.pack(signature=False)
             except:
                 pck = None
-            if pck is None or not crypto.is_valid_signature(
-                    crypto.key_from_public_bin(self.public_key), pck, self.signature):
+            if pck is None or not self._is_valid_signature(crypto, pck):
                 err("Invalid signature")
         if not crypto.is_valid_public_bin(self.link_public_key):
             err("Linked public key is not valid")
@@ -240,6 +242,28 @@ class TrustChainBlock(object):
 
         return result[0], errors
 
+    def _is_valid_signature(self, crypto, pck):
+        if self._signature_check and self._signature_check[:2] == (pck, self.signature):
+            return self._signature_check[2]
+        return crypto.is_valid_signature(crypto.key_from_public_bin(self.public_key), pck, self.signature)
+
+    def verify_signature(self):
+        """
+        Checks the signature of this block ahead of validation, so validate does not have to check it again as long as
+        the block does not change. This does not touch the database, so it can be done outside the reactor thread.
+        :return: True if the public key and the signature are valid, False otherwise
+        """
+        crypto = ECCrypto()
+        if not crypto.is_valid_public_bin(self.public_key):
+            return False
+        try:
+            pck = self.pack(signature=False)
+        except:
+            return False
+        valid = crypto.is_valid_signature(crypto.key_from_public_bin(self.public_key), pck, self.signature)
+        self._signature_check = (pck, self.signature, valid)
+        return valid
+
     def sign(self, key):
         """
         Signs this block with the given key
@@ -324,7 +348,7 @@ class TrustChainBlock(object):
         :return: generator to iterate over all properties of this block
         """
         for key, value in self.__dict__.iteritems():
-            if key == 'key':
+            if key == 'key' or key.startswith('_'):
                 continue
             if isinstance(value, basestring) and key != "insert_time":
                 yield key, value.encode("hex")
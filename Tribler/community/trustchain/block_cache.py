@@ -0,0 +1,112 @@
+"""
+In-memory view on the blocks in the database that are needed to validate a batch of blocks.
+"""
+from bisect import bisect_left, bisect_right, insort
+
+from Tribler.community.trustchain.block import UNKNOWN_SEQ
+
+
+class BlockCache(object):
+    """
+    Answers the queries that TrustChainBlock.validate makes to the database for a batch of blocks, from the blocks that
+    are fetched for the whole batch at once.
+
+    For every creator of a block in the batch, the part of its chain spanned by the batch is fetched, together with the
+    closest blocks on either side. Furthermore, the blocks the batch links to and the blocks that link to the batch
+    are fetched. Queries that fall outside of what has been fetched are passed on to the database. Blocks that are
+    accepted while going through the batch are added with add_block, so later blocks in the batch are validated as if
+    the earlier ones had been stored already.
+    """
+
+    def __init__(self, database, blocks):
+        """
+        :param database: the database to fetch the blocks from
+        :param blocks: the blocks that are going to be validated
+        """
+        self.database = database
+
+        sequence_ranges = {}
+        block_ids = set()
+        link_ids = set()
+        for block in blocks:
+            lowest, highest = sequence_ranges.get(block.public_key, (block.sequence_number, block.sequence_number))
+            sequence_ranges[block.public_key] = (min(lowest, block.sequence_number),
+                                                 max(highest, block.sequence_number))
+            link_ids.add((block.public_key, block.sequence_number))
+            if block.link_sequence_number != UNKNOWN_SEQ:
+                block_ids.add((block.link_public_key, block.link_sequence_number))
+                link_ids.add((block.link_public_key, block.link_sequence_number))
+
+        fetched = database.get_validation_blocks(sequence_ranges, block_ids, link_ids)
+
+        # public key -> ([sequence numbers], {sequence number: block}) for the creators of the blocks in the batch
+        self._chains = dict((public_key, ([], {})) for public_key in sequence_ranges)
+        # (public key, sequence number) -> block or None, for the blocks the batch links to
+        self._blocks = dict.fromkeys(block_ids)
+        # (link public key, link sequence number) -> block or None
+        self._links = dict.fromkeys(link_ids)
+        for block in fetched:
+            self.add_block(block)
+
+        # public key -> (lowest, highest) sequence number of the part of the chain that has been fetched completely
+        self._ranges = {}
+        for public_key, (lowest, highest) in sequence_ranges.iteritems():
+            sequence_numbers = self._chains[public_key][0]
+            before = sequence_numbers[bisect_left(sequence_numbers, lowest) - 1] \
+                if sequence_numbers and sequence_numbers[0] < lowest else 0
+            index = bisect_right(sequence_numbers, highest)
+            after = sequence_numbers[index] if index < len(sequence_numbers) else float('inf')
+            self._ranges[public_key] = (before, after)
+
+    def add_block(self, block):
+        if block.public_key in self._chains:
+            sequence_numbers, chain = self._chains[block.public_key]
+            if block.sequence_number not in chain:
+                insort(sequence_numbers, block.sequence_number)
+            chain[block.sequence_number] = block
+        block_id = (block.public_key, block.sequence_number)
+        if block_id in self._blocks:
+            self._blocks[block_id] = block
+        link_id = (block.link_public_key, block.link_sequence_number)
+        if link_id in self._links and self._links[link_id] is None:
+            self._links[link_id] = block
+
+    def _in_range(self, public_key, lowest, highest):
+        """
+        Whether the chain of public key has been fetched completely from lowest up to and including highest.
+        """
+        if public_key not in self._ranges:
+            return False
+        before, after = self._ranges[public_key]
+        return before <= lowest and highest <= after
+
+    def get(self, public_key, sequence_number):
+        if self._in_range(public_key, sequence_number, sequence_number):
+            return self._chains[public_key][1].get(sequence_number)
+        if (public_key, sequence_number) in self._blocks:
+            return self._blocks[(public_key, sequence_number)]
+        return self.database.get(public_key, sequence_number)
+
+    def contains(self, block):
+        return self.get(block.public_key, block.sequence_number) is not None
+
+    def get_block_after(self, block):
+        if not self._in_range(block.public_key, block.sequence_number, block.sequence_number + 1):
+            return self.database.get_block_after(block)
+        sequence_numbers, chain = self._chains[block.public_key]
+        index = bisect_right(sequence_numbers, block.sequence_number)
+        return chain[sequence_numbers[index]] if index < len(sequence_numbers) else None
+
+    def get_block_before(self, block):
+        if not self._in_range(block.public_key, block.sequence_number - 1, block.sequence_number):
+            return self.database.get_block_before(block)
+        sequence_numbers, chain = self._chains[block.public_key]
+        index = bisect_left(sequence_numbers, block.sequence_number)
+        return chain[sequence_numbers[index - 1]] if index > 0 else None
+
+    def get_linked(self, block):
+        if (block.public_key, block.sequence_number) not in self._links:
+            return self.database.get_linked(block)
+        linked = self.get(block.link_public_key, block.link_sequence_number) \
+            if block.link_sequence_number != UNKNOWN_SEQ else None
+        return linked or self._links[(block.public_key, block.sequence_number)]
@@ -4,16 +4,18 @@ This reputation system builds a tamper proof interaction history contained in a
 Every node has a chain and these chains intertwine by blocks shared by chains.
 """
 import logging
-from random import randint
 from time import time
 
 from twisted.internet import reactor
 from twisted.internet.defer import succeed, Deferred, inlineCallbacks
 
 from Tribler.community.trustchain.block import TrustChainBlock, ValidationResult, GENESIS_SEQ, UNKNOWN_SEQ
+from Tribler.community.trustchain.block_cache import BlockCache
 from Tribler.community.trustchain.conversion import TrustChainConversion
 from Tribler.community.trustchain.database import TrustChainDB
 from Tribler.community.trustchain.payload import HalfBlockPayload, CrawlRequestPayload
+from Tribler.community.trustchain.signature_workers import SignatureWorkerPool
+from Tribler.community.trustchain.trust_table import TrustTable
 from Tribler.dispersy.authentication import NoAuthentication, MemberAuthentication
 from Tribler.dispersy.candidate import Candidate
 from Tribler.dispersy.community import Community
@@ -39,6 +41,11 @@ class TrustChainCommunity(Community):
         super(TrustChainCommunity, self).__init__(*args, **kwargs)
         self.logger = logging.getLogger(self.__class__.__name__)
         self.persistence = self.DB_CLASS(self.dispersy.working_directory, self.DB_NAME)
+        self.trust_table = TrustTable(self.get_block_trust)
+        self.signature_workers = None
+        self._shutting_down = False
+        self.blocks_ingested = 0
+        self.ingest_time = 0.0
 
         self._live_edge = []
         self._live_edge_id = 0
@@ -180,25 +187,110 @@ class TrustChainCommunity(Community):
         if validation[0] != ValidationResult.partial_next and validation[0] != ValidationResult.valid:
             self.logger.error("Signed block did not validate?! Result %s", repr(validation))
         else:
-            self.persistence.add_block(block)
+            self.store_block(block)
             self.send_block(candidate, block)
 
+    def store_block(self, block):
+        """
+        Persist a block and update the trust in its creator.
+        """
+        self.store_blocks([block])
+
+    def store_blocks(self, blocks):
+        """
+        Persist a number of blocks in one transaction and update the trust in their creators.
+        """
+        self.persistence.add_blocks(blocks)
+        for block in blocks:
+            self.trust_table.update(block)
+
+    def start_signature_workers(self, size):
+        """
+        Check the signatures of received half blocks on a pool of worker threads instead of the reactor thread.
+        :param size: the number of worker threads
+        """
+        self.signature_workers = SignatureWorkerPool(size)
+        self.signature_workers.start()
+
+    def validate_and_store_blocks(self, blocks):
+        """
+        Validate a batch of received blocks and store the blocks that are not invalid and not known yet.
+        The blocks of the batch and their neighbours are fetched from the database at once, and the new blocks are
+        stored in a single transaction.
+        :param blocks: the received blocks
+        :return: the validation result of every block
+        """
+        start_time = time()
+        # For a single block, the queries of validate are cheaper than fetching the chains involved
+        database = BlockCache(self.persistence, blocks) if len(blocks) > 1 else self.persistence
+
+        validations = []
+        new_blocks = []
+        for blk in blocks:
+            validation = blk.validate(database)
+            self.logger.debug("Block validation result %s, %s, (%s)", validation[0], validation[1], blk)
+            validations.append(validation)
+            if validation[0] == ValidationResult.invalid:
+                continue
+            elif not database.contains(blk):
+                new_blocks.append(blk)
+                if database is not self.persistence:
+                    database.add_block(blk)
+            else:
+                self.logger.debug("Received already known block (%s)", blk)
+
+        if new_blocks:
+            self.store_blocks(new_blocks)
+
+        duration = time() - start_time
+        self.blocks_ingested += len(new_blocks)
+        self.ingest_time += duration
+        if len(blocks) > 1:
+            self.logger.info("Ingested %d of %d blocks in %.3f s (%.0f blocks/s)", len(new_blocks), len(blocks),
+                             duration, len(new_blocks) / duration if duration else 0)
+        return validations
+
+    def get_ingest_rate(self):
+        """
+        Return the average number of received blocks that we stored per second spent on validating and storing them.
+        """
+        return self.blocks_ingested / self.ingest_time if self.ingest_time else 0.0
+
     def received_half_block(self, messages):
         """
         We've received a half block, either because we sent a SIGNED message to some one or we are crawling
         :param messages The half block messages
         """
         self.logger.debug("Received %d half block messages.", len(messages))
-        for message in messages:
+        if self.signature_workers and len(messages) > 1:
+            self.signature_workers.verify([message.payload.block for message in messages])\
+                .addCallback(lambda _: self.on_half_blocks_verified(messages))\
+                .addErrback(lambda failure: self.logger.error("Failed to process half blocks: %s", failure))
+        else:
+            self.process_half_blocks(messages)
+
+    def on_half_blocks_verified(self, messages):
+        """
+        Process half blocks once the signature workers checked their signatures, unless we are unloading.
+        :param messages The half block messages
+        """
+        if self._shutting_down:
+            self.logger.debug("Dropping %d verified half block messages, the community is unloading", len(messages))
+            return
+        self.process_half_blocks(messages)
+
+    def process_half_blocks(self, messages):
+        """
+        Validate and store received half blocks, and sign the ones that are addressed to us.
+        Messages that had their signatures checked by the signature workers can be processed after messages that were
+        received later. This is fine, since the blocks of different messages can arrive in any order anyway.
+        :param messages The half block messages
+        """
+        validations = self.validate_and_store_blocks([message.payload.block for message in messages])
+        for message, validation in zip(messages, validations):
             blk = message.payload.block
-            validation = blk.validate(self.persistence)
-            self.logger.debug("Block validation result %s, %s, (%s)", validation[0], validation[1], blk)
             if validation[0] == ValidationResult.invalid:
                 continue
-            elif not self.persistence.contains(blk):
-                self.persistence.add_block(blk)
-            else:
-                self.logger.debug("Received already known block (%s)", blk)
 
             # Check if we are waiting for this block
             block_id = "%s.%s" % (blk.public_key.encode('hex'), blk.sequence_number)
@@ -282,6 +374,10 @@ class TrustChainCommunity(Community):
     @inlineCallbacks
     def unload_community(self):
         self.logger.debug("Unloading the TrustChain Community.")
+        self._shutting_down = True
+        if self.signature_workers:
+            signature_workers, self.signature_workers = self.signature_workers, None
+            signature_workers.stop()
         yield super(TrustChainCommunity, self).unload_community()
         # Close the persistence layer
         self.persistence.close()
@@ -314,22 +410,32 @@ class TrustChainCommunity(Community):
             self.reset_live_edges()
         self._live_edges_enabled = value
 
+    def get_block_trust(self, block):
+        """
+        Get the trust for the member that created a block, given that it is their latest block.
+        Currently this is just the length of their chain.
+
+        :param block: the latest block of the member
+        :type block: TrustChainBlock
+        :return: the trust value for this member
+        :rtype: int
+        """
+        return block.sequence_number
+
     def get_trust(self, member):
         """
         Get the trust for another member.
-        Currently this is just the length of their chain.
+        The trust is read from the trust table, the database is only queried the first time we need the trust in a
+        member.
 
         :param member: the member we interacted with
         :type member: dispersy.member.Member
         :return: the trust value for this member
         :rtype: int
         """
-        block = self.persistence.get_latest(member.public_key)
-        if block:
-            return block.sequence_number
-        else:
-            # We need a minimum of 1 trust to have a chance to be selected in the categorical distribution.
-            return 1
+        if member.public_key not in self.trust_table:
+            self.trust_table.load(member.public_key, self.persistence.get_latest(member.public_key))
+        return self.trust_table.get(member.public_key)
 
     def dispersy_get_introduce_candidate(self, exclude_candidate=None):
         """
@@ -346,18 +452,15 @@ class TrustChainCommunity(Community):
             # If we have no trusted candidates, bootstrap this process.
             return super(TrustChainCommunity, self).dispersy_get_introduce_candidate(exclude_candidate)
 
-        total_trust = sum([self.get_trust(candidate.get_member()) for candidate in eligible])
+        public_keys = [candidate.get_member().public_key for candidate in eligible]
+        for public_key in public_keys:
+            if public_key not in self.trust_table:
+                self.trust_table.load(public_key, self.persistence.get_latest(public_key))
 
-        random_trust_i = randint(0, total_trust - 1)
-        current_trust_i = 0
-        for i in xrange(0, len(eligible)):
-            next_trust_i = self.get_trust(eligible[i].get_member())
-            if current_trust_i + next_trust_i > random_trust_i:
-                return eligible[i]
-            else:
-                current_trust_i += next_trust_i
-
-        return eligible[-1]
+        index = self.trust_table.choose(public_keys)
+        if index is None:
+            return super(TrustChainCommunity, self).dispersy_get_introduce_candidate(exclude_candidate)
+        return eligible[index]
 
     def on_introduction_response(self, messages):
         super(TrustChainCommunity, self).on_introduction_response(messages)
@@ -36,11 +36,25 @@ class TrustChainDB(Database):
         Persist a block
         :param block: The data that will be saved.
         """
-        self.execute(
+        self._insert_blocks([block])
+        self.commit()
+
+    def add_blocks(self, blocks):
+        """
+        Persist a number of blocks in a single transaction
+        :param blocks: The blocks that will be saved.
+        """
+        self._insert_blocks(blocks)
+        self.commit()
+
+    def _insert_blocks(self, blocks):
+        """
+        Insert blocks without committing, subclasses can extend this to update tables derived from the blocks.
+        """
+        self.executemany(
             u"INSERT INTO %s (tx, public_key, sequence_number, link_public_key,"
             u"link_sequence_number, previous_hash, signature, block_hash) VALUES(?,?,?,?,?,?,?,?)" % self.db_name,
-            block.pack_db_insert())
-        self.commit()
+            [block.pack_db_insert() for block in blocks])
 
     def _get(self, query, params):
         db_result = self.execute(self.get_sql_header() + query, params).fetchone()
@@ -107,6 +121,38 @@ class TrustChainDB(Database):
                          u"link_sequence_number = ?", (buffer(block.link_public_key), block.link_sequence_number,
                                                        buffer(block.public_key), block.sequence_number))
 
+    def get_validation_blocks(self, sequence_ranges, block_ids, link_ids):
+        """
+        Get the blocks needed to validate a batch of blocks, see BlockCache.
+        :param sequence_ranges: a dictionary of public key -> (lowest, highest) sequence number. The blocks of the
+        public key in this range are returned, together with the closest block before and the closest block after it.
+        :param block_ids: a list of (public key, sequence number) tuples of blocks to return
+        :param link_ids: a list of (public key, sequence number) tuples, the blocks that link to these are returned
+        :return: a list of blocks, blocks can be returned more than once
+        """
+        before = u"(SELECT MAX(sequence_number) FROM %s WHERE public_key = ? AND sequence_number < ?)" % self.db_name
+        after = u"(SELECT MIN(sequence_number) FROM %s WHERE public_key = ? AND sequence_number > ?)" % self.db_name
+        range_term = u"public_key = ? AND sequence_number BETWEEN IFNULL(%s, ?) AND IFNULL(%s, ?)" % (before, after)
+        terms = []
+        for public_key, (lowest, highest) in sequence_ranges.iteritems():
+            terms.append((range_term, [buffer(public_key), buffer(public_key), lowest, lowest,
+                                       buffer(public_key), highest, highest]))
+        for public_key, sequence_number in block_ids:
+            terms.append((u"public_key = ? AND sequence_number = ?", [buffer(public_key), sequence_number]))
+        for public_key, sequence_number in link_ids:
+            terms.append((u"link_public_key = ? AND link_sequence_number = ?", [buffer(public_key), sequence_number]))
+
+        blocks = []
+        while terms:
+            # SQLite allows at most 999 parameters in a query
+            query_terms, params = [], []
+            while terms and len(params) + len(terms[-1][1]) <= 999:
+                term, term_params = terms.pop()
+                query_terms.append(u"(%s)" % term)
+                params.extend(term_params)
+            blocks.extend(self._getall(u"WHERE " + u" OR ".join(query_terms), params))
+        return blocks
+
     def crawl(self, public_key, sequence_number, limit=100):
         assert limit <= 100, "Don't fetch too much"
         return self._getall(u"WHERE insert_time >= (SELECT MAX(insert_time) FROM %s WHERE public_key = ? AND "
@@ -142,9 +188,12 @@ class TrustChainDB(Database):
          PRIMARY KEY (public_key, sequence_number)
          );
 
+        CREATE INDEX IF NOT EXISTS %s_link_idx ON %s(link_public_key, link_sequence_number);
+        CREATE INDEX IF NOT EXISTS %s_insert_time_idx ON %s(insert_time);
+
         CREATE TABLE option(key TEXT PRIMARY KEY, value BLOB);
         INSERT INTO option(key, value) VALUES('database_version', '%s');
-        """ % (self.db_name, str(self.LATEST_DB_VERSION))
+        """ % ((self.db_name,) * 5 + (str(self.LATEST_DB_VERSION),))
 
     def get_upgrade_script(self, current_version):
         """
@@ -0,0 +1,50 @@
+from twisted.internet import reactor
+from twisted.internet.defer import gatherResults, succeed
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+
+
+def verify_signatures(blocks):
+    """
+    Checks the signatures of a number of blocks, see TrustChainBlock.verify_signature.
+    :return: the number of valid signatures
+    """
+    return sum(1 for block in blocks if block.verify_signature())
+
+
+class SignatureWorkerPool(object):
+    """
+    Checks the signatures of the blocks in a batch on a number of worker threads, before the batch is validated on the
+    reactor thread. The signature checks are the most expensive part of the validation and they do not need the
+    database. The curve25519 signatures are checked by libnacl, which releases the GIL.
+    """
+
+    def __init__(self, size):
+        assert size > 0, u"Invalid number of signature workers: %s" % size
+        self.size = size
+        self._threadpool = ThreadPool(minthreads=size, maxthreads=size, name=u"SignatureWorker")
+
+    @property
+    def running(self):
+        return self._threadpool.started
+
+    def start(self):
+        self._threadpool.start()
+
+    def stop(self):
+        """
+        Stops the worker threads, waiting for the jobs that are still queued.
+        """
+        self._threadpool.stop()
+
+    def verify(self, blocks):
+        """
+        Checks the signatures of the blocks, spread over the workers.
+        :return: a Deferred that fires with the number of valid signatures on the reactor thread
+        """
+        if not blocks:
+            return succeed(0)
+        chunk_size = (len(blocks) + self.size - 1) / self.size
+        return gatherResults([deferToThreadPool(reactor, self._threadpool, verify_signatures,
+                                                blocks[index:index + chunk_size])
+                              for index in xrange(0, len(blocks), chunk_size)]).addCallback(sum)
@@ -0,0 +1,90 @@
+"""
+In-memory table with the trust we have in other members, used to choose the candidates we introduce.
+"""
+from bisect import bisect_right
+from random import random
+
+# We need a minimum of 1 trust to have a chance to be selected in the categorical distribution.
+DEFAULT_TRUST = 1
+
+
+class TrustTable(object):
+    """
+    Keeps the trust of every member we looked up, together with the sequence number of the block it is based on.
+
+    The table does not read from the database itself: the community loads the trust of an unknown member once and
+    passes every block it stores to update, so the entries follow the latest block of each member. The cumulative
+    weights of the last sampled candidates are kept until the candidates or their trust change, so choosing a candidate
+    is a binary search.
+    """
+
+    def __init__(self, get_block_trust):
+        """
+        :param get_block_trust: function that returns the trust of the member that created the given block
+        """
+        self.get_block_trust = get_block_trust
+        # public key -> (sequence number of the latest block, trust)
+        self._entries = {}
+        self._version = 0
+
+        self._sample_keys = None
+        self._sample_version = None
+        self._cumulative_weights = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, public_key):
+        return public_key in self._entries
+
+    def get(self, public_key):
+        """
+        :return: the trust in the member, or None if the member is not in the table
+        """
+        entry = self._entries.get(public_key)
+        return entry[1] if entry else None
+
+    def load(self, public_key, latest_block):
+        """
+        Adds the trust in a member that is not in the table yet.
+        :param latest_block: the latest block of the member in the database, or None if there is none
+        """
+        if latest_block:
+            self._set(public_key, latest_block.sequence_number, self.get_block_trust(latest_block))
+        else:
+            self._set(public_key, 0, DEFAULT_TRUST)
+
+    def update(self, block):
+        """
+        Updates the trust in the creator of a block that has just been stored, if the block is newer than the one the
+        table knows about. Members that are not in the table are left alone, we do not know whether the block is their
+        latest one.
+        """
+        entry = self._entries.get(block.public_key)
+        if entry and block.sequence_number > entry[0]:
+            self._set(block.public_key, block.sequence_number, self.get_block_trust(block))
+
+    def _set(self, public_key, sequence_number, trust):
+        self._entries[public_key] = (sequence_number, trust)
+        self._version += 1
+
+    def choose(self, public_keys):
+        """
+        Chooses one of the given members, each with a chance proportional to our trust in them. All members should be
+        in the table.
+        :return: the index of the chosen member in public_keys, or None if we have no trust in any of them
+        """
+        if public_keys != self._sample_keys or self._version != self._sample_version:
+            total = 0
+            cumulative_weights = []
+            for public_key in public_keys:
+                total += self._entries[public_key][1]
+                cumulative_weights.append(total)
+            self._sample_keys = public_keys
+            self._sample_version = self._version
+            self._cumulative_weights = cumulative_weights
+
+        if not self._cumulative_weights or self._cumulative_weights[-1] <= 0:
+            return None
+        index = bisect_right(self._cumulative_weights, random() * self._cumulative_weights[-1])
+        return min(index, len(self._cumulative_weights) - 1)
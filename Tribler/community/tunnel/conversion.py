@@ -1,8 +1,7 @@
+import re
 from socket import inet_ntoa, inet_aton, error as socket_error
 from struct import pack, unpack_from
 
-from libtorrent import bdecode
-
 from Tribler.dispersy.conversion import BinaryConversion
 from Tribler.dispersy.endpoint import TUNNEL_PREFIX, TUNNEL_PREFIX_LENGHT
 from Tribler.dispersy.message import DropPacket
@@ -10,6 +9,17 @@ from Tribler.dispersy.message import DropPacket
 ADDRESS_TYPE_IPV4 = 0x01
 ADDRESS_TYPE_DOMAIN_NAME = 0x02
 
+# The protocols that are allowed to exit the tunnels
+PROTOCOL_DISPERSY = u"dispersy"
+PROTOCOL_UTP = u"utp"
+PROTOCOL_UDP_TRACKER = u"udp_tracker"
+PROTOCOL_DHT = u"dht"
+
+# KRPC messages nest a few levels deep at most, deeper structures are not considered DHT traffic
+MAX_BENCODE_DEPTH = 8
+BENCODED_INTEGER = re.compile(r"(0|-?[1-9][0-9]*)$")
+BENCODED_LENGTH = re.compile(r"(0|[1-9][0-9]*)$")
+
 
 class TunnelConversion(BinaryConversion):
 
@@ -438,6 +448,10 @@ class TunnelConversion(BinaryConversion):
 
     @staticmethod
     def swap_circuit_id(packet, message_type, old_circuit_id, new_circuit_id):
+        """
+        Rewrite the circuit id of a packet. Since the circuit id is located in the plaintext header, this can also be
+        passed just the header returned by split_encrypted_packet, which avoids copying the payload.
+        """
         circuit_id_pos = 0 if message_type == u"data" else 31
         circuit_id, = unpack_from('!I', packet, circuit_id_pos)
         assert circuit_id == old_circuit_id, circuit_id
@@ -507,13 +521,11 @@ class TunnelConversion(BinaryConversion):
 
     @staticmethod
     def convert_from_cell(packet):
-        header = packet[:22] + packet[35] + packet[23:31]
-        return header + packet[31:35] + packet[36:]
+        return ''.join((packet[:22], packet[35], packet[23:35], packet[36:]))
 
     @staticmethod
     def convert_to_cell(packet):
-        header = packet[:22] + '\x01' + packet[23:31]
-        return header + packet[31:35] + packet[22] + packet[35:]
+        return ''.join((packet[:22], '\x01', packet[23:35], packet[22], packet[35:]))
 
     @staticmethod
     def could_be_utp(data):
@@ -536,23 +548,90 @@ class TunnelConversion(BinaryConversion):
             return True
         return False
 
+    @staticmethod
+    def skip_bencoded(data, offset):
+        """
+        Finds the end of the bencoded value at offset, without decoding it. Integers and string lengths are validated
+        strictly, so "i-0e", "i--5e", "i03e" and "01:a" are rejected.
+        :return: the offset after the value, or -1 if the value is malformed or nested too deeply
+        """
+        depth = 0
+        while offset < len(data):
+            char = data[offset]
+            if char == 'i':
+                end = data.find('e', offset + 1, offset + 23)
+                if end < 0 or not BENCODED_INTEGER.match(data, offset + 1, end):
+                    return -1
+                offset = end + 1
+            elif char.isdigit():
+                colon = data.find(':', offset, offset + 8)
+                if colon < 0 or not BENCODED_LENGTH.match(data, offset, colon):
+                    return -1
+                offset = colon + 1 + int(data[offset:colon])
+                if offset > len(data):
+                    return -1
+            elif char == 'l' or char == 'd':
+                depth += 1
+                if depth > MAX_BENCODE_DEPTH:
+                    return -1
+                offset += 1
+                continue
+            elif char == 'e' and depth > 0:
+                depth -= 1
+                offset += 1
+            else:
+                return -1
+
+            if depth == 0:
+                return offset
+        return -1
+
     @staticmethod
     def could_be_dht(data):
-        try:
-            decoded = bdecode(data)
-            if isinstance(decoded, dict) and decoded.get('y') in ['q', 'r', 'e']:
-                return True
-        except:
-            pass
-        return False
+        """
+        KRPC messages are bencoded dictionaries with the message type ("q", "r" or "e") stored under the "y" key. Every
+        key and value of the top-level dictionary is walked, and the dictionary has to end at the last byte of the
+        datagram, so arbitrary data cannot be smuggled out after a valid "y" key.
+        """
+        if len(data) < 8 or data[0] != 'd' or data[-1] != 'e':
+            return False
+
+        message_type = None
+        offset = 1
+        while offset < len(data) - 1:
+            if not data[offset].isdigit():
+                return False
+            key_end = TunnelConversion.skip_bencoded(data, offset)
+            if key_end < 0:
+                return False
+            value_end = TunnelConversion.skip_bencoded(data, key_end)
+            if value_end < 0:
+                return False
+            if data[offset:key_end] == '1:y':
+                message_type = data[key_end:value_end]
+            offset = value_end
+        return offset == len(data) - 1 and message_type in ('1:q', '1:r', '1:e')
 
     @staticmethod
     def could_be_dispersy(data):
         return data[:TUNNEL_PREFIX_LENGHT] == TUNNEL_PREFIX and len(data) >= (23 + TUNNEL_PREFIX_LENGHT)
 
+    @staticmethod
+    def classify(data):
+        """
+        Determine the protocol of a datagram by inspecting its header.
+        :return: one of the PROTOCOL_* constants, or None if the datagram is not allowed to exit the tunnels
+        """
+        if TunnelConversion.could_be_dispersy(data):
+            return PROTOCOL_DISPERSY
+        if TunnelConversion.could_be_utp(data):
+            return PROTOCOL_UTP
+        if TunnelConversion.could_be_udp_tracker(data):
+            return PROTOCOL_UDP_TRACKER
+        if TunnelConversion.could_be_dht(data):
+            return PROTOCOL_DHT
+        return None
+
     @staticmethod
     def is_allowed(data):
-        return (TunnelConversion.could_be_utp(data) or
-                TunnelConversion.could_be_udp_tracker(data) or
-                TunnelConversion.could_be_dht(data) or
-                TunnelConversion.could_be_dispersy(data))
+        return TunnelConversion.classify(data) is not None
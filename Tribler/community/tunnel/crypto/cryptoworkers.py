@@ -0,0 +1,67 @@
+import logging
+
+from twisted.internet import reactor
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+
+from Tribler.community.tunnel.crypto.tunnelcrypto import TunnelCrypto
+
+
+def process_cell(crypto, method, key_args, plaintext, encrypted):
+    """
+    Adds or removes a layer of encryption on the encrypted part of a cell.
+    :param crypto: the TunnelCrypto of the worker running this job
+    :param method: either "encrypt_str" or "decrypt_str"
+    :param key_args: the session key material passed to the crypto method
+    :return: the resulting datagram
+    """
+    return plaintext + getattr(crypto, method)(encrypted, *key_args)
+
+
+class CryptoWorkerPool(object):
+    """
+    Runs the AES-GCM work for cells outside of the reactor thread.
+
+    Circuits are sharded over a number of single-threaded workers by circuit_id. Since every worker handles its jobs
+    one at a time and hands the results back to the reactor in the same order, the cells of a circuit leave this
+    pool in the order they were submitted. Every worker has its own TunnelCrypto, so cipher contexts are never
+    shared between threads. The cryptography backend releases the GIL while encrypting, so multiple workers can
+    keep multiple cores busy.
+    """
+
+    def __init__(self, size):
+        assert size > 0, u"Invalid number of crypto workers: %s" % size
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self.size = size
+        self._shards = [(ThreadPool(minthreads=1, maxthreads=1, name=u"CryptoWorker-%d" % index), TunnelCrypto())
+                        for index in xrange(size)]
+        self.jobs_submitted = [0] * size
+
+    @property
+    def running(self):
+        return all(threadpool.started for threadpool, _ in self._shards)
+
+    def start(self):
+        for threadpool, _ in self._shards:
+            threadpool.start()
+
+    def stop(self):
+        """
+        Stops the worker threads, waiting for the jobs that are still queued.
+        """
+        for threadpool, _ in self._shards:
+            threadpool.stop()
+
+    def get_shard(self, circuit_id):
+        return circuit_id % self.size
+
+    def submit(self, circuit_id, job, *args):
+        """
+        Runs job(crypto, *args) on the worker responsible for this circuit.
+        :return: a Deferred that fires with the result of the job on the reactor thread
+        """
+        shard = self.get_shard(circuit_id)
+        threadpool, crypto = self._shards[shard]
+        self.jobs_submitted[shard] += 1
+        return deferToThreadPool(reactor, threadpool, job, crypto, *args)
@@ -18,3 +18,9 @@ try:
 except ImportError:
     logger.error("cannnot continue without cryptography")
     raise
+
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    # Older versions of cryptography (< 2.0) do not provide the AEAD interface
+    AESGCM = None
@@ -1,8 +1,14 @@
 import struct
+from collections import OrderedDict
 
 from Tribler.dispersy.crypto import ECCrypto, LibNaCLPK
 from Tribler.community.tunnel.crypto.cryptowrapper import crypto_box_beforenm, crypto_auth, crypto_auth_verify, Cipher,\
-    algorithms, modes, HKDFExpand, hashes, default_backend
+    algorithms, modes, HKDFExpand, hashes, default_backend, AESGCM
+
+GCM_TAG_LENGTH = 16
+# salt_explicit and the GCM tag are prepended to every encrypted string
+GCM_HEADER_LENGTH = 8 + GCM_TAG_LENGTH
+CIPHER_CACHE_SIZE = 1024
 
 
 class CryptoException(Exception):
@@ -11,6 +17,13 @@ class CryptoException(Exception):
 
 class TunnelCrypto(ECCrypto):
 
+    def __init__(self):
+        super(TunnelCrypto, self).__init__()
+        # Session keys are reused for every cell on a circuit, so we keep the key schedule around instead of
+        # rebuilding it for each cell
+        self._cipher_cache = OrderedDict()
+        self._backend = default_backend()
+
     def initialize(self, community):
         self.community = community
         self.key = self.community.my_member._ec
@@ -62,27 +75,45 @@ class TunnelCrypto(ECCrypto):
 
         return salt + str(salt_explicit)
 
+    def _get_cipher(self, key):
+        """
+        Return the (cached) cipher context for a session key. This is an AESGCM instance when the installed version
+        of cryptography supports it, otherwise it is the AES algorithm object used to construct a Cipher.
+        """
+        cipher = self._cipher_cache.pop(key, None)
+        if cipher is None:
+            cipher = AESGCM(key) if AESGCM else algorithms.AES(key)
+            if len(self._cipher_cache) >= CIPHER_CACHE_SIZE:
+                self._cipher_cache.popitem(last=False)
+        self._cipher_cache[key] = cipher
+        return cipher
+
     def encrypt_str(self, content, key, salt, salt_explicit):
         # return the encrypted content prepended with the
         # gcm tag and salt_explicit
-        cipher = Cipher(algorithms.AES(key),
-                        modes.GCM(initialization_vector=self._bulid_iv(salt, salt_explicit)),
-                        backend=default_backend()
-                        ).encryptor()
-        ciphertext = cipher.update(content) + cipher.finalize()
-        return struct.pack('!q16s', salt_explicit, cipher.tag) + ciphertext
+        iv = self._bulid_iv(salt, salt_explicit)
+        cipher = self._get_cipher(key)
+        if AESGCM:
+            ciphertext = cipher.encrypt(iv, content, None)
+            return struct.pack('!q16s', salt_explicit, ciphertext[-GCM_TAG_LENGTH:]) + ciphertext[:-GCM_TAG_LENGTH]
+
+        encryptor = Cipher(cipher, modes.GCM(initialization_vector=iv), backend=self._backend).encryptor()
+        ciphertext = encryptor.update(content) + encryptor.finalize()
+        return struct.pack('!q16s', salt_explicit, encryptor.tag) + ciphertext
 
     def decrypt_str(self, content, key, salt):
         # content contains the gcm tag and salt_explicit in plaintext
-        if len(content) < 24:
+        if len(content) < GCM_HEADER_LENGTH:
             raise CryptoException("truncated content")
 
         salt_explicit, gcm_tag = struct.unpack_from('!q16s', content)
-        cipher = Cipher(algorithms.AES(key),
-                        modes.GCM(initialization_vector=self._bulid_iv(salt, salt_explicit), tag=gcm_tag),
-                        backend=default_backend()
-                        ).decryptor()
-        return cipher.update(content[24:]) + cipher.finalize()
+        iv = self._bulid_iv(salt, salt_explicit)
+        cipher = self._get_cipher(key)
+        if AESGCM:
+            return cipher.decrypt(iv, content[GCM_HEADER_LENGTH:] + gcm_tag, None)
+
+        decryptor = Cipher(cipher, modes.GCM(initialization_vector=iv, tag=gcm_tag), backend=self._backend).decryptor()
+        return decryptor.update(content[GCM_HEADER_LENGTH:]) + decryptor.finalize()
 
 class NoTunnelCrypto(TunnelCrypto):
 
@@ -18,13 +18,15 @@ from twisted.internet.protocol import DatagramProtocol
 from twisted.internet.task import LoopingCall
 from twisted.python.threadable import isInIOThread
 
+from Tribler.Core.Utilities.dns_cache import DnsCache
 from Tribler.Core.Utilities.encoding import decode, encode
 from Tribler.community.tunnel import (CIRCUIT_ID_PORT, CIRCUIT_STATE_EXTENDING, CIRCUIT_STATE_READY, CIRCUIT_TYPE_DATA,
                                       CIRCUIT_TYPE_RENDEZVOUS, CIRCUIT_TYPE_RP, EXIT_NODE, EXIT_NODE_SALT, ORIGINATOR,
                                       ORIGINATOR_SALT, PING_INTERVAL)
 from Tribler.community.tunnel.Socks5.server import Socks5Server
 from Tribler.community.tunnel.conversion import TunnelConversion
-from Tribler.community.tunnel.crypto.tunnelcrypto import CryptoException, TunnelCrypto
+from Tribler.community.tunnel.crypto.cryptoworkers import CryptoWorkerPool, process_cell
+from Tribler.community.tunnel.crypto.tunnelcrypto import CryptoException, TunnelCrypto, GCM_HEADER_LENGTH
 from Tribler.community.tunnel.payload import (CellPayload, CreatePayload, CreatedPayload, DestroyPayload, ExtendPayload,
                                               ExtendedPayload, PingPayload, PongPayload, StatsRequestPayload,
                                               StatsResponsePayload, TunnelIntroductionRequestPayload,
@@ -127,6 +129,9 @@ class TunnelExitSocket(DatagramProtocol, TaskManager):
         self.community = community
         self.ips = defaultdict(int)
         self.bytes_up = self.bytes_down = 0
+        # Number of datagrams that were sent and received, by protocol
+        self.packets_out = defaultdict(int)
+        self.packets_in = defaultdict(int)
         self.creation_time = time.time()
         self.mid = mid
 
@@ -140,7 +145,9 @@ class TunnelExitSocket(DatagramProtocol, TaskManager):
 
     def sendto(self, data, destination):
         if self.check_num_packets(destination, False):
-            if TunnelConversion.is_allowed(data):
+            protocol = TunnelConversion.classify(data)
+            if protocol:
+                self.packets_out[protocol] += 1
                 def on_error(failure):
                     self.tunnel_logger.error("Can't resolve ip address for hostname %s. Failure: %s",
                                              destination[0], failure)
@@ -155,9 +162,11 @@ class TunnelExitSocket(DatagramProtocol, TaskManager):
                             "Failed to write data to transport: %s. Destination: %r error was: %r",
                             exception, destination, exception)
 
-                resolve_ip_address_deferred = reactor.resolve(destination[0])
+                resolve_ip_address_deferred = self.community.dns_cache.resolve(destination[0])
                 resolve_ip_address_deferred.addCallbacks(on_ip_address, on_error)
-                self.register_task("resolving_%r" % destination[0], resolve_ip_address_deferred)
+                # Only lookups that are still in progress need to be waited for when closing this socket
+                if not resolve_ip_address_deferred.called:
+                    self.register_task("resolving_%r" % destination[0], resolve_ip_address_deferred)
             else:
                 self.tunnel_logger.error("dropping forbidden packets from exit socket with circuit_id %d",
                                          self.circuit_id)
@@ -165,7 +174,9 @@ class TunnelExitSocket(DatagramProtocol, TaskManager):
     def datagramReceived(self, data, source):
         self.community.increase_bytes_received(self, len(data))
         if self.check_num_packets(source, True):
-            if TunnelConversion.is_allowed(data):
+            protocol = TunnelConversion.classify(data)
+            if protocol:
+                self.packets_in[protocol] += 1
                 self.tunnel_data(source, data)
             else:
                 self.tunnel_logger.warning("dropping forbidden packets to exit socket with circuit_id %d",
@@ -232,6 +243,10 @@ class TunnelSettings(object):
         self.max_packets_without_reply = 50
         self.dht_lookup_interval = 30
 
+        # Number of threads that encrypt/decrypt cells for the circuits we relay or exit. When set to 0, all crypto
+        # is done on the reactor thread.
+        self.crypto_workers = 0
+
         if tribler_session:
             self.socks_listen_ports = tribler_session.config.get_tunnel_community_socks5_listen_ports()
             self.become_exitnode = tribler_session.config.get_tunnel_community_exitnode_enabled()
@@ -293,6 +308,8 @@ class TunnelCommunity(Community):
                              '43e8807e6f86ef2f0a784fbc8fa21f8bc49a82ae'.decode('hex'),
                              'e79efd8853cef1640b93c149d7b0f067f6ccf221'.decode('hex')]
         self.bittorrent_peers = {}
+        self.crypto_workers = None
+        self.dns_cache = DnsCache()
 
         self.tribler_session = self.settings = self.socks_server = None
 
@@ -308,6 +325,10 @@ class TunnelCommunity(Community):
 
         self.crypto.initialize(self)
 
+        if self.settings.crypto_workers > 0:
+            self.crypto_workers = CryptoWorkerPool(self.settings.crypto_workers)
+            self.crypto_workers.start()
+
         self.dispersy.endpoint.listen_to(self.data_prefix, self.on_data)
 
         self.register_task("do_circuits", LoopingCall(self.do_circuits)).start(5, now=True)
@@ -406,6 +427,10 @@ class TunnelCommunity(Community):
         for circuit_id in self.exit_sockets.keys():
             self.remove_exit_socket(circuit_id, 'unload', destroy=True)
 
+        if self.crypto_workers:
+            crypto_workers, self.crypto_workers = self.crypto_workers, None
+            crypto_workers.stop()
+
         yield super(TunnelCommunity, self).unload_community()
 
     @property
@@ -761,6 +786,15 @@ class TunnelCommunity(Community):
 
         if message_type not in [u'create', u'created']:
             plaintext, encrypted = TunnelConversion.split_encrypted_packet(packet, message_type)
+
+            if self.crypto_workers and is_data and self.is_exit(circuit_id) and circuit_id not in self.circuits:
+                method, key_args = self.get_relay_crypto_args(circuit_id, ORIGINATOR)
+                self.crypto_workers.submit(circuit_id, process_cell, method, key_args, plaintext, encrypted)\
+                    .addCallbacks(lambda packet: self.send_packet(candidates, message_type, packet),
+                                  self.on_crypto_worker_error, errbackArgs=(circuit_id,))
+                # The packet is sent once the crypto worker is done, report the size it is going to have
+                return len(packet) + GCM_HEADER_LENGTH
+
             try:
                 encrypted = self.crypto_out(circuit_id, encrypted, is_data=is_data)
                 packet = plaintext + encrypted
@@ -798,6 +832,16 @@ class TunnelCommunity(Community):
             self.increase_bytes_received(this_relay, len(packet))
 
         plaintext, encrypted = TunnelConversion.split_encrypted_packet(packet, message_type)
+        # The circuit id is part of the plaintext header, so we only need to rewrite that (small) part of the packet
+        plaintext = TunnelConversion.swap_circuit_id(plaintext, message_type, circuit_id, next_relay.circuit_id)
+
+        if self.crypto_workers and not next_relay.rendezvous_relay:
+            method, key_args = self.get_relay_crypto_args(circuit_id, self.directions[circuit_id])
+            self.crypto_workers.submit(circuit_id, process_cell, method, key_args, plaintext, encrypted)\
+                .addCallbacks(self.send_relayed_packet, self.on_crypto_worker_error,
+                              callbackArgs=(circuit_id, message_type), errbackArgs=(circuit_id,))
+            return True
+
         try:
             if next_relay.rendezvous_relay:
                 decrypted = self.crypto_in(circuit_id, encrypted)
@@ -810,10 +854,33 @@ class TunnelCommunity(Community):
             self.tunnel_logger.error(str(e))
             return False
 
-        packet = TunnelConversion.swap_circuit_id(packet, message_type, circuit_id, next_relay.circuit_id)
-        self.increase_bytes_sent(next_relay, self.send_packet([Candidate(next_relay.sock_addr, False)], message_type, packet))
+        self.send_relayed_packet(packet, circuit_id, message_type)
         return True
 
+    def send_relayed_packet(self, packet, circuit_id, message_type):
+        next_relay = self.relay_from_to.get(circuit_id, None)
+        if not next_relay:
+            self.tunnel_logger.warning("Dropping %s for relay %d, the relay has been removed", message_type, circuit_id)
+            return
+
+        self.increase_bytes_sent(next_relay, self.send_packet([Candidate(next_relay.sock_addr, False)],
+                                                              message_type, packet))
+
+    def get_relay_crypto_args(self, circuit_id, direction):
+        """
+        Returns the crypto method and key material for adding (towards the originator) or removing (towards the exit)
+        our layer of encryption on a cell of a circuit that we relay or exit. Any change to the session keys happens
+        here, on the reactor thread, so the actual encryption can run on a crypto worker.
+        """
+        keys = self.relay_session_keys[circuit_id]
+        if direction == ORIGINATOR:
+            return "encrypt_str", self.get_session_keys(keys, ORIGINATOR)
+        return "decrypt_str", (keys[EXIT_NODE], keys[EXIT_NODE_SALT])
+
+    def on_crypto_worker_error(self, failure, circuit_id):
+        self.tunnel_logger.warning("Crypto worker failed to process cell for circuit %d: %s",
+                                   circuit_id, failure.getErrorMessage())
+
     def check_create(self, messages):
         for message in messages:
             if self.crypto.key and self.crypto.key.key_to_hash() != message.payload.node_id:
@@ -1171,6 +1238,13 @@ class TunnelCommunity(Community):
         if self.is_relay(circuit_id):
             self.relay_packet(circuit_id, message_type, packet)
 
+        elif self.crypto_workers and self.is_exit(circuit_id) and circuit_id not in self.circuits:
+            plaintext, encrypted = TunnelConversion.split_encrypted_packet(packet, message_type)
+            method, key_args = self.get_relay_crypto_args(circuit_id, EXIT_NODE)
+            self.crypto_workers.submit(circuit_id, process_cell, method, key_args, plaintext, encrypted)\
+                .addCallbacks(self.on_decrypted_data, self.on_crypto_worker_error,
+                              callbackArgs=(sock_addr,), errbackArgs=(circuit_id,))
+
         else:
             plaintext, encrypted = TunnelConversion.split_encrypted_packet(packet, message_type)
 
@@ -1181,30 +1255,32 @@ class TunnelCommunity(Community):
                 self.tunnel_logger.warning(str(e))
                 return
 
-            packet = plaintext + encrypted
-            circuit_id, destination, origin, data = TunnelConversion.decode_data(packet)
-
-            circuit = self.circuits.get(circuit_id, None)
-            if circuit and origin and sock_addr == circuit.first_hop:
-                circuit.beat_heart()
-                self.increase_bytes_received(circuit, len(packet))
-
-                if TunnelConversion.could_be_dispersy(data):
-                    self.tunnel_logger.debug("Giving incoming data packet to dispersy")
-                    self.dispersy.on_incoming_packets([(Candidate(origin, False),
-                                                        data[TUNNEL_PREFIX_LENGHT:])],
-                                                      False, source=u"circuit_%d" % circuit_id)
-                else:
-                    anon_seed = circuit.ctype == CIRCUIT_TYPE_RP
-                    self.socks_server.on_incoming_from_tunnel(self, circuit, origin, data, anon_seed)
+            self.on_decrypted_data(plaintext + encrypted, sock_addr)
+
+    def on_decrypted_data(self, packet, sock_addr):
+        circuit_id, destination, origin, data = TunnelConversion.decode_data(packet)
 
-            # It is not our circuit so we got it from a relay, we need to EXIT it!
+        circuit = self.circuits.get(circuit_id, None)
+        if circuit and origin and sock_addr == circuit.first_hop:
+            circuit.beat_heart()
+            self.increase_bytes_received(circuit, len(packet))
+
+            if TunnelConversion.could_be_dispersy(data):
+                self.tunnel_logger.debug("Giving incoming data packet to dispersy")
+                self.dispersy.on_incoming_packets([(Candidate(origin, False),
+                                                    data[TUNNEL_PREFIX_LENGHT:])],
+                                                  False, source=u"circuit_%d" % circuit_id)
             else:
-                self.tunnel_logger.debug("data for circuit %d exiting tunnel (%s)", circuit_id, destination)
-                if destination != ('0.0.0.0', 0):
-                    self.exit_data(circuit_id, sock_addr, destination, data)
-                else:
-                    self.tunnel_logger.warning("cannot exit data, destination is 0.0.0.0:0")
+                anon_seed = circuit.ctype == CIRCUIT_TYPE_RP
+                self.socks_server.on_incoming_from_tunnel(self, circuit, origin, data, anon_seed)
+
+        # It is not our circuit so we got it from a relay, we need to EXIT it!
+        else:
+            self.tunnel_logger.debug("data for circuit %d exiting tunnel (%s)", circuit_id, destination)
+            if destination != ('0.0.0.0', 0):
+                self.exit_data(circuit_id, sock_addr, destination, data)
+            else:
+                self.tunnel_logger.warning("cannot exit data, destination is 0.0.0.0:0")
 
     def on_ping(self, messages):
         for message in messages:
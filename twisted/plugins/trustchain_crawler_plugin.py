@@ -22,6 +22,7 @@ class Options(usage.Options):
           if os.environ.get('HOME') else u'.trustchain', "Use an alternate statedir"    , unicode],
         ["ip"      , "i", "0.0.0.0" ,  "Dispersy uses this ip"                          , str],
         ["port"    , "p", 6421      ,  "Dispersy uses this UDP port"                    , int],
+        ["signatureworkers", "w", 4  ,  "Number of threads that check block signatures" , int],
     ]
 
 
@@ -52,7 +53,9 @@ class TrustchainCrawlerServiceMaker(object):
                 raise RuntimeError("Unable to start Dispersy")
             master_member = TriblerChainCommunityCrawler.get_master_members(dispersy)[0]
             my_member = dispersy.get_member(private_key=crypto.key_to_bin(crypto.generate_key(u"curve25519")))
-            TriblerChainCommunityCrawler.init_community(dispersy, master_member, my_member)
+            community = TriblerChainCommunityCrawler.init_community(dispersy, master_member, my_member)
+            if options["signatureworkers"] > 0:
+                community.start_signature_workers(options["signatureworkers"])
 
             self._stopping = False
 
@@ -92,6 +92,8 @@ class Options(usage.Options):
         ["dispersy", "d", -1, 'Dispersy port', check_dispersy_port],
         ["crawl", "c", None, 'Enable crawler and use the keypair specified in the given filename', check_crawler_keypair],
         ["tunnelapi", "j", 0, 'Enable JSON api, which will run on the provided port number', check_json_port],
+        ["cryptoworkers", "w", 0, 'Number of threads used to encrypt relayed and exited cells (0 uses the reactor)',
+         int],
     ]
 
 
@@ -114,6 +116,7 @@ class TunnelRootEndpoint(resource.Resource):
         self.tunnel = tunnel
         self.putChild("history", TunnelHistoryEndpoint(self.tunnel))
         self.putChild("stats", TunnelStatsEndpoint(self.tunnel))
+        self.putChild("dns", TunnelDnsCacheEndpoint(self.tunnel))
 
 
 class TunnelStatsEndpoint(resource.Resource):
@@ -128,6 +131,20 @@ class TunnelStatsEndpoint(resource.Resource):
         return json.dumps(self.tunnel.get_stats())
 
 
+class TunnelDnsCacheEndpoint(resource.Resource):
+    """
+    This endpoint is responsible for handling requests for the statistics of the DNS cache used by the exit sockets.
+    """
+    def __init__(self, tunnel):
+        resource.Resource.__init__(self)
+        self.tunnel = tunnel
+
+    def render_GET(self, request):
+        if not self.tunnel.community:
+            return json.dumps({})
+        return json.dumps(self.tunnel.community.dns_cache.get_statistics())
+
+
 class TunnelHistoryEndpoint(resource.Resource):
     """
     This endpoint is responsible for handling tunnel history requests.
@@ -442,6 +459,10 @@ class TunnelHelperServiceMaker(object):
         else:
             logger.info("Trustchain disabled")
 
+        settings.crypto_workers = options["cryptoworkers"]
+        if settings.crypto_workers > 0:
+            logger.info("Using %d crypto workers", settings.crypto_workers)
+
         tunnel = Tunnel(settings, crawl_keypair_filename, dispersy_port)
         StandardIO(LineHandler(tunnel))
 